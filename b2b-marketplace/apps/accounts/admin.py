@@ -16,7 +16,7 @@ class CustomUserAdmin(UserAdmin):
     search_fields = ['email', 'username']
 
 class ProfileAdmin(admin.ModelAdmin):
-    list_display = ('user', 'company_name', 'phone_number', 'country')
+    list_display = ('user', 'company_name', 'phone_number', 'country', 'reputation_score', 'reputation_updated_at')
     search_fields = ('user__username', 'user__email', 'company_name')
     list_filter = ('country',)
 
@@ -7,4 +7,5 @@ class AccountsConfig(AppConfig):
 
     def ready(self):
         import apps.accounts.signals # Add this line
+        import apps.accounts.checks # Registers the deploy checks
 
@@ -0,0 +1,213 @@
+# apps/accounts/authentication.py
+"""
+Cached token authentication.
+
+DRF's TokenAuthentication runs a Token JOIN user query on every authenticated request, and most
+views then touch `request.user.profile` (e.g. UserSerializer nests it), which is another query.
+CachedTokenAuthentication keeps a snapshot of the user and profile columns per token instead. The
+password hash is left out; the user instance is built with it deferred, so save() never writes it
+back. The snapshot lives in two levels:
+
+- a bounded in-process LRU (TOKEN_AUTH_CACHE_MAX_ENTRIES entries, TOKEN_AUTH_CACHE_LOCAL_TTL seconds)
+- the shared Django cache (TOKEN_AUTH_CACHE_TTL seconds), keyed by a hash of the token, never the raw key
+
+On a hit, authentication and `request.user.profile` need no query. On a miss, one query loads token,
+user and profile together. Entries are invalidated (see signals.py) when a token is deleted and when
+a user or profile is saved, which includes password changes, deactivation and user_type changes. The
+reputation job invalidates the sellers it updates. Queryset .update() calls that bypass signals are
+not seen, such as the rating mirror in reviews_ratings; those columns can lag by up to TOKEN_AUTH_CACHE_TTL.
+
+Invalidation deletes the shared entry, so other worker processes see a change once their LRU copy
+expires, within TOKEN_AUTH_CACHE_LOCAL_TTL. That needs a cache shared by the workers. With a
+process-local backend (local memory, the default without CACHE_REDIS_URL) a delete would only reach
+the worker that made it, so the shared level is skipped and each process keeps just its LRU: other
+processes still see changes within TOKEN_AUTH_CACHE_LOCAL_TTL, at the cost of more misses.
+`manage.py check --deploy` reports the process-local setup as an error (see checks.py).
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.fields.files import FieldFile
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from apps.core.utils import cache_is_shared
+from .models import CustomUser, Profile
+
+
+def _columns(instance, exclude=()):
+    """{attname: value} for the concrete fields, in field order; files are stored by name."""
+    values = {}
+    for field in instance._meta.concrete_fields:
+        if field.attname in exclude:
+            continue
+        value = getattr(instance, field.attname)
+        values[field.attname] = value.name if isinstance(value, FieldFile) else value
+    return values
+
+
+class TokenSnapshotCache:
+    """token -> user snapshot, in a bounded in-process LRU in front of the shared cache."""
+    key_prefix = 'tokenauth'
+
+    def __init__(self, max_entries=None, ttl=None, local_ttl=None, shared=None):
+        self.max_entries = max_entries or getattr(settings, 'TOKEN_AUTH_CACHE_MAX_ENTRIES', 10000)
+        self.ttl = ttl or getattr(settings, 'TOKEN_AUTH_CACHE_TTL', 300)
+        self.local_ttl = local_ttl or getattr(settings, 'TOKEN_AUTH_CACHE_LOCAL_TTL', 5)
+        self.shared = shared # Use the Django cache too; None decides by its backend (cache_is_shared)
+        self._lock = threading.Lock()
+        self._local = OrderedDict() # digest -> (expires_at, snapshot)
+        self._digests_by_user = {} # user id -> {digest}
+
+    @staticmethod
+    def digest(key):
+        return hashlib.sha256(key.encode()).hexdigest()[:40]
+
+    def _token_key(self, digest):
+        return f'{self.key_prefix}:token:{digest}'
+
+    def _user_key(self, user_id):
+        return f'{self.key_prefix}:user:{user_id}'
+
+    def uses_shared_cache(self):
+        return cache_is_shared() if self.shared is None else self.shared
+
+    def get(self, key):
+        digest = self.digest(key)
+        with self._lock:
+            entry = self._local.get(digest)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._local.move_to_end(digest)
+                    return entry[1]
+                self._forget(digest)
+        if not self.uses_shared_cache():
+            return None
+        snapshot = cache.get(self._token_key(digest))
+        if snapshot is not None:
+            self._remember(digest, snapshot)
+        return snapshot
+
+    def set(self, key, snapshot):
+        digest = self.digest(key)
+        user_id = snapshot['user']['id']
+        if not self.uses_shared_cache():
+            self._remember(digest, snapshot)
+            return
+        # The per-user index lets user/profile changes find the token entries to drop
+        digests = set(cache.get(self._user_key(user_id)) or ()) | {digest}
+        cache.set_many({self._token_key(digest): snapshot, self._user_key(user_id): digests}, self.ttl)
+        self._remember(digest, snapshot)
+
+    def invalidate_token(self, key):
+        digest = self.digest(key)
+        if self.uses_shared_cache():
+            cache.delete(self._token_key(digest))
+        with self._lock:
+            self._forget(digest)
+
+    def invalidate_users(self, user_ids):
+        user_ids = {user_id for user_id in user_ids if user_id is not None}
+        if not user_ids:
+            return
+        if self.uses_shared_cache():
+            indexes = cache.get_many([self._user_key(user_id) for user_id in user_ids])
+            stale = [self._token_key(digest) for digests in indexes.values() for digest in digests]
+            cache.delete_many(stale + [self._user_key(user_id) for user_id in user_ids])
+        with self._lock:
+            for user_id in user_ids:
+                for digest in list(self._digests_by_user.get(user_id, ())):
+                    self._forget(digest)
+
+    def clear_local(self):
+        with self._lock:
+            self._local.clear()
+            self._digests_by_user.clear()
+
+    def _remember(self, digest, snapshot):
+        with self._lock:
+            self._forget(digest)
+            self._local[digest] = (time.monotonic() + self.local_ttl, snapshot)
+            self._digests_by_user.setdefault(snapshot['user']['id'], set()).add(digest)
+            while len(self._local) > self.max_entries:
+                self._forget(next(iter(self._local)))
+
+    def _forget(self, digest):
+        # Caller holds the lock
+        entry = self._local.pop(digest, None)
+        if entry is not None:
+            user_id = entry[1]['user']['id']
+            digests = self._digests_by_user.get(user_id)
+            if digests is not None:
+                digests.discard(digest)
+                if not digests:
+                    del self._digests_by_user[user_id]
+
+
+token_cache = TokenSnapshotCache()
+
+
+def invalidate_cached_users(user_ids):
+    """
+    Drops cached snapshots for these users now and again after the current transaction commits,
+    so a concurrent request can't re-cache the pre-commit row in between.
+    """
+    user_ids = set(user_ids)
+    token_cache.invalidate_users(user_ids)
+    transaction.on_commit(lambda: token_cache.invalidate_users(user_ids))
+
+
+def invalidate_cached_token(key):
+    token_cache.invalidate_token(key)
+    transaction.on_commit(lambda: token_cache.invalidate_token(key))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Drop-in replacement for TokenAuthentication ("Authorization: Token <key>") backed by token_cache."""
+
+    def authenticate_credentials(self, key):
+        snapshot = token_cache.get(key)
+        if snapshot is None:
+            model = self.get_model()
+            try:
+                token = model.objects.select_related('user__profile').get(key=key)
+            except model.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            user = token.user
+            if user.is_active: # Inactive users aren't cached; they fail below on every request anyway
+                token_cache.set(key, self.snapshot(token))
+        else:
+            token, user = self.restore(key, snapshot)
+
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        return (user, token)
+
+    @staticmethod
+    def snapshot(token):
+        user = token.user
+        try:
+            profile = _columns(user.profile)
+        except Profile.DoesNotExist:
+            profile = None
+        return {'token_created': token.created, 'user': _columns(user, exclude={'password'}), 'profile': profile}
+
+    def restore(self, key, snapshot):
+        """(token, user) rebuilt from a snapshot, with user.profile pre-cached, without touching the database."""
+        user_columns = snapshot['user']
+        user = CustomUser.from_db(DEFAULT_DB_ALIAS, list(user_columns), list(user_columns.values()))
+        if snapshot['profile'] is not None:
+            profile_columns = snapshot['profile']
+            profile = Profile.from_db(DEFAULT_DB_ALIAS, list(profile_columns), list(profile_columns.values()))
+            CustomUser.profile.related.set_cached_value(user, profile)
+            Profile.user.field.set_cached_value(profile, user)
+        model = self.get_model()
+        token = model.from_db(DEFAULT_DB_ALIAS, ['key', 'user_id', 'created'], [key, user.pk, snapshot['token_created']])
+        model.user.field.set_cached_value(token, user)
+        return token, user
@@ -0,0 +1,21 @@
+# apps/accounts/checks.py
+from django.core.checks import Error, Tags, register
+from rest_framework.settings import api_settings
+
+from apps.core.utils import cache_is_shared
+from .authentication import CachedTokenAuthentication
+
+
+@register(Tags.caches, deploy=True)
+def check_token_cache_is_shared(app_configs, **kwargs):
+    """CachedTokenAuthentication's invalidation only reaches other workers through a shared cache."""
+    if CachedTokenAuthentication not in api_settings.DEFAULT_AUTHENTICATION_CLASSES or cache_is_shared():
+        return []
+    return [Error(
+        'CachedTokenAuthentication is enabled but the default cache is process-local.',
+        hint=(
+            'Configure a cache shared by all workers (set CACHE_REDIS_URL). Until then token snapshots '
+            'are only cached per process, for TOKEN_AUTH_CACHE_LOCAL_TTL seconds.'
+        ),
+        id='accounts.E001',
+    )]
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from apps.accounts.reputation import ReputationService
+
+
+class Command(BaseCommand):
+    help = (
+        'Recomputes seller reputation scores (Profile.reputation_score and the copies on listings). '
+        'Scores are normally kept current by signals; use this after imports or weight changes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seller', type=int, action='append', dest='seller_ids',
+            help='Only recompute this seller (user id). Can be repeated.',
+        )
+        parser.add_argument(
+            '--explain', action='store_true',
+            help='Print the score components for each seller given with --seller.',
+        )
+
+    def handle(self, *args, **options):
+        service = ReputationService()
+        if options['seller_ids']:
+            count = service.recompute_sellers(options['seller_ids'])
+            if options['explain']:
+                for seller_id in options['seller_ids']:
+                    self.stdout.write(f'  seller {seller_id}: {service.compute(seller_id)}')
+        else:
+            count = service.recompute_all()
+        self.stdout.write(self.style.SUCCESS(f'Recomputed reputation for {count} seller(s).'))
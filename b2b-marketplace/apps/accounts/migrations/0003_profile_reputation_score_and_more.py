@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_customuser_user_type_alter_customuser_email_profile_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='reputation_score',
+            field=models.DecimalField(blank=True, db_index=True, decimal_places=2, editable=False, max_digits=5, null=True),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='reputation_updated_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+
+def create_missing_profiles(apps, schema_editor):
+    """
+    Creates the Profile of every user that has none: users bulk-created before
+    AccountService.bulk_create_users() existed skipped the post_save signal that makes them.
+    Same as AccountService().create_missing_profiles(), with the historical models.
+    """
+    CustomUser = apps.get_model('accounts', 'CustomUser')
+    Profile = apps.get_model('accounts', 'Profile')
+    missing = CustomUser.objects.filter(profile__isnull=True).order_by('pk').values_list('pk', flat=True)
+    while True:
+        user_ids = list(missing[:BATCH_SIZE]) # Re-queried: each batch drops out once created
+        if not user_ids:
+            break
+        Profile.objects.bulk_create([Profile(user_id=user_id) for user_id in user_ids])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_profile_reputation_score_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_missing_profiles, migrations.RunPython.noop),
+    ]
@@ -44,6 +44,9 @@ class Profile(models.Model):
 
     average_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.00, null=True, blank=True)
     review_count = models.PositiveIntegerField(default=0, null=True, blank=True)
+    # Composite seller score 0-100 (see reputation.py); NULL for non-sellers / not yet computed
+    reputation_score = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True, db_index=True, editable=False)
+    reputation_updated_at = models.DateTimeField(null=True, blank=True, editable=False)
 
     def __str__(self):
         return f"{self.user.username}'s Profile"
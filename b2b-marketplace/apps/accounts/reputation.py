@@ -0,0 +1,188 @@
+# apps/accounts/reputation.py
+"""
+Composite seller reputation score (0-100).
+
+Combines, per seller/manufacturer/designer:
+  - ratings: approved reviews of the seller themself (user or profile) *and* of their materials and designs,
+    as a Bayesian average so a single 5-star review doesn't beat a long track record,
+  - order completion rate and dispute/refund rate over orders containing their items,
+  - average quote response time (RFQ created -> quote submitted),
+  - sales volume (completed order items), as a small log-scaled confidence bonus.
+
+The score is stored in Profile.reputation_score and copied onto the seller's listings
+(BaseListing.seller_reputation), both indexed, so catalog ordering is a plain column sort.
+Signals in accounts/signals.py recompute only the sellers touched by an event, after commit.
+"""
+import math
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Avg, Case, Count, DurationField, ExpressionWrapper, F, Q, Sum, Value, When
+from django.utils import timezone
+
+User = get_user_model()
+
+SELLER_USER_TYPES = ('seller', 'manufacturer', 'designer')
+
+# Weights of the components (sum to 1)
+WEIGHTS = {
+    'rating': Decimal('0.50'),
+    'completion': Decimal('0.20'),
+    'disputes': Decimal('0.15'),
+    'responsiveness': Decimal('0.10'),
+    'volume': Decimal('0.05'),
+}
+RATING_PRIOR_MEAN = 3.5   # Stars assumed for sellers without reviews...
+RATING_PRIOR_WEIGHT = 5   # ...worth this many reviews
+COMPLETION_PRIOR_RATE = 0.9
+COMPLETION_PRIOR_WEIGHT = 3
+RESPONSE_FULL_SCORE_HOURS = 24       # Quoting within a day scores 1.0
+RESPONSE_ZERO_SCORE_HOURS = 24 * 14  # Two weeks or slower scores 0.0
+VOLUME_FULL_SCORE_ITEMS = 1000       # log10 scale: 1000 completed items scores 1.0
+
+COMPLETED_ORDER_STATUSES = ('delivered', 'completed')
+FAILED_ORDER_STATUSES = ('cancelled_by_seller', 'refunded', 'disputed')
+DISPUTED_ORDER_STATUSES = ('refunded', 'disputed')
+# Order statuses that haven't settled yet don't count either way
+SETTLED_ORDER_STATUSES = COMPLETED_ORDER_STATUSES + FAILED_ORDER_STATUSES
+
+
+class ReputationService:
+    """
+    Inputs are gathered with grouped queries for a whole batch of sellers (a fixed number of
+    queries per batch, not per seller), so bulk recomputes after imports stay fast.
+    """
+
+    def rating_stats(self, seller_ids):
+        """
+        {seller_id: (review_count, rating_sum)} over approved reviews of the sellers and their listings.
+        Reviews of a seller's user and of their Profile both land in `reviewed_user`, so both count.
+        """
+        from apps.reviews_ratings.models import Review
+
+        approved = Review.objects.filter(is_approved=True).order_by()
+        stats = {}
+        for owner_lookup, queryset in (
+            ('reviewed_user_id', approved.filter(reviewed_user_id__in=seller_ids)),
+            ('reviewed_material__seller_id', approved.filter(reviewed_material__seller_id__in=seller_ids)),
+            ('reviewed_design__designer_id', approved.filter(reviewed_design__designer_id__in=seller_ids)),
+        ):
+            for row in queryset.values(owner_lookup).annotate(review_count=Count('id'), rating_sum=Sum('rating')):
+                count, total = stats.get(row[owner_lookup], (0, 0))
+                stats[row[owner_lookup]] = (count + row['review_count'], total + (row['rating_sum'] or 0))
+        return stats
+
+    def order_stats(self, seller_ids):
+        """{seller_id: (settled orders, completed orders, disputed orders, completed items)}."""
+        from apps.orders.models import OrderItem
+
+        # Grouping order items by seller; an order counts once per seller however many of their items it has
+        items = OrderItem.objects.filter(seller_id__in=seller_ids, order__status__in=SETTLED_ORDER_STATUSES).order_by()
+        stats = {}
+        for row in items.values('seller_id').annotate(
+            settled=Count('order_id', distinct=True),
+            completed=Count('order_id', distinct=True, filter=Q(order__status__in=COMPLETED_ORDER_STATUSES)),
+            disputed=Count('order_id', distinct=True, filter=Q(order__status__in=DISPUTED_ORDER_STATUSES)),
+            completed_items=Count('id', filter=Q(order__status__in=COMPLETED_ORDER_STATUSES)),
+        ):
+            stats[row['seller_id']] = (row['settled'], row['completed'], row['disputed'], row['completed_items'])
+        return stats
+
+    def response_hours(self, seller_ids):
+        """{seller_id: average hours from RFQ creation to their quote}; sellers who never quoted an RFQ are absent."""
+        from apps.orders.models import Quote
+
+        delay = ExpressionWrapper(F('created_at') - F('rfq__created_at'), output_field=DurationField())
+        rows = Quote.objects.filter(supplier_id__in=seller_ids, rfq__isnull=False).order_by().values('supplier_id').annotate(avg=Avg(delay))
+        return {row['supplier_id']: row['avg'].total_seconds() / 3600 for row in rows if row['avg'] is not None}
+
+    def compute_many(self, seller_ids) -> dict:
+        """{seller_id: compute() result} for a batch of sellers, with five grouped queries in total."""
+        seller_ids = list(seller_ids)
+        ratings = self.rating_stats(seller_ids)
+        orders = self.order_stats(seller_ids)
+        hours = self.response_hours(seller_ids)
+        return {
+            seller_id: self._score(ratings.get(seller_id, (0, 0)), orders.get(seller_id, (0, 0, 0, 0)), hours.get(seller_id))
+            for seller_id in seller_ids
+        }
+
+    def compute(self, seller_id) -> dict:
+        """Component scores (0-1) and the weighted total (0-100) for one seller."""
+        return self.compute_many([seller_id])[seller_id]
+
+    def _score(self, rating_stats, order_stats, hours) -> dict:
+        review_count, rating_sum = rating_stats
+        settled, completed, disputed, completed_items = order_stats
+
+        bayesian_rating = (RATING_PRIOR_MEAN * RATING_PRIOR_WEIGHT + rating_sum) / (RATING_PRIOR_WEIGHT + review_count)
+        completion = (COMPLETION_PRIOR_RATE * COMPLETION_PRIOR_WEIGHT + completed) / (COMPLETION_PRIOR_WEIGHT + settled)
+        if hours is None:
+            responsiveness = 0.5 # Neutral for sellers who never quoted
+        else:
+            span = RESPONSE_ZERO_SCORE_HOURS - RESPONSE_FULL_SCORE_HOURS
+            responsiveness = min(1.0, max(0.0, 1 - (hours - RESPONSE_FULL_SCORE_HOURS) / span))
+        components = {
+            'rating': (bayesian_rating - 1) / 4,
+            'completion': completion,
+            'disputes': 1 - (disputed / settled if settled else 0),
+            'responsiveness': responsiveness,
+            'volume': min(1.0, math.log10(1 + completed_items) / math.log10(1 + VOLUME_FULL_SCORE_ITEMS)),
+        }
+        score = sum(Decimal(str(value)) * WEIGHTS[name] for name, value in components.items()) * 100
+        return {
+            'score': score.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP),
+            'components': {name: round(value, 4) for name, value in components.items()},
+            'review_count': review_count,
+            'settled_orders': settled,
+            'completed_items': completed_items,
+            'avg_response_hours': round(hours, 1) if hours is not None else None,
+        }
+
+    @transaction.atomic
+    def recompute_sellers(self, seller_ids) -> int:
+        """
+        Recomputes and stores scores for the given users; non-sellers are skipped. Nine queries
+        however many sellers: the seller lookup, compute_many()'s five, and one CASE UPDATE each for
+        profiles, materials and designs (so batches should stay in the hundreds of sellers).
+        """
+        from apps.accounts.authentication import invalidate_cached_users
+        from apps.accounts.models import Profile
+        from apps.listings.models import Material, Design
+
+        seller_ids = list(
+            User.objects.filter(pk__in=set(seller_ids), user_type__in=SELLER_USER_TYPES).values_list('pk', flat=True)
+        )
+        if not seller_ids:
+            return 0
+        scores = {seller_id: result['score'] for seller_id, result in self.compute_many(seller_ids).items()}
+
+        def score_of(owner_field, model):
+            return Case(
+                *[When(**{owner_field: seller_id}, then=Value(score)) for seller_id, score in scores.items()],
+                output_field=model._meta.get_field('reputation_score' if model is Profile else 'seller_reputation'),
+            )
+
+        Profile.objects.filter(user_id__in=seller_ids).update(
+            reputation_score=score_of('user_id', Profile), reputation_updated_at=timezone.now(),
+        )
+        # Denormalized copies so listing endpoints can sort by reputation without a join
+        for model, owner_field in ((Material, 'seller_id'), (Design, 'designer_id')):
+            score = score_of(owner_field, model)
+            model.objects.filter(**{f'{owner_field}__in': seller_ids}).exclude(seller_reputation=score).update(seller_reputation=score)
+        invalidate_cached_users(seller_ids) # Profile.update() above skips the signals
+        return len(seller_ids)
+
+    def recompute_all(self, batch_size=500) -> int:
+        seller_ids = list(User.objects.filter(user_type__in=SELLER_USER_TYPES).values_list('pk', flat=True))
+        for start in range(0, len(seller_ids), batch_size):
+            self.recompute_sellers(seller_ids[start:start + batch_size])
+        return len(seller_ids)
+
+
+def schedule_reputation_refresh(seller_ids):
+    """Recomputes the given sellers once the current transaction commits (immediately in autocommit)."""
+    seller_ids = {seller_id for seller_id in seller_ids if seller_id}
+    if seller_ids:
+        transaction.on_commit(lambda: ReputationService().recompute_sellers(seller_ids))
@@ -0,0 +1,53 @@
+# apps/accounts/services.py
+"""
+Profile lifecycle outside the per-user signal.
+
+signals.create_user_profile inserts one Profile when a user is created through save(). bulk_create()
+skips signals, so code creating users in bulk goes through AccountService.bulk_create_users(), or
+calls create_missing_profiles() afterwards, to get the matching profiles in bulk as well.
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from .models import Profile
+from .reputation import SELLER_USER_TYPES, schedule_reputation_refresh
+
+User = get_user_model()
+
+
+class AccountService:
+
+    @transaction.atomic
+    def bulk_create_users(self, users, batch_size=1000, profile_fields=None) -> list:
+        """
+        bulk_create()s unsaved users (set passwords with make_password() beforehand) plus one Profile
+        each, and schedules the initial reputation of new sellers: what the post_save signals do for
+        a single user. `profile_fields(user)` may return initial Profile field values.
+        """
+        users = User.objects.bulk_create(users, batch_size=batch_size)
+        if any(user.pk is None for user in users): # Backends that can't return ids from a bulk insert
+            ids = dict(User.objects.filter(username__in=[user.username for user in users]).values_list('username', 'pk'))
+            for user in users:
+                user.pk = ids[user.username]
+        self.create_missing_profiles(users, batch_size=batch_size, profile_fields=profile_fields)
+        schedule_reputation_refresh(user.pk for user in users if user.user_type in SELLER_USER_TYPES)
+        return users
+
+    def create_missing_profiles(self, users=None, batch_size=1000, profile_fields=None) -> int:
+        """
+        Bulk-creates a Profile for each of `users` (instances or ids; default: all users) that has
+        none. Returns the number created.
+        """
+        if users is None:
+            users = User.objects.filter(profile__isnull=True).only('pk', 'user_type')
+        by_id = {getattr(user, 'pk', user): user for user in users}
+        existing = set()
+        ids = list(by_id)
+        for start in range(0, len(ids), batch_size):
+            existing.update(Profile.objects.filter(user_id__in=ids[start:start + batch_size]).values_list('user_id', flat=True))
+        profiles = [
+            Profile(user_id=user_id, **(profile_fields(user) if profile_fields else {}))
+            for user_id, user in by_id.items() if user_id not in existing
+        ]
+        Profile.objects.bulk_create(profiles, batch_size=batch_size)
+        return len(profiles)
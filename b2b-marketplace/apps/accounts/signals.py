@@ -1,20 +1,79 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.conf import settings
+from .authentication import invalidate_cached_token, invalidate_cached_users
 from .models import Profile
+from .reputation import SELLER_USER_TYPES, schedule_reputation_refresh
 
 User = settings.AUTH_USER_MODEL
 
 @receiver(post_save, sender=User)
-def create_or_update_user_profile(sender, instance, created, **kwargs):
-    if created:
+def create_user_profile(sender, instance, created, raw=False, **kwargs):
+    # One INSERT when a user is created; later user saves (logins, password changes, admin edits)
+    # don't touch the profile. bulk_create() skips this, see AccountService.bulk_create_users().
+    if created and not raw:
         Profile.objects.create(user=instance)
-    try:
-        instance.profile.save()
-    except Profile.DoesNotExist: # Should not happen if signal works correctly
-        Profile.objects.create(user=instance)
-    except Exception as e: # Catch other potential errors during profile save
-        print(f"Error saving profile for user {instance.username}: {e}")
+
+
+# --- Seller reputation: recompute only the sellers an event touches (after commit) ---
+
+@receiver(post_save, sender=User)
+def initialize_seller_reputation(sender, instance, created, **kwargs):
+    if created and instance.user_type in SELLER_USER_TYPES:
+        schedule_reputation_refresh([instance.pk])
+
+
+@receiver(post_save, sender='reviews_ratings.Review')
+@receiver(post_delete, sender='reviews_ratings.Review')
+def review_changed_reputation(sender, instance, **kwargs):
+    from apps.reviews_ratings.services import get_review_target_owner_id
+    schedule_reputation_refresh([get_review_target_owner_id(instance)])
+
+
+@receiver(post_save, sender='orders.Order')
+def order_status_reputation(sender, instance, created, update_fields=None, **kwargs):
+    # Order.update_total() saves with update_fields=['order_total'] on every item change; ignore those
+    if created or (update_fields is not None and 'status' not in update_fields):
+        return
+    schedule_reputation_refresh(instance.items.order_by().values_list('seller_id', flat=True).distinct())
+
+
+@receiver(post_save, sender='orders.Quote')
+def quote_submitted_reputation(sender, instance, created, **kwargs):
+    if created and instance.rfq_id:
+        schedule_reputation_refresh([instance.supplier_id])
+
+
+@receiver(post_save, sender='listings.Material')
+@receiver(post_save, sender='listings.Design')
+def copy_seller_reputation_to_listing(sender, instance, created, **kwargs):
+    if not created:
+        return
+    owner_id = instance.seller_id if sender.__name__ == 'Material' else instance.designer_id
+    score = Profile.objects.filter(user_id=owner_id).values_list('reputation_score', flat=True).first()
+    if score is not None:
+        sender.objects.filter(pk=instance.pk).update(seller_reputation=score)
+        instance.seller_reputation = score
+
+
+# --- Cached token authentication: drop snapshots whose source rows changed (see authentication.py) ---
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed_token_cache(sender, instance, **kwargs):
+    # Covers password changes (set_password() + save()), deactivation and user_type/is_staff edits
+    invalidate_cached_users([instance.pk])
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def profile_changed_token_cache(sender, instance, **kwargs):
+    invalidate_cached_users([instance.user_id])
+
+
+@receiver(post_delete, sender='authtoken.Token')
+def token_deleted_token_cache(sender, instance, **kwargs):
+    invalidate_cached_token(instance.key)
 
 
 # If you have specific profiles like SellerProfile, DesignerProfile etc.
@@ -1,3 +1,282 @@
+import importlib
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from apps.listings.models import Category, Design, Material
+from apps.orders.models import Order, OrderItem, Quote, RFQ
+from apps.reviews_ratings.models import Review
+from apps.reviews_ratings.registry import get_reviewable
+from . import checks
+from .authentication import CachedTokenAuthentication, TokenSnapshotCache, token_cache
+from .models import Profile
+from .reputation import ReputationService
+from .services import AccountService
+
+User = get_user_model()
+
+
+class CachedTokenAuthenticationTests(APITestCase):
+    """Token auth and request.user.profile are served from the snapshot cache, and it is invalidated on changes."""
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear_local()
+        self.user = User.objects.create_user('cache-buyer', 'cache-buyer@example.com', 'password123', user_type='buyer')
+        self.user.profile.company_name = 'Acme Textiles'
+        self.user.profile.save()
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.url = reverse('user-detail-me') # Serializes request.user with its nested profile
+
+    def test_cached_requests_skip_token_and_profile_queries(self):
+        with self.assertNumQueries(1): # Cache miss: token, user and profile in one JOIN
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data['profile']['company_name'], 'Acme Textiles')
+        self.assertEqual(response.data['user_type'], 'buyer')
+
+    def test_shared_cache_serves_other_processes(self):
+        with mock.patch.object(token_cache, 'shared', True): # As with CACHE_REDIS_URL
+            self.client.get(self.url)
+            token_cache.clear_local() # As seen by another worker process
+            with self.assertNumQueries(0):
+                self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_process_local_cache_is_not_used(self):
+        self.client.get(self.url) # Tests run with the local-memory cache
+        self.assertEqual(cache.get_many([f'tokenauth:token:{token_cache.digest(self.token.key)}', f'tokenauth:user:{self.user.pk}']), {})
+        token_cache.clear_local()
+        with self.assertNumQueries(1): # Another process has no shared entry to fall back on
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_deleted_token_is_rejected(self):
+        self.client.get(self.url)
+        self.token.delete()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_password_change_invalidates(self):
+        self.client.get(self.url)
+        self.user.set_password('new-password-456')
+        self.user.save()
+        self.assertIsNone(token_cache.get(self.token.key))
+
+    def test_deactivated_user_is_rejected(self):
+        self.client.get(self.url)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_user_and_profile_updates_are_visible(self):
+        self.client.get(self.url)
+        self.user.user_type = 'seller'
+        self.user.save()
+        profile = self.user.profile
+        profile.company_name = 'Acme Mills'
+        profile.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['user_type'], 'seller')
+        self.assertEqual(response.data['profile']['company_name'], 'Acme Mills')
+
+    def test_saving_a_cached_user_keeps_the_password(self):
+        self.client.get(self.url)
+        user, _ = CachedTokenAuthentication().authenticate_credentials(self.token.key)
+        self.assertIn('password', user.get_deferred_fields())
+        user.first_name = 'Changed'
+        user.save()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.first_name, 'Changed')
+        self.assertTrue(self.user.check_password('password123'))
+
+
+class TokenSnapshotCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_local_lru_is_bounded(self):
+        store = TokenSnapshotCache(max_entries=2, shared=True)
+        for user_id, key in enumerate(['a', 'b', 'c']):
+            store.set(key, {'user': {'id': user_id}, 'profile': None})
+        self.assertEqual(len(store._local), 2)
+        self.assertNotIn(store.digest('a'), store._local)
+        self.assertIsNotNone(store.get('a')) # Still in the shared cache
+
+    def test_invalidate_users_drops_every_level(self):
+        store = TokenSnapshotCache(shared=True)
+        store.set('k1', {'user': {'id': 7}, 'profile': None})
+        store.invalidate_users([7])
+        self.assertIsNone(store.get('k1'))
+
+    def test_process_local_entries_expire_after_the_local_ttl(self):
+        store = TokenSnapshotCache(local_ttl=5, shared=False)
+        with mock.patch('apps.accounts.authentication.time.monotonic', return_value=100.0):
+            store.set('k1', {'user': {'id': 7}, 'profile': None})
+            self.assertIsNotNone(store.get('k1'))
+        with mock.patch('apps.accounts.authentication.time.monotonic', return_value=105.0):
+            self.assertIsNone(store.get('k1'))
+
+    def test_deploy_check_refuses_a_process_local_cache(self):
+        [error] = checks.check_token_cache_is_shared(None)
+        self.assertEqual(error.id, 'accounts.E001')
+        with mock.patch.object(checks, 'cache_is_shared', return_value=True):
+            self.assertEqual(checks.check_token_cache_is_shared(None), [])
+
+
+class ProfileLifecycleTests(TestCase):
+    def test_creating_a_user_inserts_one_profile(self):
+        with self.assertNumQueries(2): # User INSERT + Profile INSERT
+            user = User.objects.create(username='lifecycle', email='lifecycle@example.com', user_type='buyer')
+        self.assertTrue(Profile.objects.filter(user=user).exists())
+
+    def test_user_saves_do_not_write_the_profile(self):
+        user = User.objects.create_user('lifecycle', 'lifecycle@example.com', 'password123', user_type='buyer')
+        user.set_password('another-password-789')
+        with self.assertNumQueries(1): # Just the user UPDATE
+            user.save()
+        with self.assertNumQueries(1):
+            user.save(update_fields=['last_login'])
+
+    def test_bulk_create_users_creates_profiles_in_bulk(self):
+        password = make_password('password123')
+        users = [
+            User(username=f'bulk-{n}', email=f'bulk-{n}@example.com', password=password, user_type='seller' if n % 4 else 'buyer')
+            for n in range(300)
+        ]
+        with CaptureQueriesContext(connection) as captured:
+            created = AccountService().bulk_create_users(
+                users, batch_size=500, profile_fields=lambda user: {'country': 'Portugal'},
+            )
+        # A handful of multi-row INSERTs (split by the backend's parameter limit), not one per user
+        self.assertLess(len(captured), 20)
+        self.assertEqual(len(created), 300)
+        self.assertEqual(Profile.objects.filter(user__username__startswith='bulk-', country='Portugal').count(), 300)
+
+    def test_create_missing_profiles_backfills_only_missing(self):
+        with_profile = User.objects.create_user('has-profile', 'has-profile@example.com', 'password123')
+        User.objects.bulk_create([User(username='no-profile', email='no-profile@example.com')])
+        self.assertEqual(AccountService().create_missing_profiles(), 1)
+        self.assertEqual(AccountService().create_missing_profiles([with_profile]), 0)
+        self.assertTrue(Profile.objects.filter(user__username='no-profile').exists())
+
+    def test_migration_creates_missing_profiles_in_batches(self):
+        migration = importlib.import_module('apps.accounts.migrations.0004_create_missing_profiles')
+        User.objects.create_user('has-profile', 'has-profile@example.com', 'password123')
+        User.objects.bulk_create([User(username=f'no-profile-{n}', email=f'no-profile-{n}@example.com') for n in range(5)])
+        with mock.patch.object(migration, 'BATCH_SIZE', 2):
+            migration.create_missing_profiles(apps, None)
+        self.assertFalse(User.objects.filter(profile__isnull=True).exists())
+        self.assertEqual(Profile.objects.count(), 6)
+
+
+class ReputationTests(TestCase):
+    """Scores combine ratings, orders and quote response times, and are mirrored onto listings."""
+
+    def setUp(self):
+        self.seller = self.user('seller')
+        self.designer = self.user('designer')
+        self.buyer = self.user('buyer')
+        category = Category.objects.create(name='Linen')
+        self.material = Material.objects.create(
+            name='Washed linen', description='Linen', seller=self.seller, category=category, price_per_unit=Decimal('9.00'),
+        )
+        self.design = Design.objects.create(title='Stripes', description='Linen', designer=self.designer, category=category, price=Decimal('30.00'))
+
+    def user(self, user_type):
+        username = f'reputation-{user_type}-{User.objects.count()}'
+        return User.objects.create_user(username, f'{username}@example.com', 'password123', user_type=user_type)
+
+    def review(self, target, rating, is_approved=True):
+        return Review.objects.create(
+            author=self.user('buyer'), rating=rating, comment=f'Review {Review.objects.count()} of a reliable supplier.', is_approved=is_approved,
+            content_type=get_reviewable(target._meta.model_name).content_type, object_id_str=str(target.pk),
+        )
+
+    def order(self, status, items=1):
+        order = Order.objects.create(buyer=self.buyer, status=status)
+        for _ in range(items):
+            OrderItem.objects.create(order=order, seller=self.seller, material=self.material, quantity=1, unit_price=Decimal('9.00'))
+        return order
+
+    def test_rating_stats_include_user_profile_and_listing_reviews(self):
+        self.review(self.material, 5)
+        self.review(self.seller, 4)
+        self.review(self.seller.profile, 3)
+        self.review(self.material, 1, is_approved=False)
+        self.review(self.design, 2)
+        with self.assertNumQueries(3):
+            stats = ReputationService().rating_stats([self.seller.pk, self.designer.pk, self.buyer.pk])
+        self.assertEqual(stats, {self.seller.pk: (3, 12), self.designer.pk: (1, 2)})
+
+    def test_new_seller_gets_the_priors(self):
+        result = ReputationService().compute(self.seller.pk)
+        self.assertEqual(result['components'], {'rating': 0.625, 'completion': 0.9, 'disputes': 1, 'responsiveness': 0.5, 'volume': 0.0})
+        self.assertEqual(result['score'], Decimal('69.25'))
+
+    def test_score(self):
+        for target, rating in ((self.material, 5), (self.seller, 4), (self.seller.profile, 3)):
+            self.review(target, rating)
+        self.order('completed', items=2)
+        self.order('disputed')
+        self.order('processing') # Not settled: ignored
+        rfq = RFQ.objects.create(buyer=self.buyer, title='Linen for curtains')
+        quote = Quote.objects.create(rfq=rfq, supplier=self.seller, buyer=self.buyer, total_price=Decimal('90.00'), valid_until=date.today())
+        Quote.objects.filter(pk=quote.pk).update(created_at=rfq.created_at + timedelta(hours=48))
+
+        with self.assertNumQueries(5): # Three rating groups, orders, quotes
+            result = ReputationService().compute(self.seller.pk)
+        self.assertEqual(result['components'], {
+            'rating': 0.6719, 'completion': 0.74, 'disputes': 0.5, 'responsiveness': 0.9231, 'volume': 0.159,
+        })
+        self.assertEqual((result['review_count'], result['settled_orders'], result['completed_items'], result['avg_response_hours']), (3, 2, 2, 48.0))
+        self.assertEqual(result['score'], Decimal('65.92'))
+
+    def test_recompute_mirrors_onto_listings(self):
+        self.review(self.material, 5)
+        self.review(self.design, 1)
+        self.assertEqual(ReputationService().recompute_sellers([self.seller.pk, self.designer.pk, self.buyer.pk]), 2)
+        self.seller.profile.refresh_from_db()
+        self.material.refresh_from_db()
+        self.design.refresh_from_db()
+        self.assertIsNotNone(self.seller.profile.reputation_updated_at)
+        self.assertEqual(self.material.seller_reputation, self.seller.profile.reputation_score)
+        self.assertEqual(self.design.seller_reputation, Profile.objects.get(user=self.designer).reputation_score)
+        self.assertGreater(self.material.seller_reputation, self.design.seller_reputation)
+        self.assertIsNone(Profile.objects.get(user=self.buyer).reputation_score) # Not a seller
+
+    def test_recompute_costs_the_same_queries_for_any_number_of_sellers(self):
+        manufacturers = [self.user('manufacturer') for _ in range(3)]
+        for manufacturer in manufacturers:
+            Material.objects.create(name='Hemp twill', description='Hemp', seller=manufacturer, price_per_unit=Decimal('7.00'))
+        self.review(manufacturers[0], 1)
+        service = ReputationService()
+        with CaptureQueriesContext(connection) as one:
+            service.recompute_sellers([self.seller.pk])
+        with CaptureQueriesContext(connection) as many:
+            service.recompute_sellers([self.seller.pk, self.designer.pk, *[m.pk for m in manufacturers]])
+        self.assertEqual(len(many), len(one))
+        scores = dict(Profile.objects.filter(user__in=manufacturers).values_list('user_id', 'reputation_score'))
+        self.assertLess(scores[manufacturers[0].pk], scores[manufacturers[1].pk])
+        self.assertEqual(
+            dict(Material.objects.filter(seller__in=manufacturers).values_list('seller_id', 'seller_reputation')), scores,
+        )
 
-# Create your tests here.
+    def test_reviews_refresh_the_reviewed_seller_after_commit(self):
+        ReputationService().recompute_sellers([self.seller.pk])
+        before = Profile.objects.get(user=self.seller).reputation_score
+        with self.captureOnCommitCallbacks(execute=True):
+            self.review(self.seller.profile, 1)
+        self.assertLess(Profile.objects.get(user=self.seller).reputation_score, before)
+        self.assertLess(Material.objects.get(pk=self.material.pk).seller_reputation, before)
@@ -5,5 +5,4 @@ class CollaborationsConfig(AppConfig):
     name = 'apps.collaborations'
 
     def ready(self):
-        # import apps.collaborations.signals # If you have signals
-        pass
\ No newline at end of file
+        import apps.collaborations.signals
\ No newline at end of file
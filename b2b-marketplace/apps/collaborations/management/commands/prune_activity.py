@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.collaborations.services import ActivityFeedService
+
+
+class Command(BaseCommand):
+    help = 'Deletes activity feed events and feed rows older than ACTIVITY_RETENTION. Run it periodically, e.g. daily.'
+
+    def handle(self, *args, **options):
+        pruned = ActivityFeedService().prune()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {pruned} activity event(s) past retention.'))
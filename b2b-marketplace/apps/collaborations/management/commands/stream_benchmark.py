@@ -0,0 +1,163 @@
+import asyncio
+import resource
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from apps.collaborations.models import Message, MessageThread
+from apps.collaborations.realtime import get_broker, publish_message
+from apps.collaborations.serializers import MessageSerializer
+from apps.collaborations.streaming import STREAM_PATH, message_stream
+from apps.core.loadtest import LatencyHistogram
+
+User = get_user_model()
+
+
+class _Connection:
+    """An in-memory client socket for the stream app: counts the message events it receives."""
+
+    def __init__(self, bench):
+        self.bench = bench
+        self.ready = asyncio.Event()
+        self.gone = asyncio.Event()
+
+    async def receive(self):
+        await self.gone.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(self, message):
+        if message['type'] != 'http.response.body':
+            return
+        if not self.ready.is_set():
+            self.ready.set()
+            return
+        received = message['body'].count(b'event: message')
+        if received:
+            self.bench.delivered(received)
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks the message stream (apps.collaborations.streaming) on one event loop, as one ASGI '
+        'worker would run it: opens --connections idle streams spread over --users participants of one '
+        'thread, measures connect time, memory per stream and event loop lag while idle, then fans out '
+        '--messages messages to all of them. Connections are in-memory ASGI calls, so the server\'s own '
+        'per-socket cost is not included. Uses the synthetic users from `seed_data`.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=10000, help='Concurrent streams to open.')
+        parser.add_argument('--users', type=int, default=50, help='Thread participants the streams are spread over.')
+        parser.add_argument('--prefix', default='seed-', help='Username prefix of the users to connect as.')
+        parser.add_argument('--messages', type=int, default=20, help='Messages to fan out.')
+        parser.add_argument('--idle', type=float, default=5.0, help='Seconds to hold the streams idle.')
+        parser.add_argument('--tracemalloc', action='store_true', help='Measure memory as Python heap (slows connecting down ~4x) instead of peak RSS.')
+
+    def handle(self, *args, **options):
+        users = list(User.objects.filter(username__startswith=options['prefix'], is_active=True).order_by('pk')[:options['users']])
+        if len(users) < 2:
+            raise CommandError(f'Need at least 2 users named {options["prefix"]}*; run seed_data first.')
+        tokens = [Token.objects.get_or_create(user=user)[0].key for user in users]
+        thread = MessageThread.objects.create()
+        thread.participants.set(users)
+        try:
+            sample = MessageSerializer(Message.objects.create(thread=thread, sender=users[0], content='Sample approved, ship Friday')).data
+            self.stdout.write(f'{options["connections"]} streams over {len(users)} participants of one thread, '
+                              f'{type(get_broker()).__name__}.')
+            asyncio.run(self._run(tokens, sample, options))
+        finally:
+            thread.delete()
+
+    async def _run(self, tokens, sample, options):
+        total = options['connections']
+        self.expected = 0
+        self.received = 0
+        self.publish_started = 0.0
+        self.histogram = LatencyHistogram()
+        self.all_delivered = asyncio.Event()
+
+        if options['tracemalloc']:
+            tracemalloc.start()
+        memory_before = self._memory(options['tracemalloc'])
+        started = time.perf_counter()
+        connections, tasks = [], []
+        for n in range(total):
+            conn = _Connection(self)
+            scope = {
+                'type': 'http', 'method': 'GET', 'path': STREAM_PATH, 'query_string': b'',
+                'headers': [(b'authorization', f'Token {tokens[n % len(tokens)]}'.encode())],
+            }
+            connections.append(conn)
+            tasks.append(asyncio.ensure_future(message_stream(scope, conn.receive, conn.send)))
+        await asyncio.gather(*(conn.ready.wait() for conn in connections))
+        connect_seconds = time.perf_counter() - started
+        memory = self._memory(options['tracemalloc']) - memory_before
+        tracemalloc.stop()
+        self.stdout.write(
+            f'Connected {total} streams in {connect_seconds:.2f}s ({total / connect_seconds:.0f}/s); '
+            f'{memory / 1024 / 1024:.1f} MiB, {memory / total / 1024:.2f} KiB per stream '
+            f'({"Python heap" if options["tracemalloc"] else "peak RSS growth"}, incl. fake sockets).'
+        )
+
+        lag = await self._idle_lag(options['idle'])
+        self.stdout.write(f'Idle {options["idle"]:.0f}s: max event loop lag {lag:.1f} ms.')
+
+        fanout = LatencyHistogram()
+        queries = 0
+        for n in range(options['messages']):
+            data = dict(sample, id=f'{sample["id"]}-{n}')
+            self.all_delivered.clear()
+            self.expected += total
+            self.publish_started = time.perf_counter()
+            queries += await asyncio.to_thread(self._publish, data)
+            await self.all_delivered.wait()
+            fanout.record((time.perf_counter() - self.publish_started) * 1000)
+        self.stdout.write(
+            f'Fan-out of {options["messages"]} messages to {total} streams: '
+            f'all delivered p50 {fanout.percentile(50):.1f} ms / max {fanout.percentile(100):.1f} ms; '
+            f'per stream p50 {self.histogram.percentile(50):.1f} ms, p99 {self.histogram.percentile(99):.1f} ms; '
+            f'{queries} queries while publishing.'
+        )
+
+        started = time.perf_counter()
+        for conn in connections:
+            conn.gone.set()
+        await asyncio.gather(*tasks)
+        self.stdout.write(f'Disconnected in {time.perf_counter() - started:.2f}s; '
+                          f'{get_broker().hub.subscriber_count()} subscriptions left.')
+
+    @staticmethod
+    def _memory(traced):
+        if traced:
+            return tracemalloc.get_traced_memory()[0]
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 # KiB on Linux
+
+    @staticmethod
+    def _publish(data):
+        # As the send-message view's on_commit callback does, on a worker thread
+        with CaptureQueriesContext(connection) as captured:
+            publish_message(data)
+        return len(captured)
+
+    def delivered(self, count):
+        elapsed_ms = (time.perf_counter() - self.publish_started) * 1000
+        for _ in range(count):
+            self.histogram.record(elapsed_ms)
+        self.received += count
+        if self.received >= self.expected:
+            self.all_delivered.set()
+
+    @staticmethod
+    async def _idle_lag(seconds, interval=0.05):
+        worst = 0.0
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            await asyncio.sleep(interval)
+            worst = max(worst, (time.perf_counter() - started - interval) * 1000)
+        return worst
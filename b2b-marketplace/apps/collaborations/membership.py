@@ -0,0 +1,129 @@
+# apps/collaborations/membership.py
+"""
+Project membership index: user -> {project id: 'owner' | 'member'}.
+
+Collaboration permissions, viewsets and serializers ask "is this user in that project?" on nearly
+every request, for projects, tasks, files and comments alike. Rather than querying
+`project.members` each time, a user's roles are loaded in one query and kept:
+- for the rest of the request, so permissions, serializers and the viewset share one lookup
+- in the shared Django cache for PROJECT_MEMBERSHIP_CACHE_TTL seconds
+
+signals.py invalidates the affected users when Project.members changes, a project is saved (owner
+changes) or deleted. Staff bypass membership checks, as before.
+
+The cache level needs a backend shared by all workers (CACHE_REDIS_URL): invalidation has to reach
+the process that cached the roles, or a removed member keeps access until the TTL. With a
+process-local backend (local memory) only the per-request memo is kept, so each request loads the
+roles once.
+"""
+import uuid
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import request_finished, request_started
+from django.db import transaction
+from django.db.models import Q
+
+from apps.core.utils import cache_is_shared
+
+# user id -> roles, for the current request only (None outside requests: shell, commands, tasks)
+_request_roles = ContextVar('project_roles', default=None)
+
+
+class MembershipIndex:
+    key_prefix = 'projmembers'
+
+    def __init__(self, ttl=None, shared=None):
+        self.ttl = ttl or getattr(settings, 'PROJECT_MEMBERSHIP_CACHE_TTL', 300)
+        self.shared = shared # Use the Django cache; None decides by its backend (cache_is_shared)
+
+    def uses_shared_cache(self):
+        return cache_is_shared() if self.shared is None else self.shared
+
+    def _key(self, user_id):
+        return f'{self.key_prefix}:user:{user_id}'
+
+    def roles(self, user) -> dict:
+        """{project id: 'owner' | 'member'} for `user` (a user instance or id)."""
+        if user is None or getattr(user, 'is_anonymous', False):
+            return {}
+        user_id = getattr(user, 'pk', user)
+        memo = _request_roles.get()
+        if memo is not None and user_id in memo:
+            return memo[user_id]
+        shared = self.uses_shared_cache()
+        roles = cache.get(self._key(user_id)) if shared else None
+        if roles is None:
+            from .models import Project
+
+            roles = {}
+            for project_id, owner_id in Project.objects.filter(Q(owner_id=user_id) | Q(members=user_id)).values_list('id', 'owner_id').distinct():
+                roles[project_id] = 'owner' if owner_id == user_id else 'member'
+            if shared:
+                cache.set(self._key(user_id), roles, self.ttl)
+        if memo is not None:
+            memo[user_id] = roles
+        return roles
+
+    def role(self, user, project_id):
+        if project_id is None:
+            return None
+        return self.roles(user).get(_as_key(project_id))
+
+    def invalidate_users(self, user_ids):
+        user_ids = {user_id for user_id in user_ids if user_id is not None}
+        memo = _request_roles.get()
+        if memo:
+            for user_id in user_ids:
+                memo.pop(user_id, None)
+        if user_ids and self.uses_shared_cache():
+            cache.delete_many([self._key(user_id) for user_id in user_ids])
+
+
+membership_index = MembershipIndex()
+
+
+def _start_request(**kwargs):
+    _request_roles.set({})
+
+
+def _finish_request(**kwargs):
+    _request_roles.set(None)
+
+
+request_started.connect(_start_request, dispatch_uid='project_membership_request_started')
+request_finished.connect(_finish_request, dispatch_uid='project_membership_request_finished')
+
+
+def _as_key(project_id):
+    # Project ids are UUIDs; ids from query params or request bodies arrive as strings
+    if isinstance(project_id, str):
+        try:
+            return uuid.UUID(project_id)
+        except ValueError:
+            return None
+    return project_id
+
+
+def project_role(user, project_id):
+    """'owner', 'member' or None."""
+    return membership_index.role(user, project_id)
+
+
+def is_project_member(user, project_id) -> bool:
+    """Owner or member of the project (or staff)."""
+    if getattr(user, 'is_staff', False):
+        return True
+    return project_role(user, project_id) is not None
+
+
+def member_project_ids(user) -> list:
+    return list(membership_index.roles(user))
+
+
+def invalidate_memberships(user_ids):
+    """Drops the cached index of these users now and again after the current transaction commits."""
+    user_ids = set(user_ids)
+    membership_index.invalidate_users(user_ids)
+    transaction.on_commit(lambda: membership_index.invalidate_users(user_ids))
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_read_state(apps, schema_editor):
+    """
+    Points each thread at its newest message and gives every participant a read state. There was no
+    read tracking before, so existing messages count as read.
+    """
+    MessageThread = apps.get_model('collaborations', 'MessageThread')
+    Message = apps.get_model('collaborations', 'Message')
+    ThreadReadState = apps.get_model('collaborations', 'ThreadReadState')
+    now = timezone.now()
+    newest = {}
+    for message_id, thread_id, timestamp in Message.objects.order_by('timestamp', 'id').values_list('id', 'thread_id', 'timestamp').iterator():
+        newest[thread_id] = (message_id, timestamp)
+    threads = list(MessageThread.objects.filter(pk__in=newest).only('pk'))
+    for thread in threads:
+        thread.last_message_id, thread.last_message_at = newest[thread.pk]
+    MessageThread.objects.bulk_update(threads, ['last_message', 'last_message_at'], batch_size=500)
+    states = [
+        ThreadReadState(
+            thread_id=thread_id, user_id=user_id, last_read_at=now,
+            last_read_message_id=newest.get(thread_id, (None,))[0],
+        )
+        for thread_id, user_id in MessageThread.participants.through.objects.values_list('messagethread_id', 'customuser_id').iterator()
+    ]
+    ThreadReadState.objects.bulk_create(states, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('collaborations', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='messagethread',
+            name='last_message',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='collaborations.message'),
+        ),
+        migrations.AddField(
+            model_name='messagethread',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='ThreadReadState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('last_read_at', models.DateTimeField(blank=True, null=True)),
+                ('unread_count', models.PositiveIntegerField(default=0)),
+                ('last_read_message', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='collaborations.message')),
+                ('thread', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='read_states', to='collaborations.messagethread')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='thread_read_states', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('thread', 'user'), name='unique_thread_read_state')],
+            },
+        ),
+        migrations.RunPython(backfill_read_state, migrations.RunPython.noop),
+    ]
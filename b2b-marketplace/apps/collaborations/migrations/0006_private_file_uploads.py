@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:58
+
+from django.db import migrations, models
+
+from apps.core.downloads import move_to_private_media
+
+
+def move_files_to_private_media(apps, schema_editor):
+    """Moves ProjectFile.file uploads made before private/ existed into it (see apps.core.downloads)."""
+    move_to_private_media(apps.get_model('collaborations', 'ProjectFile'), 'file')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('collaborations', '0005_activity_feed'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='projectfile',
+            name='file',
+            field=models.FileField(upload_to='private/project_files/%Y/%m/%d/'),
+        ),
+        migrations.RunPython(move_files_to_private_media, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,10 @@
 import uuid
 from django.db import models
 from django.conf import settings
+from django.core.exceptions import ValidationError
 from apps.core.models import AbstractBaseModel # Assuming created_at, updated_at
 from apps.orders.models import Order # Optional: Link projects to orders
+from .membership import project_role
 
 # If AbstractBaseModel is not defined:
 # class AbstractBaseModel(models.Model):
@@ -84,20 +86,41 @@ class Task(AbstractBaseModel):
 
     class Meta:
         ordering = ['priority', 'due_date', 'created_at']
+        indexes = [
+            # Board columns (TaskBoardService) and incremental board refreshes
+            models.Index(fields=['project', 'status', 'priority'], name='task_board_column_idx'),
+            models.Index(fields=['project', 'updated_at'], name='task_project_updated_idx'),
+        ]
 
     def __str__(self):
         return f"Task: {self.title} (Project: {self.project.name})"
 
     def clean(self):
         super().clean()
-        if self.assigned_to and self.assigned_to not in self.project.members.all():
-            raise models.ValidationError(f"User {self.assigned_to.username} is not a member of project {self.project.name} and cannot be assigned this task.")
+        if self.assigned_to and project_role(self.assigned_to, self.project_id) is None:
+            raise ValidationError(f"User {self.assigned_to.username} is not a member of project {self.project.name} and cannot be assigned this task.")
+
+
+class TaskTombstone(models.Model):
+    """
+    Records a deleted task, so a board refreshed with ?since= can drop its card (updated_at can't
+    show deletions). Written by signals.py; rows older than BOARD_TOMBSTONE_RETENTION are pruned.
+    """
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='+')
+    task_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['project', 'deleted_at'], name='task_tombstone_project_idx')]
+
+    def __str__(self):
+        return f"Task {self.task_id} deleted from project {self.project_id}"
 
 
 class ProjectFile(AbstractBaseModel):
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='files')
     uploaded_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True)
-    file = models.FileField(upload_to='project_files/%Y/%m/%d/')
+    file = models.FileField(upload_to='private/project_files/%Y/%m/%d/')
     description = models.CharField(max_length=255, blank=True, null=True)
     # task = models.ForeignKey(Task, on_delete=models.SET_NULL, null=True, blank=True, related_name='files') # Optional: Link file to a specific task
 
@@ -127,9 +150,9 @@ class Comment(AbstractBaseModel): # Generic comment model for tasks or projects
 
     def clean(self):
         if not (self.task or self.project):
-            raise models.ValidationError("Comment must be associated with a task or a project.")
+            raise ValidationError("Comment must be associated with a task or a project.")
         if self.task and self.project:
-            raise models.ValidationError("Comment cannot be associated with both a task and a project simultaneously.")
+            raise ValidationError("Comment cannot be associated with both a task and a project simultaneously.")
 
 
 # --- For Real-time Messaging (if using Django Channels) ---
@@ -139,6 +162,10 @@ class MessageThread(AbstractBaseModel):
     # Or allow generic threads not tied to a project, e.g., direct messages
     # name = models.CharField(max_length=100, null=True, blank=True) # For group chats not tied to project
     participants = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name='message_threads')
+    # Copied from the newest message by MessagingService.record_message(), so the thread list needs
+    # no per-row subquery for ordering or the preview
+    last_message = models.ForeignKey('Message', on_delete=models.SET_NULL, null=True, blank=True, related_name='+', editable=False)
+    last_message_at = models.DateTimeField(null=True, blank=True, db_index=True, editable=False)
 
     def __str__(self):
         if self.project:
@@ -155,6 +182,79 @@ class Message(AbstractBaseModel):
 
     class Meta:
         ordering = ['timestamp'] # Or ['-timestamp'] for newest first in some views
+        indexes = [
+            # Keyset pagination of a thread's history (pagination.MessageCursorPagination)
+            models.Index(fields=['thread', 'timestamp', 'id'], name='message_thread_timeline_idx'),
+        ]
+
+    def __str__(self):
+        return f"Message from {self.sender.username} in thread {self.thread.id} at {self.timestamp}"
+
+
+class ThreadReadState(AbstractBaseModel):
+    """
+    A participant's read cursor in a thread, plus the number of messages from others after it.
+    One row per participant, kept in step with MessageThread.participants by signals.py.
+    """
+    thread = models.ForeignKey(MessageThread, on_delete=models.CASCADE, related_name='read_states')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='thread_read_states')
+    last_read_message = models.ForeignKey(Message, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    last_read_at = models.DateTimeField(null=True, blank=True)
+    unread_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['thread', 'user'], name='unique_thread_read_state')]
+
+    def __str__(self):
+        return f"{self.user_id} in thread {self.thread_id}: {self.unread_count} unread"
+
+
+class ActivityEvent(models.Model):
+    """
+    Something that happened in a project (a task created or changed, a comment, a file, a message),
+    written once. Feeds show events newest first by id (see ActivityFeedService). Events of projects
+    with up to ACTIVITY_FANOUT_MAX_MEMBERS members are copied to each member's feed when written
+    (fanned_out); those of larger projects are read from here when a feed is loaded.
+    """
+    VERB_CHOICES = (
+        ('task_created', 'Task created'),
+        ('task_updated', 'Task updated'),
+        ('comment_added', 'Comment added'),
+        ('file_uploaded', 'File uploaded'),
+        ('message_sent', 'Message sent'),
+    )
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='activity_events')
+    actor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name='+')
+    verb = models.CharField(max_length=20, choices=VERB_CHOICES)
+    target_type = models.CharField(max_length=20) # 'task', 'comment', 'file' or 'message'
+    target_id = models.CharField(max_length=64)
+    summary = models.CharField(max_length=255, blank=True)
+    fanned_out = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True) # Retention pruning
+
+    class Meta:
+        indexes = [
+            # Feeds read large projects' events newest first from a cursor (fan-out on read)
+            models.Index(fields=['project', 'fanned_out', 'id'], name='activity_project_feed_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_verb_display()} in project {self.project_id} by {self.actor_id}"
+
+
+class FeedEntry(models.Model):
+    """
+    An event in one user's feed (fan-out on write). project_id and created_at are copied from the
+    event, so feeds filter by current membership and old entries are pruned without joins.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='feed_entries')
+    event = models.ForeignKey(ActivityEvent, on_delete=models.CASCADE, related_name='feed_entries')
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='+')
+    created_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['user', 'event'], name='unique_feed_entry')]
+        verbose_name_plural = "Feed entries"
 
     def __str__(self):
-        return f"Message from {self.sender.username} in thread {self.thread.id} at {self.timestamp}"
\ No newline at end of file
+        return f"Event {self.event_id} for {self.user_id}"
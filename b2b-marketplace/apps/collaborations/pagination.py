@@ -0,0 +1,91 @@
+# apps/collaborations/pagination.py
+from collections import OrderedDict
+
+from rest_framework import serializers
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class MessageCursorPagination(BasePagination):
+    """
+    Keyset pagination over a thread's messages, newest first, with message ids as cursors:
+
+        ?limit=50               the newest messages
+        ?before=<id>&limit=50   the next older page (scrolling back)
+        ?after=<id>&limit=50    messages newer than <id>, e.g. the last one seen before a reconnect;
+                                the `limit` oldest of them, so following `newer` misses nothing
+
+    Pages are found by seeking the (thread, timestamp, id) index from the cursor message, so every
+    page costs the same however deep it is: no COUNT and no OFFSET. Results are newest first in both
+    directions; `older`/`newer` link to the adjacent pages (null when that direction is known to be
+    exhausted).
+    """
+    default_limit = 50
+    max_limit = 200
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self._limit(request)
+        before, after = request.query_params.get('before'), request.query_params.get('after')
+        if before and after:
+            raise serializers.ValidationError({'detail': 'Use either before or after, not both.'})
+        self.direction = 'newer' if after else 'older'
+        cursor = self._cursor(queryset, 'after' if after else 'before', after or before)
+
+        if cursor is None:
+            page = queryset.order_by('-timestamp', '-id')
+        elif self.direction == 'older':
+            # timestamp <= t bounds the index scan; the exclude drops the cursor and its ties after it
+            page = queryset.filter(timestamp__lte=cursor['timestamp']).exclude(
+                timestamp=cursor['timestamp'], id__gte=cursor['id'],
+            ).order_by('-timestamp', '-id')
+        else:
+            page = queryset.filter(timestamp__gte=cursor['timestamp']).exclude(
+                timestamp=cursor['timestamp'], id__lte=cursor['id'],
+            ).order_by('timestamp', 'id')
+        page = list(page[:self.limit + 1])
+        self.has_more = len(page) > self.limit
+        page = page[:self.limit]
+        if self.direction == 'newer':
+            page.reverse()
+        self.page = page
+        return page
+
+    def get_paginated_response(self, data):
+        url = remove_query_param(remove_query_param(self.request.build_absolute_uri(), 'before'), 'after')
+        older = newer = None
+        if self.page:
+            if self.direction == 'newer' or self.has_more:
+                older = replace_query_param(url, 'before', self.page[-1].id)
+            if self.direction == 'older' or self.has_more:
+                newer = replace_query_param(url, 'after', self.page[0].id)
+        return Response(OrderedDict([('older', older), ('newer', newer), ('results', data)]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'older': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'newer': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def _limit(self, request):
+        try:
+            return min(max(int(request.query_params.get('limit', self.default_limit)), 1), self.max_limit)
+        except ValueError:
+            raise serializers.ValidationError({'limit': ['A valid integer is required.']})
+
+    @staticmethod
+    def _cursor(queryset, param, value):
+        if not value:
+            return None
+        try:
+            cursor = queryset.filter(pk=int(value)).values('timestamp', 'id').first()
+        except ValueError:
+            cursor = None
+        if cursor is None:
+            raise serializers.ValidationError({param: ['No such message in this thread.']})
+        return cursor
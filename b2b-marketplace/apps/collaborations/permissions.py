@@ -1,19 +1,22 @@
 from rest_framework import permissions
 
+from .membership import is_project_member, project_role
+from .models import Message, MessageThread, Project
+
 class IsProjectOwnerOrMemberReadOnly(permissions.BasePermission):
     """
     Allows read access to project members.
     Allows write/delete access only to project owner or admin.
     """
     def has_object_permission(self, request, view, obj): # obj is Project
-        is_member = request.user in obj.members.all() or request.user == obj.owner
+        role = project_role(request.user, obj.pk) # From the membership index, see membership.py
         is_admin = request.user.is_staff
 
         if request.method in permissions.SAFE_METHODS:
-            return is_member or is_admin # Members and admin can read
+            return role is not None or is_admin # Members and admin can read
 
         # Write permissions only for owner or admin
-        return obj.owner == request.user or is_admin
+        return role == 'owner' or is_admin
 
 
 class IsProjectMember(permissions.BasePermission):
@@ -26,22 +29,17 @@ class IsProjectMember(permissions.BasePermission):
         if user.is_staff:
             return True
 
-        project = None
-        if hasattr(obj, 'project'): # For Task, ProjectFile
-            project = obj.project
-        elif isinstance(obj, Project): # For Project itself
-            project = obj
-        elif hasattr(obj, 'task') and obj.task: # For Comment on Task
-            project = obj.task.project
-        elif hasattr(obj, 'project_comment') and obj.project_comment: # For Comment on Project (if using different related_name)
-             project = obj.project_comment
-        elif hasattr(obj, 'id') and view.basename == 'project': # If obj is Project, from generic view
-             project = obj
-
+        # Only the project id is needed, so related projects aren't loaded
+        project_id = None
+        if isinstance(obj, Project): # For Project itself
+            project_id = obj.pk
+        elif getattr(obj, 'project_id', None): # For Task, ProjectFile, Comment on Project
+            project_id = obj.project_id
+        elif getattr(obj, 'task_id', None): # For Comment on Task
+            project_id = obj.task.project_id
 
-        if project:
-            return project.owner == user or project.members.filter(id=user.id).exists()
-        return False # Deny if project context cannot be determined or user is not member
+        # Deny if project context cannot be determined or user is not member
+        return project_id is not None and is_project_member(user, project_id)
 
     def has_permission(self, request, view): # For list views where object is not yet fetched
         if not request.user or not request.user.is_authenticated:
@@ -55,11 +53,7 @@ class IsProjectMember(permissions.BasePermission):
         if view.action == 'create':
             project_id = request.data.get('project_id') or request.data.get('project')
             if project_id:
-                try:
-                    project = Project.objects.get(id=project_id)
-                    return project.owner == request.user or project.members.filter(id=request.user.id).exists()
-                except Project.DoesNotExist:
-                    return False # Project not found, deny
+                return is_project_member(request.user, project_id) # Also False for unknown projects
             return False # Project ID required for creation of sub-resources
         return True # Allow other list/detail views, let has_object_permission handle detail.
 
@@ -74,10 +68,10 @@ class IsTaskAssigneeOrProjectMember(permissions.BasePermission):
         if user.is_staff:
             return True
 
-        project = obj.project
-        is_project_owner = project.owner == user
-        is_project_member = project.members.filter(id=user.id).exists()
-        is_assignee = obj.assigned_to == user
+        role = project_role(user, obj.project_id)
+        is_project_owner = role == 'owner'
+        is_project_member = role is not None
+        is_assignee = obj.assigned_to_id == user.id
 
         if request.method in permissions.SAFE_METHODS:
             return is_project_member or is_assignee # Members or assignee can read
@@ -98,21 +92,21 @@ class IsCommentAuthorOrProjectMemberReadOnly(permissions.BasePermission):
         if user.is_staff:
             return True
 
-        project = None
-        if obj.task:
-            project = obj.task.project
-        elif obj.project: # Direct comment on project
-            project = obj.project
+        project_id = None
+        if obj.task_id:
+            project_id = obj.task.project_id
+        elif obj.project_id: # Direct comment on project
+            project_id = obj.project_id
 
-        if not project: return False # Should not happen if comment is valid
+        if not project_id: return False # Should not happen if comment is valid
 
-        is_project_member = project.members.filter(id=user.id).exists() or project.owner == user
+        role = project_role(user, project_id)
 
         if request.method in permissions.SAFE_METHODS:
-            return is_project_member
+            return role is not None
 
         # Write permissions for comment author or project owner
-        return obj.author == user or project.owner == user
+        return obj.author_id == user.id or role == 'owner'
 
 
 class IsThreadParticipant(permissions.BasePermission):
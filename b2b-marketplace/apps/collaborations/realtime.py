@@ -0,0 +1,321 @@
+# apps/collaborations/realtime.py
+"""
+Pub/sub behind the message stream (streaming.py).
+
+Events go to named channels:
+- `thread:<id>` carries new messages of one MessageThread
+- `user:<id>` tells one user's open streams about thread membership changes
+
+publish() can be called from sync code on any thread, e.g. a view's transaction.on_commit
+callback. Each event is encoded once into a Server-Sent Events frame, which every subscriber then
+shares. A stream subscribes to its user's threads once when it connects, so a publish only does a
+dict lookup plus one queue append per connected participant: O(participants) with no database read.
+
+The broker class comes from the REALTIME_BACKEND setting:
+- InProcessBroker (default) delivers inside the current process. It only works when the API and
+  the streams are served by the same single ASGI process.
+- RedisBroker sends every publish through Redis pub/sub. Each process runs one listener that feeds
+  its own subscribers, so any number of WSGI/ASGI workers can publish to streams held by any other
+  worker. It needs the `redis` package.
+
+A subscriber that falls REALTIME_QUEUE_SIZE events behind is closed rather than buffered without
+bound; its client reconnects and reloads the thread.
+"""
+import asyncio
+import json
+import logging
+import threading
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+Event = namedtuple('Event', ['channel', 'name', 'data', 'frame'])
+PING = Event(None, 'ping', None, b': ping\n\n') # SSE comment line, ignored by clients
+
+
+def thread_channel(thread_id):
+    return f'thread:{thread_id}'
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+def encode_frame(name, data, event_id=None) -> bytes:
+    """One Server-Sent Events frame."""
+    payload = json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':'))
+    frame = f'event: {name}\ndata: {payload}\n\n'
+    if event_id is not None:
+        frame = f'id: {event_id}\n' + frame
+    return frame.encode()
+
+
+class Subscription:
+    """One stream's inbox; lives on the event loop that created it."""
+
+    def __init__(self, broker, max_queue):
+        self.broker = broker
+        self.loop = asyncio.get_running_loop()
+        self.channels = set()
+        self.closed = None # Reason, once closed
+        self._queue = asyncio.Queue(maxsize=max_queue)
+
+    def push(self, event):
+        # Runs on self.loop
+        if self.closed:
+            return
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.close('overflow')
+
+    async def get(self):
+        """Waits for the next events and returns everything queued as a list; None once closed."""
+        if self.closed:
+            return None
+        event = await self._queue.get()
+        if event is None:
+            return None
+        events = [event]
+        while not self._queue.empty():
+            event = self._queue.get_nowait()
+            if event is None:
+                break
+            events.append(event)
+        return events
+
+    def subscribe(self, channels):
+        self.broker.hub.add(self, channels)
+
+    def unsubscribe(self, channels):
+        self.broker.hub.discard(self, channels)
+
+    def close(self, reason='closed'):
+        if self.closed:
+            return
+        self.closed = reason
+        self.broker.hub.discard(self, list(self.channels))
+        self.broker.hub.forget(self)
+        try:
+            self._queue.put_nowait(None) # Wakes a pending get()
+        except asyncio.QueueFull:
+            pass
+
+
+class LocalHub:
+    """
+    channel -> subscriptions in this process. Also sends the keep-alive PING to every open
+    subscription, from one task per event loop; per-stream timers would cost a timer reschedule
+    on each delivered event.
+    """
+
+    def __init__(self, heartbeat=None):
+        self.heartbeat = heartbeat or getattr(settings, 'REALTIME_HEARTBEAT', 15)
+        self._lock = threading.Lock()
+        self._channels = {}
+        self._by_loop = {} # event loop -> open subscriptions
+        self._heartbeats = {} # event loop -> heartbeat task
+
+    def register(self, subscription):
+        # On subscription.loop
+        loop = subscription.loop
+        with self._lock:
+            self._by_loop.setdefault(loop, set()).add(subscription)
+            task = self._heartbeats.get(loop)
+            if task is None or task.done():
+                self._heartbeats[loop] = loop.create_task(self._send_heartbeats(loop))
+
+    def forget(self, subscription):
+        with self._lock:
+            subscriptions = self._by_loop.get(subscription.loop)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+
+    async def _send_heartbeats(self, loop):
+        while True:
+            await asyncio.sleep(self.heartbeat)
+            with self._lock:
+                subscriptions = tuple(self._by_loop.get(loop, ()))
+                if not subscriptions: # Started again by the next subscription
+                    self._by_loop.pop(loop, None)
+                    self._heartbeats.pop(loop, None)
+                    return
+            _push_all(subscriptions, PING)
+
+    def add(self, subscription, channels):
+        with self._lock:
+            for channel in channels:
+                self._channels.setdefault(channel, set()).add(subscription)
+                subscription.channels.add(channel)
+
+    def discard(self, subscription, channels):
+        with self._lock:
+            for channel in channels:
+                subscription.channels.discard(channel)
+                subscribers = self._channels.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._channels[channel]
+
+    def has_subscribers(self, channel):
+        return channel in self._channels
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscriptions) for subscriptions in self._by_loop.values())
+
+    def deliver(self, event) -> int:
+        """Queues `event` for every subscriber of its channel. Safe to call from any thread."""
+        with self._lock:
+            subscribers = tuple(self._channels.get(event.channel, ()))
+        if not subscribers:
+            return 0
+        by_loop = {}
+        for subscription in subscribers:
+            by_loop.setdefault(subscription.loop, []).append(subscription)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        for loop, group in by_loop.items():
+            if loop is running:
+                _push_all(group, event)
+            elif not loop.is_closed():
+                # One wakeup per event loop, not one per subscriber
+                loop.call_soon_threadsafe(_push_all, group, event)
+        return len(subscribers)
+
+    def close_all(self, reason='shutdown'):
+        with self._lock:
+            subscriptions = [subscription for subscriptions in self._by_loop.values() for subscription in subscriptions]
+        for subscription in subscriptions:
+            if not subscription.loop.is_closed():
+                subscription.loop.call_soon_threadsafe(subscription.close, reason)
+
+
+def _push_all(subscriptions, event):
+    for subscription in subscriptions:
+        subscription.push(event)
+
+
+class InProcessBroker:
+    """Delivers publishes to the subscribers of this process."""
+
+    def __init__(self, queue_size=None):
+        self.queue_size = queue_size or getattr(settings, 'REALTIME_QUEUE_SIZE', 100)
+        self.hub = LocalHub()
+
+    def publish(self, channel, name, data, event_id=None):
+        self.hub.deliver(Event(channel, name, data, encode_frame(name, data, event_id)))
+
+    async def subscribe(self, channels=()) -> Subscription:
+        subscription = Subscription(self, self.queue_size)
+        self.hub.register(subscription)
+        subscription.subscribe(channels)
+        return subscription
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        self.hub.close_all()
+
+
+class RedisBroker(InProcessBroker):
+    """
+    Publishes through Redis (REALTIME_REDIS_URL). Every process pattern-subscribes once to
+    REALTIME_REDIS_PREFIX* and hands messages to its local hub; channels without a local
+    subscriber are dropped before the payload is decoded.
+    """
+
+    def __init__(self, queue_size=None, url=None, prefix=None):
+        super().__init__(queue_size)
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured('RedisBroker needs the redis package (pip install redis).')
+        self.url = url or getattr(settings, 'REALTIME_REDIS_URL', 'redis://localhost:6379/0')
+        self.prefix = prefix or getattr(settings, 'REALTIME_REDIS_PREFIX', 'marketplace:realtime:')
+        self._client = redis.Redis.from_url(self.url)
+        self._listener = None
+
+    def publish(self, channel, name, data, event_id=None):
+        payload = json.dumps({'name': name, 'data': data, 'id': event_id}, cls=DjangoJSONEncoder, separators=(',', ':'))
+        self._client.publish(self.prefix + channel, payload)
+
+    async def subscribe(self, channels=()) -> Subscription:
+        await self.start()
+        return await super().subscribe(channels)
+
+    async def start(self):
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.get_running_loop().create_task(self._listen())
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+        await super().stop()
+
+    async def _listen(self):
+        import redis.asyncio as aioredis
+
+        while True:
+            client = aioredis.Redis.from_url(self.url)
+            try:
+                async with client.pubsub() as pubsub:
+                    await pubsub.psubscribe(self.prefix + '*')
+                    async for message in pubsub.listen():
+                        if message['type'] != 'pmessage':
+                            continue
+                        channel = message['channel'].decode()[len(self.prefix):]
+                        if not self.hub.has_subscribers(channel):
+                            continue
+                        payload = json.loads(message['data'])
+                        frame = encode_frame(payload['name'], payload['data'], payload['id'])
+                        self.hub.deliver(Event(channel, payload['name'], payload['data'], frame))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Events published while disconnected are lost; clients reload on reconnect
+                logger.exception('Realtime Redis listener failed; reconnecting')
+                await asyncio.sleep(1)
+            finally:
+                await client.aclose()
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(getattr(settings, 'REALTIME_BACKEND', 'apps.collaborations.realtime.InProcessBroker'))()
+    return _broker
+
+
+def publish_message(data):
+    """Pushes a serialized Message (MessageSerializer data) to the streams of its thread's participants."""
+    get_broker().publish(thread_channel(data['thread_id']), 'message', data, event_id=data['id'])
+
+
+def publish_membership(thread_id, user_ids, joined=True):
+    """Tells these users' open streams to start (or stop) following a thread."""
+    broker = get_broker()
+    name = 'thread.joined' if joined else 'thread.left'
+    for user_id in user_ids:
+        broker.publish(user_channel(user_id), name, {'thread_id': thread_id})
+
+
+def publish_read_state(user_id, data):
+    """Tells a user's open streams that they read a thread (ThreadReadStateSerializer data)."""
+    get_broker().publish(user_channel(user_id), 'thread.read', data)
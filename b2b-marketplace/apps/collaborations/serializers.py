@@ -1,13 +1,30 @@
 from rest_framework import serializers
 from django.conf import settings
-from .models import Project, Task, ProjectFile, Comment, MessageThread, Message
+from django.db import models
+from .models import ActivityEvent, Project, Task, ProjectFile, Comment, MessageThread, Message, ThreadReadState
 from apps.accounts.serializers import UserSerializer # For owner, members, assigned_to, author etc.
+from apps.core.serializers import DownloadURLField
 from apps.orders.serializers import OrderSerializer # For related_order details (optional)
 from django.contrib.auth import get_user_model
 from apps.orders.models import Order
+from .membership import is_project_member, project_role
+from .services import ProjectService
 
 User = get_user_model()
 
+
+def parse_expand(value, strict=True):
+    """?expand=tasks,files -> {'tasks', 'files'}. Unknown names raise a ValidationError if `strict`."""
+    names = {name.strip() for name in (value or '').split(',') if name.strip()}
+    if 'all' in names:
+        return set(ProjectSerializer.EXPANDABLE)
+    unknown = names - set(ProjectSerializer.EXPANDABLE)
+    if unknown and strict:
+        raise serializers.ValidationError({'expand': [
+            f"Unknown: {', '.join(sorted(unknown))}. Choose from: {', '.join(ProjectSerializer.EXPANDABLE)} or all."
+        ]})
+    return names - unknown
+
 class CommentSerializer(serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
     author_id = serializers.PrimaryKeyRelatedField(
@@ -45,7 +62,7 @@ class CommentSerializer(serializers.ModelSerializer):
         elif project_obj:
             target_project = project_obj
 
-        if user and target_project and not target_project.members.filter(id=user.id).exists() and not user.is_staff:
+        if user and target_project and not is_project_member(user, target_project.pk):
             raise serializers.ValidationError("You must be a member of the project to comment.")
 
         # Set author if not explicitly provided by CurrentUserDefault
@@ -81,13 +98,11 @@ class TaskSerializer(serializers.ModelSerializer):
     def validate_assigned_to_id(self, value):
         # Ensure assigned_to user is a member of the project
         project = self.initial_data.get('project_id') # Get project_id from initial data for validation
-        if value and project: # project is ID here, needs to be instance
-            try:
-                project_instance = Project.objects.get(id=project)
-                if not project_instance.members.filter(id=value.id).exists():
-                    raise serializers.ValidationError(f"User {value.username} is not a member of project {project_instance.name}.")
-            except Project.DoesNotExist:
-                 raise serializers.ValidationError(f"Project with id {project} not found.") # Should be caught by project_id validation
+        if value and project is None and self.instance: # Reassigning an existing task
+            project = self.instance.project_id
+        if value and project: # Checked against the assignee's membership index, not the project's member list
+            if project_role(value, project) is None:
+                raise serializers.ValidationError(f"User {value.username} is not a member of this project.")
         return value
 
     def validate(self, data):
@@ -95,7 +110,7 @@ class TaskSerializer(serializers.ModelSerializer):
         user = request.user if request else None
         project = data.get('project') # This is project instance now after project_id field
 
-        if user and project and not project.members.filter(id=user.id).exists() and not user.is_staff:
+        if user and project and not is_project_member(user, project.pk):
             # On create, only members or admin can create tasks for a project
             if not self.instance: # Only for creation
                  raise serializers.ValidationError("You must be a member of the project to create tasks.")
@@ -104,6 +119,24 @@ class TaskSerializer(serializers.ModelSerializer):
         return data
 
 
+class BoardTaskSerializer(serializers.ModelSerializer):
+    """A task card on the project board: no nested users or comments. Pass `today` in the context."""
+    assigned_to_id = serializers.IntegerField(read_only=True, allow_null=True)
+    assigned_to_username = serializers.CharField(source='assigned_to.username', read_only=True, default=None)
+    is_overdue = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Task
+        fields = [
+            'id', 'title', 'status', 'priority', 'due_date', 'is_overdue', 'assigned_to_id', 'assigned_to_username',
+            'estimated_hours', 'actual_hours', 'updated_at',
+        ]
+        read_only_fields = fields
+
+    def get_is_overdue(self, obj):
+        return bool(obj.due_date and obj.status != 'done' and obj.due_date < self.context['today'])
+
+
 class ProjectFileSerializer(serializers.ModelSerializer):
     uploaded_by = UserSerializer(read_only=True, allow_null=True)
     uploaded_by_id = serializers.PrimaryKeyRelatedField(
@@ -111,7 +144,7 @@ class ProjectFileSerializer(serializers.ModelSerializer):
         default=serializers.CurrentUserDefault()
     )
     project_id = serializers.PrimaryKeyRelatedField(queryset=Project.objects.all(), source='project')
-    file_url = serializers.FileField(source='file', read_only=True)
+    file_url = DownloadURLField('project_file')
 
     class Meta:
         model = ProjectFile
@@ -126,12 +159,30 @@ class ProjectFileSerializer(serializers.ModelSerializer):
         user = request.user if request else None
         project = data.get('project')
 
-        if user and project and not project.members.filter(id=user.id).exists() and not user.is_staff:
+        if user and project and not is_project_member(user, project.pk):
             raise serializers.ValidationError("You must be a member of the project to upload files.")
         return data
 
 
+class ProjectListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        projects = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        ProjectService().attach_summaries(projects) # Counts for the whole page in grouped queries
+        return super().to_representation(projects)
+
+
 class ProjectSerializer(serializers.ModelSerializer):
+    """
+    By default a project carries summary counts (member_count, task_counts per status, file_count,
+    comment_count); the heavy nested relations are opt-in with ?expand=members,tasks,files,comments,
+    related_order (or context['expand']).
+    """
+    # ?expand= name -> the nested field it adds
+    EXPANDABLE = {
+        'members': 'members', 'tasks': 'tasks', 'files': 'files', 'comments': 'comments',
+        'related_order': 'related_order_details',
+    }
+
     owner = UserSerializer(read_only=True)
     owner_id = serializers.PrimaryKeyRelatedField(
         queryset=User.objects.all(), source='owner', write_only=True,
@@ -143,11 +194,16 @@ class ProjectSerializer(serializers.ModelSerializer):
     )
     related_order_details = OrderSerializer(source='related_order', read_only=True, allow_null=True)
     related_order_id = serializers.PrimaryKeyRelatedField(
-        queryset=Order.objects.all(), source='related_order', write_only=True, allow_null=True, required=False
+        queryset=Order.objects.all(), source='related_order', allow_null=True, required=False
     )
     tasks = TaskSerializer(many=True, read_only=True) # Optionally nest tasks
     files = ProjectFileSerializer(many=True, read_only=True) # Optionally nest files
     comments = CommentSerializer(many=True, read_only=True) # Comments directly on the project
+    # Set by ProjectService.attach_summaries()
+    member_count = serializers.IntegerField(read_only=True)
+    task_counts = serializers.DictField(child=serializers.IntegerField(), read_only=True)
+    file_count = serializers.IntegerField(read_only=True)
+    comment_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Project
@@ -155,10 +211,28 @@ class ProjectSerializer(serializers.ModelSerializer):
             'id', 'name', 'description', 'owner', 'owner_id', 'members', 'member_ids',
             'status', 'start_date', 'due_date',
             'related_order_id', 'related_order_details',
+            'member_count', 'task_counts', 'file_count', 'comment_count',
             'tasks', 'files', 'comments',
             'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at', 'tasks', 'files', 'comments', 'related_order_details']
+        list_serializer_class = ProjectListSerializer
+
+    def get_fields(self):
+        fields = super().get_fields()
+        expand = self.context.get('expand')
+        if expand is None:
+            request = self.context.get('request')
+            expand = parse_expand(request.query_params.get('expand') if request else None, strict=False)
+        for name, field_name in self.EXPANDABLE.items():
+            if name not in expand:
+                fields.pop(field_name)
+        return fields
+
+    def to_representation(self, instance):
+        if 'member_count' not in instance.__dict__: # Serialized on its own, not through ProjectListSerializer
+            ProjectService().attach_summaries([instance])
+        return super().to_representation(instance)
 
     def create(self, validated_data):
         member_ids = validated_data.pop('member_ids', [])
@@ -233,8 +307,14 @@ class MessageSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("You must be a participant in the thread to send messages.")
         return data
 
+class ProjectBriefSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Project
+        fields = ['id', 'name', 'status']
+
+
 class MessageThreadSerializer(serializers.ModelSerializer):
-    project_details = ProjectSerializer(source='project', read_only=True, allow_null=True)
+    project_details = ProjectBriefSerializer(source='project', read_only=True, allow_null=True)
     project_id = serializers.PrimaryKeyRelatedField(
         queryset=Project.objects.all(), source='project', write_only=True, allow_null=True, required=False
     )
@@ -242,25 +322,21 @@ class MessageThreadSerializer(serializers.ModelSerializer):
     participant_ids = serializers.PrimaryKeyRelatedField(
         queryset=User.objects.all(), source='participants', write_only=True, many=True
     )
-    messages = MessageSerializer(many=True, read_only=True) # Optionally nest last N messages
-    last_message = MessageSerializer(read_only=True, allow_null=True) # For displaying latest message in thread list
+    last_message = MessageSerializer(read_only=True, allow_null=True) # Stored on the thread, see services.py
+    # The requesting user's read state, annotated by MessageThreadViewSet.get_queryset()
+    unread_count = serializers.IntegerField(read_only=True, default=0)
+    last_read_message_id = serializers.IntegerField(read_only=True, default=None)
 
     class Meta:
         model = MessageThread
         fields = [
             'id', 'project_id', 'project_details', 'participants', 'participant_ids',
-            'messages', 'last_message', 'created_at', 'updated_at'
+            'last_message', 'last_message_at', 'unread_count', 'last_read_message_id', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at', 'messages', 'last_message', 'project_details']
-
-    def get_last_message(self, obj):
-        last_msg = obj.messages.order_by('-timestamp').first()
-        if last_msg:
-            return MessageSerializer(last_msg, context=self.context).data
-        return None
+        read_only_fields = ['id', 'created_at', 'updated_at', 'last_message', 'last_message_at', 'project_details']
 
     def create(self, validated_data):
-        participant_ids = validated_data.pop('participant_ids')
+        participant_ids = validated_data.pop('participants') # participant_ids has source='participants'
         project = validated_data.get('project')
         request = self.context.get('request')
         user = request.user if request else None
@@ -295,4 +371,27 @@ class MessageThreadSerializer(serializers.ModelSerializer):
 
         thread = MessageThread.objects.create(**validated_data)
         thread.participants.set(participant_ids)
-        return thread
\ No newline at end of file
+        return thread
+
+
+class ThreadReadStateSerializer(serializers.ModelSerializer):
+    message_id = serializers.PrimaryKeyRelatedField(
+        queryset=Message.objects.all(), source='last_read_message', write_only=True, required=False,
+        help_text='Read up to and including this message; defaults to the newest.',
+    )
+
+    class Meta:
+        model = ThreadReadState
+        fields = ['thread_id', 'message_id', 'last_read_message_id', 'last_read_at', 'unread_count']
+        read_only_fields = ['thread_id', 'last_read_message_id', 'last_read_at', 'unread_count']
+
+
+class ActivityEventSerializer(serializers.ModelSerializer):
+    """An entry of the activity feed; actor and project come from select_related (ActivityFeedService.feed)."""
+    project = ProjectBriefSerializer(read_only=True)
+    actor_username = serializers.CharField(source='actor.username', read_only=True, default=None)
+
+    class Meta:
+        model = ActivityEvent
+        fields = ['id', 'project', 'actor_id', 'actor_username', 'verb', 'target_type', 'target_id', 'summary', 'created_at']
+        read_only_fields = fields
@@ -0,0 +1,286 @@
+# apps/collaborations/services.py
+"""
+Project summaries and read state of message threads.
+
+ProjectService.attach_summaries() counts members, tasks per status, files and comments for a page
+of projects with one grouped query per relation, so ProjectSerializer can show the counts without
+nesting (and loading) the rows themselves. TaskBoardService computes a project's Kanban board:
+columns per status with a page of task cards each, and counts, overdue tasks and hour sums per
+status, priority and assignee, from grouped queries instead of every task.
+
+Each participant has a ThreadReadState row: a read cursor (last_read_message) and unread_count, the
+number of messages from others after it. Instead of counting messages per thread when listing:
+- record_message() runs for every new message (post_save, see signals.py). It moves the thread's
+  last_message columns with one UPDATE and bumps every other participant's counter with one more.
+  The sender's own cursor moves to the message.
+- mark_read() moves a participant's cursor forward and resets the counter.
+
+ActivityFeedService keeps each user's "what changed in my projects" feed. Every task, comment, file
+and project message is recorded once as an ActivityEvent (signals.py). For projects with up to
+ACTIVITY_FANOUT_MAX_MEMBERS members the event is also copied into each member's feed as a FeedEntry
+row (fan-out on write), so loading a feed is one index range scan instead of a union over four
+tables. Events of larger projects aren't copied (that would be thousands of rows per event); feeds
+read them from the project's events (fan-out on read) and merge both by event id.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, F, Q, Sum, Value, When, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from .membership import member_project_ids
+from .models import (
+    ActivityEvent, Comment, FeedEntry, Message, MessageThread, Project, ProjectFile, Task, TaskTombstone, ThreadReadState,
+)
+
+
+class ProjectService:
+
+    def attach_summaries(self, projects):
+        """
+        Sets member_count, task_counts, file_count and comment_count on each project: one grouped
+        query per relation, or none for relations already prefetched (e.g. by ?expand=).
+        """
+        ids = [project.pk for project in projects]
+        if not ids:
+            return
+
+        def prefetched(name):
+            return all(name in getattr(project, '_prefetched_objects_cache', {}) for project in projects)
+
+        def counts(name, queryset):
+            if prefetched(name):
+                return {project.pk: len(getattr(project, name).all()) for project in projects}
+            return dict(queryset.values_list('project_id').annotate(n=Count('id')).order_by())
+
+        members = counts('members', Project.members.through.objects.filter(project_id__in=ids))
+        files = counts('files', ProjectFile.objects.filter(project_id__in=ids))
+        # The 'comments' prefetch of ProjectViewSet holds project-level comments only, like this count
+        comments = counts('comments', Comment.objects.filter(project_id__in=ids, task__isnull=True))
+        tasks = {project_id: {status: 0 for status, _ in Task.TASK_STATUS_CHOICES} for project_id in ids}
+        if prefetched('tasks'):
+            rows = [(project.pk, task.status, 1) for project in projects for task in project.tasks.all()]
+        else:
+            rows = Task.objects.filter(project_id__in=ids).values_list('project_id', 'status').annotate(n=Count('id')).order_by()
+        for project_id, status, n in rows:
+            tasks[project_id][status] = tasks[project_id].get(status, 0) + n
+        for project in projects:
+            project.member_count = members.get(project.pk, 0)
+            project.task_counts = tasks[project.pk]
+            project.file_count = files.get(project.pk, 0)
+            project.comment_count = comments.get(project.pk, 0)
+
+
+class TaskBoardService:
+    """
+    A project's tasks as a Kanban board. All methods are scoped to one project and take `today`
+    for the overdue rule (due before today and not done).
+    """
+    # Card order within a column: most urgent first, then earliest due
+    card_order = [F('priority').desc(), F('due_date').asc(nulls_last=True), F('created_at').asc(), F('id').asc()]
+
+    def __init__(self, project_id, today=None):
+        self.project_id = project_id
+        self.today = today or timezone.localdate()
+
+    def tasks(self):
+        return Task.objects.filter(project_id=self.project_id)
+
+    def _aggregates(self):
+        return {
+            'count': Count('id'),
+            'overdue': Count('id', filter=Q(due_date__lt=self.today) & ~Q(status='done')),
+            'estimated_hours': Sum('estimated_hours'),
+            'actual_hours': Sum('actual_hours'),
+        }
+
+    def stats(self):
+        """
+        Board totals, per-status columns (with per-priority counts) and per-assignee workload:
+        one query grouped by (status, priority), one by assignee.
+        """
+        columns = {status: self._empty(label=label, status=status, by_priority={str(p): 0 for p, _ in Task.PRIORITY_CHOICES})
+                   for status, label in Task.TASK_STATUS_CHOICES}
+        totals = self._empty()
+        for row in self.tasks().values('status', 'priority').annotate(**self._aggregates()).order_by():
+            column = columns.setdefault(row['status'], self._empty(label=row['status'], status=row['status'], by_priority={}))
+            column['by_priority'][str(row['priority'])] = row['count']
+            self._add(column, row)
+            self._add(totals, row)
+        assignees = [
+            self._add(self._empty(assigned_to_id=row['assigned_to_id'], username=row['assigned_to__username']), row)
+            for row in self.tasks().values('assigned_to_id', 'assigned_to__username').annotate(**self._aggregates()).order_by('assigned_to__username')
+        ]
+        for entry in [totals, *columns.values(), *assignees]:
+            for field in ('estimated_hours', 'actual_hours'):
+                entry[field] = f'{entry[field]:.2f}' # As TaskSerializer's DecimalFields render
+        return {'totals': totals, 'columns': list(columns.values()), 'assignees': assignees}
+
+    @staticmethod
+    def _empty(**fields):
+        return {**fields, 'count': 0, 'overdue': 0, 'estimated_hours': Decimal('0'), 'actual_hours': Decimal('0')}
+
+    @staticmethod
+    def _add(entry, row):
+        entry['count'] += row['count']
+        entry['overdue'] += row['overdue']
+        entry['estimated_hours'] += row['estimated_hours'] or 0
+        entry['actual_hours'] += row['actual_hours'] or 0
+        return entry
+
+    def column_cards(self, statuses, limit, offset=0):
+        """
+        {status: [tasks]}: positions offset+1 .. offset+limit of each column, in one query (numbered
+        per column with ROW_NUMBER() over the task_board_column_idx rows of the project).
+        """
+        position = Window(RowNumber(), partition_by=[F('status')], order_by=self.card_order)
+        cards = self.tasks().filter(status__in=statuses).select_related('assigned_to').annotate(
+            position=position,
+        ).filter(position__gt=offset, position__lte=offset + limit).order_by('status', 'position')
+        columns = {status: [] for status in statuses}
+        for task in cards:
+            columns[task.status].append(task)
+        return columns
+
+    def changes(self, since, limit):
+        """
+        Tasks updated and ids of tasks deleted at or after `since`, oldest change first, at most
+        `limit` updated tasks. Returns (changed, removed, complete); complete is False if more tasks
+        changed or `since` is older than the tombstones kept, i.e. the board must be reloaded.
+        """
+        changed = list(self.tasks().filter(updated_at__gte=since).select_related('assigned_to').order_by('updated_at', 'id')[:limit + 1])
+        removed = list(TaskTombstone.objects.filter(project_id=self.project_id, deleted_at__gte=since).values_list('task_id', flat=True))
+        complete = len(changed) <= limit and since >= timezone.now() - timedelta(seconds=settings.BOARD_TOMBSTONE_RETENTION)
+        return changed[:limit], removed, complete
+
+    @staticmethod
+    def record_deletion(task):
+        now = timezone.now()
+        TaskTombstone.objects.create(project_id=task.project_id, task_id=task.pk)
+        TaskTombstone.objects.filter(
+            project_id=task.project_id, deleted_at__lt=now - timedelta(seconds=settings.BOARD_TOMBSTONE_RETENTION),
+        ).delete()
+
+
+class MessagingService:
+
+    def record_message(self, message):
+        # Guarded on the timestamp, so a message that commits late can't replace a newer preview
+        MessageThread.objects.filter(pk=message.thread_id).filter(
+            Q(last_message_at__isnull=True) | Q(last_message_at__lte=message.timestamp)
+        ).update(last_message=message, last_message_at=message.timestamp)
+        is_sender = Q(user_id=message.sender_id)
+        ThreadReadState.objects.filter(thread_id=message.thread_id).update(
+            unread_count=Case(When(is_sender, then=Value(0)), default=F('unread_count') + 1),
+            last_read_message=Case(
+                When(is_sender, then=Value(message.pk)), default=F('last_read_message'),
+                output_field=ThreadReadState._meta.get_field('last_read_message'),
+            ),
+            last_read_at=Case(When(is_sender, then=Value(message.timestamp)), default=F('last_read_at')),
+        )
+
+    def refresh_last_message(self, thread_id):
+        """Re-points a thread at its newest message, e.g. after the previous one was deleted."""
+        newest = Message.objects.filter(thread_id=thread_id).order_by('-timestamp', '-id').values('id', 'timestamp').first()
+        MessageThread.objects.filter(pk=thread_id).update(
+            last_message=newest and newest['id'], last_message_at=newest and newest['timestamp'],
+        )
+
+    @transaction.atomic
+    def mark_read(self, thread, user, message=None) -> ThreadReadState:
+        """
+        Moves `user`'s cursor to `message` (default: the newest) and recounts what is unread after
+        it. Cursors only move forward. The state row is locked, so a message sent concurrently is
+        either counted here or incremented after this commits, never lost.
+        """
+        state, _ = ThreadReadState.objects.select_for_update().get_or_create(thread=thread, user=user)
+        if message is None:
+            message = Message.objects.filter(thread=thread).order_by('-timestamp', '-id').first()
+            if message is None:
+                return state
+        current = state.last_read_message
+        if current is not None and (current.timestamp, current.pk) >= (message.timestamp, message.pk):
+            return state
+        state.unread_count = Message.objects.filter(thread=thread).exclude(sender=user).filter(
+            Q(timestamp__gt=message.timestamp) | Q(timestamp=message.timestamp, pk__gt=message.pk)
+        ).count()
+        state.last_read_message = message
+        state.last_read_at = timezone.now()
+        state.save(update_fields=['unread_count', 'last_read_message', 'last_read_at', 'updated_at'])
+        return state
+
+    def add_participants(self, thread_id, user_ids):
+        """Read states for new participants. Earlier messages don't count as unread for them."""
+        now = timezone.now()
+        ThreadReadState.objects.bulk_create(
+            [ThreadReadState(thread_id=thread_id, user_id=user_id, last_read_at=now) for user_id in user_ids],
+            ignore_conflicts=True,
+        )
+
+    def remove_participants(self, thread_id, user_ids):
+        ThreadReadState.objects.filter(thread_id=thread_id, user_id__in=user_ids).delete()
+
+
+class ActivityFeedService:
+    prune_batch_size = 1000
+
+    def record(self, project_id, actor_id, verb, target_type, target_id, summary='') -> ActivityEvent:
+        """
+        Writes an event, and fans it out to the feeds of the project's members other than the actor
+        unless the project has more than ACTIVITY_FANOUT_MAX_MEMBERS of them.
+        """
+        limit = settings.ACTIVITY_FANOUT_MAX_MEMBERS
+        member_ids = [pk for pk in Project.objects.filter(pk=project_id).values_list('members', flat=True)[:limit + 1] if pk is not None]
+        event = ActivityEvent.objects.create(
+            project_id=project_id, actor_id=actor_id, verb=verb, target_type=target_type,
+            target_id=str(target_id), summary=summary[:255], fanned_out=len(member_ids) <= limit,
+        )
+        if event.fanned_out:
+            FeedEntry.objects.bulk_create([
+                FeedEntry(user_id=user_id, event=event, project_id=project_id, created_at=event.created_at)
+                for user_id in member_ids if user_id != actor_id
+            ])
+        return event
+
+    def feed(self, user, before=None, limit=20):
+        """
+        The newest `limit` events in `user`'s projects (older than event id `before`, if given), from
+        their feed rows and the events of large projects. Only projects the user is still a member of
+        count. Returns (events, has_more).
+        """
+        project_ids = member_project_ids(user)
+        if not project_ids:
+            return [], False
+        entries = FeedEntry.objects.filter(user=user, project_id__in=project_ids)
+        pulled = ActivityEvent.objects.filter(project_id__in=project_ids, fanned_out=False).exclude(actor_id=user.pk)
+        if before is not None:
+            entries, pulled = entries.filter(event_id__lt=before), pulled.filter(id__lt=before)
+        event_ids = sorted({
+            *entries.order_by('-event_id').values_list('event_id', flat=True)[:limit + 1],
+            *pulled.order_by('-id').values_list('id', flat=True)[:limit + 1],
+        }, reverse=True)
+        has_more = len(event_ids) > limit
+        events = ActivityEvent.objects.filter(pk__in=event_ids[:limit]).select_related('actor', 'project').order_by('-id')
+        return list(events), has_more
+
+    def prune(self, now=None):
+        """
+        Deletes events (and their feed rows) older than ACTIVITY_RETENTION seconds, in batches so
+        no statement holds locks on a large part of the tables. Returns how many events.
+        """
+        cutoff = (now or timezone.now()) - timedelta(seconds=settings.ACTIVITY_RETENTION)
+        self._delete_in_batches(FeedEntry.objects.filter(created_at__lt=cutoff))
+        return self._delete_in_batches(ActivityEvent.objects.filter(created_at__lt=cutoff)) # Feed rows written meanwhile cascade
+
+    def _delete_in_batches(self, queryset):
+        """Deletes the rows of `queryset`, prune_batch_size ids per statement. Returns how many."""
+        deleted = 0
+        while True:
+            batch = list(queryset.values_list('id', flat=True)[:self.prune_batch_size])
+            if not batch:
+                return deleted
+            queryset.model.objects.filter(pk__in=batch).delete()
+            deleted += len(batch)
@@ -0,0 +1,128 @@
+import os
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .membership import invalidate_memberships
+from .models import Comment, Message, MessageThread, Project, ProjectFile, Task
+from .realtime import publish_membership
+from .services import ActivityFeedService, MessagingService, TaskBoardService
+
+
+# --- Read state: last-message columns and unread counters (see services.py) ---
+
+@receiver(post_save, sender=Message)
+def message_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        MessagingService().record_message(instance)
+
+
+@receiver(post_delete, sender=Message)
+def message_deleted(sender, instance, **kwargs):
+    # Unread counters are left as they are; the next mark_read() recounts them
+    if MessageThread.objects.filter(pk=instance.thread_id, last_message__isnull=True).exists():
+        MessagingService().refresh_last_message(instance.thread_id)
+
+
+# --- Participants: read states, and real-time streams following threads a user joins or leaves ---
+
+@receiver(m2m_changed, sender=MessageThread.participants.through)
+def thread_participants_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        # The removed ids are gone by post_clear
+        related = instance.message_threads if reverse else instance.participants
+        instance._cleared_participant_pks = set(related.values_list('pk', flat=True))
+        return
+    if action == 'post_clear':
+        pk_set = getattr(instance, '_cleared_participant_pks', set())
+    elif action not in ('post_add', 'post_remove'):
+        return
+    if not pk_set:
+        return
+    joined = action == 'post_add'
+    if reverse: # user.message_threads.add(...): instance is the user, pk_set the threads
+        pairs = [(thread_id, [instance.pk]) for thread_id in pk_set]
+    else:
+        pairs = [(instance.pk, list(pk_set))]
+    service = MessagingService()
+    for thread_id, user_ids in pairs:
+        if joined:
+            service.add_participants(thread_id, user_ids)
+        else:
+            service.remove_participants(thread_id, user_ids)
+    transaction.on_commit(lambda: [publish_membership(thread_id, user_ids, joined) for thread_id, user_ids in pairs])
+
+
+# --- Project membership index (see membership.py): drop the cached roles of every affected user ---
+
+@receiver(m2m_changed, sender=Project.members.through)
+def project_members_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse: # user.collaborative_projects.add(...): instance is the user
+        invalidate_memberships([instance.pk])
+    elif action == 'pre_clear': # The removed ids are gone by post_clear
+        invalidate_memberships(instance.members.values_list('pk', flat=True))
+    elif pk_set:
+        invalidate_memberships(pk_set)
+
+
+@receiver(post_save, sender=Project)
+def project_saved(sender, instance, created, raw=False, **kwargs):
+    # A new project's owner is added to members (and so invalidated) by Project.save(). On updates
+    # the owner may have changed; the previous owner stays a member, so their role is covered too
+    if not created and not raw:
+        invalidate_memberships([instance.owner_id, *instance.members.values_list('pk', flat=True)])
+
+
+@receiver(pre_delete, sender=Project)
+def project_deleted(sender, instance, **kwargs):
+    invalidate_memberships([instance.owner_id, *instance.members.values_list('pk', flat=True)])
+
+
+# --- Board refreshes (TaskBoardService.changes): deleted tasks leave a tombstone ---
+
+@receiver(post_delete, sender=Task)
+def task_deleted(sender, instance, origin=None, **kwargs):
+    # Tasks only cascade from their project's deletion, and a deleted project has no board to refresh
+    if isinstance(origin, Task) or getattr(origin, 'model', None) is Task:
+        TaskBoardService.record_deletion(instance)
+
+
+# --- Activity feed (ActivityFeedService): each change is recorded once and fanned out to members ---
+
+@receiver(post_save, sender=Task)
+def task_activity(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    # Who changed a task isn't on the task; TaskViewSet sets activity_actor_id for updates
+    actor_id = instance.reporter_id if created else getattr(instance, 'activity_actor_id', None)
+    ActivityFeedService().record(
+        instance.project_id, actor_id, 'task_created' if created else 'task_updated', 'task', instance.pk,
+        f'{instance.title} ({instance.get_status_display()})',
+    )
+
+
+@receiver(post_save, sender=Comment)
+def comment_activity(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        project_id = instance.task.project_id if instance.task_id else instance.project_id
+        if project_id:
+            ActivityFeedService().record(project_id, instance.author_id, 'comment_added', 'comment', instance.pk, instance.text[:120])
+
+
+@receiver(post_save, sender=ProjectFile)
+def file_activity(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        ActivityFeedService().record(
+            instance.project_id, instance.uploaded_by_id, 'file_uploaded', 'file', instance.pk, os.path.basename(instance.file.name),
+        )
+
+
+@receiver(post_save, sender=Message)
+def message_activity(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and instance.thread.project_id: # Direct threads have no project feed
+        ActivityFeedService().record(
+            instance.thread.project_id, instance.sender_id, 'message_sent', 'message', instance.pk, instance.content[:120],
+        )
@@ -0,0 +1,150 @@
+# apps/collaborations/streaming.py
+"""
+Server-Sent Events stream of the messages in a user's threads.
+
+    GET /api/v1/collaborations/stream/?token=<key>     (or "Authorization: Token <key>")
+
+This is a plain ASGI app, mounted in marketplace_api/asgi.py in front of Django, so an idle stream
+costs one coroutine and a small queue: no request thread, middleware run or open DB connection.
+On connect, the stream authenticates the token (served by the token_cache of
+CachedTokenAuthentication), subscribes to the user's own channel (joins and leaves), then loads the
+ids of the user's threads in one query and subscribes to them too. It then emits:
+
+    event: ready            {"threads": [...]}  once subscribed; load or refresh history now, e.g.
+                            message-threads/<id>/history/?after=<last id seen>
+    event: message          MessageSerializer data of each new message, with `id:` set to its id
+    event: thread.joined    {"thread_id": ...}  the user was added to a thread, now followed too
+    event: thread.left      {"thread_id": ...}
+    event: thread.read      {"thread_id": ..., "unread_count": ...} the user read a thread elsewhere
+    event: reset            {"reason": "overflow"} the stream fell behind and is closed; reconnect
+
+plus a comment line every REALTIME_HEARTBEAT seconds to keep proxies from closing idle streams.
+Messages are sent through the REST send-message endpoint as before. Under WSGI (runserver),
+this path is not served.
+"""
+import asyncio
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.db import DatabaseError, close_old_connections
+from rest_framework import exceptions
+
+from .realtime import encode_frame, get_broker, thread_channel, user_channel
+
+STREAM_PATH = '/api/v1/collaborations/stream/'
+
+
+def _token_from_scope(scope):
+    # EventSource can't set headers, so ?token= is accepted as well
+    for name, value in scope.get('headers', ()):
+        if name == b'authorization':
+            keyword, _, key = value.decode('latin-1').partition(' ')
+            if keyword.lower() == 'token' and key:
+                return key.strip()
+    values = parse_qs(scope.get('query_string', b'').decode('latin-1')).get('token')
+    return values[0] if values else None
+
+
+def _authenticate_stream(key):
+    """User id for a token; raises AuthenticationFailed. Served by token_cache on a hit."""
+    from apps.accounts.authentication import CachedTokenAuthentication
+
+    if not key:
+        raise exceptions.NotAuthenticated()
+    user, _ = _reconnecting(CachedTokenAuthentication().authenticate_credentials, key)
+    return user.pk
+
+
+def _load_thread_ids(user_id):
+    from .models import MessageThread
+
+    return _reconnecting(
+        lambda: list(MessageThread.objects.filter(participants=user_id).order_by().values_list('id', flat=True))
+    )
+
+
+def _reconnecting(func, *args):
+    """
+    Runs a database call on the shared sync thread, whose connection is kept between streams
+    (reconnecting per stream would dominate the cost of a reconnect storm after a deploy), and
+    drops the connection if it broke so the next stream reconnects.
+    """
+    try:
+        return func(*args)
+    except DatabaseError:
+        close_old_connections()
+        raise
+
+
+async def _plain_response(send, status, body):
+    await send({'type': 'http.response.start', 'status': status, 'headers': [(b'content-type', b'application/json')]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def message_stream(scope, receive, send):
+    if scope['method'] != 'GET':
+        await _plain_response(send, 405, b'{"detail":"Method not allowed."}')
+        return
+    try:
+        user_id = await sync_to_async(_authenticate_stream)(_token_from_scope(scope))
+    except exceptions.APIException as exc:
+        await _plain_response(send, 401, b'{"detail":"%s"}' % str(exc.detail).encode())
+        return
+
+    # The user channel goes first, so joins that happen while the thread ids load aren't missed
+    subscription = await get_broker().subscribe([user_channel(user_id)])
+    try:
+        thread_ids = await sync_to_async(_load_thread_ids)(user_id)
+    except BaseException:
+        subscription.close('disconnected')
+        raise
+    subscription.subscribe([thread_channel(thread_id) for thread_id in thread_ids])
+
+    async def watch_disconnect():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+        subscription.close('disconnected')
+
+    watcher = asyncio.ensure_future(watch_disconnect())
+    try:
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'), # nginx: don't buffer the stream
+        ]})
+        ready = b'retry: 3000\n' + encode_frame('ready', {'threads': thread_ids})
+        await send({'type': 'http.response.body', 'body': ready, 'more_body': True})
+        while True:
+            events = await subscription.get()
+            if events is None:
+                if subscription.closed == 'disconnected':
+                    return
+                body = encode_frame('reset', {'reason': subscription.closed})
+                await send({'type': 'http.response.body', 'body': body})
+                return
+            for event in events:
+                if event.name == 'thread.joined':
+                    subscription.subscribe([thread_channel(event.data['thread_id'])])
+                elif event.name == 'thread.left':
+                    subscription.unsubscribe([thread_channel(event.data['thread_id'])])
+            # Everything queued goes out in one write
+            body = b''.join(event.frame for event in events)
+            await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+    except OSError: # Client went away mid-write
+        pass
+    finally:
+        subscription.close('disconnected')
+        watcher.cancel()
+
+
+async def lifespan(scope, receive, send):
+    """Starts/stops the broker with the server (e.g. RedisBroker's listener)."""
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await get_broker().start()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await get_broker().stop()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
@@ -0,0 +1,595 @@
+import asyncio
+from datetime import timedelta
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APITestCase
+
+from apps.accounts.authentication import token_cache
+from apps.core.testing import QueryBudgetAPITestCase, seed_marketplace
+from marketplace_api.asgi import application
+from .membership import is_project_member, member_project_ids, membership_index, project_role
+from .models import ActivityEvent, FeedEntry, Project, Task, Comment, Message, MessageThread, ThreadReadState
+from .realtime import InProcessBroker, thread_channel
+from . import streaming
+from .services import ActivityFeedService
+from .streaming import STREAM_PATH
+
+User = get_user_model()
+
+
+class ProjectQueryBudgetTests(QueryBudgetAPITestCase):
+    """Project list/detail nest members, order, tasks, files and comments without per-row queries."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_marketplace()
+
+    def test_project_list(self):
+        owner = self.data['buyers'][0]
+        self.client.force_authenticate(owner)
+
+        def add_projects():
+            for i in range(3):
+                project = Project.objects.create(name=f'Extra project {i}', owner=owner, related_order=self.data['orders'][i])
+                project.members.add(self.data['sellers'][i], self.data['designers'][0])
+                task = Task.objects.create(project=project, title='Sample approval', reporter=owner, assigned_to=self.data['sellers'][i])
+                Comment.objects.create(project=project, author=owner, text='Timeline')
+                Comment.objects.create(task=task, author=owner, text='Sent swatches')
+
+        self.get_within_budget(reverse('project-list'), 'collaborations.project-list', grow=add_projects)
+
+    def test_project_list_expanded(self):
+        owner = self.data['buyers'][0]
+        self.client.force_authenticate(owner)
+
+        def add_project():
+            project = Project.objects.create(name='Expanded project', owner=owner, related_order=self.data['orders'][0])
+            project.members.add(self.data['sellers'][0])
+            task = Task.objects.create(project=project, title='Cut samples', reporter=owner)
+            Comment.objects.create(task=task, author=owner, text='Use the 2nd lot')
+
+        self.get_within_budget(
+            reverse('project-list'), 'collaborations.project-list-expanded', grow=add_project, data={'expand': 'all'},
+        )
+
+    def test_project_detail(self):
+        project = self.data['projects'][0]
+        self.client.force_authenticate(project.owner)
+        self.get_within_budget(reverse('project-detail', kwargs={'id': project.id}), 'collaborations.project-detail')
+
+
+
+
+class ProjectSummaryTests(APITestCase):
+    """Projects show grouped counts by default and nest relations only when expanded."""
+
+    def setUp(self):
+        self.owner = User.objects.create_user('summary-owner', 'summary-owner@example.com', 'password123', user_type='buyer')
+        self.seller = User.objects.create_user('summary-seller', 'summary-seller@example.com', 'password123', user_type='seller')
+        self.project = Project.objects.create(name='Denim capsule', owner=self.owner)
+        self.project.members.add(self.seller)
+        for status in ('todo', 'todo', 'done'):
+            Task.objects.create(project=self.project, title=f'{status} task', status=status, reporter=self.owner)
+        Comment.objects.create(project=self.project, author=self.owner, text='Kickoff')
+        self.client.force_authenticate(self.owner)
+        self.url = reverse('project-detail', kwargs={'id': self.project.id})
+
+    def test_counts_by_default(self):
+        data = self.client.get(self.url).data
+        self.assertEqual(data['member_count'], 2) # The owner is a member too
+        self.assertEqual(data['task_counts'], {'todo': 2, 'in_progress': 0, 'review': 0, 'done': 1, 'blocked': 0})
+        self.assertEqual((data['file_count'], data['comment_count']), (0, 1))
+        for nested in ('members', 'tasks', 'files', 'comments', 'related_order_details'):
+            self.assertNotIn(nested, data)
+
+    def test_expand_nests_only_what_is_asked(self):
+        data = self.client.get(self.url, {'expand': 'tasks,members'}).data
+        self.assertEqual(len(data['tasks']), 3)
+        self.assertEqual(len(data['members']), 2)
+        self.assertNotIn('files', data)
+        self.assertEqual(self.client.get(self.url, {'expand': 'invoices'}).status_code, 400)
+
+
+class ProjectMembershipTests(APITestCase):
+    """Permissions read one cached membership index per user, invalidated when members change."""
+
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user('member-owner', 'member-owner@example.com', 'password123', user_type='buyer')
+        self.seller = User.objects.create_user('member-seller', 'member-seller@example.com', 'password123', user_type='seller')
+        self.outsider = User.objects.create_user('member-outsider', 'member-outsider@example.com', 'password123', user_type='seller')
+        self.project = Project.objects.create(name='Linen capsule', owner=self.owner)
+        self.project.members.add(self.seller)
+        self.task = Task.objects.create(project=self.project, title='Dye lot', reporter=self.owner)
+
+    def test_roles_load_in_one_query_then_come_from_the_cache(self):
+        self.enterContext(mock.patch.object(membership_index, 'shared', True)) # As with CACHE_REDIS_URL
+        with self.assertNumQueries(1):
+            self.assertEqual(membership_index.roles(self.owner), {self.project.pk: 'owner'})
+        with self.assertNumQueries(0):
+            self.assertEqual(project_role(self.owner.pk, str(self.project.pk)), 'owner')
+            self.assertTrue(is_project_member(self.owner, self.project.pk))
+        with self.assertNumQueries(1):
+            self.assertEqual(member_project_ids(self.seller), [self.project.pk])
+            self.assertEqual(project_role(self.seller, self.project.pk), 'member')
+
+    def test_member_changes_invalidate(self):
+        self.assertEqual(project_role(self.outsider, self.project.pk), None)
+        self.project.members.add(self.outsider)
+        self.assertEqual(project_role(self.outsider, self.project.pk), 'member')
+        self.outsider.collaborative_projects.remove(self.project)
+        self.assertEqual(project_role(self.outsider, self.project.pk), None)
+
+        self.project.owner = self.seller
+        self.project.save()
+        self.assertEqual((project_role(self.owner, self.project.pk), project_role(self.seller, self.project.pk)), ('member', 'owner'))
+        self.project.members.clear()
+        self.assertEqual(project_role(self.owner, self.project.pk), None)
+        project_id = self.project.pk
+        self.project.delete()
+        self.assertEqual(project_role(self.seller, project_id), None)
+
+    def test_process_local_cache_keeps_roles_for_one_request_only(self):
+        self.assertEqual(project_role(self.seller, self.project.pk), 'member')
+        self.assertIsNone(cache.get(membership_index._key(self.seller.pk))) # Tests run with the local-memory cache
+
+        detail = reverse('project-detail', kwargs={'id': self.project.id})
+        self.client.force_authenticate(self.seller)
+        self.assertEqual(self.client.get(detail).status_code, 200)
+        # Removed without signals, as by another worker whose invalidation can't reach this process
+        Project.members.through.objects.filter(project=self.project, customuser=self.seller).delete()
+        self.assertEqual(self.client.get(detail).status_code, 404) # New request, new memo
+
+    def test_api_permissions(self):
+        detail = reverse('project-detail', kwargs={'id': self.project.id})
+        self.client.force_authenticate(self.outsider)
+        self.assertEqual(self.client.get(detail).status_code, 404)
+        self.assertEqual(self.client.get(reverse('task-list'), {'project_id': self.project.id}).data['results'], [])
+        response = self.client.post(reverse('task-list'), {'project_id': self.project.id, 'title': 'Sneak in'})
+        self.assertEqual(response.status_code, 400)
+
+        self.client.force_authenticate(self.seller)
+        self.assertEqual(self.client.get(detail).status_code, 200)
+        self.assertEqual(self.client.patch(detail, {'name': 'Renamed'}).status_code, 403)
+        response = self.client.post(reverse('task-list'), {
+            'project_id': self.project.id, 'title': 'Cut samples', 'assigned_to_id': self.outsider.pk,
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('assigned_to_id', response.data)
+
+        self.client.force_authenticate(self.owner)
+        response = self.client.post(reverse('project-add-member', kwargs={'id': self.project.id}), {'user_id': self.outsider.pk})
+        self.assertEqual(response.status_code, 200)
+        self.client.force_authenticate(self.outsider) # The same user instance, in a new request
+        self.assertEqual(self.client.get(detail).status_code, 200)
+
+    def test_task_clean_checks_the_assignee(self):
+        self.task.assigned_to = self.outsider
+        with self.assertRaises(ValidationError):
+            self.task.clean()
+        self.task.assigned_to = self.seller
+        self.task.clean()
+
+class TaskBoardTests(QueryBudgetAPITestCase):
+    """The board groups and sums tasks in SQL and refreshes incrementally."""
+
+    def setUp(self):
+        self.owner = User.objects.create_user('board-owner', 'board-owner@example.com', 'password123', user_type='buyer')
+        self.seller = User.objects.create_user('board-seller', 'board-seller@example.com', 'password123', user_type='seller')
+        self.project = Project.objects.create(name='Wool coats', owner=self.owner)
+        self.project.members.add(self.seller)
+        yesterday = timezone.localdate() - timedelta(days=1)
+        self.tasks = [
+            Task.objects.create(project=self.project, title=title, status=status, priority=priority, due_date=due,
+                                assigned_to=assignee, estimated_hours=estimated, actual_hours=actual, reporter=self.owner)
+            for title, status, priority, due, assignee, estimated, actual in [
+                ('Pattern', 'todo', 2, yesterday, self.seller, '4.00', None),
+                ('Fabric', 'todo', 4, None, self.seller, '2.50', '1.00'),
+                ('Lining', 'todo', 1, yesterday, None, None, None),
+                ('Buttons', 'done', 3, yesterday, self.owner, '1.00', '1.50'),
+            ]
+        ]
+        self.client.force_authenticate(self.seller)
+        self.url = reverse('project-board', kwargs={'id': self.project.id})
+
+    def test_columns_and_aggregates(self):
+        data = self.client.get(self.url, {'limit': 2}).data
+        self.assertEqual(data['totals'], {'count': 4, 'overdue': 2, 'estimated_hours': '7.50', 'actual_hours': '2.50'})
+        todo, done = data['columns'][0], data['columns'][3]
+        self.assertEqual((todo['status'], todo['count'], todo['overdue']), ('todo', 3, 2))
+        self.assertEqual(todo['by_priority'], {'1': 1, '2': 1, '3': 0, '4': 1})
+        self.assertEqual([card['title'] for card in todo['tasks']], ['Fabric', 'Pattern']) # Most urgent first
+        self.assertTrue(todo['has_more'])
+        self.assertTrue(todo['tasks'][1]['is_overdue'])
+        self.assertFalse(done['tasks'][0]['is_overdue'] or done['has_more'])
+        seller = next(row for row in data['assignees'] if row['assigned_to_id'] == self.seller.pk)
+        self.assertEqual((seller['count'], seller['overdue'], seller['estimated_hours']), (2, 1, '6.50'))
+
+        data = self.client.get(self.url, {'limit': 2, 'offset': 2, 'status': 'todo'}).data
+        self.assertEqual([card['title'] for card in data['columns'][0]['tasks']], ['Lining'])
+        self.assertNotIn('tasks', data['columns'][3])
+
+    def test_board_within_budget(self):
+        def add_tasks():
+            for status, _ in Task.TASK_STATUS_CHOICES:
+                Task.objects.create(project=self.project, title=f'More {status}', status=status, assigned_to=self.owner, reporter=self.owner)
+
+        self.get_within_budget(self.url, 'collaborations.project-board', grow=add_tasks)
+
+    def test_since_returns_changes_and_removals(self):
+        Task.objects.filter(project=self.project).update(updated_at=timezone.now() - timedelta(hours=1))
+        since = timezone.now() - timedelta(minutes=1)
+        moved, deleted = self.tasks[0], self.tasks[1]
+        moved.status = 'review'
+        moved.save()
+        deleted_id = deleted.pk
+        deleted.delete()
+
+        data = self.client.get(self.url, {'since': since.isoformat()}).data
+        self.assertEqual([(card['id'], card['status']) for card in data['changed']], [(moved.pk, 'review')])
+        self.assertEqual(data['removed'], [deleted_id])
+        self.assertFalse(data['reset'])
+        self.assertEqual(data['columns'][2]['count'], 1)
+        self.assertNotIn('tasks', data['columns'][0])
+
+        self.assertTrue(self.client.get(self.url, {'since': (since - timedelta(days=30)).isoformat()}).data['reset'])
+        self.assertEqual(self.client.get(self.url, {'since': 'yesterday'}).status_code, 400)
+
+    def test_outsiders_cannot_see_the_board(self):
+        outsider = User.objects.create_user('board-outsider', 'board-outsider@example.com', 'password123', user_type='seller')
+        self.client.force_authenticate(outsider)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+@override_settings(ACTIVITY_FANOUT_MAX_MEMBERS=3)
+class ActivityFeedTests(QueryBudgetAPITestCase):
+    """Events are written once; small projects fan out to feed rows, large ones are read on load."""
+
+    def setUp(self):
+        self.owner = User.objects.create_user('feed-owner', 'feed-owner@example.com', 'password123', user_type='buyer')
+        self.seller = User.objects.create_user('feed-seller', 'feed-seller@example.com', 'password123', user_type='seller')
+        self.small = Project.objects.create(name='Knitwear', owner=self.owner)
+        self.small.members.add(self.seller)
+        self.large = Project.objects.create(name='Denim', owner=self.owner)
+        self.large.members.add(self.seller, *[
+            User.objects.create_user(f'feed-member-{i}', f'feed-member-{i}@example.com', 'password123', user_type='seller') for i in range(3)
+        ])
+        self.url = reverse('activity-list')
+        self.client.force_authenticate(self.seller)
+
+    def test_feed_merges_fanned_out_and_large_project_events(self):
+        task = Task.objects.create(project=self.small, title='Swatches', reporter=self.owner)
+        Comment.objects.create(project=self.large, author=self.owner, text='Wash test passed')
+        Comment.objects.create(task=task, author=self.seller, text='Own comment') # Not in the seller's own feed
+        self.assertEqual(ActivityEvent.objects.count(), 3)
+        self.assertEqual(FeedEntry.objects.filter(event__project=self.small).count(), 2) # Owner and seller, minus the actor
+        self.assertFalse(FeedEntry.objects.filter(event__project=self.large).exists())
+
+        data = self.client.get(self.url).data
+        self.assertEqual([(row['verb'], row['project']['name']) for row in data['results']], [
+            ('comment_added', 'Denim'), ('task_created', 'Knitwear'),
+        ])
+        self.assertEqual(data['results'][0]['actor_username'], 'feed-owner')
+
+        self.small.members.remove(self.seller) # Former projects drop out of the feed
+        self.assertEqual([row['project']['name'] for row in self.client.get(self.url).data['results']], ['Denim'])
+
+    def test_cursor_pages(self):
+        for i in range(5):
+            Task.objects.create(project=self.small if i % 2 else self.large, title=f'Task {i}', reporter=self.owner)
+        first = self.client.get(self.url, {'limit': 2}).data
+        second = self.client.get(first['next']).data
+        third = self.client.get(second['next']).data
+        titles = [row['summary'] for page in (first, second, third) for row in page['results']]
+        self.assertEqual(titles, [f'Task {i} (To Do)' for i in reversed(range(5))])
+        self.assertIsNone(third['next'])
+        self.assertEqual(self.client.get(self.url, {'before': 'x'}).status_code, 400)
+
+    def test_feed_within_budget(self):
+        def add_events():
+            for project in (self.small, self.large):
+                Task.objects.create(project=project, title='More', reporter=self.owner)
+
+        add_events()
+        self.get_within_budget(self.url, 'collaborations.activity-feed', grow=add_events)
+
+    def test_prune_removes_events_past_retention(self):
+        Task.objects.create(project=self.small, title='Old', reporter=self.owner)
+        Task.objects.create(project=self.large, title='Old', reporter=self.owner)
+        service = ActivityFeedService()
+        self.assertEqual(service.prune(), 0)
+        self.assertEqual(service.prune(now=timezone.now() + timedelta(days=91)), 2)
+        self.assertFalse(ActivityEvent.objects.exists() or FeedEntry.objects.exists())
+
+    def test_prune_deletes_feed_rows_in_batches(self):
+        for i in range(5):
+            Task.objects.create(project=self.small, title=f'Old {i}', reporter=self.owner) # A feed row for the seller
+        service = ActivityFeedService()
+        service.prune_batch_size = 2
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(service.prune(now=timezone.now() + timedelta(days=91)), 5)
+        feed_deletes = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('DELETE FROM "collaborations_feedentry"')]
+        by_id = [sql for sql in feed_deletes if '"collaborations_feedentry"."id" IN' in sql]
+        self.assertEqual(len(by_id), 3) # 5 rows, at most 2 per statement
+        self.assertTrue(all(sql.count(',') < 2 for sql in by_id))
+        self.assertFalse([sql for sql in feed_deletes if 'created_at' in sql])
+        self.assertFalse(ActivityEvent.objects.exists() or FeedEntry.objects.exists())
+
+
+class MessageThreadReadStateTests(APITestCase):
+    """Unread counters and the last-message preview are stored, not counted per request."""
+
+    def setUp(self):
+        self.buyer = User.objects.create_user('read-buyer', 'read-buyer@example.com', 'password123', user_type='buyer')
+        self.seller = User.objects.create_user('read-seller', 'read-seller@example.com', 'password123', user_type='seller')
+        self.designer = User.objects.create_user('read-designer', 'read-designer@example.com', 'password123', user_type='designer')
+        self.client.force_authenticate(self.buyer)
+        response = self.client.post(reverse('messagethread-list'), {'participant_ids': [self.seller.id]}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.thread = MessageThread.objects.get(id=response.data['id'])
+
+    def send(self, user, content):
+        self.client.force_authenticate(user)
+        url = reverse('messagethread-send-message', kwargs={'id': self.thread.id})
+        response = self.client.post(url, {'thread_id': str(self.thread.id), 'content': content}, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.data
+
+    def thread_row(self, user):
+        self.client.force_authenticate(user)
+        return self.client.get(reverse('messagethread-list')).data['results'][0]
+
+    def test_send_bumps_other_participants_with_one_update(self):
+        self.send(self.buyer, 'Can you do 500m?')
+        with CaptureQueriesContext(connection) as captured:
+            last = self.send(self.buyer, 'In navy')
+        updates = [q['sql'] for q in captured.captured_queries if q['sql'].startswith('UPDATE "collaborations_threadreadstate"')]
+        self.assertEqual(len(updates), 1)
+        row = self.thread_row(self.seller)
+        self.assertEqual(row['unread_count'], 2)
+        self.assertEqual(row['last_message']['content'], 'In navy')
+        self.assertEqual(self.thread_row(self.buyer)['unread_count'], 0)
+        self.assertEqual(self.thread_row(self.buyer)['last_read_message_id'], last['id'])
+
+    def test_mark_read_resets_or_recounts_after_the_cursor(self):
+        first = self.send(self.buyer, 'Samples shipped')
+        self.send(self.buyer, 'Tracking attached')
+        self.send(self.buyer, 'Invoice too')
+        self.client.force_authenticate(self.seller)
+        url = reverse('messagethread-mark-read', kwargs={'id': self.thread.id})
+        response = self.client.post(url, {'message_id': first['id']}, format='json')
+        self.assertEqual(response.data['unread_count'], 2)
+        self.assertEqual(self.client.post(url, {}, format='json').data['unread_count'], 0)
+        # Cursors don't move back
+        self.assertEqual(self.client.post(url, {'message_id': first['id']}, format='json').data['unread_count'], 0)
+        self.assertEqual(self.client.get(reverse('messagethread-unread')).data, {'messages': 0, 'threads': 0})
+
+    def test_unread_totals(self):
+        self.send(self.buyer, 'Hello')
+        self.send(self.buyer, 'Are you there?')
+        self.client.force_authenticate(self.seller)
+        self.assertEqual(self.client.get(reverse('messagethread-unread')).data, {'messages': 2, 'threads': 1})
+
+    def test_participants_joining_later_start_read(self):
+        self.send(self.buyer, 'Before you joined')
+        self.thread.participants.add(self.designer)
+        self.assertEqual(self.thread_row(self.designer)['unread_count'], 0)
+        self.send(self.seller, 'Welcome')
+        self.assertEqual(self.thread_row(self.designer)['unread_count'], 1)
+        self.thread.participants.remove(self.designer)
+        self.assertFalse(ThreadReadState.objects.filter(thread=self.thread, user=self.designer).exists())
+
+    def test_deleting_the_last_message_restores_the_previous_preview(self):
+        self.send(self.buyer, 'Keep this')
+        last = self.send(self.buyer, 'Typo')
+        Message.objects.filter(id=last['id']).delete()
+        self.assertEqual(self.thread_row(self.buyer)['last_message']['content'], 'Keep this')
+
+
+class MessageThreadQueryBudgetTests(QueryBudgetAPITestCase):
+    def test_thread_list(self):
+        data = seed_marketplace()
+        buyer = data['buyers'][0]
+        self.client.force_authenticate(buyer)
+
+        def add_threads():
+            for seller in data['sellers']:
+                thread = MessageThread.objects.create()
+                thread.participants.set([buyer, seller])
+                Message.objects.create(thread=thread, sender=seller, content='Quote attached')
+
+        add_threads()
+        self.get_within_budget(reverse('messagethread-list'), 'collaborations.messagethread-list', grow=add_threads)
+
+
+class MessageHistoryTests(QueryBudgetAPITestCase):
+    """history/ pages newest-first by message-id cursors in constant queries per page."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.buyer = User.objects.create_user('history-buyer', 'history-buyer@example.com', 'password123', user_type='buyer')
+        cls.seller = User.objects.create_user('history-seller', 'history-seller@example.com', 'password123', user_type='seller')
+        cls.thread = MessageThread.objects.create()
+        cls.thread.participants.set([cls.buyer, cls.seller])
+        messages = Message.objects.bulk_create([
+            Message(thread=cls.thread, sender=cls.buyer if n % 2 else cls.seller, content=f'Message {n}') for n in range(120)
+        ])
+        # Runs of equal timestamps, as with messages sent in the same instant: ties are ordered by id
+        base = timezone.now() - timedelta(hours=1)
+        for n, message in enumerate(messages):
+            message.timestamp = base + timedelta(seconds=n // 7)
+        Message.objects.bulk_update(messages, ['timestamp'])
+        cls.ids = [message.id for message in messages] # Oldest first
+
+    def setUp(self):
+        self.client.force_authenticate(self.buyer)
+        self.url = reverse('messagethread-message-history', kwargs={'id': self.thread.id})
+
+    def test_latest_page_then_scroll_back_to_the_start(self):
+        response = self.get_within_budget(self.url, 'collaborations.messagethread-message_history', data={'limit': 50})
+        seen = [message['id'] for message in response.data['results']]
+        self.assertEqual(seen, self.ids[::-1][:50])
+        older = response.data['older']
+        while older:
+            response = self.client.get(older)
+            seen += [message['id'] for message in response.data['results']]
+            older = response.data['older']
+        self.assertEqual(seen, self.ids[::-1])
+
+    def test_deep_pages_cost_the_same_queries(self):
+        first = self.get_within_budget(self.url, None, data={'limit': 20})
+        with CaptureQueriesContext(connection) as latest:
+            self.client.get(self.url, {'limit': 20})
+        with CaptureQueriesContext(connection) as deep:
+            self.client.get(self.url, {'limit': 20, 'before': self.ids[25]})
+        self.assertEqual(len(deep), len(latest) + 1) # + the cursor lookup
+        self.assertTrue(all('OFFSET' not in query['sql'] and 'COUNT(' not in query['sql'] for query in deep.captured_queries))
+        self.assertIsNotNone(first.data['older'])
+
+    def test_after_last_seen_resyncs_forward(self):
+        response = self.client.get(self.url, {'after': self.ids[89], 'limit': 20})
+        self.assertEqual([message['id'] for message in response.data['results']], self.ids[90:110][::-1])
+        response = self.client.get(response.data['newer'])
+        self.assertEqual([message['id'] for message in response.data['results']], self.ids[110:][::-1])
+        self.assertIsNone(response.data['newer'])
+
+    def test_cursor_must_be_a_message_of_the_thread(self):
+        other = MessageThread.objects.create()
+        other.participants.set([self.buyer])
+        stranger = Message.objects.create(thread=other, sender=self.buyer, content='Elsewhere')
+        self.assertEqual(self.client.get(self.url, {'before': stranger.id}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'before': 'latest'}).status_code, 400)
+
+class RealtimeHubTests(SimpleTestCase):
+    def test_publish_reaches_only_subscribers_of_the_channel(self):
+        async def run():
+            broker = InProcessBroker(queue_size=10)
+            follower = await broker.subscribe([thread_channel('t1')])
+            other = await broker.subscribe([thread_channel('t2')])
+            # From a worker thread, as the send-message view's on_commit callback does
+            await asyncio.to_thread(broker.publish, thread_channel('t1'), 'message', {'id': 1}, 1)
+            events = await asyncio.wait_for(follower.get(), 1)
+            self.assertEqual(events[0].frame, b'id: 1\nevent: message\ndata: {"id":1}\n\n')
+            self.assertTrue(other._queue.empty())
+            follower.close()
+            other.close()
+            self.assertEqual(broker.hub.subscriber_count(), 0)
+
+        asyncio.run(run())
+
+    def test_subscriber_that_falls_behind_is_reset(self):
+        async def run():
+            broker = InProcessBroker(queue_size=2)
+            subscription = await broker.subscribe([thread_channel('t1')])
+            for n in range(3):
+                broker.publish(thread_channel('t1'), 'message', {'id': n})
+            self.assertEqual(subscription.closed, 'overflow')
+            self.assertFalse(broker.hub.has_subscribers(thread_channel('t1')))
+
+        asyncio.run(run())
+
+
+class MessageStreamTests(TransactionTestCase):
+    """The ASGI stream pushes new messages and membership changes to the participants' open streams."""
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear_local()
+        self.sender = User.objects.create_user('stream-sender', 'stream-sender@example.com', 'password123', user_type='buyer')
+        self.receiver = User.objects.create_user('stream-receiver', 'stream-receiver@example.com', 'password123', user_type='seller')
+        self.outsider = User.objects.create_user('stream-outsider', 'stream-outsider@example.com', 'password123', user_type='seller')
+        self.thread = MessageThread.objects.create()
+        self.thread.participants.set([self.sender, self.receiver])
+
+    async def open_stream(self, user, headers=None):
+        token = await sync_to_async(lambda: Token.objects.get_or_create(user=user)[0].key)()
+        scope = {
+            'type': 'http', 'method': 'GET', 'path': STREAM_PATH, 'query_string': f'token={token}'.encode(),
+            'headers': headers or [],
+        }
+        frames, gone = asyncio.Queue(), asyncio.Event()
+
+        async def receive():
+            await gone.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            await frames.put(message)
+
+        task = asyncio.ensure_future(application(scope, receive, send))
+        start = await asyncio.wait_for(frames.get(), 5)
+        if start['status'] == 200:
+            self.assertIn(b'event: ready', (await asyncio.wait_for(frames.get(), 5))['body'])
+        return start, frames, lambda: (gone.set(), task)[1]
+
+    async def next_event(self, frames, name):
+        while True:
+            body = (await asyncio.wait_for(frames.get(), 5))['body']
+            if f'event: {name}'.encode() in body:
+                return body
+
+    def send_message(self, content):
+        client = APIClient()
+        client.force_authenticate(self.sender)
+        url = reverse('messagethread-send-message', kwargs={'id': self.thread.id})
+        return client.post(url, {'thread_id': str(self.thread.id), 'content': content}, format='json')
+
+    def test_token_is_required(self):
+        async def run():
+            start, _, _ = await self.open_stream(self.receiver, headers=[(b'authorization', b'Token not-a-token')])
+            self.assertEqual(start['status'], 401)
+
+        asyncio.run(run())
+
+    def test_sent_message_reaches_participants_only(self):
+        async def run():
+            _, received, close_receiver = await self.open_stream(self.receiver)
+            _, outsider_frames, close_outsider = await self.open_stream(self.outsider)
+            response = await sync_to_async(self.send_message)('Lab dips approved')
+            self.assertEqual(response.status_code, 201)
+            body = await self.next_event(received, 'message')
+            self.assertIn(f'id: {response.data["id"]}'.encode(), body)
+            self.assertIn(b'Lab dips approved', body)
+            self.assertTrue(outsider_frames.empty())
+            await close_receiver()
+            await close_outsider()
+
+        asyncio.run(run())
+
+    def test_added_participant_follows_the_thread(self):
+        async def run():
+            _, frames, close = await self.open_stream(self.outsider)
+            await sync_to_async(self.thread.participants.add)(self.outsider)
+            self.assertIn(str(self.thread.id).encode(), await self.next_event(frames, 'thread.joined'))
+            await sync_to_async(self.send_message)('Welcome aboard')
+            self.assertIn(b'Welcome aboard', await self.next_event(frames, 'message'))
+            await close()
+
+        asyncio.run(run())
+
+    def test_participant_added_while_the_stream_opens(self):
+        load_thread_ids = streaming._load_thread_ids
+
+        def added_before_loading(user_id):
+            self.thread.participants.add(self.outsider) # After the user channel subscription, before the thread ids
+            return load_thread_ids(user_id)
+
+        async def run():
+            with mock.patch.object(streaming, '_load_thread_ids', added_before_loading):
+                _, frames, close = await self.open_stream(self.outsider)
+            self.assertIn(str(self.thread.id).encode(), await self.next_event(frames, 'thread.joined'))
+            await sync_to_async(self.send_message)('Welcome aboard')
+            self.assertIn(b'Welcome aboard', await self.next_event(frames, 'message'))
+            await close()
+
+        asyncio.run(run())
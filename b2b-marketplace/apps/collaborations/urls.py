@@ -2,7 +2,7 @@ from django.urls import path, include
 #from rest_framework_nested import routers # For nested routing if needed
 from .views import (
     ProjectViewSet, TaskViewSet, ProjectFileViewSet, CommentViewSet,
-    MessageThreadViewSet #, MessageViewSet (if you decide to use it standalone)
+    MessageThreadViewSet, ActivityFeedViewSet #, MessageViewSet (if you decide to use it standalone)
 )
 from rest_framework.routers import DefaultRouter
 router = DefaultRouter()
@@ -13,6 +13,7 @@ router.register(r'tasks', TaskViewSet, basename='task') # Can be filtered by pro
 router.register(r'files', ProjectFileViewSet, basename='projectfile') # Can be filtered by project_id
 router.register(r'comments', CommentViewSet, basename='comment') # Can be filtered by task_id or project_id
 router.register(r'message-threads', MessageThreadViewSet, basename='messagethread')
+router.register(r'activity', ActivityFeedViewSet, basename='activity')
 # router.register(r'messages', MessageViewSet, basename='message') # If using a separate MessageViewSet
 
 # Example of Nested Routers (optional, but good for clearly defined hierarchies)
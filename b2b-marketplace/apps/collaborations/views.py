@@ -1,14 +1,27 @@
-from rest_framework import viewsets, status, permissions, generics
+from rest_framework import viewsets, status, permissions, generics, serializers
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Q, Prefetch, OuterRef, Subquery, F
+from django.db.models import Q, Prefetch, F, Count, FilteredRelation, Sum
+from django.db.models.functions import Coalesce
+from django.db import transaction
 from django.shortcuts import get_object_or_404
-
-from .models import Project, Task, ProjectFile, Comment, MessageThread, Message
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.utils.urls import replace_query_param
+
+from .models import Project, Task, ProjectFile, Comment, MessageThread, Message, ThreadReadState
 from .serializers import (
-    ProjectSerializer, TaskSerializer, ProjectFileSerializer, CommentSerializer,
-    MessageThreadSerializer, MessageSerializer
+    ProjectSerializer, TaskSerializer, BoardTaskSerializer, ProjectFileSerializer, CommentSerializer,
+    MessageThreadSerializer, MessageSerializer, ThreadReadStateSerializer, ActivityEventSerializer, parse_expand
 )
+from .membership import is_project_member, member_project_ids, project_role
+from .pagination import MessageCursorPagination
+from .realtime import publish_message, publish_read_state
+from .services import ActivityFeedService, MessagingService, TaskBoardService
 from .permissions import ( # You'll need to create these
     IsProjectOwnerOrMemberReadOnly, IsProjectMember,
     IsTaskAssigneeOrProjectMember, IsCommentAuthorOrProjectMemberReadOnly,
@@ -16,27 +29,63 @@ from .permissions import ( # You'll need to create these
 )
 
 class ProjectViewSet(viewsets.ModelViewSet):
-    queryset = Project.objects.all().select_related('owner__profile', 'related_order').prefetch_related(
-        'members__profile',
-        Prefetch('tasks', queryset=Task.objects.order_by('priority', 'due_date')), # Example prefetch for tasks
-        'files',
-        Prefetch('comments', queryset=Comment.objects.filter(task__isnull=True).select_related('author__profile')) # Project-level comments
-    )
+    # Projects are listed with summary counts (ProjectService.attach_summaries); what ?expand= nests
+    # is loaded up front, so the query count doesn't grow with the number of projects, tasks or comments
+    queryset = Project.objects.all().select_related('owner__profile')
+    # ?expand= name -> what its nested field needs
+    expand_querysets = {
+        'members': lambda queryset: queryset.prefetch_related('members__profile'),
+        'tasks': lambda queryset: queryset.prefetch_related(Prefetch('tasks', queryset=Task.objects.order_by('priority', 'due_date').select_related(
+            'assigned_to__profile', 'reporter__profile'
+        ).prefetch_related(
+            Prefetch('comments', queryset=Comment.objects.select_related('author__profile')) # Task comments
+        ))),
+        'files': lambda queryset: queryset.prefetch_related(Prefetch('files', queryset=ProjectFile.objects.select_related('uploaded_by__profile'))),
+        'comments': lambda queryset: queryset.prefetch_related(
+            Prefetch('comments', queryset=Comment.objects.filter(task__isnull=True).select_related('author__profile')) # Project-level comments
+        ),
+        'related_order': lambda queryset: queryset.select_related(
+            'related_order__buyer__profile',
+            'related_order__related_quote__supplier__profile',
+            'related_order__related_quote__buyer__profile',
+            'related_order__related_quote__rfq',
+        ).prefetch_related(
+            'related_order__items__material',
+            'related_order__items__design',
+            'related_order__items__seller',
+        ),
+    }
     serializer_class = ProjectSerializer
     permission_classes = [permissions.IsAuthenticated, IsProjectOwnerOrMemberReadOnly]
     lookup_field = 'id' # UUID
+    query_budgets = {'list': 12, 'retrieve': 12, 'board': 6}
+    board_limit, board_max_limit, board_max_changes = 20, 100, 500
+
+    def get_expand(self):
+        if not hasattr(self, '_expand'):
+            self._expand = parse_expand(self.request.query_params.get('expand'))
+        return self._expand
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['expand'] = self.get_expand()
+        return context
 
     def get_queryset(self):
         user = self.request.user
         if not user.is_authenticated:
             return Project.objects.none() # Projects are not public by default
 
+        queryset = super().get_queryset()
+        for name in self.get_expand():
+            queryset = self.expand_querysets[name](queryset)
+
         # Admins see all projects
         if user.is_staff or user.is_superuser:
-            return super().get_queryset()
+            return queryset
 
-        # Users see projects they own or are members of
-        return super().get_queryset().filter(Q(owner=user) | Q(members=user)).distinct()
+        # Users see projects they own or are members of: ids from the membership index, so no join or DISTINCT
+        return queryset.filter(pk__in=member_project_ids(user))
 
     def perform_create(self, serializer):
         # Owner is set by CurrentUserDefault in serializer
@@ -50,12 +99,12 @@ class ProjectViewSet(viewsets.ModelViewSet):
         if not user_id:
             return Response({"detail": "user_id is required."}, status=status.HTTP_400_BAD_REQUEST)
         try:
-            user_to_add = settings.AUTH_USER_MODEL.objects.get(id=user_id)
-            if user_to_add in project.members.all():
+            user_to_add = get_user_model().objects.get(id=user_id)
+            if project_role(user_to_add, project.pk) is not None:
                 return Response({"detail": "User is already a member."}, status=status.HTTP_400_BAD_REQUEST)
             project.members.add(user_to_add)
             return Response(ProjectSerializer(project, context={'request': request}).data)
-        except settings.AUTH_USER_MODEL.DoesNotExist:
+        except get_user_model().DoesNotExist:
             return Response({"detail": "User not found."}, status=status.HTTP_404_NOT_FOUND)
 
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated, IsProjectOwnerOrMemberReadOnly]) # Owner can manage members
@@ -65,16 +114,16 @@ class ProjectViewSet(viewsets.ModelViewSet):
         if not user_id:
             return Response({"detail": "user_id is required."}, status=status.HTTP_400_BAD_REQUEST)
         try:
-            user_to_remove = settings.AUTH_USER_MODEL.objects.get(id=user_id)
-            if user_to_remove == project.owner:
+            user_to_remove = get_user_model().objects.get(id=user_id)
+            if user_to_remove.pk == project.owner_id:
                 return Response({"detail": "Cannot remove the project owner."}, status=status.HTTP_400_BAD_REQUEST)
-            if user_to_remove not in project.members.all():
+            if project_role(user_to_remove, project.pk) is None:
                 return Response({"detail": "User is not a member of this project."}, status=status.HTTP_400_BAD_REQUEST)
             project.members.remove(user_to_remove)
-            # Also unassign from tasks if they were assigned
-            Task.objects.filter(project=project, assigned_to=user_to_remove).update(assigned_to=None)
+            # Also unassign from tasks if they were assigned (updated_at moved too, for board refreshes)
+            Task.objects.filter(project=project, assigned_to=user_to_remove).update(assigned_to=None, updated_at=timezone.now())
             return Response(ProjectSerializer(project, context={'request': request}).data)
-        except settings.AUTH_USER_MODEL.DoesNotExist:
+        except get_user_model().DoesNotExist:
             return Response({"detail": "User not found."}, status=status.HTTP_404_NOT_FOUND)
 
     @action(detail=True, methods=['get'], url_path='tasks', permission_classes=[permissions.IsAuthenticated, IsProjectMember])
@@ -98,6 +147,55 @@ class ProjectViewSet(viewsets.ModelViewSet):
         serializer = CommentSerializer(comments, many=True, context={'request': request})
         return Response(serializer.data)
 
+    @action(detail=True, methods=['get'], url_path='board', permission_classes=[permissions.IsAuthenticated, IsProjectMember])
+    def board(self, request, id=None):
+        """
+        The project's tasks as a Kanban board: totals, a column per status (count, overdue, hour sums,
+        counts per priority, and the first `limit` task cards) and the workload per assignee.
+
+            ?limit=20&offset=0     cards per column (max 100); offset pages further down the columns
+            ?status=todo,review    only these columns' cards
+            ?since=<next_since>    incremental refresh: the aggregates, plus `changed` cards and
+                                   `removed` task ids since a previous response. If `reset` is true,
+                                   too much changed (or since is too old): reload without since.
+        """
+        project = self.get_object()
+        started = timezone.now()
+        service = TaskBoardService(project.pk)
+        limit, offset = self._board_int('limit', self.board_limit, 1, self.board_max_limit), self._board_int('offset', 0, 0, None)
+        statuses = [choice for choice, _ in Task.TASK_STATUS_CHOICES]
+        if request.query_params.get('status'):
+            statuses = [choice for choice in request.query_params['status'].split(',') if choice in statuses]
+        since = request.query_params.get('since')
+        if since:
+            since = parse_datetime(since)
+            if since is None:
+                return Response({'since': ['Use the next_since value of a previous response.']}, status=status.HTTP_400_BAD_REQUEST)
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+
+        board = service.stats()
+        context = {'request': request, 'today': service.today}
+        if since:
+            changed, removed, complete = service.changes(since, self.board_max_changes)
+            board.update(changed=BoardTaskSerializer(changed, many=True, context=context).data, removed=removed, reset=not complete)
+        else:
+            cards = service.column_cards(statuses, limit, offset)
+            for column in board['columns']:
+                if column['status'] in cards:
+                    column['tasks'] = BoardTaskSerializer(cards[column['status']], many=True, context=context).data
+                    column['has_more'] = column['count'] > offset + len(column['tasks'])
+        board['project_id'] = project.pk
+        board['next_since'] = started - timedelta(seconds=settings.BOARD_SINCE_OVERLAP)
+        return Response(board)
+
+    def _board_int(self, name, default, minimum, maximum):
+        try:
+            value = max(int(self.request.query_params.get(name, default)), minimum)
+        except ValueError:
+            raise serializers.ValidationError({name: ['A valid integer is required.']})
+        return min(value, maximum) if maximum else value
+
 
 class TaskViewSet(viewsets.ModelViewSet):
     queryset = Task.objects.all().select_related('project', 'assigned_to__profile', 'reporter__profile').prefetch_related('comments__author__profile')
@@ -114,27 +212,25 @@ class TaskViewSet(viewsets.ModelViewSet):
         # Filter tasks based on project membership or assignment
         project_id = self.request.query_params.get('project_id')
         if project_id:
-            try:
-                project = Project.objects.get(id=project_id)
-                if project.members.filter(id=user.id).exists() or project.owner == user:
-                    return super().get_queryset().filter(project_id=project_id)
-                else: # User not a member of the specified project
-                    return Task.objects.none()
-            except Project.DoesNotExist:
-                return Task.objects.none() # Project not found
+            if is_project_member(user, project_id): # Unknown projects aren't in the index either
+                return super().get_queryset().filter(project_id=project_id)
+            return Task.objects.none() # User not a member of the specified project
 
         # Default: show tasks from projects user is member of, or tasks assigned to user
         return super().get_queryset().filter(
-            Q(project__members=user) | Q(assigned_to=user)
-        ).distinct()
+            Q(project_id__in=member_project_ids(user)) | Q(assigned_to=user)
+        )
 
     def perform_create(self, serializer):
-        project_id = self.request.data.get('project_id')
-        project = get_object_or_404(Project, id=project_id)
-        if not project.members.filter(id=self.request.user.id).exists() and not self.request.user.is_staff:
-            raise permissions.PermissionDenied("You must be a member of the project to create tasks.")
+        project = serializer.validated_data['project'] # Looked up by the project_id field
+        if not is_project_member(self.request.user, project.pk):
+            raise PermissionDenied("You must be a member of the project to create tasks.")
         # Reporter is set by CurrentUserDefault in serializer
-        serializer.save(project=project)
+        serializer.save()
+
+    def perform_update(self, serializer):
+        serializer.instance.activity_actor_id = self.request.user.pk # The activity event's actor (signals.py)
+        serializer.save()
 
     @action(detail=True, methods=['get'], url_path='comments', permission_classes=[permissions.IsAuthenticated, IsTaskAssigneeOrProjectMember])
     def list_comments(self, request, pk=None):
@@ -156,24 +252,19 @@ class ProjectFileViewSet(viewsets.ModelViewSet):
 
         project_id = self.request.query_params.get('project_id')
         if project_id:
-            try:
-                project = Project.objects.get(id=project_id)
-                if project.members.filter(id=user.id).exists() or project.owner == user:
-                    return super().get_queryset().filter(project_id=project_id)
-                return ProjectFile.objects.none()
-            except Project.DoesNotExist:
-                return ProjectFile.objects.none()
+            if is_project_member(user, project_id):
+                return super().get_queryset().filter(project_id=project_id)
+            return ProjectFile.objects.none()
 
-        return super().get_queryset().filter(project__members=user).distinct()
+        return super().get_queryset().filter(project_id__in=member_project_ids(user))
 
 
     def perform_create(self, serializer):
-        project_id = self.request.data.get('project_id')
-        project = get_object_or_404(Project, id=project_id)
-        if not project.members.filter(id=self.request.user.id).exists() and not self.request.user.is_staff:
-            raise permissions.PermissionDenied("You must be a member of the project to upload files.")
+        project = serializer.validated_data['project']
+        if not is_project_member(self.request.user, project.pk):
+            raise PermissionDenied("You must be a member of the project to upload files.")
         # uploaded_by is set by CurrentUserDefault
-        serializer.save(project=project)
+        serializer.save()
 
 
 class CommentViewSet(viewsets.ModelViewSet):
@@ -189,61 +280,83 @@ class CommentViewSet(viewsets.ModelViewSet):
         task_id = self.request.query_params.get('task_id')
         project_id = self.request.query_params.get('project_id') # For project-level comments
 
+        project_ids = member_project_ids(user)
         q_filter = Q()
         if task_id:
-            q_filter &= Q(task_id=task_id, task__project__members=user)
+            q_filter &= Q(task_id=task_id, task__project_id__in=project_ids)
         elif project_id:
-            q_filter &= Q(project_id=project_id, project__members=user, task__isnull=True)
+            q_filter &= Q(project_id=project_id, project_id__in=project_ids, task__isnull=True)
         else: # General case: comments user can see (authored or on projects/tasks they are part of)
-            q_filter = Q(author=user) | Q(task__project__members=user) | Q(project__members=user, task__isnull=True)
+            q_filter = Q(author=user) | Q(task__project_id__in=project_ids) | Q(project_id__in=project_ids, task__isnull=True)
 
-        return super().get_queryset().filter(q_filter).distinct()
+        return super().get_queryset().filter(q_filter)
 
     def perform_create(self, serializer):
         # Author is set by CurrentUserDefault
         # Validation in serializer checks if user is member of project/task's project
-        task_id = self.request.data.get('task')
-        project_id = self.request.data.get('project') # project_id if comment is on project directly
+        task = serializer.validated_data.get('task')
+        project = serializer.validated_data.get('project') # if comment is on project directly
 
-        target_project = None
-        if task_id:
-            task = get_object_or_404(Task, id=task_id)
-            target_project = task.project
-        elif project_id:
-            target_project = get_object_or_404(Project, id=project_id)
-
-        if target_project:
-            if not target_project.members.filter(id=self.request.user.id).exists() and not self.request.user.is_staff:
-                raise permissions.PermissionDenied("You must be a member of the project to comment.")
+        target_project_id = task.project_id if task else project and project.pk
+        if target_project_id:
+            if not is_project_member(self.request.user, target_project_id):
+                raise PermissionDenied("You must be a member of the project to comment.")
         else: # Should be caught by serializer validation (task or project must be specified)
-            raise permissions.PermissionDenied("Comment must be associated with a task or project.")
+            raise PermissionDenied("Comment must be associated with a task or project.")
 
         serializer.save()
 
 
+class ActivityFeedViewSet(viewsets.GenericViewSet):
+    """
+    What changed in the user's projects, newest first (ActivityFeedService):
+
+        ?limit=20               the newest events (max 100)
+        ?before=<id>            older events; `next` links to the following page (null at the end)
+    """
+    serializer_class = ActivityEventSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    service = ActivityFeedService()
+    default_limit, max_limit = 20, 100
+    query_budgets = {'list': 5}
+
+    def list(self, request):
+        try:
+            limit = min(max(int(request.query_params.get('limit', self.default_limit)), 1), self.max_limit)
+            before = int(request.query_params['before']) if request.query_params.get('before') else None
+        except ValueError:
+            raise serializers.ValidationError({'detail': 'limit and before must be integers.'})
+        events, has_more = self.service.feed(request.user, before=before, limit=limit)
+        next_url = replace_query_param(request.build_absolute_uri(), 'before', events[-1].pk) if has_more else None
+        return Response({'next': next_url, 'results': self.get_serializer(events, many=True).data})
+
+
 # --- Messaging Views ---
 class MessageThreadViewSet(viewsets.ModelViewSet):
     serializer_class = MessageThreadSerializer
     permission_classes = [permissions.IsAuthenticated, IsThreadParticipant]
     lookup_field = 'id'
+    query_budgets = {'list': 6, 'retrieve': 6, 'message_history': 4}
 
     def get_queryset(self):
         user = self.request.user
         if not user.is_authenticated:
             return MessageThread.objects.none()
 
-        # Annotate with last message for ordering/display (can also be done in serializer or model manager)
-        last_message_subquery = Message.objects.filter(thread=OuterRef('pk')).order_by('-timestamp').values('timestamp')[:1]
-        # last_message_content_subquery = Message.objects.filter(thread=OuterRef('pk')).order_by('-timestamp').values('content')[:1]
-
-        queryset = MessageThread.objects.filter(participants=user).annotate(
-            last_message_timestamp=Subquery(last_message_subquery),
-            # last_message_content=Subquery(last_message_content_subquery) # if needed
-        ).select_related('project').prefetch_related(
+        queryset = MessageThread.objects.filter(participants=user)
+        if self.action in ('list_messages', 'message_history', 'send_message', 'mark_read'):
+            return queryset # Only the thread itself is needed, for the permission check
+
+        # Ordering, preview and unread badge all come from stored columns (see services.py): the
+        # thread's last_message and the user's ThreadReadState row, joined in
+        queryset = queryset.alias(
+            my_read_state=FilteredRelation('read_states', condition=Q(read_states__user=user)),
+        ).annotate(
+            unread_count=Coalesce(F('my_read_state__unread_count'), 0),
+            last_read_message_id=F('my_read_state__last_read_message'),
+        ).select_related('project', 'last_message__sender__profile').prefetch_related(
             'participants__profile',
-            # Prefetch only the latest message for each thread for 'last_message' field if not done via annotation
-            # Prefetch('messages', queryset=Message.objects.order_by('-timestamp')[:1], to_attr='latest_message_list')
-        ).order_by(F('last_message_timestamp').desc(nulls_last=True), '-updated_at')
+        ).order_by(F('last_message_at').desc(nulls_last=True), '-updated_at')
         return queryset
 
     def perform_create(self, serializer):
@@ -264,6 +377,38 @@ class MessageThreadViewSet(viewsets.ModelViewSet):
         serializer = MessageSerializer(messages, many=True, context={'request': request})
         return Response(serializer.data)
 
+    @action(detail=True, methods=['get'], url_path='history', pagination_class=MessageCursorPagination)
+    def message_history(self, request, id=None):
+        """Newest-first message history with before/after cursors, see MessageCursorPagination."""
+        thread = self.get_object()
+        messages = thread.messages.all().select_related('sender__profile')
+        page = self.paginate_queryset(messages)
+        serializer = MessageSerializer(page, many=True, context={'request': request})
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=True, methods=['post'], url_path='read')
+    def mark_read(self, request, id=None):
+        """Marks the thread read up to `message_id` (default: the newest message) for the current user."""
+        thread = self.get_object()
+        serializer = ThreadReadStateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        message = serializer.validated_data.get('last_read_message')
+        if message is not None and message.thread_id != thread.id:
+            return Response({"message_id": ["Message is not in this thread."]}, status=status.HTTP_400_BAD_REQUEST)
+        state = MessagingService().mark_read(thread, request.user, message)
+        data = ThreadReadStateSerializer(state).data
+        # The user's other open streams update their badges
+        transaction.on_commit(lambda: publish_read_state(request.user.id, data))
+        return Response(data)
+
+    @action(detail=False, methods=['get'], url_path='unread')
+    def unread(self, request):
+        """Total unread messages and threads with unread messages, e.g. for a navigation badge."""
+        totals = ThreadReadState.objects.filter(user=request.user, unread_count__gt=0).aggregate(
+            messages=Coalesce(Sum('unread_count'), 0), threads=Count('id'),
+        )
+        return Response(totals)
+
     @action(detail=True, methods=['post'], url_path='send-message')
     def send_message(self, request, id=None):
         thread = self.get_object() # Permission check
@@ -275,18 +420,10 @@ class MessageThreadViewSet(viewsets.ModelViewSet):
                  return Response({"detail": "Mismatch in thread ID."}, status=status.HTTP_400_BAD_REQUEST)
 
             message = serializer.save(sender=request.user, thread=thread)
-            # If using Django Channels, broadcast this message
-            # from asgiref.sync import async_to_sync
-            # from channels.layers import get_channel_layer
-            # channel_layer = get_channel_layer()
-            # async_to_sync(channel_layer.group_send)(
-            #     f"thread_{thread.id}",
-            #     {
-            #         "type": "chat.message", # Corresponds to a consumer method
-            #         "message": MessageSerializer(message).data,
-            #     }
-            # )
-            return Response(MessageSerializer(message).data, status=status.HTTP_201_CREATED)
+            data = MessageSerializer(message).data
+            # Pushed to the participants' open streams (see streaming.py) once the message is committed
+            transaction.on_commit(lambda: publish_message(data))
+            return Response(data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:58
+
+from django.db import migrations, models
+
+from apps.core.downloads import move_to_private_media
+
+
+def move_files_to_private_media(apps, schema_editor):
+    """Moves ShowcaseItem.file uploads made before private/ existed into it (see apps.core.downloads)."""
+    move_to_private_media(apps.get_model('community_engagement', 'ShowcaseItem'), 'file')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community_engagement', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='showcaseitem',
+            name='file',
+            field=models.FileField(blank=True, help_text='e.g., PDF, Design file', null=True, upload_to='private/showcases/files/'),
+        ),
+        migrations.RunPython(move_files_to_private_media, migrations.RunPython.noop),
+    ]
@@ -62,12 +62,17 @@ class ForumThread(AbstractBaseModel):
     def get_reply_count(self):
         return self.posts.count() -1 # Exclude the initial post if it's part of posts
 
+    def get_last_post(self):
+        if hasattr(self, 'latest_posts'): # Prefetched by ForumThreadViewSet
+            return self.latest_posts[0] if self.latest_posts else None
+        return self.posts.order_by('-created_at').first()
+
     def get_last_post_author(self):
-        last_post = self.posts.order_by('-created_at').first()
+        last_post = self.get_last_post()
         return last_post.author if last_post else None
 
     def get_last_post_created_at(self):
-        last_post = self.posts.order_by('-created_at').first()
+        last_post = self.get_last_post()
         return last_post.created_at if last_post else self.updated_at
 
 
@@ -131,7 +136,7 @@ class ShowcaseItem(AbstractBaseModel):
     title = models.CharField(max_length=200, blank=True, null=True)
     description = models.TextField(blank=True, null=True)
     image = models.ImageField(upload_to='showcases/items/', blank=True, null=True)
-    file = models.FileField(upload_to='showcases/files/', blank=True, null=True, help_text="e.g., PDF, Design file")
+    file = models.FileField(upload_to='private/showcases/files/', blank=True, null=True, help_text="e.g., PDF, Design file")
     url_link = models.URLField(blank=True, null=True, help_text="Link to external project or item")
     item_type = models.CharField(max_length=50, default='image', choices=(('image', 'Image'), ('file', 'File'), ('link', 'Link')))
     order = models.PositiveIntegerField(default=0, help_text="Order of item in showcase")
@@ -2,6 +2,7 @@ from rest_framework import serializers
 from django.conf import settings
 from .models import ForumCategory, ForumThread, ForumPost, Showcase, ShowcaseItem
 from apps.accounts.serializers import UserSerializer # For author/user details
+from apps.core.serializers import DownloadURLField
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -72,6 +73,8 @@ class ForumThreadSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'slug', 'views_count', 'posts_count', 'created_at', 'updated_at', 'last_activity_at', 'last_activity_by']
 
     def get_posts_count(self, obj):
+        if hasattr(obj, 'posts_count_annotated'): # Annotated by ForumThreadViewSet
+            return obj.posts_count_annotated
         return obj.posts.count()
 
     # def get_initial_post(self, obj):
@@ -109,7 +112,7 @@ class ForumThreadDetailSerializer(ForumThreadSerializer):
 class ShowcaseItemSerializer(serializers.ModelSerializer):
     showcase_id = serializers.PrimaryKeyRelatedField(queryset=Showcase.objects.all(), source='showcase')
     image_url = serializers.ImageField(source='image', read_only=True, allow_null=True)
-    file_url = serializers.FileField(source='file', read_only=True, allow_null=True)
+    file_url = DownloadURLField('showcase_item_file')
 
     class Meta:
         model = ShowcaseItem
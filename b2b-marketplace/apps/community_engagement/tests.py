@@ -0,0 +1,35 @@
+from django.urls import reverse
+
+from apps.core.testing import QueryBudgetAPITestCase, seed_marketplace
+from .models import ForumThread, ForumPost
+
+
+class ForumThreadQueryBudgetTests(QueryBudgetAPITestCase):
+    """Forum thread list/detail stay within their query budgets however many threads/posts exist."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_marketplace()
+
+    def setUp(self):
+        self.client.force_authenticate(self.data['buyers'][0])
+
+    def test_thread_list(self):
+        author = self.data['sellers'][1]
+
+        def add_threads():
+            for i in range(3):
+                thread = ForumThread.objects.create(category=self.data['forum_category'], author=author, title=f'Extra thread {i}')
+                ForumPost.objects.create(thread=thread, author=self.data['buyers'][i], content='Following')
+
+        self.get_within_budget(reverse('forumthread-list'), 'community.forumthread-list')
+        self.get_within_budget(reverse('forumthread-list'), None, grow=add_threads, data={'author__username': author.username})
+
+    def test_thread_detail(self):
+        thread = self.data['threads'][0]
+
+        def add_posts():
+            for buyer in self.data['buyers']:
+                ForumPost.objects.create(thread=thread, author=buyer, content='Same question here')
+
+        self.get_within_budget(reverse('forumthread-detail', kwargs={'slug': thread.slug}), 'community.forumthread-detail', grow=add_posts)
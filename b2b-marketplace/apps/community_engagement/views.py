@@ -38,10 +38,14 @@ class ForumCategoryViewSet(viewsets.ModelViewSet):
 class ForumThreadViewSet(viewsets.ModelViewSet):
     queryset = ForumThread.objects.select_related('author__profile', 'category').annotate(
         posts_count_annotated=Count('posts')
+    ).prefetch_related(
+        # Only the newest post per thread, for last_activity_at/last_activity_by (see ForumThread.get_last_post)
+        Prefetch('posts', queryset=ForumPost.objects.select_related('author__profile').order_by('-created_at')[:1], to_attr='latest_posts')
     ).order_by('-is_pinned', '-updated_at')
     # serializer_class = ForumThreadSerializer # Default, override in retrieve
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly]
     lookup_field = 'slug'
+    query_budgets = {'list': 4, 'retrieve': 6}
     filter_backends = [DjangoFilterBackend]
     filterset_fields = {
         'category__slug': ['exact'],
@@ -50,6 +54,12 @@ class ForumThreadViewSet(viewsets.ModelViewSet):
         'is_locked': ['exact'],
     }
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'retrieve':
+            queryset = queryset.prefetch_related(Prefetch('posts', queryset=ForumPost.objects.select_related('author__profile')))
+        return queryset
+
     def get_serializer_class(self):
         if self.action == 'retrieve':
             return ForumThreadDetailSerializer
@@ -62,10 +72,9 @@ class ForumThreadViewSet(viewsets.ModelViewSet):
 
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
-        # Increment view count (basic implementation)
-        instance.views_count = F('views_count') + 1
-        instance.save(update_fields=['views_count'])
-        instance.refresh_from_db() # Get the updated views_count
+        # Increment view count atomically, without refresh_from_db() dropping the prefetched posts
+        ForumThread.objects.filter(pk=instance.pk).update(views_count=F('views_count') + 1)
+        instance.views_count += 1
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
 
@@ -0,0 +1,9 @@
+from django.contrib import admin
+from .models import ExchangeRate
+
+
+@admin.register(ExchangeRate)
+class ExchangeRateAdmin(admin.ModelAdmin):
+    list_display = ('currency', 'rate_to_base', 'source', 'updated_at')
+    search_fields = ('currency',)
+    readonly_fields = ('created_at', 'updated_at')
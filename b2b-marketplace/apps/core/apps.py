@@ -4,4 +4,10 @@ class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.core' # If 'core' is a top-level app
     # If 'core' is inside 'apps/' directory, then use:
-    # name = 'apps.core'
\ No newline at end of file
+    # name = 'apps.core'
+
+    def ready(self):
+        import apps.core.checks # Registers the media storage check
+        import apps.core.signals # Reprices listings when exchange rates change
+        from apps.core.instrumentation import install_serializer_timing
+        install_serializer_timing() # Attributes DRF serialization time to the current request
@@ -0,0 +1,32 @@
+# apps/core/checks.py
+import os
+import tempfile
+
+from django.core.checks import Error, Tags, register
+from django.core.files.storage import storages
+
+from .storage import ContentAddressedStorage
+
+
+@register(Tags.files)
+def check_media_root_holds_hard_links(app_configs, **kwargs):
+    """ContentAddressedStorage stores every name as a hard link to a blob under its location."""
+    storage = storages['default']
+    if not isinstance(storage, ContentAddressedStorage):
+        return []
+    try:
+        os.makedirs(storage.location, exist_ok=True)
+        with tempfile.TemporaryDirectory(dir=storage.location) as directory:
+            source = os.path.join(directory, 'source')
+            open(source, 'wb').close()
+            os.link(source, os.path.join(directory, 'link'))
+    except OSError as e:
+        return [Error(
+            f'ContentAddressedStorage is the default storage but {storage.location} cannot hold hard links ({e}).',
+            hint=(
+                'Put MEDIA_ROOT on a filesystem with hard links (not FAT, SMB or most object-store mounts), '
+                'or unset MEDIA_STORAGE_BACKEND to use FileSystemStorage.'
+            ),
+            id='core.E001',
+        )]
+    return []
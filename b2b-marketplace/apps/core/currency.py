@@ -0,0 +1,88 @@
+import time
+from decimal import Decimal
+
+from django.apps import apps
+from django.conf import settings
+from django.db.models import F
+
+# Models with a precomputed base-currency price column, as
+# (app_label.ModelName, price field, normalized field, currency field).
+# refresh_normalized_prices() rewrites these columns with one UPDATE per currency.
+NORMALIZED_PRICE_FIELDS = [
+    ('listings.Material', 'price_per_unit', 'price_per_unit_base', 'currency'),
+]
+
+RATE_CACHE_TTL = 300 # seconds; other processes pick up rate changes within this window
+
+_rate_cache = {'rates': None, 'loaded_at': 0.0}
+
+
+def get_base_currency() -> str:
+    return getattr(settings, 'BASE_CURRENCY', 'USD').upper()
+
+
+def get_rates() -> dict:
+    """
+    Returns {currency: rate_to_base} from an in-process cache, loading the whole
+    ExchangeRate table (a few hundred rows at most) in one query when stale.
+    """
+    now = time.monotonic()
+    if _rate_cache['rates'] is None or now - _rate_cache['loaded_at'] > RATE_CACHE_TTL:
+        ExchangeRate = apps.get_model('core', 'ExchangeRate')
+        rates = dict(ExchangeRate.objects.values_list('currency', 'rate_to_base'))
+        rates[get_base_currency()] = Decimal('1')
+        _rate_cache['rates'] = rates
+        _rate_cache['loaded_at'] = now
+    return _rate_cache['rates']
+
+
+def invalidate_rate_cache():
+    _rate_cache['rates'] = None
+
+
+def is_supported_currency(currency: str) -> bool:
+    return bool(currency) and currency.upper() in get_rates()
+
+
+def convert(amount, from_currency: str, to_currency: str):
+    """Converts `amount` between two currencies via the base currency. Returns None if a rate is missing."""
+    if amount is None:
+        return None
+    from_currency, to_currency = from_currency.upper(), to_currency.upper()
+    if from_currency == to_currency:
+        return Decimal(amount)
+    rates = get_rates()
+    if from_currency not in rates or to_currency not in rates:
+        return None
+    converted = Decimal(amount) * rates[from_currency] / rates[to_currency]
+    return converted.quantize(Decimal('0.01'))
+
+
+def to_base(amount, currency: str):
+    return convert(amount, currency, get_base_currency())
+
+
+def refresh_normalized_prices(currencies=None) -> int:
+    """
+    Recomputes every normalized price column in bulk: one UPDATE per (model, currency),
+    with the conversion done by the database (`price * rate`), never row by row in Python.
+    Rows in a currency without a rate get NULL so they drop out of base-price filters.
+    Returns the number of rows updated.
+    """
+    invalidate_rate_cache()
+    rates = get_rates()
+    updated = 0
+    for model_label, price_field, base_field, currency_field in NORMALIZED_PRICE_FIELDS:
+        model = apps.get_model(model_label)
+        if currencies is None:
+            targets = set(model.objects.order_by().values_list(currency_field, flat=True).distinct())
+        else:
+            targets = {currency.upper() for currency in currencies}
+        for currency in targets:
+            rows = model.objects.filter(**{currency_field: currency})
+            rate = rates.get(currency)
+            if rate is None:
+                updated += rows.update(**{base_field: None})
+            else:
+                updated += rows.update(**{base_field: F(price_field) * rate})
+    return updated
@@ -0,0 +1,294 @@
+# apps/core/downloads.py
+"""
+Authorized downloads of private files (tech packs, project files, RFQ specifications).
+
+    GET /api/v1/core/downloads/<kind>/<id>/      e.g. /downloads/tech_pack/42/
+
+Django only checks who may have the file; the bytes are sent by the web server in front of it
+(MEDIA_SENDFILE), so a worker is busy for one permission check however large or slow the download:
+
+    MEDIA_SENDFILE = 'x-accel-redirect'   nginx: X-Accel-Redirect: <MEDIA_SENDFILE_URL><name>, with
+                                          location /protected-media/ { internal; alias <MEDIA_ROOT>/; }
+    MEDIA_SENDFILE = 'x-sendfile'         Apache mod_xsendfile / lighttpd: X-Sendfile: <absolute path>
+    MEDIA_SENDFILE = ''                   no front proxy (development, tests): a FileResponse
+
+The FileResponse fallback supports single Range requests (resumed and parallel downloads), ETag and
+Last-Modified. Its body is the open file itself, limited to the requested range, so WSGI servers with
+wsgi.file_wrapper (gunicorn) send it with sendfile(2) without copying it through Python. Files in
+storages without local paths (S3 and the like) are redirected to the storage's URL instead.
+
+Private files are uploaded under MEDIA_ROOT/private/ (PRIVATE_MEDIA_PREFIX), and only there:
+
+    private/project_files/            ProjectFile.file
+    private/designs/tech_packs/       TechPack.file
+    private/rfqs/specifications/      RFQ.specifications_file
+    private/showcases/files/          ShowcaseItem.file
+
+The front proxy serves MEDIA_URL publicly for images (listings, profiles, showcases, certifications)
+but must refuse MEDIA_URL + 'private/' (nginx: location /media/private/ { return 404; }); the internal
+location above is the only way to those files, and only through X-Accel-Redirect. Serializers link
+them with DownloadURLField (apps.core.serializers), never with their MEDIA_URL, and in DEBUG Django
+doesn't serve private/ either. Files uploaded before were moved there by the apps' migrations
+(move_to_private_media).
+
+Download kinds are registered below: which model and FileField, and who may download. Checks use
+the project membership index and the set of designs each buyer has completed orders for, both
+cached only when the cache backend is shared by all workers.
+"""
+import mimetypes
+import os
+import re
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Callable
+from urllib.parse import quote
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, HttpResponseRedirect
+from django.utils.http import content_disposition_header, http_date
+
+from .utils import cache_is_shared
+
+# Orders in these states give their buyer the designs' files (tech packs)
+DESIGN_ACCESS_ORDER_STATUSES = ('completed',)
+
+# upload_to prefix of every private file; never served under MEDIA_URL
+PRIVATE_MEDIA_PREFIX = 'private/'
+
+
+@dataclass(frozen=True)
+class DownloadTarget:
+    name: str                       # As in the URL
+    model_label: str                # 'app_label.ModelName' holding the file
+    file_field: str                 # FileField on that model
+    is_allowed: Callable            # (user, obj) -> bool; staff may download everything
+    select_related: tuple = ()      # Relations is_allowed reads, loaded with the object
+
+    @cached_property
+    def model(self):
+        return apps.get_model(self.model_label)
+
+    def get_object(self, pk):
+        """The object `pk` refers to, or None if there is none (or `pk` isn't a valid id)."""
+        try:
+            pk = self.model._meta.pk.to_python(pk)
+        except ValidationError:
+            return None
+        return self.model.objects.select_related(*self.select_related).filter(pk=pk).first()
+
+    def allowed(self, user, obj) -> bool:
+        return user.is_staff or bool(self.is_allowed(user, obj))
+
+
+_REGISTRY = {}
+
+
+def register_download_target(target: DownloadTarget):
+    _REGISTRY[target.name] = target
+    return target
+
+
+def get_download_target(name):
+    """DownloadTarget registered as `name`, or None."""
+    return _REGISTRY.get(name)
+
+
+def _purchases_key(user_id):
+    return f'downloads:purchases:{user_id}'
+
+
+def purchased_design_ids(user):
+    """
+    Ids of the designs `user` has completed orders for, cached per user (see invalidate_purchases).
+    The cache needs a backend shared by all workers, or a refund would only revoke access in the
+    worker that saved the order; with a process-local one every call queries (one per download).
+    """
+    from apps.orders.models import OrderItem
+
+    shared = cache_is_shared()
+    key = _purchases_key(user.pk)
+    design_ids = cache.get(key) if shared else None
+    if design_ids is None:
+        design_ids = set(OrderItem.objects.filter(
+            order__buyer_id=user.pk, order__status__in=DESIGN_ACCESS_ORDER_STATUSES, design__isnull=False,
+        ).values_list('design_id', flat=True).distinct())
+        if shared:
+            cache.set(key, design_ids, settings.DOWNLOAD_PURCHASES_CACHE_TTL)
+    return design_ids
+
+
+def invalidate_purchases(user_id):
+    if cache_is_shared():
+        cache.delete(_purchases_key(user_id))
+
+
+def _is_project_member(user, project_file):
+    from apps.collaborations.membership import is_project_member # Cached membership index
+
+    return is_project_member(user, project_file.project_id)
+
+
+def _may_download_tech_pack(user, tech_pack):
+    return tech_pack.design.designer_id == user.pk or tech_pack.design_id in purchased_design_ids(user)
+
+
+register_download_target(DownloadTarget('project_file', 'collaborations.ProjectFile', 'file', _is_project_member))
+register_download_target(DownloadTarget(
+    'tech_pack', 'listings.TechPack', 'file', _may_download_tech_pack, select_related=('design',),
+))
+register_download_target(DownloadTarget(
+    'rfq_specifications', 'orders.RFQ', 'specifications_file', lambda user, rfq: rfq.buyer_id == user.pk,
+))
+register_download_target(DownloadTarget(
+    'showcase_item_file', 'community_engagement.ShowcaseItem', 'file',
+    lambda user, item: item.showcase.is_public or item.showcase.user_id == user.pk, select_related=('showcase',),
+))
+
+
+def move_to_private_media(model, field_name, batch_size=1000):
+    """
+    Moves the files of `model`.`field_name` stored outside PRIVATE_MEDIA_PREFIX (uploaded before it
+    existed) under it, keeping the rest of their names, and updates the rows. For data migrations,
+    with the historical model. Files in storages without local paths are left where they are.
+    Returns how many files were moved.
+    """
+    field = model._meta.get_field(field_name)
+    storage = field.storage
+    rows = (
+        model.objects.exclude(**{f'{field_name}__startswith': PRIVATE_MEDIA_PREFIX})
+        .exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+        .order_by('pk').values_list('pk', field_name)
+    )
+    moved, last_pk = 0, None
+    while True:
+        batch = list((rows.filter(pk__gt=last_pk) if last_pk is not None else rows)[:batch_size])
+        if not batch:
+            return moved
+        for pk, name in batch:
+            try:
+                source = storage.path(name)
+            except NotImplementedError:
+                return moved # Not on local disk, so not served from MEDIA_ROOT by the front proxy
+            if not os.path.exists(source):
+                continue
+            new_name = storage.get_available_name(PRIVATE_MEDIA_PREFIX + name, max_length=field.max_length)
+            os.makedirs(os.path.dirname(storage.path(new_name)), exist_ok=True)
+            os.replace(source, storage.path(new_name))
+            model.objects.filter(pk=pk).update(**{field_name: new_name})
+            moved += 1
+        last_pk = batch[-1][0]
+
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def parse_range(header, size):
+    """
+    (start, end) inclusive for a single-range Range header, 'unsatisfiable', or None to send the
+    whole file (no header, several ranges, or a syntax we don't handle: RFC 9110 allows ignoring it).
+    """
+    match = _RANGE_RE.match((header or '').replace(' ', ''))
+    if not match or match.group(1) == match.group(2) == '':
+        return None
+    first, last = match.groups()
+    if first == '': # Suffix range: the last N bytes
+        if int(last) == 0:
+            return 'unsatisfiable'
+        return max(size - int(last), 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if last and int(last) < start:
+        return None # Invalid, so ignored
+    if start >= size:
+        return 'unsatisfiable'
+    return start, end
+
+
+class _FileRange:
+    """
+    `length` bytes of an open file from its current position. Keeps fileno(), so wsgi.file_wrapper
+    implementations that use sendfile(2) (bounded by Content-Length) still can; everything else reads
+    it through read() and never gets past the range.
+    """
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size) if size else b''
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def _etag(stat):
+    return f'"{int(stat.st_mtime_ns // 1000):x}-{stat.st_size:x}"'
+
+
+def _file_response(request, path, filename, content_type):
+    stat = os.stat(path)
+    etag, last_modified = _etag(stat), http_date(stat.st_mtime)
+    if etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]:
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    size = stat.st_size
+    byte_range = parse_range(request.headers.get('Range'), size)
+    if_range = request.headers.get('If-Range')
+    if byte_range and if_range and if_range not in (etag, last_modified):
+        byte_range = None # Changed since the client's partial copy: send it whole
+    if byte_range == 'unsatisfiable':
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    start, end = byte_range or (0, size - 1)
+    length = max(end - start + 1, 0)
+
+    file = open(path, 'rb')
+    file.seek(start)
+    response = FileResponse(_FileRange(file, length), status=206 if byte_range else 200, content_type=content_type)
+    response['Content-Length'] = str(length)
+    if byte_range:
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Content-Disposition'] = content_disposition_header(True, filename)
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = last_modified
+    return response
+
+
+def serve_file(request, fieldfile):
+    """
+    Response that makes the client download `fieldfile`: a hand-off to the front proxy (MEDIA_SENDFILE),
+    a redirect for storages without local files, or a FileResponse streamed from disk.
+    """
+    storage, name = fieldfile.storage, fieldfile.name
+    filename = os.path.basename(name)
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    try:
+        path = storage.path(name)
+    except NotImplementedError: # Remote storage: its (signed) URL serves the file
+        return HttpResponseRedirect(storage.url(name))
+
+    mode = settings.MEDIA_SENDFILE.lower()
+    if mode in ('x-accel-redirect', 'x-sendfile'):
+        response = HttpResponse(content_type=content_type) # The proxy fills in the body, ranges and length
+        if mode == 'x-accel-redirect':
+            response['X-Accel-Redirect'] = settings.MEDIA_SENDFILE_URL + quote(name.replace('\\', '/'))
+        else:
+            response['X-Sendfile'] = path
+        response['Content-Disposition'] = content_disposition_header(True, filename)
+        return response
+    return _file_response(request, path, filename, content_type)
@@ -0,0 +1,214 @@
+# apps/core/instrumentation.py
+"""
+Per-request SQL/latency instrumentation.
+
+RequestInstrumentationMiddleware (middleware.py) wraps every request in a RequestMetrics
+collector that counts SQL queries and their total time via `connection.execute_wrapper`
+(works with DEBUG off), fingerprints each statement to spot duplicates (N+1 patterns), and
+times DRF serialization. Finished requests are folded into an in-process MetricsStore keyed by
+resolved URL name and viewset action (e.g. 'material-list:list'); the admin-only endpoint in
+core/views.py reports percentiles from it.
+
+Views can declare `query_budgets = {'list': 8, 'retrieve': 5}` (or a single int): the most SQL
+queries one request to each action (or, on plain views, HTTP method) may run, whatever the page
+size. Budgets are enforced in tests: QueryBudgetAPITestCase (testing.py) turns QUERY_BUDGET_ENFORCE
+on, so a request that exceeds its budget raises QueryBudgetExceeded, and get_within_budget() also
+fails if an endpoint has no budget or its query count grows with the rows on the page.
+"""
+import re
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+_current_metrics = ContextVar('request_metrics', default=None)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised (when QUERY_BUDGET_ENFORCE is on) if a request runs more queries than its view declares."""
+
+
+def fingerprint_sql(sql):
+    """Normalizes a statement so the same query with different parameters maps to one fingerprint."""
+    sql = _STRING_LITERAL.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('(...)', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+class RequestMetrics:
+    """Collects SQL and serializer timings for one request."""
+
+    def __init__(self):
+        self.query_count = 0
+        self.sql_time = 0.0
+        self.serializer_time = 0.0
+        self.fingerprints = Counter()
+        self.started = time.perf_counter()
+        self._stack = None
+        self._serializer_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - start
+            self.query_count += 1
+            self.fingerprints[fingerprint_sql(sql)] += 1
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        self._token = _current_metrics.set(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _current_metrics.reset(self._token)
+        self._stack.close()
+        self.elapsed = time.perf_counter() - self.started
+        return False
+
+    @property
+    def duplicate_queries(self):
+        """{fingerprint: count} for statements run more than once in this request."""
+        return {sql: count for sql, count in self.fingerprints.items() if count > 1}
+
+
+def current_metrics():
+    return _current_metrics.get()
+
+
+class MetricsStore:
+    """
+    Bounded in-process store of recent request samples per endpoint key. Each worker process
+    keeps its own; that's enough to find N+1-heavy endpoints without external infrastructure.
+    """
+
+    def __init__(self, max_samples=None):
+        self.max_samples = max_samples or getattr(settings, 'REQUEST_INSTRUMENTATION_MAX_SAMPLES', 500)
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=self.max_samples))
+        self._duplicates = defaultdict(Counter)
+
+    def record(self, key, metrics: RequestMetrics, response_size: int, status_code: int):
+        sample = (
+            metrics.query_count,
+            metrics.sql_time * 1000,
+            metrics.serializer_time * 1000,
+            metrics.elapsed * 1000,
+            response_size,
+            status_code,
+        )
+        duplicates = metrics.duplicate_queries
+        with self._lock:
+            self._samples[key].append(sample)
+            if duplicates:
+                self._duplicates[key].update(duplicates)
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._duplicates.clear()
+
+    @staticmethod
+    def _percentiles(values):
+        ordered = sorted(values)
+        last = len(ordered) - 1
+        result = {f'p{p}': round(ordered[min(last, round(p / 100 * last))], 2) for p in PERCENTILES}
+        result['max'] = round(ordered[-1], 2)
+        return result
+
+    def summary(self, top_duplicates=5):
+        """Aggregated percentiles per endpoint key, most queries (p95) first."""
+        with self._lock:
+            snapshot = {key: list(samples) for key, samples in self._samples.items()}
+            duplicates = {key: counter.most_common(top_duplicates) for key, counter in self._duplicates.items()}
+        endpoints = []
+        for key, samples in snapshot.items():
+            if not samples:
+                continue
+            columns = list(zip(*samples))
+            endpoints.append({
+                'endpoint': key,
+                'requests': len(samples),
+                'errors': sum(1 for status_code in columns[5] if status_code >= 500),
+                'query_count': self._percentiles(columns[0]),
+                'sql_ms': self._percentiles(columns[1]),
+                'serializer_ms': self._percentiles(columns[2]),
+                'total_ms': self._percentiles(columns[3]),
+                'response_bytes': self._percentiles(columns[4]),
+                'duplicate_queries': [{'sql': sql, 'count': count} for sql, count in duplicates.get(key, [])],
+            })
+        endpoints.sort(key=lambda endpoint: endpoint['query_count']['p95'], reverse=True)
+        return endpoints
+
+
+metrics_store = MetricsStore()
+
+
+def endpoint_key(request):
+    """'<url name>:<viewset action or method>' for the resolved view, e.g. 'material-list:list'."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    name = match.view_name or match._func_path
+    actions = getattr(match.func, 'actions', None) # Set by ViewSet.as_view()
+    action = actions.get(request.method.lower()) if actions else request.method.lower()
+    return f'{name}:{action}'
+
+
+def view_query_budget(request):
+    """The resolved view's declared query budget for this request, or None."""
+    match = getattr(request, 'resolver_match', None)
+    view_class = getattr(getattr(match, 'func', None), 'cls', None) if match else None
+    budgets = getattr(view_class, 'query_budgets', None)
+    if budgets is None:
+        return None
+    if isinstance(budgets, int):
+        return budgets
+    actions = getattr(match.func, 'actions', None)
+    action = actions.get(request.method.lower()) if actions else request.method.lower()
+    return budgets.get(action)
+
+
+def install_serializer_timing():
+    """
+    Wraps DRF's Serializer.data / ListSerializer.data so time spent serializing is attributed
+    to the current request. Nested .data calls are only counted once.
+    """
+    from rest_framework import serializers
+
+    for cls in (serializers.Serializer, serializers.ListSerializer):
+        original = cls.data
+        if getattr(original.fget, '_instrumented', False):
+            continue
+
+        def timed_data(self, _original=original):
+            metrics = _current_metrics.get()
+            if metrics is None:
+                return _original.fget(self)
+            metrics._serializer_depth += 1
+            start = time.perf_counter()
+            try:
+                return _original.fget(self)
+            finally:
+                metrics._serializer_depth -= 1
+                if metrics._serializer_depth == 0:
+                    metrics.serializer_time += time.perf_counter() - start
+
+        timed_data._instrumented = True
+        cls.data = property(timed_data)
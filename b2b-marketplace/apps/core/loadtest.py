@@ -0,0 +1,534 @@
+# apps/core/loadtest.py
+"""
+Offline load-testing harness, driven by `manage.py loadtest`.
+
+Virtual users replay weighted scenarios (anonymous catalog browsing, buyer checkout, supplier
+quoting, forum reading) against a running server. They use a small keep-alive asyncio HTTP/1.1
+client built on the standard library, so a run needs no network access or extra packages. Request
+targets are sampled from the synthetic dataset created by `seed_data` (users prefixed "seed-",
+password "password123").
+
+Every request is recorded under the same '<url name>:<action>' key the server-side
+instrumentation uses (see instrumentation.py), so a slow endpoint here can be looked up directly
+in /api/v1/core/metrics/requests/. The report holds request counts, error rates, throughput and a
+latency histogram per endpoint. LoadTestReport.to_dict() is what `--output` writes, tagged with
+the git commit; compare_reports() diffs two such files to compare runs across commits.
+"""
+import asyncio
+import json
+import math
+import random
+import time
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+User = get_user_model()
+
+SEED_PASSWORD = 'password123' # Set by seed_data (and apps/core/testing.py) for every generated user
+DEFAULT_MIX = {'browse': 60, 'forum': 20, 'checkout': 10, 'quoting': 10}
+SEARCH_TERMS = ['cotton', 'linen', 'wool', 'denim', 'jersey', 'organic', 'recycled', 'twill']
+
+
+# --- HTTP client ---
+
+class HTTPResponse:
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body or b'null')
+
+
+class AsyncHTTPClient:
+    """
+    Minimal HTTP/1.1 client over one keep-alive connection, like a single browser tab. Handles
+    Content-Length, chunked and close-delimited bodies. A request on a reused connection the
+    server has since closed is retried once on a fresh connection.
+    """
+
+    def __init__(self, host, port, timeout=30.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._reader = None
+        self._writer = None
+
+    async def request(self, method, path, headers=None, json_body=None):
+        body = b'' if json_body is None else json.dumps(json_body).encode()
+        lines = [
+            f'{method} {path} HTTP/1.1',
+            f'Host: {self.host}:{self.port}',
+            'Accept: application/json',
+            f'Content-Length: {len(body)}',
+        ]
+        if json_body is not None:
+            lines.append('Content-Type: application/json')
+        lines.extend(f'{name}: {value}' for name, value in (headers or {}).items())
+        payload = ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body
+
+        for attempt in range(2):
+            reused = self._writer is not None
+            if not reused:
+                self._reader, self._writer = await asyncio.wait_for(
+                    asyncio.open_connection(self.host, self.port), self.timeout
+                )
+            try:
+                self._writer.write(payload)
+                await self._writer.drain()
+                response = await asyncio.wait_for(self._read_response(method), self.timeout)
+                break
+            except (ConnectionError, asyncio.IncompleteReadError):
+                await self.close()
+                if not reused or attempt:
+                    raise
+        if response.headers.get('connection', '').lower() == 'close':
+            await self.close()
+        return response
+
+    async def _read_response(self, method):
+        status_line = await self._reader.readline()
+        if not status_line:
+            raise ConnectionResetError('Server closed the connection.')
+        status = int(status_line.split(b' ', 2)[1])
+        headers = {}
+        while True:
+            line = await self._reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if method == 'HEAD' or status in (204, 304) or status < 200:
+            body = b''
+        elif headers.get('transfer-encoding', '').lower() == 'chunked':
+            body = await self._read_chunked()
+        elif 'content-length' in headers:
+            body = await self._reader.readexactly(int(headers['content-length']))
+        else:
+            body = await self._reader.read() # Delimited by the server closing the connection
+            headers['connection'] = 'close'
+        return HTTPResponse(status, headers, body)
+
+    async def _read_chunked(self):
+        chunks = []
+        while True:
+            size = int((await self._reader.readline()).split(b';')[0], 16)
+            if size == 0:
+                while (await self._reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass # Trailers
+                return b''.join(chunks)
+            chunks.append(await self._reader.readexactly(size))
+            await self._reader.readexactly(2) # CRLF after each chunk
+
+    async def close(self):
+        writer, self._reader, self._writer = self._writer, None, None
+        if writer is not None:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+
+# --- Statistics ---
+
+class LatencyHistogram:
+    """
+    Log-bucketed latency histogram: 5% wide buckets from 0.1ms up, so percentiles are accurate to
+    ~5% at a fixed memory cost however many samples are recorded. Serializes to JSON and merges.
+    """
+    MIN_MS = 0.1
+    GROWTH = 1.05
+    DISPLAY_EDGES_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+    def __init__(self):
+        self.buckets = Counter()
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, ms):
+        index = 0 if ms <= self.MIN_MS else int(math.log(ms / self.MIN_MS, self.GROWTH)) + 1
+        self.buckets[index] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def upper_bound(self, index):
+        return self.MIN_MS * self.GROWTH ** index
+
+    def percentile(self, p):
+        if not self.count:
+            return 0.0
+        rank, seen = p / 100 * self.count, 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(self.upper_bound(index), self.max_ms)
+        return self.max_ms
+
+    @property
+    def mean_ms(self):
+        return self.total_ms / self.count if self.count else 0.0
+
+    def coarse(self):
+        """[(label, count)] over DISPLAY_EDGES_MS, for printing."""
+        counts = Counter()
+        for index, count in self.buckets.items():
+            bound = self.upper_bound(index)
+            edge = next((edge for edge in self.DISPLAY_EDGES_MS if bound <= edge * self.GROWTH), None)
+            counts[edge] += count
+        rows = [(f'<={edge}ms', counts[edge]) for edge in self.DISPLAY_EDGES_MS if counts[edge]]
+        if counts[None]:
+            rows.append((f'>{self.DISPLAY_EDGES_MS[-1]}ms', counts[None]))
+        return rows
+
+    def to_dict(self):
+        return {
+            'count': self.count, 'total_ms': round(self.total_ms, 3), 'max_ms': round(self.max_ms, 3),
+            'buckets': {str(index): count for index, count in sorted(self.buckets.items())},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls()
+        histogram.count, histogram.total_ms, histogram.max_ms = data['count'], data['total_ms'], data['max_ms']
+        histogram.buckets = Counter({int(index): count for index, count in data['buckets'].items()})
+        return histogram
+
+
+class EndpointStats:
+    def __init__(self):
+        self.histogram = LatencyHistogram()
+        self.errors = Counter() # 'HTTP 500' / exception name -> count
+
+    @property
+    def requests(self):
+        return self.histogram.count
+
+    @property
+    def error_count(self):
+        return sum(self.errors.values())
+
+
+class LoadTestReport:
+    def __init__(self):
+        self.endpoints = defaultdict(EndpointStats)
+        self.scenarios = Counter()
+        self.duration = 0.0
+
+    def record(self, endpoint, elapsed_ms, error=None):
+        stats = self.endpoints[endpoint]
+        stats.histogram.record(elapsed_ms)
+        if error:
+            stats.errors[error] += 1
+
+    @property
+    def total_requests(self):
+        return sum(stats.requests for stats in self.endpoints.values())
+
+    @property
+    def total_errors(self):
+        return sum(stats.error_count for stats in self.endpoints.values())
+
+    def rows(self):
+        """Per-endpoint summary dicts, busiest first."""
+        rows = []
+        for endpoint, stats in self.endpoints.items():
+            histogram = stats.histogram
+            rows.append({
+                'endpoint': endpoint,
+                'requests': stats.requests,
+                'errors': stats.error_count,
+                'error_rate': round(stats.error_count / stats.requests, 4) if stats.requests else 0.0,
+                'rps': round(stats.requests / self.duration, 2) if self.duration else 0.0,
+                'mean_ms': round(histogram.mean_ms, 2),
+                'p50_ms': round(histogram.percentile(50), 2),
+                'p90_ms': round(histogram.percentile(90), 2),
+                'p95_ms': round(histogram.percentile(95), 2),
+                'p99_ms': round(histogram.percentile(99), 2),
+                'max_ms': round(histogram.max_ms, 2),
+            })
+        rows.sort(key=lambda row: row['requests'], reverse=True)
+        return rows
+
+    def to_dict(self, **meta):
+        return {
+            **meta,
+            'duration_s': round(self.duration, 3),
+            'total_requests': self.total_requests,
+            'total_errors': self.total_errors,
+            'rps': round(self.total_requests / self.duration, 2) if self.duration else 0.0,
+            'scenarios': dict(self.scenarios),
+            'endpoints': {
+                row['endpoint']: {
+                    **row,
+                    'error_kinds': dict(self.endpoints[row['endpoint']].errors),
+                    'histogram': self.endpoints[row['endpoint']].histogram.to_dict(),
+                }
+                for row in self.rows()
+            },
+        }
+
+
+def compare_reports(baseline, current, tolerance=1.2):
+    """
+    Compares two LoadTestReport.to_dict() results. Returns one row per endpoint present in both,
+    with before/after p50/p95/rps/error rate. A row is flagged as a regression when p95 grows, or
+    throughput drops, by more than `tolerance`x, or when the error rate rises.
+    """
+    rows = []
+    for endpoint, after in current['endpoints'].items():
+        before = baseline['endpoints'].get(endpoint)
+        if before is None:
+            continue
+        regressed = (
+            after['p95_ms'] > before['p95_ms'] * tolerance
+            or after['rps'] * tolerance < before['rps']
+            or after['error_rate'] > before['error_rate']
+        )
+        rows.append({
+            'endpoint': endpoint,
+            'p50_ms': (before['p50_ms'], after['p50_ms']),
+            'p95_ms': (before['p95_ms'], after['p95_ms']),
+            'rps': (before['rps'], after['rps']),
+            'error_rate': (before['error_rate'], after['error_rate']),
+            'regressed': regressed,
+        })
+    return rows
+
+
+# --- Dataset and scenarios ---
+
+class Dataset:
+    """Request targets sampled from the database before the run (the server reads the same database)."""
+
+    def __init__(self, materials, designs, threads, forum_categories, categories, buyers, suppliers, rfqs):
+        self.materials = materials # [(id, slug, price_per_unit)]
+        self.designs = designs # [slug]
+        self.threads = threads # [slug]
+        self.forum_categories = forum_categories # [slug]
+        self.categories = categories # [slug]
+        self.buyers = buyers # [username]
+        self.suppliers = suppliers # [username]
+        self.rfqs = rfqs # [id]
+        self.material_pages = self._pages(materials)
+        self.thread_pages = self._pages(threads)
+
+    @staticmethod
+    def _pages(rows, limit=50):
+        """List pages to spread requests over: the first `limit` pages that exist (deep pages are rare)."""
+        return max(1, min(limit, math.ceil(len(rows) / settings.REST_FRAMEWORK.get('PAGE_SIZE', 10))))
+
+    @classmethod
+    def load(cls, prefix='seed-', sample_size=5000):
+        from apps.community_engagement.models import ForumCategory, ForumThread
+        from apps.listings.models import Category, Material, Design
+        from apps.orders.models import RFQ
+
+        users = User.objects.filter(username__startswith=prefix, is_active=True)
+        return cls(
+            materials=[
+                (pk, slug, str(price)) for pk, slug, price in Material.objects.filter(
+                    seller__username__startswith=prefix, is_active=True,
+                ).order_by('pk').values_list('pk', 'slug', 'price_per_unit')[:sample_size]
+            ],
+            designs=list(Design.objects.filter(designer__username__startswith=prefix, is_active=True).order_by('pk').values_list('slug', flat=True)[:sample_size]),
+            threads=list(ForumThread.objects.filter(author__username__startswith=prefix).order_by('slug').values_list('slug', flat=True)[:sample_size]),
+            forum_categories=list(ForumCategory.objects.order_by('slug').values_list('slug', flat=True)),
+            categories=list(Category.objects.order_by('slug').values_list('slug', flat=True)),
+            buyers=list(users.filter(user_type='buyer').order_by('pk').values_list('username', flat=True)[:sample_size]),
+            suppliers=list(users.filter(user_type__in=['seller', 'manufacturer']).order_by('pk').values_list('username', flat=True)[:sample_size]),
+            rfqs=[
+                str(pk) for pk in RFQ.objects.filter(
+                    buyer__username__startswith=prefix, status='open', deadline_for_quotes__gte=timezone.now() + timedelta(hours=1),
+                ).order_by('pk').values_list('pk', flat=True)[:sample_size]
+            ],
+        )
+
+
+class ScenarioAborted(Exception):
+    """A step failed (already recorded); the virtual user abandons the rest of the scenario."""
+
+
+class VirtualUser:
+    def __init__(self, client, dataset, report, rng, tokens, think_time_ms=0):
+        self.client = client
+        self.dataset = dataset
+        self.report = report
+        self.rng = rng
+        self.tokens = tokens # username -> auth token, shared by all virtual users
+        self.think_time_ms = think_time_ms
+        self.token = None
+
+    async def call(self, endpoint, method, path, json_body=None, expect=(200,)):
+        headers = {'Authorization': f'Token {self.token}'} if self.token else None
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, path, headers=headers, json_body=json_body)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as exc:
+            self.report.record(endpoint, (time.perf_counter() - start) * 1000, error=type(exc).__name__)
+            raise ScenarioAborted from exc
+        ok = response.status in expect
+        self.report.record(endpoint, (time.perf_counter() - start) * 1000, error=None if ok else f'HTTP {response.status}')
+        if self.think_time_ms:
+            await asyncio.sleep(self.rng.uniform(0, 2 * self.think_time_ms) / 1000)
+        if not ok:
+            raise ScenarioAborted
+        return response
+
+    async def get(self, endpoint, path, **params):
+        return await self.call(endpoint, 'GET', f'{path}?{urlencode(params)}' if params else path)
+
+    async def login(self, username):
+        self.token = self.tokens.get(username)
+        if self.token is None:
+            response = await self.call(
+                'account_login:post', 'POST', '/api/v1/accounts/login/',
+                json_body={'username': username, 'password': SEED_PASSWORD},
+            )
+            self.token = self.tokens[username] = response.json()['token']
+
+    def logout(self):
+        self.token = None
+
+
+SCENARIOS = {}
+
+
+def scenario(name, requires=()):
+    """Registers a scenario coroutine; `requires` names Dataset lists that must be non-empty."""
+    def register(func):
+        func.requires = requires
+        SCENARIOS[name] = func
+        return func
+    return register
+
+
+@scenario('browse', requires=('materials',))
+async def browse_catalog(user):
+    """Anonymous buyer: material pages, a search or category filter, material details, designs."""
+    rng, data = user.rng, user.dataset
+    user.logout()
+    await user.get('material-list:list', '/api/v1/listings/materials/', page=rng.randint(1, data.material_pages))
+    if rng.random() < 0.3:
+        await user.get('material-list:list', '/api/v1/listings/materials/', search=rng.choice(SEARCH_TERMS))
+    elif data.categories and rng.random() < 0.3:
+        await user.get('material-list:list', '/api/v1/listings/materials/', category__slug=rng.choice(data.categories))
+    for _ in range(rng.randint(1, 3)):
+        await user.get('material-detail:retrieve', f'/api/v1/listings/materials/{rng.choice(data.materials)[1]}/')
+    if rng.random() < 0.2:
+        await user.get('category-list:list', '/api/v1/listings/categories/')
+    if data.designs and rng.random() < 0.3:
+        await user.get('design-list:list', '/api/v1/listings/designs/')
+        await user.get('design-detail:retrieve', f'/api/v1/listings/designs/{rng.choice(data.designs)}/')
+
+
+@scenario('checkout', requires=('materials', 'buyers'))
+async def buyer_checkout(user):
+    """Buyer: look at a material, place an order (OrderViewSet.create), initiate payment, view the order."""
+    rng, data = user.rng, user.dataset
+    await user.login(rng.choice(data.buyers))
+    picked = rng.sample(data.materials, min(len(data.materials), rng.randint(1, 3)))
+    await user.get('material-detail:retrieve', f'/api/v1/listings/materials/{picked[0][1]}/')
+    response = await user.call('order-list:create', 'POST', '/api/v1/orders/orders/', json_body={
+        'items': [
+            {'material_id': material_id, 'quantity': rng.randint(10, 500), 'unit_price': price}
+            for material_id, _, price in picked
+        ],
+        'shipping_address': 'Load test, 1 Synthetic Way',
+    }, expect=(201,))
+    order_id = response.json()['id']
+    await user.call('order-initiate-payment:initiate_payment', 'POST', f'/api/v1/orders/orders/{order_id}/initiate-payment/')
+    await user.get('order-detail:retrieve', f'/api/v1/orders/orders/{order_id}/')
+
+
+@scenario('quoting', requires=('suppliers', 'rfqs'))
+async def supplier_quoting(user):
+    """Seller/manufacturer: browse open RFQs, open one, submit a quote, check their quotes."""
+    rng, data = user.rng, user.dataset
+    await user.login(rng.choice(data.suppliers))
+    await user.get('rfq-list:list', '/api/v1/orders/rfqs/')
+    rfq_id = rng.choice(data.rfqs)
+    await user.get('rfq-detail:retrieve', f'/api/v1/orders/rfqs/{rfq_id}/')
+    quantity, price = rng.choice([100, 250, 500, 1000]), round(rng.uniform(2, 40), 2)
+    await user.call('quote-list:create', 'POST', '/api/v1/orders/quotes/', json_body={
+        'rfq_id': rfq_id,
+        'price_per_unit': f'{price:.2f}',
+        'total_price': f'{price * quantity:.2f}',
+        'quantity_offered': quantity,
+        'lead_time_days': rng.randint(7, 60),
+        'valid_until': (date.today() + timedelta(days=30)).isoformat(),
+        'notes': 'Load test quote',
+    }, expect=(201,))
+    await user.get('quote-list:list', '/api/v1/orders/quotes/')
+
+
+@scenario('forum', requires=('threads',))
+async def forum_reading(user):
+    """Anonymous reader: thread list (sometimes by category), a thread, its posts."""
+    rng, data = user.rng, user.dataset
+    user.logout()
+    if data.forum_categories and rng.random() < 0.4:
+        await user.get('forumthread-list:list', '/api/v1/community/forum-threads/', category__slug=rng.choice(data.forum_categories))
+    else:
+        await user.get('forumthread-list:list', '/api/v1/community/forum-threads/', page=rng.randint(1, min(5, data.thread_pages)))
+    slug = rng.choice(data.threads)
+    await user.get('forumthread-detail:retrieve', f'/api/v1/community/forum-threads/{slug}/')
+    if rng.random() < 0.5:
+        await user.get('forumthread-list-posts:list_posts', f'/api/v1/community/forum-threads/{slug}/posts/')
+
+
+def runnable_mix(mix, dataset):
+    """Drops scenarios whose data is missing. Returns (mix, {skipped scenario: missing data})."""
+    runnable, skipped = {}, {}
+    for name, weight in mix.items():
+        missing = [field for field in SCENARIOS[name].requires if not getattr(dataset, field)]
+        if missing:
+            skipped[name] = missing
+        elif weight > 0:
+            runnable[name] = weight
+    return runnable, skipped
+
+
+async def run_load_test(base_url, dataset, mix, concurrency=10, duration=30.0, think_time_ms=0, ramp_up=0.0, seed=42):
+    """
+    Runs `concurrency` virtual users for `duration` seconds (closed loop: each user starts its
+    next scenario as soon as the previous one finishes, plus optional think time). Users start
+    staggered over `ramp_up` seconds. Returns a LoadTestReport.
+    """
+    parsed = urlsplit(base_url)
+    host, port = parsed.hostname, parsed.port or 80
+    names, weights = list(mix), list(mix.values())
+    report, tokens = LoadTestReport(), {}
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    deadline = started + duration
+
+    async def virtual_user(number):
+        rng = random.Random(f'{seed}-{number}')
+        client = AsyncHTTPClient(host, port)
+        user = VirtualUser(client, dataset, report, rng, tokens, think_time_ms)
+        if ramp_up:
+            await asyncio.sleep(ramp_up * number / concurrency)
+        try:
+            while loop.time() < deadline:
+                name = rng.choices(names, weights)[0]
+                try:
+                    await SCENARIOS[name](user)
+                except ScenarioAborted:
+                    pass
+                report.scenarios[name] += 1
+        finally:
+            await client.close()
+
+    await asyncio.gather(*(virtual_user(number) for number in range(concurrency)))
+    report.duration = loop.time() - started
+    return report
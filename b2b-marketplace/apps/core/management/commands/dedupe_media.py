@@ -0,0 +1,64 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import storages
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.storage import ContentAddressedStorage, file_sha256
+
+
+class Command(BaseCommand):
+    help = (
+        'Converts an existing MEDIA_ROOT to content-addressed storage (apps.core.storage): hashes every '
+        'file in parallel and replaces duplicates with hard links to one blob per content, so each is '
+        'stored (and backed up) once. Safe to re-run, and to run while the site is up. --gc removes '
+        'blobs no file links to any more.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=min(8, (os.cpu_count() or 1) * 2),
+                            help='Files hashed and linked concurrently (hashing and file I/O release the GIL).')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what deduplicating would free.')
+        parser.add_argument('--gc', action='store_true', help='Also delete blobs nothing links to.')
+
+    def handle(self, *args, **options):
+        storage = storages['default']
+        if not isinstance(storage, ContentAddressedStorage):
+            raise CommandError('The default storage is not apps.core.storage.ContentAddressedStorage (set MEDIA_STORAGE_BACKEND).')
+
+        started = time.perf_counter()
+        paths = list(self._files(storage))
+        work = self._measure if options['dry_run'] else storage.deduplicate
+        with ThreadPoolExecutor(max_workers=max(options['workers'], 1)) as pool:
+            results = list(pool.map(work, paths))
+        if options['dry_run']: # (digest, size): everything but one copy of each content would go
+            sizes = dict(results)
+            freed = sum(size for _, size in results) - sum(sizes.values())
+        else: # (digest, bytes freed)
+            freed = sum(size for _, size in results)
+        self.stdout.write(self.style.SUCCESS(
+            f'{"Would free" if options["dry_run"] else "Freed"} {freed / 1024 / 1024:.1f} MiB ({freed} bytes): '
+            f'{len(paths)} file(s), {len({digest for digest, _ in results})} distinct, '
+            f'in {time.perf_counter() - started:.1f}s with {options["workers"]} worker(s).'
+        ))
+        if options['gc'] and not options['dry_run']:
+            blobs, freed_bytes = storage.collect_garbage()
+            self.stdout.write(self.style.SUCCESS(f'Removed {blobs} unreferenced blob(s), {freed_bytes / 1024 / 1024:.1f} MiB.'))
+
+    @staticmethod
+    def _files(storage):
+        """Regular files under MEDIA_ROOT not linked to a blob yet, skipping the blobs and upload chunks."""
+        root = storage.location
+        skip = {os.path.join(root, storage.blob_dir), os.path.normpath(os.path.join(root, settings.UPLOAD_PART_DIR))}
+        for directory, subdirectories, filenames in os.walk(root):
+            subdirectories[:] = [d for d in subdirectories if os.path.join(directory, d) not in skip]
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                if not os.path.islink(path) and os.stat(path).st_nlink == 1:
+                    yield path
+
+    @staticmethod
+    def _measure(path):
+        return file_sha256(path), os.path.getsize(path)
@@ -0,0 +1,171 @@
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.core.loadtest import DEFAULT_MIX, SCENARIOS, Dataset, compare_reports, run_load_test, runnable_mix
+
+
+class Command(BaseCommand):
+    help = (
+        'Replays realistic API traffic (catalog browsing, checkout, supplier quoting, forum reading) '
+        'against a locally started server and reports latency histograms and error rates per endpoint. '
+        'Runs fully offline against the synthetic dataset from `seed_data --users ... --rfqs ...`. '
+        'Use --output to save the results and --compare to diff them against a run from another commit.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='Target an already running server (e.g. http://127.0.0.1:8000) instead of starting one. It must use this database.')
+        parser.add_argument('--duration', type=float, default=30.0, help='Seconds to generate load for.')
+        parser.add_argument('--concurrency', type=int, default=10, help='Concurrent virtual users.')
+        parser.add_argument('--ramp-up', type=float, default=0.0, help='Seconds over which virtual users are started.')
+        parser.add_argument('--think-time', type=float, default=0.0, help='Mean pause (ms) after each request; 0 for maximum throughput.')
+        parser.add_argument(
+            '--mix', default=','.join(f'{name}={weight}' for name, weight in DEFAULT_MIX.items()),
+            help=f'Scenario weights, e.g. "browse=60,checkout=10". Scenarios: {", ".join(SCENARIOS)}.',
+        )
+        parser.add_argument('--prefix', default='seed-', help='Username prefix of the synthetic users to act as.')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for the virtual users.')
+        parser.add_argument('--output', help='Write the results as JSON to this path.')
+        parser.add_argument('--compare', help='Compare against a previous --output file.')
+        parser.add_argument('--tolerance', type=float, default=1.2, help='p95/throughput ratio beyond which --compare flags a regression.')
+        parser.add_argument('--fail-on-regression', action='store_true', help='Exit with an error if --compare finds regressions.')
+        parser.add_argument('--histograms', action='store_true', help='Print a latency histogram per endpoint.')
+
+    def handle(self, *args, **options):
+        mix = self._parse_mix(options['mix'])
+        dataset = Dataset.load(prefix=options['prefix'])
+        mix, skipped = runnable_mix(mix, dataset)
+        for name, missing in skipped.items():
+            self.stdout.write(self.style.WARNING(f'Skipping scenario "{name}": no {", ".join(missing)} in the dataset.'))
+        if not mix:
+            raise CommandError('Nothing to run. Generate data first, e.g. `seed_data --users 500 --materials 2000 --orders 2000 --threads 300 --rfqs 300`.')
+
+        with self._server(options['url']) as base_url:
+            self.stdout.write(
+                f'Running {", ".join(f"{name}={weight}" for name, weight in mix.items())} with '
+                f'{options["concurrency"]} virtual users for {options["duration"]:.0f}s against {base_url}...'
+            )
+            report = asyncio.run(run_load_test(
+                base_url, dataset, mix, concurrency=options['concurrency'], duration=options['duration'],
+                think_time_ms=options['think_time'], ramp_up=options['ramp_up'], seed=options['seed'],
+            ))
+
+        self._print_report(report, options['histograms'])
+        result = report.to_dict(
+            commit=self._git_commit(), started_at=timezone.now().isoformat(), mix=mix,
+            concurrency=options['concurrency'], think_time_ms=options['think_time'],
+        )
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(result, indent=2) + '\n')
+            self.stdout.write(f'Results written to {options["output"]}.')
+        if options['compare']:
+            try:
+                baseline = json.loads(Path(options['compare']).read_text())
+            except (OSError, ValueError) as exc:
+                raise CommandError(f'Cannot read {options["compare"]}: {exc}')
+            regressions = self._print_comparison(baseline, result, options['tolerance'])
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f'{regressions} endpoint(s) regressed against {options["compare"]}.')
+
+    def _parse_mix(self, value):
+        mix = {}
+        for part in filter(None, (part.strip() for part in value.split(','))):
+            name, _, weight = part.partition('=')
+            if name not in SCENARIOS:
+                raise CommandError(f'Unknown scenario "{name}". Choose from: {", ".join(SCENARIOS)}.')
+            try:
+                mix[name] = float(weight or 1)
+            except ValueError:
+                raise CommandError(f'Invalid weight in "{part}".')
+        return mix
+
+    @contextmanager
+    def _server(self, url):
+        if url:
+            yield url.rstrip('/')
+            return
+        with socket.socket() as probe: # Let the OS pick a free port
+            probe.bind(('127.0.0.1', 0))
+            port = probe.getsockname()[1]
+        log = tempfile.NamedTemporaryFile('w+', prefix='loadtest-server-', suffix='.log', delete=False)
+        process = subprocess.Popen(
+            [sys.executable, str(Path(settings.BASE_DIR) / 'manage.py'), 'runserver', '--noreload', f'127.0.0.1:{port}'],
+            stdout=log, stderr=subprocess.STDOUT, env={**os.environ, 'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE},
+        )
+        try:
+            deadline = time.monotonic() + 30
+            while True:
+                if process.poll() is not None:
+                    raise CommandError(f'The server exited during startup, see {log.name}.')
+                try:
+                    socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                    break
+                except OSError:
+                    if time.monotonic() > deadline:
+                        raise CommandError(f'The server did not start within 30s, see {log.name}.')
+                    time.sleep(0.2)
+            self.stdout.write(f'Started a local server on port {port} (log: {log.name}).')
+            yield f'http://127.0.0.1:{port}'
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+            log.close()
+
+    def _git_commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def _print_report(self, report, histograms):
+        self.stdout.write(self.style.SUCCESS(
+            f'\n{report.total_requests} requests in {report.duration:.1f}s '
+            f'({report.total_requests / report.duration:.1f} req/s), {report.total_errors} errors. '
+            f'Scenarios: {", ".join(f"{name}={count}" for name, count in report.scenarios.most_common())}'
+        ))
+        header = f'{"endpoint":<45} {"reqs":>7} {"err%":>6} {"req/s":>7} {"p50":>8} {"p90":>8} {"p95":>8} {"p99":>8} {"max":>8}'
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for row in report.rows():
+            line = (
+                f'{row["endpoint"]:<45} {row["requests"]:>7} {row["error_rate"] * 100:>5.1f}% {row["rps"]:>7.1f} '
+                f'{row["p50_ms"]:>8.1f} {row["p90_ms"]:>8.1f} {row["p95_ms"]:>8.1f} {row["p99_ms"]:>8.1f} {row["max_ms"]:>8.1f}'
+            )
+            self.stdout.write(self.style.ERROR(line) if row['errors'] else line)
+            stats = report.endpoints[row['endpoint']]
+            if stats.errors:
+                self.stdout.write(f'    errors: {", ".join(f"{kind} x{count}" for kind, count in stats.errors.most_common())}')
+            if histograms:
+                coarse = stats.histogram.coarse()
+                widest = max(count for _, count in coarse)
+                for label, count in coarse:
+                    self.stdout.write(f'    {label:>9} {count:>7} {"#" * max(1, round(40 * count / widest))}')
+        self.stdout.write('(latencies in ms)')
+
+    def _print_comparison(self, baseline, result, tolerance):
+        rows = compare_reports(baseline, result, tolerance)
+        self.stdout.write(f'\nCompared with {baseline.get("commit") or "baseline"} ({baseline.get("started_at", "?")}):')
+        self.stdout.write(f'{"endpoint":<45} {"p50 before/after":>20} {"p95 before/after":>20} {"req/s before/after":>20}')
+        for row in rows:
+            line = (
+                f'{row["endpoint"]:<45} {"%.1f / %.1f" % row["p50_ms"]:>20} {"%.1f / %.1f" % row["p95_ms"]:>20} '
+                f'{"%.1f / %.1f" % row["rps"]:>20}'
+            )
+            self.stdout.write(self.style.ERROR(f'{line}  REGRESSED') if row['regressed'] else line)
+        return sum(1 for row in rows if row['regressed'])
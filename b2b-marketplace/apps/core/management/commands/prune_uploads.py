@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.core.uploads import ChunkedUploadService
+
+
+class Command(BaseCommand):
+    help = 'Discards resumable upload sessions past their expiry (UPLOAD_SESSION_TTL) and the chunks they received. Run it periodically, e.g. hourly.'
+
+    def handle(self, *args, **options):
+        pruned = ChunkedUploadService().prune()
+        self.stdout.write(self.style.SUCCESS(f'Discarded {pruned} expired upload session(s).'))
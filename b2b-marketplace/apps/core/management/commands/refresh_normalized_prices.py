@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from apps.core.currency import get_base_currency, refresh_normalized_prices
+
+
+class Command(BaseCommand):
+    help = 'Recomputes base-currency price columns (e.g. Material.price_per_unit_base) from the ExchangeRate table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--currency', action='append', dest='currencies',
+            help='Only refresh listings priced in this currency. Can be repeated. Default: all currencies.',
+        )
+
+    def handle(self, *args, **options):
+        updated = refresh_normalized_prices(options['currencies'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Refreshed {updated} normalized price(s) in base currency {get_base_currency()}.'
+        ))
@@ -1,42 +1,141 @@
+import random
+import time
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
 from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
 from django.utils import timezone
-from django.contrib.auth import get_user_model
-# Import models from your apps that you want to seed
-# from apps.accounts.models import Profile
-# from apps.listings.models import Category, Material, Design
-# from apps.payments_monetization.models import SubscriptionPlan
+from django.utils.text import slugify
 
 User = get_user_model()
 
+SEED_PREFIX = 'seed-' # Username/slug prefix of generated rows, so --clear only removes synthetic data
+
+# Share of generated users per type
+USER_TYPE_WEIGHTS = [('buyer', 70), ('seller', 18), ('manufacturer', 7), ('designer', 5)]
+ORDER_STATUS_WEIGHTS = [
+    ('completed', 40), ('delivered', 20), ('shipped', 10), ('processing', 10), ('pending_payment', 8),
+    ('cancelled_by_buyer', 4), ('cancelled_by_seller', 3), ('refunded', 3), ('disputed', 2),
+]
+RFQ_STATUS_WEIGHTS = [('open', 80), ('closed', 10), ('awarded', 7), ('cancelled', 3)]
+RATING_WEIGHTS = [(5, 45), (4, 30), (3, 12), (2, 6), (1, 7)]
+
+CATEGORIES = {
+    'Fabrics': ['Cotton', 'Linen', 'Wool', 'Silk', 'Denim'],
+    'Trims': ['Buttons', 'Zippers', 'Labels'],
+    'Accessories': ['Buckles', 'Straps'],
+    'Sustainable Materials': ['Recycled Polyester', 'Organic Cotton', 'Hemp'],
+    'Tech Textiles': ['Waterproof Membranes', 'Conductive Yarns'],
+}
+TAGS = ['organic', 'recycled', 'gots-certified', 'oeko-tex', 'stretch', 'heavyweight', 'lightweight', 'vegan', 'fire-retardant', 'low-moq']
+SUBSCRIPTION_PLANS = [
+    {'name': 'Basic', 'price': Decimal('0.00'), 'interval': 'month', 'features': {'listings_limit': 5}, 'stripe_plan_id': 'price_basic_000', 'display_order': 1},
+    {'name': 'Pro', 'price': Decimal('29.99'), 'interval': 'month', 'features': {'listings_limit': 50, 'priority_support': True}, 'stripe_plan_id': 'price_pro_123', 'display_order': 2},
+    {'name': 'Enterprise', 'price': Decimal('99.99'), 'interval': 'month', 'features': {'listings_limit': 'unlimited', 'analytics_access': 'full'}, 'stripe_plan_id': 'price_ent_456', 'display_order': 3},
+]
+FORUM_CATEGORIES = ['Sourcing', 'Manufacturing', 'Sustainability', 'Logistics', 'Marketplace Help']
+
+ADJECTIVES = ['Organic', 'Brushed', 'Stretch', 'Recycled', 'Heavy', 'Washed', 'Slub', 'Peached', 'Ripstop', 'Twill']
+MATERIAL_NOUNS = ['Cotton Poplin', 'Linen Canvas', 'Wool Flannel', 'Silk Satin', 'Denim', 'Jersey', 'Fleece', 'Corduroy', 'Chambray', 'Gabardine']
+COUNTRIES = ['Portugal', 'Italy', 'Turkey', 'India', 'China', 'Vietnam', 'Bangladesh', 'Peru', 'Japan', 'USA']
+REVIEW_COMMENTS = [
+    'Colour matched the swatch and the hand feel is great.',
+    'Shipped on time, consistent quality across rolls.',
+    'Slight shade variation between batches, otherwise fine.',
+    'Shrinkage was higher than the spec sheet says.',
+    'Excellent communication with the seller, will reorder.',
+    'MOQ was flexible and samples arrived quickly.',
+    'Quality dropped on the second order.',
+    'Good value for the price, packaging could be better.',
+]
+THREAD_TOPICS = ['Looking for', 'Best supplier for', 'Lead times on', 'Certification question about', 'Pricing for']
+
+
 class Command(BaseCommand):
-    help = 'Seeds the database with initial data for development or testing.'
+    help = (
+        'Seeds the database with demo accounts, categories and plans, plus an optional seeded random '
+        'synthetic dataset (--users/--materials/--orders/--reviews/--threads/--rfqs) for load testing. '
+        'Rows are inserted with bulk_create in chunks (no per-row signals); profiles, rating aggregates '
+        'and seller reputation are backfilled in bulk afterwards.'
+    )
 
     def add_arguments(self, parser):
         parser.add_argument(
             '--clear',
             action='store_true',
-            help='Clear existing data before seeding (use with caution!).',
+            help=f'Delete previously generated synthetic data (users prefixed "{SEED_PREFIX}" and everything they own) first.',
         )
-        # Add more arguments if needed, e.g., --users=10 to specify number of users to create
+        parser.add_argument('--users', type=int, default=0, help='Synthetic users (buyers, sellers, manufacturers, designers).')
+        parser.add_argument('--materials', type=int, default=0, help='Synthetic materials, spread over sellers/manufacturers.')
+        parser.add_argument('--orders', type=int, default=0, help='Synthetic orders (1-4 items each) placed by buyers.')
+        parser.add_argument('--reviews', type=int, default=0, help='Synthetic material reviews, mostly by buyers who ordered them.')
+        parser.add_argument('--threads', type=int, default=0, help='Synthetic forum threads (1-8 posts each).')
+        parser.add_argument('--rfqs', type=int, default=0, help='Synthetic RFQs from buyers, mostly open for quotes.')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed; the same seed and sizes give the same names, prices and choices (not the same integer ids).')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk_create/transaction.')
 
     def handle(self, *args, **options):
         self.stdout.write(self.style.SUCCESS('Starting data seeding process...'))
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
 
         if options['clear']:
-            self.stdout.write(self.style.WARNING('Clearing existing data...'))
-            # Add logic to clear specific models if needed. Be very careful with this.
-            # Example: Category.objects.all().delete()
-            # User.objects.filter(is_superuser=False).delete() # Don't delete superuser
-            self.stdout.write(self.style.WARNING('Data clearing placeholder. Implement carefully.'))
-
+            self._clear_synthetic_data()
 
         self._create_users()
         self._create_subscription_plans()
         self._create_listing_categories()
-        # Add calls to other seeding methods
+
+        if any(options[size] for size in ('users', 'materials', 'orders', 'reviews', 'threads', 'rfqs')):
+            if User.objects.filter(username__startswith=SEED_PREFIX).exists():
+                raise CommandError('Synthetic data already exists. Re-run with --clear to regenerate it.')
+            started = time.monotonic()
+            self._generate(options)
+            self.stdout.write(self.style.SUCCESS(f'Synthetic dataset generated in {time.monotonic() - started:.1f}s.'))
 
         self.stdout.write(self.style.SUCCESS('Successfully seeded data.'))
 
+    def _clear_synthetic_data(self):
+        from apps.community_engagement.models import ForumCategory, ForumThread, ForumPost
+        from apps.listings.models import Material, Design
+        from apps.orders.models import Order, OrderItem
+        from apps.reviews_ratings.models import Review, ReviewReply, ReviewHelpfulVote
+
+        self.stdout.write(self.style.WARNING('Clearing previously generated synthetic data...'))
+        started = time.monotonic()
+        seed_users = User.objects.filter(username__startswith=SEED_PREFIX)
+        seed_reviews = Review.objects.filter(author__in=seed_users)
+        with transaction.atomic():
+            # Children first, so each delete() is a single statement instead of the ORM collecting
+            # millions of related rows. Orders are SET_NULL on user deletion, so they go explicitly.
+            ReviewReply.objects.filter(review__in=seed_reviews).delete()
+            ReviewHelpfulVote.objects.filter(review__in=seed_reviews).delete()
+            # Review has delete signals (rating deltas, reputation) that would run per row; the
+            # aggregates are rebuilt in one pass below instead
+            seed_reviews._raw_delete(seed_reviews.db)
+            # Also matched through seed materials, which catches orders whose buyer is already gone
+            seed_orders = list(Order.objects.filter(
+                Q(buyer__in=seed_users) | Q(items__material__slug__startswith=SEED_PREFIX)
+            ).values_list('pk', flat=True).distinct())
+            for start in range(0, len(seed_orders), self.batch_size):
+                chunk = seed_orders[start:start + self.batch_size]
+                OrderItem.objects.filter(order__in=chunk).delete()
+                Order.objects.filter(pk__in=chunk).delete()
+            ForumPost.objects.filter(thread__slug__startswith=SEED_PREFIX).delete()
+            ForumThread.objects.filter(slug__startswith=SEED_PREFIX).delete()
+            Material.tags.through.objects.filter(material__slug__startswith=SEED_PREFIX).delete()
+            Material.objects.filter(slug__startswith=SEED_PREFIX).delete()
+            Design.objects.filter(designer__in=seed_users).delete()
+            deleted, _ = seed_users.delete()
+            ForumCategory.objects.filter(slug__startswith=SEED_PREFIX).delete()
+        self._backfill({}, reviews=True)
+        self.stdout.write(self.style.WARNING(f'Deleted synthetic data ({deleted} rows with the users) in {time.monotonic() - started:.1f}s.'))
+
     def _create_users(self):
         self.stdout.write('Creating sample users...')
         # Create a superuser if one doesn't exist
@@ -62,46 +161,297 @@ class Command(BaseCommand):
                     first_name=data.get('first_name', ''),
                     last_name=data.get('last_name', '')
                 )
-                # Profile is created via signal, but you can update it here
-                # if hasattr(user, 'profile'):
-                #     user.profile.company_name = f"{data['first_name']}'s Company"
-                #     user.profile.save()
+                # Profile is created via signal
                 self.stdout.write(f'User "{user.username}" created.')
             else:
                 self.stdout.write(f'User "{data["username"]}" already exists.')
 
-
     def _create_subscription_plans(self):
-        # from apps.payments_monetization.models import SubscriptionPlan # Local import
-        # self.stdout.write('Creating subscription plans...')
-        # plans_data = [
-        #     {'name': 'Basic', 'price': 0.00, 'interval': 'month', 'features': {"listings_limit": 5}, 'stripe_plan_id': 'price_basic_000'},
-        #     {'name': 'Pro', 'price': 29.99, 'interval': 'month', 'features': {"listings_limit": 50, "priority_support": True}, 'stripe_plan_id': 'price_pro_123'},
-        #     {'name': 'Enterprise', 'price': 99.99, 'interval': 'month', 'features': {"listings_limit": "unlimited", "analytics_access": "full"}, 'stripe_plan_id': 'price_ent_456'},
-        # ]
-        # for data in plans_data:
-        #     plan, created = SubscriptionPlan.objects.get_or_create(
-        #         name=data['name'],
-        #         defaults=data
-        #     )
-        #     if created:
-        #         self.stdout.write(f'Subscription plan "{plan.name}" created.')
-        #     else:
-        #         self.stdout.write(f'Subscription plan "{plan.name}" already exists.')
-        self.stdout.write(self.style.NOTICE('Subscription plan seeding placeholder.'))
-
+        from apps.payments_monetization.models import SubscriptionPlan # Local import
+        self.stdout.write('Creating subscription plans...')
+        for data in SUBSCRIPTION_PLANS:
+            plan, created = SubscriptionPlan.objects.get_or_create(name=data['name'], defaults=data)
+            if created:
+                self.stdout.write(f'Subscription plan "{plan.name}" created.')
+            else:
+                self.stdout.write(f'Subscription plan "{plan.name}" already exists.')
 
     def _create_listing_categories(self):
-        # from apps.listings.models import Category # Local import
-        # self.stdout.write('Creating listing categories...')
-        # categories = ['Fabrics', 'Trims', 'Accessories', 'Sustainable Materials', 'Tech Textiles']
-        # for cat_name in categories:
-        #     category, created = Category.objects.get_or_create(name=cat_name)
-        #     if created:
-        #         self.stdout.write(f'Category "{category.name}" created.')
-        #     else:
-        #         self.stdout.write(f'Category "{category.name}" already exists.')
-        self.stdout.write(self.style.NOTICE('Listing category seeding placeholder.'))
-
-    # Add more methods like _create_materials, _create_designs, etc.
-    # Remember to use get_or_create to avoid duplicates if the command is run multiple times.
\ No newline at end of file
+        from apps.listings.models import Category, Tag # Local import
+        self.stdout.write('Creating listing categories and tags...')
+        for parent_name, children in CATEGORIES.items():
+            parent, _ = Category.objects.get_or_create(name=parent_name)
+            for child_name in children:
+                Category.objects.get_or_create(name=child_name, defaults={'parent_category': parent})
+        for tag_name in TAGS:
+            Tag.objects.get_or_create(name=tag_name)
+
+    # --- Synthetic dataset ---
+
+    def _generate(self, options):
+        self.password_hash = make_password('password123') # Hashing once; PBKDF2 per user would dominate the run
+        users = self._generate_users(options['users'])
+        materials = self._generate_materials(options['materials'], users)
+        verified = self._generate_orders(options['orders'], users, materials, review_sample=options['reviews'])
+        self._generate_reviews(options['reviews'], users, materials, verified)
+        self._generate_threads(options['threads'], users)
+        self._generate_rfqs(options['rfqs'], users)
+        self._backfill(users, reviews=options['reviews'])
+
+    def _weighted(self, weights):
+        return self.rng.choices([value for value, _ in weights], [weight for _, weight in weights])[0]
+
+    def _uuid(self):
+        return uuid.UUID(int=self.rng.getrandbits(128), version=4) # Deterministic, unlike uuid4()
+
+    def _bulk_insert(self, model, rows, label, child_model=None, child_label=None):
+        """
+        bulk_create()s an iterable of unsaved instances in chunks, one transaction per chunk. With
+        `child_model`, `rows` yields (instance, [children]) and each chunk's children are inserted
+        right after it, so neither is ever held in full.
+        """
+        started, total, child_total, batch, children = time.monotonic(), 0, 0, [], []
+        for row in rows:
+            if child_model is not None:
+                row, row_children = row
+                children.extend(row_children)
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                total, child_total = total + len(batch), child_total + self._flush(model, batch, child_model, children)
+                batch, children = [], []
+        if batch:
+            total, child_total = total + len(batch), child_total + self._flush(model, batch, child_model, children)
+        children_note = f' ({child_total} {child_label})' if child_model is not None else ''
+        self.stdout.write(f'  {label}: {total}{children_note} in {time.monotonic() - started:.1f}s')
+        return total
+
+    def _flush(self, model, batch, child_model=None, children=()):
+        """Inserts `batch` and then its `children`, in one transaction. Returns how many children."""
+        with transaction.atomic():
+            model.objects.bulk_create(batch, batch_size=self.batch_size)
+            if children:
+                child_model.objects.bulk_create(children, batch_size=self.batch_size)
+        return len(children)
+
+    def _generate_users(self, count):
+        from apps.accounts.services import AccountService
+
+        self.stdout.write(f'Generating {count} users...')
+
+        def rows():
+            for n in range(count):
+                user_type = self._weighted(USER_TYPE_WEIGHTS)
+                username = f'{SEED_PREFIX}{user_type}-{n}'
+                yield User(
+                    username=username, email=f'{username}@example.com', password=self.password_hash,
+                    user_type=user_type, first_name=user_type.title(), last_name=str(n),
+                )
+
+        self._bulk_insert(User, rows(), 'users')
+        users = {user_type: [] for user_type, _ in USER_TYPE_WEIGHTS}
+        for user_id, user_type in User.objects.filter(username__startswith=SEED_PREFIX).order_by('pk').values_list('pk', 'user_type'):
+            users[user_type].append(user_id)
+
+        # Profiles in bulk too; the post_save signal that creates them doesn't run for bulk_create
+        user_types = {user_id: user_type for user_type, user_ids in users.items() for user_id in user_ids}
+        started = time.monotonic()
+        created = AccountService().create_missing_profiles(
+            list(user_types), batch_size=self.batch_size,
+            profile_fields=lambda user_id: {
+                'company_name': f'{user_types[user_id].title()} Co {user_id}' if user_types[user_id] != 'buyer' else None,
+                'country': self.rng.choice(COUNTRIES),
+                'seller_verified': user_types[user_id] != 'buyer' and self.rng.random() < 0.3,
+            },
+        )
+        self.stdout.write(f'  profiles: {created} in {time.monotonic() - started:.1f}s')
+        return users
+
+    def _generate_materials(self, count, users):
+        from apps.core.currency import get_base_currency, get_rates, to_base
+        from apps.listings.models import Category, Tag, Material
+
+        supplier_ids = users['seller'] + users['manufacturer']
+        if count and not supplier_ids:
+            raise CommandError('--materials needs --users large enough to include sellers or manufacturers.')
+        self.stdout.write(f'Generating {count} materials...')
+        category_ids = list(Category.objects.filter(parent_category__isnull=False).order_by('pk').values_list('pk', flat=True))
+        base_currency = get_base_currency()
+        other_currencies = sorted(currency for currency in get_rates() if currency != base_currency)
+
+        def rows():
+            for n in range(count):
+                currency = self.rng.choice(other_currencies) if other_currencies and self.rng.random() < 0.2 else base_currency
+                price = Decimal(self.rng.randint(150, 4500)) / 100
+                name = f'{self.rng.choice(ADJECTIVES)} {self.rng.choice(MATERIAL_NOUNS)} {n}'
+                yield Material(
+                    name=name, slug=f'{SEED_PREFIX}{slugify(name)}', description=f'{name}, sold by the meter.',
+                    seller_id=self.rng.choice(supplier_ids), category_id=self.rng.choice(category_ids),
+                    price_per_unit=price, currency=currency, price_per_unit_base=to_base(price, currency), # Material.save() does this per row
+                    stock_quantity=self.rng.randint(0, 5000), minimum_order_quantity=self.rng.choice([1, 10, 50, 100]),
+                    country_of_origin=self.rng.choice(COUNTRIES), weight_gsm=self.rng.randint(80, 450),
+                )
+
+        self._bulk_insert(Material, rows(), 'materials')
+        materials = list(
+            Material.objects.filter(slug__startswith=SEED_PREFIX).order_by('pk').values_list('pk', 'seller_id', 'price_per_unit_base')
+        )
+
+        # Two tags per material through the M2M table directly
+        tag_ids = list(Tag.objects.order_by('pk').values_list('pk', flat=True))
+        if tag_ids:
+            MaterialTag = Material.tags.through
+            self._bulk_insert(MaterialTag, (
+                MaterialTag(material_id=material_id, tag_id=tag_id)
+                for material_id, _, _ in materials
+                for tag_id in self.rng.sample(tag_ids, min(2, len(tag_ids)))
+            ), 'material tags')
+        return materials
+
+    def _generate_orders(self, count, users, materials, review_sample=0):
+        """
+        Orders mix materials priced in several currencies, so they are placed in the base currency at
+        base prices. Returns up to `review_sample` distinct (buyer_id, material_id) pairs bought, a
+        reservoir sample of the order items, so reviews can come from actual customers without every
+        purchase being kept.
+        """
+        from apps.core.currency import get_base_currency
+        from apps.orders.models import Order, OrderItem
+
+        if count and (not users['buyer'] or not materials):
+            raise CommandError('--orders needs buyers and materials (raise --users/--materials).')
+        self.stdout.write(f'Generating {count} orders...')
+        base_currency = get_base_currency()
+        sample, sampled, seen = [], set(), 0
+
+        def keep_for_reviews(pair):
+            nonlocal seen
+            if not review_sample:
+                return
+            seen += 1
+            slot = len(sample) if len(sample) < review_sample else self.rng.randrange(seen)
+            if slot < review_sample and pair not in sampled:
+                if slot == len(sample):
+                    sample.append(pair)
+                else:
+                    sampled.discard(sample[slot])
+                    sample[slot] = pair
+                sampled.add(pair)
+
+        def order_rows():
+            for _ in range(count):
+                order_id, buyer_id = self._uuid(), self.rng.choice(users['buyer'])
+                total, items = Decimal('0.00'), []
+                for material_id, seller_id, price in self.rng.sample(materials, min(self.rng.randint(1, 4), len(materials))):
+                    quantity = self.rng.randint(1, 200)
+                    total += price * quantity
+                    items.append(OrderItem(order_id=order_id, material_id=material_id, seller_id=seller_id, quantity=quantity, unit_price=price))
+                    keep_for_reviews((buyer_id, material_id))
+                yield Order(
+                    id=order_id, buyer_id=buyer_id, order_total=total, currency=base_currency, status=self._weighted(ORDER_STATUS_WEIGHTS),
+                ), items
+
+        self._bulk_insert(Order, order_rows(), 'orders', child_model=OrderItem, child_label='order items')
+        return sample
+
+    def _generate_reviews(self, count, users, materials, verified):
+        from apps.reviews_ratings.models import Review
+        from apps.reviews_ratings.moderation import text_hash
+        from apps.reviews_ratings.registry import get_reviewable
+
+        if count and (not users['buyer'] or not materials):
+            raise CommandError('--reviews needs buyers and materials (raise --users/--materials).')
+        self.stdout.write(f'Generating {count} reviews...')
+        content_type_id = get_reviewable('material').content_type.id
+        # (author, material) pairs are unique; verified buyers first (the orders' sample), then random buyers
+        pairs = list(verified)
+        self.rng.shuffle(pairs)
+        seen = set(pairs)
+        attempts = 0
+        capacity = len(users['buyer']) * len(materials)
+        while len(pairs) < min(count, capacity) and attempts < count * 10:
+            attempts += 1
+            pair = (self.rng.choice(users['buyer']), self.rng.choice(materials)[0])
+            if pair not in seen:
+                seen.add(pair)
+                pairs.append(pair)
+
+        def rows():
+            for author_id, material_id in pairs:
+                comment = self.rng.choice(REVIEW_COMMENTS)
+                yield Review(
+                    author_id=author_id, rating=self._weighted(RATING_WEIGHTS), title=comment.split(',')[0][:200], comment=comment,
+                    content_type_id=content_type_id, object_id_str=str(material_id), reviewed_material_id=material_id,
+                    text_hash=text_hash(comment), helpful_count=self.rng.randint(0, 20),
+                )
+
+        self._bulk_insert(Review, rows(), 'reviews')
+
+    def _generate_threads(self, count, users):
+        from apps.community_engagement.models import ForumCategory, ForumThread, ForumPost
+
+        all_user_ids = [user_id for user_ids in users.values() for user_id in user_ids]
+        if count and not all_user_ids:
+            raise CommandError('--threads needs --users.')
+        self.stdout.write(f'Generating {count} forum threads...')
+        category_ids = [
+            ForumCategory.objects.get_or_create(name=name, defaults={'slug': f'{SEED_PREFIX}{slugify(name)}'})[0].pk
+            for name in FORUM_CATEGORIES
+        ]
+
+        def thread_rows():
+            for n in range(count):
+                thread_id, author_id = self._uuid(), self.rng.choice(all_user_ids)
+                title = f'{self.rng.choice(THREAD_TOPICS)} {self.rng.choice(MATERIAL_NOUNS).lower()}?'
+                posts = []
+                for position in range(self.rng.randint(1, 8)):
+                    poster_id = author_id if position == 0 else self.rng.choice(all_user_ids) # Thread author writes the first post
+                    posts.append(ForumPost(id=self._uuid(), thread_id=thread_id, author_id=poster_id, content=self.rng.choice(REVIEW_COMMENTS)))
+                yield ForumThread(
+                    id=thread_id, category_id=self.rng.choice(category_ids), author_id=author_id,
+                    title=title, slug=f'{SEED_PREFIX}thread-{n}', views_count=self.rng.randint(0, 5000),
+                    is_pinned=self.rng.random() < 0.01,
+                ), posts
+
+        self._bulk_insert(ForumThread, thread_rows(), 'threads', child_model=ForumPost, child_label='forum posts')
+
+    def _generate_rfqs(self, count, users):
+        from apps.orders.models import RFQ
+
+        if count and not users['buyer']:
+            raise CommandError('--rfqs needs --users large enough to include buyers.')
+        self.stdout.write(f'Generating {count} RFQs...')
+        now = timezone.now()
+
+        def rows():
+            for _ in range(count):
+                noun = self.rng.choice(MATERIAL_NOUNS)
+                quantity = self.rng.choice([100, 250, 500, 1000, 5000])
+                yield RFQ(
+                    id=self._uuid(), buyer_id=self.rng.choice(users['buyer']),
+                    title=f'{quantity}m {self.rng.choice(ADJECTIVES).lower()} {noun.lower()}',
+                    description=f'Looking for {noun.lower()} from {self.rng.choice(COUNTRIES)}, samples first.',
+                    quantity_required=quantity, unit_of_measurement='meter',
+                    deadline_for_quotes=now + timedelta(days=self.rng.randint(3, 60)),
+                    status=self._weighted(RFQ_STATUS_WEIGHTS),
+                )
+
+        self._bulk_insert(RFQ, rows(), 'rfqs')
+
+    def _backfill(self, users, reviews):
+        """Denormalized data that per-row signals would have maintained."""
+        from apps.accounts.reputation import ReputationService, SELLER_USER_TYPES
+        from apps.reviews_ratings.registry import get_reviewable
+        from apps.reviews_ratings.services import RatingAggregationService
+
+        if reviews:
+            started = time.monotonic()
+            rated = RatingAggregationService().recompute(get_reviewable('material').content_type.id)
+            self.stdout.write(f'  rating aggregates: {rated} materials in {time.monotonic() - started:.1f}s')
+
+        seller_ids = [user_id for user_type in SELLER_USER_TYPES for user_id in users.get(user_type, [])]
+        if seller_ids:
+            started = time.monotonic()
+            service = ReputationService()
+            for start in range(0, len(seller_ids), 500):
+                service.recompute_sellers(seller_ids[start:start + 500])
+            self.stdout.write(f'  seller reputation: {len(seller_ids)} sellers in {time.monotonic() - started:.1f}s')
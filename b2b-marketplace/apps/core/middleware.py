@@ -0,0 +1,53 @@
+# apps/core/middleware.py
+import random
+
+from django.conf import settings
+
+from .instrumentation import (
+    QueryBudgetExceeded, RequestMetrics, endpoint_key, metrics_store, view_query_budget,
+)
+
+
+class RequestInstrumentationMiddleware:
+    """
+    Records SQL query count/time, duplicate queries, serializer time and response size for each
+    request (see core/instrumentation.py). Enabled by REQUEST_INSTRUMENTATION, for the fraction of
+    requests given by REQUEST_INSTRUMENTATION_SAMPLE_RATE (all of them while QUERY_BUDGET_ENFORCE is
+    on); with DEBUG on the numbers are also returned as X-Query-Count / X-SQL-Time-Ms headers.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'REQUEST_INSTRUMENTATION', False):
+            return self.get_response(request)
+        enforce_budgets = getattr(settings, 'QUERY_BUDGET_ENFORCE', False)
+        if not enforce_budgets and random.random() >= getattr(settings, 'REQUEST_INSTRUMENTATION_SAMPLE_RATE', 1.0):
+            return self.get_response(request)
+
+        with RequestMetrics() as metrics:
+            response = self.get_response(request)
+        if getattr(response, 'streaming', False):
+            response_size = 0 # Not known without consuming the stream
+        else:
+            response_size = len(response.content)
+
+        key = endpoint_key(request)
+        metrics_store.record(key, metrics, response_size, response.status_code)
+
+        if settings.DEBUG:
+            response['X-Query-Count'] = str(metrics.query_count)
+            response['X-SQL-Time-Ms'] = f'{metrics.sql_time * 1000:.1f}'
+
+        if enforce_budgets:
+            budget = view_query_budget(request)
+            if budget is not None and metrics.query_count > budget:
+                duplicates = ''.join(
+                    f'\n  {count}x {sql}' for sql, count in sorted(metrics.duplicate_queries.items(), key=lambda item: -item[1])
+                )
+                raise QueryBudgetExceeded(
+                    f'{request.method} {request.path} ({key}) ran {metrics.query_count} queries, '
+                    f'budget is {budget}.' + (f' Repeated queries:{duplicates}' if duplicates else '')
+                )
+        return response
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExchangeRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('currency', models.CharField(help_text='ISO 4217 code, e.g., EUR', max_length=3, unique=True)),
+                ('rate_to_base', models.DecimalField(decimal_places=8, help_text='Units of base currency per 1 unit of this currency', max_digits=18)),
+                ('source', models.CharField(blank=True, help_text='e.g., ECB, manual', max_length=100, null=True)),
+            ],
+            options={
+                'ordering': ['currency'],
+            },
+        ),
+    ]
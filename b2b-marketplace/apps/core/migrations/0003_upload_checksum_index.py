@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_upload_sessions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='uploadsession',
+            index=models.Index(fields=['user', 'checksum'], name='upload_user_checksum_idx'),
+        ),
+    ]
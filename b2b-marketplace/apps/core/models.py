@@ -1,4 +1,5 @@
 import uuid
+from django.conf import settings
 from django.db import models
 
 class AbstractBaseModel(models.Model):
@@ -52,6 +53,82 @@ class SlugMixin(models.Model):
             self.slug = self._generate_unique_slug()
         super().save(*args, **kwargs)
 
+class ExchangeRate(AbstractBaseModel):
+    """
+    Conversion rate from `currency` into settings.BASE_CURRENCY.
+    Saving a rate refreshes every normalized price column for that currency in bulk
+    (see apps.core.currency.refresh_normalized_prices).
+    """
+    currency = models.CharField(max_length=3, unique=True, help_text="ISO 4217 code, e.g., EUR")
+    rate_to_base = models.DecimalField(max_digits=18, decimal_places=8, help_text="Units of base currency per 1 unit of this currency")
+    source = models.CharField(max_length=100, blank=True, null=True, help_text="e.g., ECB, manual")
+
+    class Meta:
+        ordering = ['currency']
+
+    def __str__(self):
+        return f"1 {self.currency} = {self.rate_to_base} (base)"
+
+    def save(self, *args, **kwargs):
+        self.currency = self.currency.upper()
+        super().save(*args, **kwargs)
+
+
+class UploadSession(AbstractBaseModel):
+    """
+    A resumable chunked upload of one file for an upload target (apps.core.uploads): the client
+    declares the file, PUTs its chunks in any order (or in parallel, or again after a dropped
+    connection) and completes the session, which attaches the assembled file to the target model.
+    """
+    STATUS_CHOICES = (
+        ('pending', 'Receiving chunks'),
+        ('assembling', 'Assembling'),
+        ('complete', 'Complete'),
+    )
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='upload_sessions')
+    target = models.CharField(max_length=50, help_text="Upload target name, e.g., project_file")
+    target_id = models.CharField(max_length=64, help_text="Id of the parent (new objects) or of the object the file is for")
+    fields = models.JSONField(default=dict, blank=True, help_text="Other fields of a new object, e.g., description")
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    chunk_size = models.PositiveIntegerField()
+    checksum = models.CharField(max_length=64, blank=True, help_text="SHA-256 of the whole file (hex), checked on completion")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    expires_at = models.DateTimeField(db_index=True)
+    result_id = models.CharField(max_length=64, blank=True, null=True, help_text="Id of the object the file was attached to")
+
+    class Meta(AbstractBaseModel.Meta):
+        indexes = [models.Index(fields=['user', 'checksum'], name='upload_user_checksum_idx')] # Re-uploads, see uploads.py
+
+    def __str__(self):
+        return f"Upload {self.filename} ({self.target}, {self.status})"
+
+    @property
+    def chunk_count(self):
+        return -(-self.size // self.chunk_size)
+
+    def chunk_length(self, index):
+        """Bytes expected in chunk `index`: chunk_size, except for the last chunk."""
+        return min(self.chunk_size, self.size - index * self.chunk_size)
+
+
+class UploadChunk(models.Model):
+    """A received chunk of an UploadSession, stored as its own file until the session completes."""
+    session = models.ForeignKey(UploadSession, on_delete=models.CASCADE, related_name='chunks')
+    index = models.PositiveIntegerField() # Byte offset / session.chunk_size
+    size = models.PositiveIntegerField()
+    sha256 = models.CharField(max_length=64)
+    path = models.CharField(max_length=255) # Name in default_storage
+
+    class Meta:
+        ordering = ['session', 'index']
+        constraints = [models.UniqueConstraint(fields=['session', 'index'], name='unique_upload_chunk')]
+
+    def __str__(self):
+        return f"Chunk {self.index} of upload {self.session_id}"
+
+
 # You can add other base models or mixins here, for example:
 # - SoftDeleteMixin
 # - SeoTagsMixin
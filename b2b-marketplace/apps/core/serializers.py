@@ -0,0 +1,85 @@
+# apps/core/serializers.py
+from django.conf import settings
+from django.urls import reverse
+from rest_framework import serializers
+
+from .downloads import get_download_target
+from .models import UploadSession
+from .uploads import get_upload_target, upload_target_names
+
+
+class DownloadURLField(serializers.Field):
+    """
+    Read-only URL of a private file: the authorized download endpoint (apps.core.downloads) for the
+    `kind` registered there, never its MEDIA_URL. None when the object has no file.
+    """
+
+    def __init__(self, kind, **kwargs):
+        self.kind = kind
+        kwargs.update(source='*', read_only=True)
+        super().__init__(**kwargs)
+
+    def to_representation(self, obj):
+        if not getattr(obj, get_download_target(self.kind).file_field):
+            return None
+        url = reverse('download', kwargs={'kind': self.kind, 'pk': obj.pk})
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    """A resumable upload (apps.core.uploads): what is being uploaded, and which chunks are still missing."""
+    missing_offsets = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UploadSession
+        fields = [
+            'id', 'target', 'target_id', 'fields', 'filename', 'size', 'chunk_size', 'checksum',
+            'status', 'missing_offsets', 'expires_at', 'result_id', 'created_at',
+        ]
+        read_only_fields = ['id', 'status', 'missing_offsets', 'expires_at', 'result_id', 'created_at']
+        extra_kwargs = {
+            'chunk_size': {'required': False},
+            'checksum': {'required': False},
+            'size': {'min_value': 1},
+        }
+
+    def get_missing_offsets(self, obj):
+        # Offsets of chunks not received yet; uses the prefetched `chunks` where the view has them
+        if obj.status != 'pending':
+            return [] # Completed sessions no longer keep their chunks
+        received = {chunk.index for chunk in obj.chunks.all()}
+        return [index * obj.chunk_size for index in range(obj.chunk_count) if index not in received]
+
+    def validate_target(self, value):
+        if get_upload_target(value) is None:
+            raise serializers.ValidationError(f"Unknown upload target. Choose from: {', '.join(upload_target_names())}.")
+        return value
+
+    def validate_size(self, value):
+        if value > settings.UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(f"Files may be at most {settings.UPLOAD_MAX_SIZE} bytes.")
+        return value
+
+    def validate_chunk_size(self, value):
+        if not settings.UPLOAD_MIN_CHUNK_SIZE <= value <= settings.UPLOAD_MAX_CHUNK_SIZE:
+            raise serializers.ValidationError(
+                f"Chunks are {settings.UPLOAD_MIN_CHUNK_SIZE} to {settings.UPLOAD_MAX_CHUNK_SIZE} bytes."
+            )
+        return value
+
+    def validate_checksum(self, value):
+        if value and (len(value) != 64 or any(c not in '0123456789abcdefABCDEF' for c in value)):
+            raise serializers.ValidationError("Give the file's SHA-256 as 64 hex digits.")
+        return value
+
+    def validate(self, data):
+        target = get_upload_target(data['target'])
+        if not isinstance(data.get('fields') or {}, dict):
+            raise serializers.ValidationError({'fields': ['Expected an object of field names and values.']})
+        unknown = set(data.get('fields') or {}) - set(target.fields)
+        if unknown:
+            raise serializers.ValidationError({'fields': [
+                f"Not settable for {target.name}: {', '.join(sorted(unknown))}." + (f" Allowed: {', '.join(target.fields)}." if target.fields else '')
+            ]})
+        return data
@@ -0,0 +1,25 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .currency import invalidate_rate_cache, refresh_normalized_prices
+from .downloads import invalidate_purchases
+from .models import ExchangeRate
+
+
+@receiver(post_save, sender=ExchangeRate)
+@receiver(post_delete, sender=ExchangeRate)
+def exchange_rate_changed(sender, instance, **kwargs):
+    """Reprice everything listed in the changed currency once the rate change is committed."""
+    invalidate_rate_cache()
+    currency = instance.currency
+    transaction.on_commit(lambda: refresh_normalized_prices([currency]))
+
+
+@receiver(post_save, sender='orders.Order')
+@receiver(post_delete, sender='orders.Order')
+def order_changed(sender, instance, **kwargs):
+    """An order's status decides which designs' files its buyer may download."""
+    if instance.buyer_id:
+        invalidate_purchases(instance.buyer_id)
+        transaction.on_commit(lambda: invalidate_purchases(instance.buyer_id))
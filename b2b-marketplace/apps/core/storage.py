@@ -0,0 +1,176 @@
+# apps/core/storage.py
+"""
+Content-addressed, deduplicated media storage.
+
+The same tech packs, CAD files and images are uploaded again and again (to TechPack, ProjectFile,
+ShowcaseItem, listings...), and every upload_to helper gives each copy a fresh name. With
+ContentAddressedStorage each distinct content is stored once, as a blob named by its SHA-256:
+
+    MEDIA_ROOT/blobs/3f/a2/3fa2...e9         the bytes, stored once
+    MEDIA_ROOT/tech_packs/.../<uuid>.pdf     a hard link to the blob, under the name upload_to chose
+
+Uploads are hashed while they are streamed to a temporary file next to the blobs; if the blob
+already exists the temporary copy is dropped and only a link is made. Uploads Django already wrote
+to a temporary file (FILE_UPLOAD_MAX_MEMORY_SIZE and up) are hashed in place and moved, as
+FileSystemStorage does, so they are not copied again when FILE_UPLOAD_TEMP_DIR is on MEDIA_ROOT's
+filesystem. FileField names, url(),
+path() and serving media from disk by the web server work as before, since every name is a real
+file. The blob's hard link count is its reference count: deleting a file removes its link, and
+collect_garbage() (`manage.py dedupe_media --gc`) removes blobs nothing links to any more.
+
+Linked files must never be written in place (Django never does: every save is a new file), as that
+would change every file sharing the blob. It is opt-in (MEDIA_STORAGE_BACKEND), as MEDIA_ROOT must
+support hard links (system check core.E001); the `dedupe_media` command converts an existing
+MEDIA_ROOT.
+"""
+import hashlib
+import os
+import tempfile
+import uuid
+
+from django.conf import settings
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.core.files.storage.filesystem import safe_makedirs
+
+
+def file_sha256(path):
+    """SHA-256 (hex) of a file, read in 1 MiB blocks."""
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    blob_dir = 'blobs'
+
+    def blob_name(self, digest):
+        return f'{self.blob_dir}/{digest[:2]}/{digest[2:4]}/{digest}'
+
+    def has_blob(self, digest):
+        return os.path.exists(self.path(self.blob_name(digest.lower())))
+
+    def _makedirs(self, directory):
+        if self.directory_permissions_mode is not None:
+            safe_makedirs(directory, self.directory_permissions_mode, exist_ok=True)
+        else:
+            os.makedirs(directory, exist_ok=True)
+
+    def _stored_as_is(self, name):
+        # Chunks of resumable uploads (apps.core.uploads) are temporary and unique: nothing to share
+        return name.replace('\\', '/').startswith(f'{settings.UPLOAD_PART_DIR.rstrip("/")}/')
+
+    def _save(self, name, content):
+        if self._stored_as_is(name):
+            return super()._save(name, content)
+        staging = self.path(f'{self.blob_dir}/tmp')
+        self._makedirs(staging)
+        fd, staged = tempfile.mkstemp(dir=staging) # Same filesystem as the blobs, so it can be linked
+        try:
+            if hasattr(content, 'temporary_file_path'):
+                # Already on disk (large uploads, TemporaryUploadedFile): hashed there, then moved, not copied
+                os.close(fd)
+                source = content.temporary_file_path()
+                digest = file_sha256(source)
+                linked = self._link(self.path(self.blob_name(digest)), name) if self.has_blob(digest) else None
+                if linked is not None:
+                    return linked # Stored before; Django deletes its temporary file
+                file_move_safe(source, staged, allow_overwrite=True) # A rename if on the same filesystem
+            else:
+                sha256 = hashlib.sha256()
+                with os.fdopen(fd, 'wb') as f:
+                    for chunk in content.chunks():
+                        if isinstance(chunk, str):
+                            chunk = chunk.encode()
+                        sha256.update(chunk)
+                        f.write(chunk)
+                digest = sha256.hexdigest()
+            if self.file_permissions_mode is not None:
+                os.chmod(staged, self.file_permissions_mode)
+            while True:
+                blob = self._publish(staged, digest)
+                linked = self._link(blob, name)
+                if linked is not None:
+                    return linked
+                # The blob was garbage collected between _publish and _link; publish it again
+        finally:
+            os.unlink(staged)
+
+    def _publish(self, staged, digest):
+        """Makes `staged` the blob for `digest` unless that blob exists. Returns the blob's path."""
+        blob = self.path(self.blob_name(digest))
+        self._makedirs(os.path.dirname(blob))
+        try:
+            os.link(staged, blob)
+        except FileExistsError:
+            pass # Stored before: this upload's bytes are dropped
+        return blob
+
+    def _link(self, blob, name):
+        """Links `blob` as `name` (or the next available name). None if the blob is gone."""
+        full_path = self.path(name)
+        self._makedirs(os.path.dirname(full_path))
+        while True:
+            try:
+                os.link(blob, full_path)
+            except FileExistsError:
+                name = self.get_available_name(name)
+                full_path = self.path(name)
+            except FileNotFoundError:
+                return None
+            else:
+                break
+        self._ensure_location_group_id(full_path)
+        return os.path.relpath(full_path, self.location).replace('\\', '/')
+
+    def link_blob(self, digest, name):
+        """
+        Stores the already present content `digest` under `name` without any bytes being sent, e.g.
+        for a re-upload whose checksum is known up front. Returns the name used, or None if there is
+        no such blob.
+        """
+        blob = self.path(self.blob_name(digest.lower()))
+        if not os.path.exists(blob):
+            return None
+        return self._link(blob, self.get_available_name(name))
+
+    def collect_garbage(self):
+        """Deletes blobs no file links to any more (link count 1). Returns (blobs, bytes) freed."""
+        freed = freed_bytes = 0
+        root = self.path(self.blob_dir)
+        for directory, subdirectories, filenames in os.walk(root):
+            if directory == root:
+                subdirectories[:] = [d for d in subdirectories if d != 'tmp'] # Uploads in progress
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                try:
+                    stat = os.stat(path)
+                    if stat.st_nlink == 1:
+                        os.unlink(path)
+                        freed, freed_bytes = freed + 1, freed_bytes + stat.st_size
+                except FileNotFoundError:
+                    pass
+        return freed, freed_bytes
+
+    def deduplicate(self, path):
+        """
+        Turns an existing file (absolute `path` under the storage root) into a link to its blob,
+        publishing it as the blob if it is the first copy. Safe to run concurrently on the same
+        content. Returns (digest, bytes freed).
+        """
+        digest = file_sha256(path)
+        while True:
+            blob = self._publish(path, digest)
+            if os.path.samefile(blob, path):
+                return digest, 0 # This file is the blob (or was already linked to it)
+            stat = os.stat(path)
+            freed = stat.st_size if stat.st_nlink == 1 else 0 # Other links keep the old copy alive
+            replacement = f'{path}.dedupe-{uuid.uuid4().hex[:12]}'
+            try:
+                os.link(blob, replacement)
+            except FileNotFoundError:
+                continue # Garbage collected meanwhile; publish this copy instead
+            os.replace(replacement, path) # Atomic: readers see the old copy or the link, never neither
+            return digest, freed
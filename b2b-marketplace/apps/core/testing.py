@@ -0,0 +1,215 @@
+# apps/core/testing.py
+"""
+Shared helpers for the query budget / performance regression tests in each app's tests.py.
+
+- QueryBudgetAPITestCase turns on REQUEST_INSTRUMENTATION and QUERY_BUDGET_ENFORCE, so any request
+  exceeding its view's `query_budgets` raises QueryBudgetExceeded (see instrumentation.py).
+- get_within_budget() additionally checks that the endpoint declares a budget and that its query
+  count doesn't grow with the number of rows on the page (N+1 detection), and records wall-clock time.
+- Timings are compared against a JSON baseline (settings.PERF_BASELINE_PATH). Timings depend on
+  the machine, so the file is not tracked and is only written with PERF_BASELINE_UPDATE=True;
+  without one nothing is compared. Regressions beyond PERF_BASELINE_TOLERANCE are logged as
+  warnings, and fail the test when PERF_BASELINE_STRICT=True.
+- seed_marketplace() builds a realistic fixture set (several sellers, materials, orders, threads...).
+"""
+import json
+import logging
+import os
+import threading
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from .instrumentation import view_query_budget
+
+User = get_user_model()
+logger = logging.getLogger(__name__)
+
+
+class PerformanceBaseline:
+    """Wall-clock timings (ms) per test label, persisted as JSON."""
+
+    def __init__(self, path=None):
+        self.path = str(path or getattr(settings, 'PERF_BASELINE_PATH', settings.BASE_DIR / 'perf_baseline.json'))
+        self.update = os.getenv('PERF_BASELINE_UPDATE', 'False') == 'True'
+        self.strict = os.getenv('PERF_BASELINE_STRICT', 'False') == 'True'
+        self.tolerance = float(getattr(settings, 'PERF_BASELINE_TOLERANCE', 2.0))
+        self.slack_ms = float(getattr(settings, 'PERF_BASELINE_SLACK_MS', 10.0)) # Absolute noise allowance
+        self._lock = threading.Lock()
+        self._entries = None
+
+    @property
+    def entries(self):
+        if self._entries is None:
+            try:
+                with open(self.path) as baseline_file:
+                    self._entries = json.load(baseline_file)
+            except (FileNotFoundError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def check(self, label, elapsed_ms):
+        """
+        Returns an error message if `elapsed_ms` regressed against the baseline, else None.
+        With PERF_BASELINE_UPDATE on, records `elapsed_ms` as the new baseline instead.
+        """
+        if self.update:
+            self.record(label, elapsed_ms)
+            return None
+        baseline = self.entries.get(label)
+        if baseline is None:
+            return None # Not recorded on this machine
+        limit = baseline['ms'] * self.tolerance + self.slack_ms
+        if elapsed_ms > limit:
+            return f'{label}: {elapsed_ms:.1f}ms vs baseline {baseline["ms"]:.1f}ms (limit {limit:.1f}ms)'
+        return None
+
+    def record(self, label, elapsed_ms):
+        with self._lock:
+            self.entries[label] = {'ms': round(elapsed_ms, 2)}
+            with open(self.path, 'w') as baseline_file:
+                json.dump(dict(sorted(self.entries.items())), baseline_file, indent=2)
+                baseline_file.write('\n')
+
+
+perf_baseline = PerformanceBaseline()
+
+
+@override_settings(REQUEST_INSTRUMENTATION=True, QUERY_BUDGET_ENFORCE=True)
+class QueryBudgetAPITestCase(APITestCase):
+    timing_repeats = 3 # Best of N requests is compared against the baseline
+
+    def get_within_budget(self, url, label, grow=None, **kwargs):
+        """
+        GETs `url` (must return 200 and stay within the view's declared query budget) and records
+        its best-of-N wall time under `label`. If `grow` is given, it is called to add more rows and
+        the request is repeated: the query count must not change.
+        """
+        response, query_count = self._timed_get(url, label, **kwargs)
+        budget = view_query_budget(response.wsgi_request)
+        self.assertIsNotNone(budget, f'{url} has no query_budgets entry for this action.')
+        self.assertLessEqual(query_count, budget)
+        if grow is not None:
+            grow()
+            self.client.get(url, **kwargs) # Re-warm caches grow() invalidated, as the repeats above did
+            response, grown_count = self._timed_get(url, None, **kwargs)
+            self.assertEqual(
+                grown_count, query_count,
+                f'{url}: query count went from {query_count} to {grown_count} after adding rows (N+1?).'
+            )
+        return response
+
+    def _timed_get(self, url, label, **kwargs):
+        best_ms, response, queries = None, None, None
+        for _ in range(self.timing_repeats if label else 1):
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                response = self.client.get(url, **kwargs)
+                elapsed_ms = (time.perf_counter() - start) * 1000
+            self.assertEqual(response.status_code, 200, f'GET {url}: {response.status_code}')
+            best_ms = elapsed_ms if best_ms is None else min(best_ms, elapsed_ms)
+            queries = captured.captured_queries
+        if label:
+            regression = perf_baseline.check(label, best_ms)
+            if regression:
+                logger.warning('Performance regression: %s', regression)
+                if perf_baseline.strict:
+                    self.fail(regression)
+        return response, len(queries)
+
+
+def seed_marketplace(sellers=4, materials_per_seller=5, designers=2, designs_per_designer=3,
+                     buyers=3, orders_per_buyer=4, threads=12, posts_per_thread=3, projects=6, prefix='perf'):
+    """
+    Creates a connected set of users, listings, orders, reviews, forum threads and projects
+    through the normal model save paths (signals included). Returns a dict of the created objects.
+    """
+    from apps.collaborations.models import Project, Task, Comment
+    from apps.community_engagement.models import ForumCategory, ForumThread, ForumPost
+    from apps.listings.models import Category, Tag, Material, Design
+    from apps.orders.models import Order, OrderItem
+    from apps.reviews_ratings.models import Review, ReviewReply
+    from apps.reviews_ratings.registry import get_reviewable
+
+    def make_user(name, user_type):
+        return User.objects.create_user(name, f'{name}@example.com', 'password123', user_type=user_type)
+
+    seller_users = [make_user(f'{prefix}-seller{i}', 'seller') for i in range(sellers)]
+    designer_users = [make_user(f'{prefix}-designer{i}', 'designer') for i in range(designers)]
+    buyer_users = [make_user(f'{prefix}-buyer{i}', 'buyer') for i in range(buyers)]
+
+    category = Category.objects.create(name=f'{prefix} Fabrics')
+    tags = [Tag.objects.create(name=f'{prefix}-tag{i}') for i in range(3)]
+
+    materials = []
+    for seller in seller_users:
+        for i in range(materials_per_seller):
+            material = Material.objects.create(
+                name=f'{seller.username} material {i}', description='Woven cotton', seller=seller,
+                category=category, price_per_unit=Decimal('4.50') + i, stock_quantity=100,
+            )
+            material.tags.set(tags[:1 + i % len(tags)])
+            materials.append(material)
+
+    designs = []
+    for designer in designer_users:
+        for i in range(designs_per_designer):
+            design = Design.objects.create(
+                title=f'{designer.username} design {i}', description='Print pattern', designer=designer,
+                category=category, price=Decimal('120.00'),
+            )
+            design.tags.set(tags[:1])
+            designs.append(design)
+
+    orders = []
+    for buyer_index, buyer in enumerate(buyer_users):
+        for i in range(orders_per_buyer):
+            order = Order.objects.create(buyer=buyer, status='processing')
+            for material in (materials[(buyer_index + i) % len(materials)], materials[(buyer_index + i + 1) % len(materials)]):
+                OrderItem.objects.create(order=order, material=material, seller=material.seller, quantity=3, unit_price=material.price_per_unit)
+            orders.append(order)
+
+    material_type = get_reviewable('material')
+    reviews = []
+    for buyer_index, buyer in enumerate(buyer_users):
+        for material in materials[buyer_index::buyers]:
+            review = Review.objects.create(
+                author=buyer, rating=3 + (material.pk % 3), title='Good fabric',
+                comment=f'Consistent quality across the {material.name} batch, shipped on time.',
+                content_type=material_type.content_type, object_id_str=str(material.pk),
+            )
+            if material.pk % 2:
+                ReviewReply.objects.create(review=review, author=material.seller, comment='Thank you for ordering!')
+            reviews.append(review)
+
+    forum_category = ForumCategory.objects.create(name=f'{prefix} Sourcing')
+    forum_threads = []
+    for i in range(threads):
+        author = (seller_users + buyer_users)[i % (sellers + buyers)]
+        thread = ForumThread.objects.create(category=forum_category, author=author, title=f'{prefix} thread {i}')
+        for j in range(posts_per_thread):
+            ForumPost.objects.create(thread=thread, author=buyer_users[j % buyers], content=f'Reply {j}')
+        forum_threads.append(thread)
+
+    project_list = []
+    for i in range(projects):
+        owner = buyer_users[i % buyers]
+        project = Project.objects.create(name=f'{prefix} project {i}', owner=owner, related_order=orders[i % len(orders)])
+        project.members.add(seller_users[i % sellers], designer_users[i % designers])
+        task = Task.objects.create(project=project, title='Approve lab dip', reporter=owner, assigned_to=seller_users[i % sellers])
+        Comment.objects.create(project=project, author=owner, text='Kickoff notes')
+        Comment.objects.create(task=task, author=owner, text='Please confirm colour')
+        project_list.append(project)
+
+    return {
+        'sellers': seller_users, 'designers': designer_users, 'buyers': buyer_users,
+        'category': category, 'tags': tags, 'materials': materials, 'designs': designs,
+        'orders': orders, 'reviews': reviews, 'forum_category': forum_category,
+        'threads': forum_threads, 'projects': project_list,
+    }
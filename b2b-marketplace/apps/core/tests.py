@@ -0,0 +1,617 @@
+import asyncio
+import hashlib
+import importlib
+import io
+import os
+import random
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import LiveServerTestCase, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from apps.collaborations.models import Project, ProjectFile
+from apps.listings.models import Category, Design, Material, TechPack
+from apps.orders.models import RFQ, Order, OrderItem
+
+from .loadtest import (
+    SCENARIOS, AsyncHTTPClient, Dataset, LatencyHistogram, LoadTestReport, VirtualUser,
+    compare_reports, run_load_test,
+)
+from . import checks, currency
+from .instrumentation import MetricsStore, RequestMetrics, fingerprint_sql, metrics_store
+from .models import ExchangeRate, UploadChunk, UploadSession
+from .storage import ContentAddressedStorage
+from .testing import PerformanceBaseline, QueryBudgetAPITestCase, seed_marketplace
+from .uploads import ChunkedUploadService
+
+
+class LatencyHistogramTests(SimpleTestCase):
+    def test_percentiles_within_bucket_resolution(self):
+        histogram = LatencyHistogram()
+        for ms in range(1, 1001):
+            histogram.record(float(ms))
+        for p in (50, 90, 99):
+            self.assertAlmostEqual(histogram.percentile(p), p * 10, delta=p * 10 * LatencyHistogram.GROWTH - p * 10)
+        self.assertEqual(histogram.percentile(100), 1000.0)
+
+    def test_round_trips_through_json(self):
+        histogram = LatencyHistogram()
+        for ms in (0.05, 3.2, 48.0, 48.1, 7000.0):
+            histogram.record(ms)
+        restored = LatencyHistogram.from_dict(histogram.to_dict())
+        self.assertEqual(restored.buckets, histogram.buckets)
+        self.assertEqual(restored.percentile(50), histogram.percentile(50))
+
+
+class CompareReportsTests(SimpleTestCase):
+    def _result(self, p95_ms, rps, errors=0):
+        report = LoadTestReport()
+        for _ in range(100):
+            report.record('material-list:list', p95_ms)
+        for _ in range(errors):
+            report.record('material-list:list', p95_ms, error='HTTP 500')
+        report.duration = 100 / rps
+        return report.to_dict()
+
+    def test_flags_slower_less_throughput_or_more_errors(self):
+        baseline = self._result(100, 50)
+        self.assertFalse(compare_reports(baseline, self._result(110, 48))[0]['regressed'])
+        self.assertTrue(compare_reports(baseline, self._result(150, 50))[0]['regressed'])
+        self.assertTrue(compare_reports(baseline, self._result(100, 30))[0]['regressed'])
+        self.assertTrue(compare_reports(baseline, self._result(100, 50, errors=1))[0]['regressed'])
+
+
+class LoadTestScenarioTests(LiveServerTestCase):
+    """Every scenario runs error-free against a live server with the fixture dataset."""
+
+    def setUp(self):
+        from apps.orders.models import RFQ
+
+        data = seed_marketplace()
+        RFQ.objects.create(
+            buyer=data['buyers'][0], title='500m denim', description='Samples first',
+            deadline_for_quotes=timezone.now() + timedelta(days=7), status='open',
+        )
+        self.dataset = Dataset.load(prefix='perf-')
+
+    def test_each_scenario_without_errors(self):
+        report = LoadTestReport()
+        host, port = self.server_thread.host, self.server_thread.port
+
+        async def run_each():
+            client = AsyncHTTPClient(host, port)
+            user = VirtualUser(client, self.dataset, report, random.Random(1), tokens={})
+            try:
+                for name, run_scenario in SCENARIOS.items():
+                    await run_scenario(user)
+                    report.scenarios[name] += 1
+            finally:
+                await client.close()
+
+        asyncio.run(run_each())
+        self.assertEqual(set(report.scenarios), set(SCENARIOS))
+        self.assertEqual(report.total_errors, 0, {name: dict(stats.errors) for name, stats in report.endpoints.items()})
+        self.assertIn('order-initiate-payment:initiate_payment', report.endpoints)
+        self.assertIn('quote-list:create', report.endpoints)
+
+    def test_run_load_test_reports_per_endpoint(self):
+        report = asyncio.run(run_load_test(self.live_server_url, self.dataset, {'browse': 1}, concurrency=2, duration=0.5))
+        self.assertGreater(report.total_requests, 0)
+        self.assertIn('material-list:list', report.endpoints)
+        result = report.to_dict(commit='abc123')
+        self.assertEqual(result['total_requests'], sum(row['requests'] for row in result['endpoints'].values()))
+
+
+class InstrumentationTests(SimpleTestCase):
+    def test_fingerprints_ignore_parameters(self):
+        self.assertEqual(
+            fingerprint_sql("SELECT * FROM t WHERE name = 'O''Brien' AND id IN (%s, %s, %s)  AND n > 10.5"),
+            'SELECT * FROM t WHERE name = ? AND id IN (...) AND n > ?',
+        )
+        self.assertEqual(fingerprint_sql('SELECT * FROM t WHERE id = 1'), fingerprint_sql('SELECT  *\nFROM t WHERE id = 22'))
+        self.assertEqual(fingerprint_sql('SELECT col2 FROM t1'), 'SELECT col2 FROM t1') # Digits inside names stay
+
+    def test_percentiles(self):
+        self.assertEqual(MetricsStore._percentiles(range(1, 101)), {'p50': 51, 'p90': 90, 'p95': 95, 'p99': 99, 'max': 100})
+        self.assertEqual(MetricsStore._percentiles([7.123]), {'p50': 7.12, 'p90': 7.12, 'p95': 7.12, 'p99': 7.12, 'max': 7.12})
+
+    def test_store_keeps_recent_samples_and_duplicates(self):
+        store = MetricsStore(max_samples=3)
+        for query_count in (1, 2, 3, 4):
+            metrics = RequestMetrics()
+            metrics.query_count, metrics.elapsed = query_count, 0.01
+            metrics.fingerprints.update({'SELECT ?': 2})
+            store.record('material-list:list', metrics, response_size=100, status_code=500 if query_count == 4 else 200)
+        [endpoint] = store.summary()
+        self.assertEqual((endpoint['requests'], endpoint['errors'], endpoint['query_count']['max']), (3, 1, 4))
+        self.assertEqual(endpoint['query_count']['p50'], 3)
+        self.assertEqual(endpoint['duplicate_queries'], [{'sql': 'SELECT ?', 'count': 8}])
+
+
+class PerformanceBaselineTests(SimpleTestCase):
+    def setUp(self):
+        work_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(work_dir.cleanup)
+        self.path = os.path.join(work_dir.name, 'baseline.json')
+
+    def baseline(self, **env):
+        with mock.patch.dict(os.environ, env):
+            return PerformanceBaseline(self.path)
+
+    def test_records_only_when_asked(self):
+        self.assertIsNone(self.baseline().check('material-list', 50.0))
+        self.assertFalse(os.path.exists(self.path))
+        self.assertIsNone(self.baseline(PERF_BASELINE_UPDATE='True').check('material-list', 50.0))
+        self.assertEqual(PerformanceBaseline(self.path).entries, {'material-list': {'ms': 50.0}})
+
+    def test_regressions_beyond_tolerance_and_slack(self):
+        self.baseline(PERF_BASELINE_UPDATE='True').record('material-list', 50.0)
+        baseline = self.baseline()
+        self.assertIsNone(baseline.check('material-list', 110.0)) # 50 * 2.0 + 10
+        self.assertIn('baseline 50.0ms', baseline.check('material-list', 110.1))
+
+
+class RequestMetricsViewTests(APITestCase):
+    def setUp(self):
+        metrics_store.reset()
+        self.addCleanup(metrics_store.reset)
+        self.url = reverse('request-metrics')
+        self.admin = get_user_model().objects.create_user('metrics-admin', 'metrics-admin@example.com', 'password123', is_staff=True)
+
+    def endpoints(self):
+        return {endpoint['endpoint']: endpoint for endpoint in metrics_store.summary()}
+
+    def test_off_by_default(self):
+        self.client.force_authenticate(self.admin)
+        data = self.client.get(self.url).data
+        self.assertEqual((data['enabled'], data['endpoints']), (False, []))
+        self.assertEqual(self.endpoints(), {})
+
+    @override_settings(REQUEST_INSTRUMENTATION=True)
+    def test_admin_only(self):
+        self.client.force_authenticate(get_user_model().objects.create_user('metrics-buyer', 'metrics-buyer@example.com', 'password123'))
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.assertEqual(self.client.delete(self.url).status_code, 403)
+        self.assertEqual(self.endpoints()['request-metrics:get']['errors'], 0) # Still measured
+
+    @override_settings(REQUEST_INSTRUMENTATION=True)
+    def test_reports_and_resets(self):
+        self.client.force_authenticate(self.admin)
+        self.client.get(self.url)
+        data = self.client.get(self.url, {'endpoint': 'request-metrics'}).data
+        [endpoint] = data['endpoints']
+        self.assertEqual((endpoint['endpoint'], endpoint['requests']), ('request-metrics:get', 1))
+        self.assertEqual(self.client.get(self.url, {'endpoint': 'material'}).data['endpoints'], [])
+        self.assertEqual(self.client.delete(self.url).status_code, 204)
+        self.assertNotIn('request-metrics:get', self.endpoints())
+
+    @override_settings(REQUEST_INSTRUMENTATION=True, REQUEST_INSTRUMENTATION_SAMPLE_RATE=0.5)
+    def test_sampling(self):
+        self.client.force_authenticate(self.admin)
+        with mock.patch('apps.core.middleware.random.random', side_effect=[0.7, 0.2]):
+            self.client.get(self.url) # Skipped
+            self.client.get(self.url) # Measured
+        self.assertEqual(self.endpoints()['request-metrics:get']['requests'], 1)
+
+@override_settings(BASE_CURRENCY='USD')
+class CurrencyTests(TestCase):
+    """Prices convert through the base currency; normalized columns follow rate changes in bulk."""
+
+    def setUp(self):
+        currency.invalidate_rate_cache()
+        self.addCleanup(currency.invalidate_rate_cache)
+        ExchangeRate.objects.create(currency='EUR', rate_to_base=Decimal('1.10'))
+        self.seller = get_user_model().objects.create_user('fx-seller', 'fx-seller@example.com', 'password123', user_type='seller')
+        self.category = Category.objects.create(name='FX Fabrics')
+
+    def material(self, price, material_currency):
+        return Material.objects.create(
+            name=f'Linen {material_currency}', description='Linen', seller=self.seller, category=self.category,
+            price_per_unit=Decimal(price), currency=material_currency, stock_quantity=10,
+        )
+
+    def test_convert(self):
+        self.assertEqual(currency.convert(Decimal('10.00'), 'eur', 'USD'), Decimal('11.00'))
+        self.assertEqual(currency.convert(Decimal('11.00'), 'USD', 'EUR'), Decimal('10.00'))
+        self.assertEqual(currency.convert('2.50', 'GBP', 'GBP'), Decimal('2.50')) # Same currency needs no rate
+        self.assertIsNone(currency.convert(Decimal('1.00'), 'GBP', 'USD'))
+        self.assertIsNone(currency.to_base(None, 'EUR'))
+        self.assertTrue(currency.is_supported_currency('usd'))
+        self.assertFalse(currency.is_supported_currency('GBP'))
+
+    def test_rate_cache_expires(self):
+        with mock.patch('apps.core.currency.time.monotonic', return_value=1000.0):
+            self.assertEqual(currency.get_rates()['EUR'], Decimal('1.10'))
+        ExchangeRate.objects.filter(currency='EUR').update(rate_to_base=Decimal('1.20')) # No signal: only expiry notices
+        with mock.patch('apps.core.currency.time.monotonic', return_value=1000.0 + currency.RATE_CACHE_TTL):
+            self.assertEqual(currency.get_rates()['EUR'], Decimal('1.10'))
+        with mock.patch('apps.core.currency.time.monotonic', return_value=1001.0 + currency.RATE_CACHE_TTL):
+            self.assertEqual(currency.get_rates()['EUR'], Decimal('1.20'))
+
+    def test_material_save_stores_the_base_price(self):
+        eur, usd = self.material('10.00', 'eur'), self.material('4.50', 'USD')
+        self.assertEqual(eur.currency, 'EUR')
+        self.assertEqual((eur.price_per_unit_base, usd.price_per_unit_base), (Decimal('11.00'), Decimal('4.50')))
+        eur.price_per_unit = Decimal('20.00')
+        eur.save(update_fields=['price_per_unit']) # The normalized column is added to update_fields
+        eur.refresh_from_db()
+        self.assertEqual(eur.price_per_unit_base, Decimal('22.00'))
+
+    def test_new_rates_backfill_non_base_prices(self):
+        gbp, usd = self.material('10.00', 'GBP'), self.material('4.50', 'USD')
+        self.assertIsNone(gbp.price_per_unit_base) # No rate yet: left out of base-price filters
+        with self.captureOnCommitCallbacks(execute=True):
+            ExchangeRate.objects.create(currency='GBP', rate_to_base=Decimal('1.25'))
+        gbp.refresh_from_db()
+        self.assertEqual(gbp.price_per_unit_base, Decimal('12.50'))
+
+        Material.objects.filter(pk=usd.pk).update(price_per_unit_base=None)
+        self.assertEqual(currency.refresh_normalized_prices(), 2) # Every currency present, one UPDATE each
+        usd.refresh_from_db()
+        self.assertEqual(usd.price_per_unit_base, Decimal('4.50'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ExchangeRate.objects.get(currency='GBP').delete()
+        gbp.refresh_from_db()
+        self.assertIsNone(gbp.price_per_unit_base)
+
+
+@override_settings(BASE_CURRENCY='USD')
+class SeedDataTests(TestCase):
+    def test_orders_are_in_the_base_currency(self):
+        ExchangeRate.objects.create(currency='EUR', rate_to_base=Decimal('1.10'))
+        currency.invalidate_rate_cache()
+        call_command('seed_data', users=30, materials=40, orders=20, seed=3, stdout=io.StringIO())
+        self.assertTrue(Material.objects.filter(slug__startswith='seed-', currency='EUR').exists())
+        orders = Order.objects.filter(buyer__username__startswith='seed-').prefetch_related('items__material')
+        self.assertEqual({order.currency for order in orders}, {'USD'})
+        for order in orders:
+            self.assertEqual(order.order_total, sum(item.unit_price * item.quantity for item in order.items.all()))
+            for item in order.items.all():
+                self.assertEqual(item.unit_price, item.material.price_per_unit_base)
+
+    def test_child_rows_are_inserted_with_each_batch(self):
+        from apps.community_engagement.models import ForumPost, ForumThread
+        from apps.reviews_ratings.models import Review
+
+        out = io.StringIO()
+        call_command('seed_data', users=30, materials=40, orders=20, reviews=6, threads=7, seed=5, batch_size=3, stdout=out)
+        self.assertEqual(Order.objects.filter(buyer__username__startswith='seed-').count(), 20)
+        items = OrderItem.objects.filter(order__buyer__username__startswith='seed-')
+        self.assertIn(f'orders: 20 ({items.count()} order items)', out.getvalue())
+        self.assertFalse(Order.objects.filter(buyer__username__startswith='seed-', items__isnull=True).exists())
+        bought = set(items.values_list('order__buyer_id', 'material_id'))
+        reviews = Review.objects.filter(author__username__startswith='seed-')
+        self.assertEqual(reviews.count(), 6)
+        self.assertTrue(all(pair in bought for pair in reviews.values_list('author_id', 'reviewed_material_id'))) # From the orders' sample
+        threads = ForumThread.objects.filter(slug__startswith='seed-')
+        self.assertEqual(threads.count(), 7)
+        self.assertFalse(threads.filter(posts__isnull=True).exists())
+        self.assertIn(f'threads: 7 ({ForumPost.objects.filter(thread__in=threads).count()} forum posts)', out.getvalue())
+
+class ChunkedUploadTests(APITestCase):
+    """Files arrive in checksummed chunks, in any order, and are attached to their model on completion."""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media.name, UPLOAD_MIN_CHUNK_SIZE=1)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        User = get_user_model()
+        self.owner = User.objects.create_user('upload-owner', 'upload-owner@example.com', 'password123', user_type='buyer')
+        self.outsider = User.objects.create_user('upload-outsider', 'upload-outsider@example.com', 'password123', user_type='seller')
+        self.project = Project.objects.create(name='Outerwear', owner=self.owner)
+        self.content = bytes(range(256)) * 40 + b'tail' # 10244 bytes: three 4096-byte chunks, the last one short
+        self.client.force_authenticate(self.owner)
+
+    def start(self, **data):
+        data = {'target': 'project_file', 'target_id': str(self.project.pk), 'filename': 'coat.dxf',
+                'size': len(self.content), 'chunk_size': 4096, **data}
+        return self.client.post(reverse('upload-list'), data, format='json')
+
+    def put_chunk(self, session_id, offset, body=None, checksum=None):
+        body = self.content[offset:offset + 4096] if body is None else body
+        return self.client.generic(
+            'PUT', reverse('upload-upload-chunk', kwargs={'pk': session_id, 'offset': offset}), body,
+            content_type='application/octet-stream', HTTP_X_CHUNK_SHA256=checksum or hashlib.sha256(body).hexdigest(),
+        )
+
+    def test_chunks_in_any_order_then_complete(self):
+        session = self.start(checksum=hashlib.sha256(self.content).hexdigest(), fields={'description': 'Pattern'}).data
+        self.assertEqual(session['missing_offsets'], [0, 4096, 8192])
+        for offset in (8192, 0):
+            self.assertEqual(self.put_chunk(session['id'], offset).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.put_chunk(session['id'], 0).status_code, 200) # A retried chunk replaces the first copy
+        status = self.client.get(reverse('upload-detail', kwargs={'pk': session['id']})).data
+        self.assertEqual(status['missing_offsets'], [4096])
+        self.assertEqual(self.client.post(reverse('upload-complete', kwargs={'pk': session['id']})).status_code, 400)
+
+        self.put_chunk(session['id'], 4096)
+        done = self.client.post(reverse('upload-complete', kwargs={'pk': session['id']})).data
+        self.assertEqual(done['status'], 'complete')
+        project_file = ProjectFile.objects.get(pk=done['result_id'])
+        self.assertEqual((project_file.project_id, project_file.uploaded_by, project_file.description), (self.project.pk, self.owner, 'Pattern'))
+        with project_file.file.open('rb') as f:
+            self.assertEqual(f.read(), self.content)
+        self.assertTrue(project_file.file.name.endswith('.dxf'))
+        self.assertFalse(UploadChunk.objects.exists())
+        self.assertEqual(default_storage.listdir(f'uploads/partial/{session["id"]}')[1], [])
+
+    def test_bad_chunks_are_rejected(self):
+        session_id = self.start().data['id']
+        self.assertEqual(self.put_chunk(session_id, 100).status_code, 400) # Not a chunk boundary
+        self.assertEqual(self.put_chunk(session_id, 0, body=b'short').status_code, 400)
+        self.assertEqual(self.put_chunk(session_id, 0, checksum='0' * 64).status_code, 400)
+        self.assertFalse(UploadChunk.objects.exists())
+
+    def test_file_checksum_is_checked_on_completion(self):
+        session_id = self.start(checksum='0' * 64).data['id']
+        for offset in (0, 4096, 8192):
+            self.put_chunk(session_id, offset)
+        response = self.client.post(reverse('upload-complete', kwargs={'pk': session_id}))
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ProjectFile.objects.exists())
+        self.assertEqual(UploadSession.objects.get(pk=session_id).status, 'pending')
+
+    def test_attaches_to_an_existing_object(self):
+        rfq = RFQ.objects.create(buyer=self.owner, title='Recycled wool', description='400 m')
+        session_id = self.start(target='rfq_specifications', target_id=str(rfq.pk)).data['id']
+        for offset in (0, 4096, 8192):
+            self.put_chunk(session_id, offset)
+        self.assertEqual(self.client.post(reverse('upload-complete', kwargs={'pk': session_id})).data['result_id'], str(rfq.pk))
+        rfq.refresh_from_db()
+        self.assertEqual(rfq.specifications_file.size, len(self.content))
+
+    def test_only_allowed_users(self):
+        session_id = self.start().data['id']
+        self.client.force_authenticate(self.outsider)
+        self.assertEqual(self.start().status_code, 403)
+        self.assertEqual(self.put_chunk(session_id, 0).status_code, 404) # Someone else's session
+        self.assertEqual(self.start(target='invoice').status_code, 400)
+
+    def test_reupload_of_own_content_completes_without_chunks(self):
+        self.enterContext(override_settings(STORAGES={
+            **settings.STORAGES, 'default': {'BACKEND': 'apps.core.storage.ContentAddressedStorage'},
+        }))
+        checksum = hashlib.sha256(self.content).hexdigest()
+        first = self.start(checksum=checksum).data['id']
+        for offset in (0, 4096, 8192):
+            self.put_chunk(first, offset)
+        first_file = ProjectFile.objects.get(pk=self.client.post(reverse('upload-complete', kwargs={'pk': first})).data['result_id'])
+
+        again = self.start(checksum=checksum, filename='coat-v2.dxf').data
+        self.assertEqual((again['status'], again['missing_offsets']), ('complete', []))
+        second_file = ProjectFile.objects.get(pk=again['result_id'])
+        self.assertNotEqual(second_file.file.name, first_file.file.name)
+        self.assertTrue(os.path.samefile(second_file.file.path, first_file.file.path)) # One copy on disk
+
+        # Someone who only knows the checksum still has to send the bytes
+        self.project.members.add(self.outsider)
+        self.client.force_authenticate(self.outsider)
+        self.assertEqual(self.start(checksum=checksum).data['missing_offsets'], [0, 4096, 8192])
+
+    def test_expired_sessions_are_pruned(self):
+        session_id = self.start().data['id']
+        self.put_chunk(session_id, 0)
+        self.assertEqual(ChunkedUploadService().prune(now=timezone.now() + timedelta(days=2)), 1)
+        self.assertFalse(UploadSession.objects.exists())
+        self.assertEqual(default_storage.listdir(f'uploads/partial/{session_id}')[1], [])
+
+
+class DownloadTests(QueryBudgetAPITestCase):
+    """Private files are only served to who may have them, by the front proxy or with Range support."""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media.name, MEDIA_SENDFILE='')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        User = get_user_model()
+        self.designer = User.objects.create_user('dl-designer', 'dl-designer@example.com', 'password123', user_type='designer')
+        self.buyer = User.objects.create_user('dl-buyer', 'dl-buyer@example.com', 'password123', user_type='buyer')
+        self.outsider = User.objects.create_user('dl-outsider', 'dl-outsider@example.com', 'password123', user_type='buyer')
+        self.design = Design.objects.create(title='Quilted liner', description='Diamond quilt', designer=self.designer, price=Decimal('120.00'))
+        self.content = bytes(range(256)) * 4 # 1024 bytes
+        self.tech_pack = TechPack(design=self.design, version='1')
+        self.tech_pack.file.save('liner.pdf', ContentFile(self.content))
+        self.url = reverse('download', kwargs={'kind': 'tech_pack', 'pk': self.tech_pack.pk})
+
+    def buy(self, status):
+        order = Order.objects.create(buyer=self.buyer, status='processing')
+        OrderItem.objects.create(order=order, design=self.design, seller=self.designer, quantity=1, unit_price=self.design.price)
+        order.status = status
+        order.save()
+
+    def test_tech_pack_needs_designer_or_completed_order(self):
+        self.client.force_authenticate(self.designer)
+        response = self.get_within_budget(self.url, 'core.download.tech_pack')
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertIn('attachment; filename="', response['Content-Disposition'])
+
+        self.client.force_authenticate(self.buyer)
+        self.assertEqual(self.client.get(self.url).status_code, 403) # Nothing bought yet
+        self.buy('delivered')
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.buy('completed') # Saving the order invalidates the cached purchases
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+        self.client.force_authenticate(self.outsider)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.assertEqual(self.client.get(reverse('download', kwargs={'kind': 'tech_pack', 'pk': 0})).status_code, 404)
+        self.assertEqual(self.client.get(reverse('download', kwargs={'kind': 'invoice', 'pk': 1})).status_code, 404)
+
+    def test_process_local_cache_sees_revoked_purchases(self):
+        self.buy('completed')
+        self.client.force_authenticate(self.buyer)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.assertIsNone(cache.get(f'downloads:purchases:{self.buyer.pk}')) # Tests run with the local-memory cache
+        # Refunded without signals, as by another worker whose invalidation can't reach this process
+        Order.objects.filter(buyer=self.buyer).update(status='refunded')
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_project_files_need_membership(self):
+        project = Project.objects.create(name='Outerwear', owner=self.buyer)
+        project_file = ProjectFile(project=project, uploaded_by=self.buyer)
+        project_file.file.save('coat.dxf', ContentFile(b'pattern'))
+        url = reverse('download', kwargs={'kind': 'project_file', 'pk': project_file.pk})
+        self.client.force_authenticate(self.outsider)
+        self.assertEqual(self.client.get(url).status_code, 403)
+        project.members.add(self.outsider)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_ranges(self):
+        self.client.force_authenticate(self.designer)
+        response = self.client.get(self.url, HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 100-199/1024')
+        self.assertEqual(response['Content-Length'], '100')
+        self.assertEqual(b''.join(response.streaming_content), self.content[100:200])
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-24')
+        self.assertEqual(b''.join(response.streaming_content), self.content[-24:])
+        response = self.client.get(self.url, HTTP_RANGE='bytes=1000-')
+        self.assertEqual(response['Content-Range'], 'bytes 1000-1023/1024')
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE='bytes=2048-').status_code, 416)
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE='bytes=0-1,5-6').status_code, 200) # Multiple ranges: whole file
+
+        etag = response['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag).status_code, 206)
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"').status_code, 200)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_private_files_are_linked_through_the_endpoint(self):
+        from apps.collaborations.serializers import ProjectFileSerializer
+        from apps.listings.serializers import TechPackSerializer
+        from apps.orders.serializers import RFQSerializer
+
+        self.assertTrue(self.tech_pack.file.name.startswith('private/designs/tech_packs/'))
+        self.assertEqual(TechPackSerializer(self.tech_pack).data['file_url'], self.url)
+        self.assertNotIn('file', TechPackSerializer(self.tech_pack).data)
+        project_file = ProjectFile(project=Project.objects.create(name='Knitwear', owner=self.buyer), uploaded_by=self.buyer)
+        project_file.file.save('rib.dxf', ContentFile(b'pattern'))
+        self.assertTrue(project_file.file.name.startswith('private/project_files/'))
+        self.assertEqual(
+            ProjectFileSerializer(project_file).data['file_url'],
+            reverse('download', kwargs={'kind': 'project_file', 'pk': project_file.pk}),
+        )
+        rfq = RFQ.objects.create(buyer=self.buyer, title='Zips', description='YKK #5', quantity_required=100)
+        self.assertIsNone(RFQSerializer(rfq).data['specifications_file_url'])
+
+    def test_migration_moves_earlier_uploads_to_private_media(self):
+        from django.apps import apps as global_apps
+        migration = importlib.import_module('apps.listings.migrations.0006_private_tech_packs')
+
+        old_name = default_storage.save('designs/tech_packs/old/liner.pdf', ContentFile(self.content))
+        TechPack.objects.filter(pk=self.tech_pack.pk).update(file=old_name)
+        migration.move_files_to_private_media(global_apps, None)
+        self.tech_pack.refresh_from_db()
+        self.assertEqual(self.tech_pack.file.name, 'private/designs/tech_packs/old/liner.pdf')
+        self.assertFalse(default_storage.exists(old_name))
+        with self.tech_pack.file.open('rb') as f:
+            self.assertEqual(f.read(), self.content)
+
+    def test_transfer_is_handed_to_the_front_proxy(self):
+        self.client.force_authenticate(self.designer)
+        with override_settings(MEDIA_SENDFILE='x-accel-redirect'):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/' + self.tech_pack.file.name)
+        self.assertEqual(response.content, b'')
+        with override_settings(MEDIA_SENDFILE='x-sendfile'):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Sendfile'], self.tech_pack.file.path)
+
+
+class ContentAddressedStorageTests(SimpleTestCase):
+    """Each distinct content is stored once; names are hard links counted as references."""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.root = media.name
+        self.storage = ContentAddressedStorage(location=self.root)
+
+    def test_same_content_is_stored_once(self):
+        first = self.storage.save('tech_packs/a.pdf', ContentFile(b'%PDF tech pack'))
+        second = self.storage.save('project_files/b.pdf', ContentFile(b'%PDF tech pack'))
+        other = self.storage.save('tech_packs/a.pdf', ContentFile(b'%PDF other'))
+        self.assertNotEqual(other, first) # Names stay unique
+        blob = self.storage.path(self.storage.blob_name(hashlib.sha256(b'%PDF tech pack').hexdigest()))
+        self.assertEqual(os.stat(blob).st_nlink, 3) # The blob and two names
+        self.assertTrue(os.path.samefile(self.storage.path(first), self.storage.path(second)))
+        self.assertEqual(os.listdir(os.path.join(self.root, 'blobs', 'tmp')), [])
+
+        self.storage.delete(first)
+        self.assertEqual(self.storage.open(second).read(), b'%PDF tech pack')
+        self.assertEqual(self.storage.collect_garbage(), (0, 0))
+        self.storage.delete(second)
+        self.assertEqual(self.storage.collect_garbage(), (1, len(b'%PDF tech pack')))
+        self.assertFalse(os.path.exists(blob))
+
+    def test_temporary_uploads_are_moved_not_copied(self):
+        def upload(content):
+            file = TemporaryUploadedFile('cad.dxf', 'application/dxf', len(content), None)
+            file.write(content)
+            file.flush()
+            self.addCleanup(file.close)
+            return file
+
+        with override_settings(FILE_UPLOAD_TEMP_DIR=self.root):
+            first, second = upload(b'grading rules'), upload(b'grading rules')
+        inode = os.stat(first.temporary_file_path()).st_ino
+        name = self.storage.save('project_files/a.dxf', first)
+        self.assertFalse(os.path.exists(first.temporary_file_path()))
+        self.assertEqual(os.stat(self.storage.path(name)).st_ino, inode) # The upload itself, now the blob
+        other = self.storage.save('project_files/b.dxf', second)
+        self.assertTrue(os.path.exists(second.temporary_file_path())) # Already stored: only linked
+        self.assertTrue(os.path.samefile(self.storage.path(name), self.storage.path(other)))
+        self.assertEqual(os.listdir(os.path.join(self.root, 'blobs', 'tmp')), [])
+
+    def test_media_root_must_hold_hard_links(self):
+        storage_settings = {'default': {'BACKEND': 'apps.core.storage.ContentAddressedStorage'}}
+        with override_settings(MEDIA_ROOT=self.root, STORAGES=storage_settings):
+            self.assertEqual(checks.check_media_root_holds_hard_links(None), [])
+            with mock.patch.object(checks.os, 'link', side_effect=PermissionError('Operation not permitted')):
+                errors = checks.check_media_root_holds_hard_links(None)
+        self.assertEqual([error.id for error in errors], ['core.E001'])
+        self.assertEqual(checks.check_media_root_holds_hard_links(None), []) # FileSystemStorage: no links needed
+
+    def test_link_blob_needs_stored_content(self):
+        digest = hashlib.sha256(b'swatch').hexdigest()
+        self.assertIsNone(self.storage.link_blob(digest, 'showcases/files/s.png'))
+        self.storage.save('showcases/files/s.png', ContentFile(b'swatch'))
+        name = self.storage.link_blob(digest, 'showcases/files/s.png')
+        self.assertNotEqual(name, 'showcases/files/s.png')
+        self.assertEqual(self.storage.open(name).read(), b'swatch')
+
+    def test_dedupe_media_links_existing_duplicates(self):
+        for name, content in [('a/1.dxf', b'pattern'), ('b/2.dxf', b'pattern'), ('c/3.dxf', b'pattern'), ('c/4.dxf', b'grading')]:
+            os.makedirs(os.path.join(self.root, os.path.dirname(name)), exist_ok=True)
+            with open(os.path.join(self.root, name), 'wb') as f:
+                f.write(content)
+        out = io.StringIO()
+        with override_settings(MEDIA_ROOT=self.root, STORAGES={'default': {'BACKEND': 'apps.core.storage.ContentAddressedStorage'}}):
+            call_command('dedupe_media', '--dry-run', stdout=out)
+            self.assertIn('Would free 0.0 MiB (14 bytes): 4 file(s), 2 distinct', out.getvalue())
+            call_command('dedupe_media', '--workers', '3', stdout=out)
+            self.assertIn('Freed 0.0 MiB (14 bytes): 4 file(s), 2 distinct', out.getvalue())
+            call_command('dedupe_media', stdout=out) # Nothing left to do
+            self.assertIn('(0 bytes): 0 file(s)', out.getvalue())
+        paths = [os.path.join(self.root, name) for name in ('a/1.dxf', 'b/2.dxf', 'c/3.dxf')]
+        self.assertTrue(all(os.path.samefile(paths[0], path) for path in paths))
+        with open(paths[2], 'rb') as f:
+            self.assertEqual(f.read(), b'pattern')
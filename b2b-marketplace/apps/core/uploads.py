@@ -0,0 +1,315 @@
+# apps/core/uploads.py
+"""
+Resumable chunked uploads for large files (CAD files, tech packs, specifications).
+
+Multipart form uploads buffer the whole file in one request, time out on slow links and restart
+from zero. Instead (see UploadSessionViewSet):
+
+    POST   /api/v1/core/uploads/                      {target, target_id, filename, size, checksum?, chunk_size?, fields?}
+    PUT    /api/v1/core/uploads/<id>/chunks/<offset>/ raw bytes, X-Chunk-SHA256: <hex>   (any order, in parallel)
+    GET    /api/v1/core/uploads/<id>/                 which offsets have arrived, to resume
+    POST   /api/v1/core/uploads/<id>/complete/        assembles the file and attaches it to the target
+
+Each chunk is streamed from the request into its own file in default_storage while its SHA-256 is
+computed, so neither a chunk nor the file is ever held in memory. Completing a session streams the
+chunk files, in order, through the target model's FileField (so its upload_to and storage apply),
+checks the whole-file checksum and creates or updates the target object.
+
+Re-uploads skip the bytes: if the declared checksum is content the user has uploaded before and the
+target's storage still holds it (ContentAddressedStorage, apps/core/storage.py), the session is
+completed as soon as it is created, by linking the stored content. Content uploaded only by others
+must be sent, so a checksum alone never gives access to a file.
+
+Upload targets are registered below: which model and FileField a file goes to, whether a new object
+is created under a parent (a ProjectFile under a project) or an existing one gets the file (an RFQ's
+specifications), and who may upload.
+"""
+import hashlib
+import io
+from dataclasses import dataclass, field
+from datetime import timedelta
+from functools import cached_property
+from typing import Callable
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from .models import UploadChunk, UploadSession
+
+
+@dataclass(frozen=True)
+class UploadTarget:
+    name: str                       # As sent by clients
+    model_label: str                # 'app_label.ModelName' receiving the file
+    file_field: str                 # FileField on that model
+    parent_field: str = None        # FK set on a new object (target_id is its parent); None: target_id is an existing object
+    owner_lookup: str = None        # Path from the parent (or existing object) to the user allowed to upload
+    is_allowed: Callable = None     # (user, target_id) -> bool, instead of owner_lookup
+    uploader_field: str = None      # FK on a new object set to the uploading user
+    fields: tuple = field(default=()) # Other fields a client may set on a new object
+
+    @cached_property
+    def model(self):
+        return apps.get_model(self.model_label)
+
+    @cached_property
+    def lookup_model(self):
+        """The model target_id refers to: the parent's for new objects."""
+        if self.parent_field:
+            return self.model._meta.get_field(self.parent_field).related_model
+        return self.model
+
+    def to_pk(self, target_id):
+        """Native-typed primary key for `target_id`, or None if it isn't a valid id."""
+        try:
+            return self.lookup_model._meta.pk.to_python(target_id)
+        except ValidationError:
+            return None
+
+    def allowed(self, user, target_id) -> bool:
+        pk = self.to_pk(target_id)
+        if pk is None:
+            return False
+        if user.is_staff:
+            return self.lookup_model.objects.filter(pk=pk).exists()
+        if self.is_allowed:
+            return self.is_allowed(user, pk)
+        return self.lookup_model.objects.filter(pk=pk, **{self.owner_lookup: user}).exists()
+
+    @property
+    def storage(self):
+        return self.model._meta.get_field(self.file_field).storage
+
+    def attach(self, session, content=None, blob=None):
+        """
+        Saves `content` through the target's FileField (streamed into storage), or links the stored
+        `blob` (a SHA-256), on a new or existing object, which is not saved yet. Returns the object,
+        or None if the blob is no longer stored.
+        """
+        pk = self.to_pk(session.target_id)
+        if self.parent_field:
+            obj = self.model(**{f'{self.parent_field}_id': pk}, **{name: session.fields[name] for name in self.fields if name in session.fields})
+            if self.uploader_field:
+                setattr(obj, f'{self.uploader_field}_id', session.user_id)
+        else:
+            obj = self.model.objects.get(pk=pk)
+        if blob:
+            name = self.storage.link_blob(blob, getattr(obj, self.file_field).field.generate_filename(obj, session.filename))
+            if name is None:
+                return None
+            setattr(obj, self.file_field, name)
+        else:
+            getattr(obj, self.file_field).save(session.filename, content, save=False)
+        return obj
+
+
+_REGISTRY = {}
+
+
+def register_upload_target(target: UploadTarget):
+    _REGISTRY[target.name] = target
+    return target
+
+
+def get_upload_target(name):
+    """UploadTarget registered as `name`, or None."""
+    return _REGISTRY.get(name)
+
+
+def upload_target_names():
+    return sorted(_REGISTRY)
+
+
+def _is_project_member(user, project_id):
+    from apps.collaborations.membership import is_project_member # Cached membership index
+
+    return is_project_member(user, project_id)
+
+
+register_upload_target(UploadTarget(
+    'project_file', 'collaborations.ProjectFile', 'file', parent_field='project',
+    is_allowed=_is_project_member, uploader_field='uploaded_by', fields=('description',),
+))
+register_upload_target(UploadTarget(
+    'tech_pack', 'listings.TechPack', 'file', parent_field='design', owner_lookup='designer', fields=('version', 'notes'),
+))
+register_upload_target(UploadTarget('rfq_specifications', 'orders.RFQ', 'specifications_file', owner_lookup='buyer'))
+register_upload_target(UploadTarget('showcase_item_file', 'community_engagement.ShowcaseItem', 'file', owner_lookup='showcase__user'))
+
+
+class UploadError(Exception):
+    """A chunk or a completion request that can't be accepted; the message is shown to the client."""
+
+
+class _HashingReader(io.RawIOBase):
+    """Reads at most `length` bytes from `stream`, hashing them (SHA-256) on the way through."""
+
+    def __init__(self, stream, length):
+        self.stream = stream
+        self.remaining = length
+        self.read_bytes = 0
+        self.sha256 = hashlib.sha256()
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.stream.read(min(len(buffer), self.remaining)) if self.remaining else b''
+        self.remaining -= len(data)
+        self.read_bytes += len(data)
+        self.sha256.update(data)
+        buffer[:len(data)] = data
+        return len(data)
+
+
+class _ConcatenatedChunks(io.RawIOBase):
+    """The chunk files of a session read back to back from storage, one open file at a time."""
+
+    def __init__(self, paths):
+        self.paths = list(paths)
+        self.current = None
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while True:
+            if self.current is None:
+                if not self.paths:
+                    return 0
+                self.current = default_storage.open(self.paths.pop(0), 'rb')
+            data = self.current.read(len(buffer))
+            if data:
+                buffer[:len(data)] = data
+                return len(data)
+            self.current.close()
+            self.current = None
+
+    def close(self):
+        if self.current is not None:
+            self.current.close()
+        super().close()
+
+
+def _stream_file(raw, name, size):
+    content = File(io.BufferedReader(raw, buffer_size=File.DEFAULT_CHUNK_SIZE), name=name)
+    content.size = size # Storages that need it (e.g. S3 multipart thresholds) can't seek a stream
+    return content
+
+
+class ChunkedUploadService:
+
+    def create_session(self, user, target, target_id, filename, size, chunk_size=None, checksum='', fields=None):
+        return UploadSession.objects.create(
+            user=user, target=target.name, target_id=str(target_id), filename=filename, size=size,
+            chunk_size=chunk_size or settings.UPLOAD_CHUNK_SIZE, checksum=(checksum or '').lower(),
+            fields=fields or {}, expires_at=timezone.now() + timedelta(seconds=settings.UPLOAD_SESSION_TTL),
+        )
+
+    def receive_chunk(self, session, offset, stream, length, sha256=None) -> UploadChunk:
+        """
+        Streams one chunk (`length` bytes of `stream`, starting at byte `offset` of the file) into
+        storage. A chunk sent again (a retry) replaces the earlier copy.
+        """
+        if session.status != 'pending':
+            raise UploadError('This upload is no longer receiving chunks.')
+        if offset % session.chunk_size or offset >= session.size:
+            raise UploadError(f'Offsets are multiples of the chunk size ({session.chunk_size}) below the file size ({session.size}).')
+        index = offset // session.chunk_size
+        if length != session.chunk_length(index):
+            raise UploadError(f'The chunk at offset {offset} must be {session.chunk_length(index)} bytes.')
+
+        reader = _HashingReader(stream, length)
+        path = default_storage.save(f'{settings.UPLOAD_PART_DIR}/{session.pk}/{index}', _stream_file(reader, str(index), length))
+        digest = reader.sha256.hexdigest()
+        if reader.read_bytes != length or (sha256 and sha256.lower() != digest):
+            default_storage.delete(path)
+            raise UploadError('The chunk arrived incomplete or does not match its checksum; send it again.')
+
+        previous = UploadChunk.objects.filter(session=session, index=index).values_list('path', flat=True).first()
+        chunk, _ = UploadChunk.objects.update_or_create(
+            session=session, index=index, defaults={'size': length, 'sha256': digest, 'path': path},
+        )
+        if previous and previous != path:
+            transaction.on_commit(lambda: default_storage.delete(previous))
+        return chunk
+
+    def missing_offsets(self, session):
+        received = set(session.chunks.values_list('index', flat=True))
+        return [index * session.chunk_size for index in range(session.chunk_count) if index not in received]
+
+    def already_stored(self, session, target) -> bool:
+        """
+        Whether the session's file can be linked instead of uploaded: its checksum is content this
+        user has completed an upload of before, and the target's storage still holds it.
+        """
+        if not session.checksum or not hasattr(target.storage, 'link_blob'):
+            return False
+        return (
+            UploadSession.objects.filter(user_id=session.user_id, checksum=session.checksum, status='complete').exists()
+            and target.storage.has_blob(session.checksum)
+        )
+
+    def complete(self, session, target):
+        """
+        Assembles the chunks into the target's FileField (or links already stored content) and saves
+        the target object. The session is claimed first (pending -> assembling), so a repeated
+        request can't assemble it twice; copying the file happens outside any transaction.
+        """
+        missing = self.missing_offsets(session)
+        stored = bool(missing) and self.already_stored(session, target)
+        if missing and not stored:
+            raise UploadError(f'Chunks missing at offsets: {", ".join(map(str, missing[:20]))}.')
+        if not UploadSession.objects.filter(pk=session.pk, status='pending').update(status='assembling'):
+            raise UploadError('This upload is already being completed.')
+        session.status = 'assembling'
+        chunks = list(session.chunks.order_by('index'))
+        obj = None
+        try:
+            if stored:
+                obj = target.attach(session, blob=session.checksum)
+                if obj is None: # Garbage collected since already_stored()
+                    raise UploadError(f'Chunks missing at offsets: {", ".join(map(str, missing[:20]))}.')
+            else:
+                raw = _HashingReader(_ConcatenatedChunks(chunk.path for chunk in chunks), session.size)
+                obj = target.attach(session, _stream_file(raw, session.filename, session.size))
+                if session.checksum and raw.sha256.hexdigest() != session.checksum:
+                    raise UploadError('The assembled file does not match the checksum given when the upload started.')
+            with transaction.atomic():
+                obj.save()
+                session.status, session.result_id = 'complete', str(obj.pk)
+                session.save(update_fields=['status', 'result_id', 'updated_at'])
+        except Exception:
+            if obj is not None:
+                getattr(obj, target.file_field).storage.delete(getattr(obj, target.file_field).name)
+            UploadSession.objects.filter(pk=session.pk).update(status='pending')
+            session.status = 'pending'
+            raise
+        self.discard_chunks(session, chunks)
+        return obj
+
+    def discard_chunks(self, session, chunks=None):
+        chunks = list(session.chunks.all()) if chunks is None else chunks
+        for chunk in chunks:
+            default_storage.delete(chunk.path)
+        UploadChunk.objects.filter(pk__in=[chunk.pk for chunk in chunks]).delete()
+
+    def discard(self, session):
+        """Deletes a session and its chunk files (not a completed session's file)."""
+        self.discard_chunks(session)
+        session.delete()
+
+    def prune(self, now=None):
+        """
+        Discards unfinished sessions past their expiry. Returns how many. Completed sessions are kept:
+        they record which content each user has uploaded (see already_stored()).
+        """
+        sessions = list(UploadSession.objects.filter(expires_at__lt=now or timezone.now()).exclude(status='complete'))
+        for session in sessions:
+            self.discard(session)
+        return len(sessions)
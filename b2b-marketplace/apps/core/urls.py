@@ -0,0 +1,13 @@
+from django.urls import include, path
+from rest_framework.routers import DefaultRouter
+
+from .views import DownloadView, RequestMetricsView, UploadSessionViewSet
+
+router = DefaultRouter()
+router.register(r'uploads', UploadSessionViewSet, basename='upload')
+
+urlpatterns = [
+    path('metrics/requests/', RequestMetricsView.as_view(), name='request-metrics'),
+    path('downloads/<str:kind>/<str:pk>/', DownloadView.as_view(), name='download'),
+    path('', include(router.urls)),
+]
@@ -1,5 +1,8 @@
 import random
 import string
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
 from django.utils.text import slugify
 
 def generate_random_string(length=10, chars=string.ascii_lowercase + string.digits):
@@ -81,4 +84,11 @@ class ApiResponse:
 # - Email sending helpers (though Django has built-in mail functions)
 # - Date/time manipulation utilities
 # - File handling utilities (e.g., custom storage backends, file validators)
-# - Third-party API integration helpers (if generic enough)
\ No newline at end of file
+# - Third-party API integration helpers (if generic enough)
+
+def cache_is_shared(alias='default'):
+    """
+    False for cache backends that live inside one process (local memory, dummy): what one worker
+    stores or deletes there is never seen by the others, so cross-request invalidation can't work.
+    """
+    return not isinstance(caches[alias], (LocMemCache, DummyCache))
@@ -0,0 +1,122 @@
+# apps/core/views.py
+from django.conf import settings
+from django.db.models import Prefetch
+from rest_framework import mixins, permissions, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, PermissionDenied
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .downloads import get_download_target, serve_file
+from .instrumentation import metrics_store
+from .models import UploadChunk, UploadSession
+from .serializers import UploadSessionSerializer
+from .uploads import ChunkedUploadService, UploadError, get_upload_target
+
+
+class RequestMetricsView(APIView):
+    """
+    Admin-only: query count, SQL time, serializer time, total time and response size percentiles
+    per endpoint (URL name + viewset action) for this worker process, from the requests sampled
+    while REQUEST_INSTRUMENTATION is on. DELETE clears the samples.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        endpoints = metrics_store.summary()
+        prefix = request.query_params.get('endpoint')
+        if prefix:
+            endpoints = [endpoint for endpoint in endpoints if endpoint['endpoint'].startswith(prefix)]
+        return Response({
+            'enabled': settings.REQUEST_INSTRUMENTATION,
+            'sample_rate': settings.REQUEST_INSTRUMENTATION_SAMPLE_RATE,
+            'sample_limit': metrics_store.max_samples,
+            'endpoints': endpoints,
+        })
+
+    def delete(self, request, *args, **kwargs):
+        metrics_store.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class DownloadView(APIView):
+    """
+    Downloads a private file after checking the user may have it (apps/core/downloads.py). The
+    transfer itself is handed to the front proxy where one is configured (MEDIA_SENDFILE).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    query_budgets = {'get': 4}
+
+    def get(self, request, kind, pk):
+        target = get_download_target(kind)
+        obj = target.get_object(pk) if target else None
+        fieldfile = getattr(obj, target.file_field) if obj is not None else None
+        if not fieldfile:
+            raise NotFound()
+        if not target.allowed(request.user, obj):
+            raise PermissionDenied("You can't download this file.")
+        try:
+            return serve_file(request, fieldfile)
+        except FileNotFoundError:
+            raise NotFound('The file is missing from storage.')
+
+
+class UploadSessionViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, mixins.DestroyModelMixin, viewsets.GenericViewSet):
+    """
+    Resumable chunked uploads (the protocol is described in apps/core/uploads.py). Users only see
+    their own sessions; DELETE abandons one and removes the chunks received so far.
+    """
+    serializer_class = UploadSessionSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    service = ChunkedUploadService()
+
+    def get_queryset(self):
+        queryset = UploadSession.objects.filter(user=self.request.user)
+        if self.action == 'retrieve':
+            queryset = queryset.prefetch_related(Prefetch('chunks', queryset=UploadChunk.objects.only('session_id', 'index')))
+        return queryset
+
+    def perform_create(self, serializer):
+        target = get_upload_target(serializer.validated_data['target'])
+        if not target.allowed(self.request.user, serializer.validated_data['target_id']):
+            raise PermissionDenied("You can't upload files for this object.")
+        session = self.service.create_session(user=self.request.user, target=target, **{
+            name: value for name, value in serializer.validated_data.items() if name != 'target'
+        })
+        if self.service.already_stored(session, target):
+            self.service.complete(session, target) # Nothing to upload: the response says complete
+        serializer.instance = session
+
+    def perform_destroy(self, instance):
+        self.service.discard(instance)
+
+    @action(detail=True, methods=['put'], url_path=r'chunks/(?P<offset>\d+)')
+    def upload_chunk(self, request, pk=None, offset=None):
+        """
+        Raw chunk bytes as the body (not multipart), read from the request stream straight into
+        storage. X-Chunk-SHA256, if sent, must match the chunk.
+        """
+        session = self.get_object()
+        try:
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = 0
+        try:
+            chunk = self.service.receive_chunk(session, int(offset), request._request, length, request.META.get('HTTP_X_CHUNK_SHA256'))
+        except UploadError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'offset': chunk.index * session.chunk_size, 'size': chunk.size, 'sha256': chunk.sha256})
+
+    @action(detail=True, methods=['post'])
+    def complete(self, request, pk=None):
+        session = self.get_object()
+        if session.status == 'complete':
+            return Response(self.get_serializer(session).data) # Already done, e.g. a retried request
+        target = get_upload_target(session.target)
+        if not target.allowed(request.user, session.target_id): # Access may have changed since the upload started
+            raise PermissionDenied("You can't upload files for this object.")
+        try:
+            self.service.complete(session, target)
+        except UploadError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(self.get_serializer(session).data)
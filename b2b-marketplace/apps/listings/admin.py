@@ -20,16 +20,16 @@ class TechPackInline(admin.StackedInline): # Or admin.TabularInline
 
 @admin.register(Material)
 class MaterialAdmin(admin.ModelAdmin):
-    list_display = ('name', 'seller', 'category', 'price_per_unit', 'unit', 'stock_quantity', 'is_active', 'created_at')
+    list_display = ('name', 'seller', 'category', 'price_per_unit', 'currency', 'unit', 'stock_quantity', 'is_active', 'created_at')
     list_filter = ('is_active', 'category', 'seller__user_type')
     search_fields = ('name', 'description', 'seller__username')
-    readonly_fields = ('created_at', 'updated_at', 'slug')
+    readonly_fields = ('created_at', 'updated_at', 'slug', 'price_per_unit_base')
     fieldsets = (
         (None, {
             'fields': ('seller', 'name', 'slug', 'description', 'category', 'tags')
         }),
         ('Pricing & Stock', {
-            'fields': ('price_per_unit', 'unit', 'minimum_order_quantity', 'stock_quantity', 'sku')
+            'fields': ('price_per_unit', 'currency', 'price_per_unit_base', 'unit', 'minimum_order_quantity', 'stock_quantity', 'sku')
         }),
         ('Properties', {
             'fields': ('composition', 'weight_gsm', 'width_cm', 'country_of_origin', 'lead_time_days')
@@ -57,7 +57,7 @@ class DesignAdmin(admin.ModelAdmin):
             'fields': ('designer', 'title', 'description', 'category', 'tags') # slug removed as it's readonly and auto
         }),
         ('Pricing & Details', {
-            'fields': ('price', 'licensing_terms')
+            'fields': ('price', 'currency', 'licensing_terms')
         }),
         ('Media & Status', {
             # 'fields': ('thumbnail_image', 'design_files', 'is_active', 'certifications') # OLD
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:18
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_price_per_unit_base(apps, schema_editor):
+    # Every existing listing was implicitly priced in the base currency.
+    Material = apps.get_model('listings', 'Material')
+    Material.objects.filter(currency=getattr(settings, 'BASE_CURRENCY', 'USD').upper()).update(
+        price_per_unit_base=F('price_per_unit')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0003_remove_techpack_uploaded_at_design_average_rating_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='design',
+            name='currency',
+            field=models.CharField(default='USD', help_text='ISO 4217 code the listing is priced in', max_length=3),
+        ),
+        migrations.AddField(
+            model_name='material',
+            name='currency',
+            field=models.CharField(default='USD', help_text='ISO 4217 code the listing is priced in', max_length=3),
+        ),
+        migrations.AddField(
+            model_name='material',
+            name='price_per_unit_base',
+            field=models.DecimalField(blank=True, db_index=True, decimal_places=2, editable=False, max_digits=14, null=True),
+        ),
+        migrations.RunPython(backfill_price_per_unit_base, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0004_design_currency_material_currency_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='design',
+            name='seller_reputation',
+            field=models.DecimalField(blank=True, db_index=True, decimal_places=2, editable=False, max_digits=5, null=True),
+        ),
+        migrations.AddField(
+            model_name='material',
+            name='seller_reputation',
+            field=models.DecimalField(blank=True, db_index=True, decimal_places=2, editable=False, max_digits=5, null=True),
+        ),
+    ]
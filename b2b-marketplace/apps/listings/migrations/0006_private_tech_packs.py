@@ -0,0 +1,19 @@
+from django.db import migrations
+
+from apps.core.downloads import move_to_private_media
+
+
+def move_files_to_private_media(apps, schema_editor):
+    """Moves TechPack.file uploads made before private/ existed into it (see apps.core.downloads)."""
+    move_to_private_media(apps.get_model('listings', 'TechPack'), 'file')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0005_design_seller_reputation_material_seller_reputation'),
+    ]
+
+    operations = [
+        migrations.RunPython(move_files_to_private_media, migrations.RunPython.noop),
+    ]
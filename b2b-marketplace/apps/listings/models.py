@@ -5,6 +5,7 @@ from django.db import models
 from django.conf import settings
 from django.utils.text import slugify
 from apps.core.models import AbstractBaseModel # Corrected import path assuming core is top-level
+from apps.core.currency import get_base_currency, to_base
 
 # --- Upload Path Helper Functions ---
 def get_listing_image_upload_path(instance, filename):
@@ -33,14 +34,14 @@ def get_design_thumbnail_upload_path(instance, filename):
 def get_tech_pack_upload_path(instance, filename):
     """
     Generates a unique upload path for TechPack files.
-    Example: designs/tech_packs/design_slug_or_id/uuid_filename.ext
+    Example: private/designs/tech_packs/design_slug_or_id/uuid_filename.ext (private: see apps.core.downloads)
     """
     ext = filename.split('.')[-1]
     new_filename = f"{uuid.uuid4()}.{ext}"
     # Using design's slug or ID for subfolder if desired for organization
     design_identifier = instance.design.slug if instance.design and instance.design.slug else str(instance.design.id)
     date_path = datetime.datetime.now().strftime('%Y/%m/%d') # Optional: add date path too
-    return os.path.join('designs', 'tech_packs', design_identifier, date_path, new_filename)
+    return os.path.join('private', 'designs', 'tech_packs', design_identifier, date_path, new_filename)
 
 def get_certification_file_upload_path(instance, filename):
     """
@@ -118,10 +119,14 @@ class BaseListing(AbstractBaseModel):
     is_verified = models.BooleanField(default=False)
     main_image = models.ImageField(upload_to=get_listing_image_upload_path, blank=True, null=True)
     certifications = models.ManyToManyField(Certification, blank=True)
+    currency = models.CharField(max_length=3, default='USD', help_text="ISO 4217 code the listing is priced in")
 
     # Fields for average rating and review count
     average_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.00, null=True, blank=True)
     review_count = models.PositiveIntegerField(default=0, null=True, blank=True)
+    # Copy of the seller's Profile.reputation_score, kept in sync by apps.accounts.reputation,
+    # so listings can be ordered by seller reputation without joining profiles
+    seller_reputation = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True, db_index=True, editable=False)
 
     class Meta:
         abstract = True
@@ -173,6 +178,9 @@ class Material(BaseListing):
     )
     seller = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='materials_listed', limit_choices_to={'user_type__in': ['seller', 'manufacturer']})
     price_per_unit = models.DecimalField(max_digits=10, decimal_places=2)
+    # price_per_unit converted to settings.BASE_CURRENCY. Maintained on save and refreshed in bulk
+    # when exchange rates change, so price filters/ordering compare like with like.
+    price_per_unit_base = models.DecimalField(max_digits=14, decimal_places=2, null=True, blank=True, db_index=True, editable=False)
     unit = models.CharField(max_length=10, choices=UNIT_CHOICES, default='m')
     minimum_order_quantity = models.PositiveIntegerField(default=1)
     stock_quantity = models.PositiveIntegerField(null=True, blank=True)
@@ -189,8 +197,14 @@ class Material(BaseListing):
 
     def __str__(self):
         return f"{self.name} (by {self.seller.username})"
-    
-    # No need to override save() for slug if BaseListing's save correctly uses self.name
+
+    def save(self, *args, **kwargs):
+        self.currency = (self.currency or get_base_currency()).upper()
+        self.price_per_unit_base = to_base(self.price_per_unit, self.currency)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'price_per_unit', 'currency'} & set(update_fields):
+            kwargs['update_fields'] = list(update_fields) + ['price_per_unit_base']
+        super().save(*args, **kwargs) # BaseListing.save() still handles the slug
 
 
 class Design(BaseListing):
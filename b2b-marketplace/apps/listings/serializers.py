@@ -3,6 +3,8 @@ from .models import Category, Material, Design, TechPack, Certification, Tag
 from apps.accounts.serializers import UserSerializer # For seller/designer info
 from django.conf import settings
 from django.contrib.auth import get_user_model # ADD THIS
+from apps.core.currency import is_supported_currency
+from apps.core.serializers import DownloadURLField
 
 User = get_user_model()
 
@@ -20,6 +22,9 @@ class CategorySerializer(serializers.ModelSerializer):
         read_only_fields = ['slug']
 
     def get_subcategories_count(self, obj):
+        # Listing querysets prefetch 'category__subcategories'; counting in Python avoids a query per row
+        if 'subcategories' in getattr(obj, '_prefetched_objects_cache', {}):
+            return len(obj.subcategories.all())
         return obj.subcategories.count()
 
 class CertificationSerializer(serializers.ModelSerializer):
@@ -28,10 +33,16 @@ class CertificationSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 class TechPackSerializer(serializers.ModelSerializer):
+    file_url = DownloadURLField('tech_pack')
+    uploaded_at = serializers.DateTimeField(source='created_at', read_only=True) # The model has no uploaded_at
+
     class Meta:
         model = TechPack
-        fields = ['id', 'design', 'file', 'version', 'notes', 'uploaded_at']
-        read_only_fields = ['uploaded_at']
+        fields = ['id', 'design', 'file', 'file_url', 'version', 'notes', 'uploaded_at']
+        read_only_fields = ['file_url']
+        extra_kwargs = {
+            'file': {'write_only': True}
+        }
 
 class MaterialSerializer(serializers.ModelSerializer):
     seller = UserSerializer(read_only=True)
@@ -62,15 +73,16 @@ class MaterialSerializer(serializers.ModelSerializer):
             'id', 'seller', 'seller_id', 'name', 'slug', 'description', 'category', 'category_id',
             'tags', 'tag_ids', 'is_active', 'is_verified', 'main_image', 'main_image_url', # <-- ADDED main_image_url HERE
             'additional_images', 'certifications', 'certification_ids',
-            'price_per_unit', 'unit', 'minimum_order_quantity', 'stock_quantity', 'sku',
+            'price_per_unit', 'currency', 'price_per_unit_base', 'unit', 'minimum_order_quantity', 'stock_quantity', 'sku',
             'composition', 'weight_gsm', 'width_cm', 'country_of_origin', 'lead_time_days',
-            'average_rating', 'review_count',
+            'average_rating', 'review_count', 'seller_reputation',
             'created_at', 'updated_at'
         ]
         # 'main_image_url' is already set as read_only=True in its definition,
         # so explicitly adding it to read_only_fields here is redundant but doesn't hurt.
         read_only_fields = ('id', 'slug', 'is_verified', 'created_at', 'updated_at', 'seller', 
-                            'average_rating', 'review_count', 'main_image_url') # main_image_url is here
+                            'average_rating', 'review_count', 'main_image_url', # main_image_url is here
+                            'price_per_unit_base', 'seller_reputation')
         extra_kwargs = {
             'main_image': {'required': False, 'allow_null': True},
             'category_id': {'required': True}, # Make sure this is intended. If category can be optional, set required=False.
@@ -80,6 +92,12 @@ class MaterialSerializer(serializers.ModelSerializer):
             'lead_time_days': {'required': False, 'allow_null': True},
         }
 
+    def validate_currency(self, value):
+        value = value.upper()
+        if not is_supported_currency(value):
+            raise serializers.ValidationError(f"No exchange rate configured for currency '{value}'.")
+        return value
+
 class DesignSerializer(serializers.ModelSerializer):
     designer = UserSerializer(read_only=True)
     designer_id = serializers.PrimaryKeyRelatedField(
@@ -107,11 +125,17 @@ class DesignSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'designer', 'designer_id', 'title', 'slug', 'description', 'category', 'category_id',
             'tags', 'tag_ids', 'is_active', 'is_verified', 'thumbnail_image', 'thumbnail_image_url',
-            'certifications', 'certification_ids', 'price', 'licensing_terms',
-            'design_files_link', 'tech_packs',
+            'certifications', 'certification_ids', 'price', 'currency', 'licensing_terms',
+            'design_files_link', 'tech_packs', 'seller_reputation',
             'created_at', 'updated_at'
         ]
-        read_only_fields = ('slug', 'is_verified', 'created_at', 'updated_at', 'thumbnail_image_url')
+        read_only_fields = ('slug', 'is_verified', 'created_at', 'updated_at', 'thumbnail_image_url', 'seller_reputation')
         extra_kwargs = {
             'thumbnail_image': {'write_only': True, 'required': False},
-        }
\ No newline at end of file
+        }
+
+    def validate_currency(self, value):
+        value = value.upper()
+        if not is_supported_currency(value):
+            raise serializers.ValidationError(f"No exchange rate configured for currency '{value}'.")
+        return value
\ No newline at end of file
@@ -1,3 +1,52 @@
-from django.test import TestCase
+from decimal import Decimal
 
-# Create your tests here.
+from django.urls import reverse
+
+from apps.core.testing import QueryBudgetAPITestCase, seed_marketplace
+from .models import Material, Design
+
+
+class ListingQueryBudgetTests(QueryBudgetAPITestCase):
+    """Material/Design list and detail endpoints stay within their declared query budgets."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_marketplace()
+
+    def setUp(self):
+        self.client.force_authenticate(self.data['buyers'][0])
+
+    def test_material_list(self):
+        self.get_within_budget(reverse('material-list'), 'listings.material-list')
+
+    def test_material_list_query_count_independent_of_rows(self):
+        seller = self.data['sellers'][0]
+
+        def add_materials():
+            for i in range(3):
+                material = Material.objects.create(
+                    name=f'Extra material {i}', description='Twill', seller=seller,
+                    category=self.data['category'], price_per_unit=Decimal('7.00'),
+                )
+                material.tags.set(self.data['tags'])
+
+        self.get_within_budget(reverse('material-list'), None, grow=add_materials, data={'seller__username': seller.username})
+
+    def test_material_detail(self):
+        material = self.data['materials'][0]
+        self.get_within_budget(reverse('material-detail', kwargs={'slug': material.slug}), 'listings.material-detail')
+
+    def test_design_list(self):
+        designer = self.data['designers'][0]
+
+        def add_designs():
+            for i in range(3):
+                design = Design.objects.create(title=f'Extra design {i}', description='Jacquard', designer=designer, price=Decimal('80.00'))
+                design.tags.set(self.data['tags'])
+
+        self.get_within_budget(reverse('design-list'), 'listings.design-list')
+        self.get_within_budget(reverse('design-list'), None, grow=add_designs, data={'designer__username': designer.username})
+
+    def test_design_detail(self):
+        design = self.data['designs'][0]
+        self.get_within_budget(reverse('design-detail', kwargs={'slug': design.slug}), 'listings.design-detail')
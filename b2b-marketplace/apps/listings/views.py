@@ -81,6 +81,10 @@ class MaterialViewSet(viewsets.ModelViewSet):
         'tags__slug': ['in'],
         'country_of_origin': ['exact', 'in'],
         'price_per_unit': ['gte', 'lte', 'exact'],
+        # Base-currency price; use this to compare across sellers pricing in different currencies
+        'price_per_unit_base': ['gte', 'lte'],
+        'currency': ['exact', 'in'],
+        'seller_reputation': ['gte'], # Denormalized seller score, e.g. ?seller_reputation__gte=80
         'is_verified': ['exact'],
         'is_active': ['exact'], # Allows explicit filtering by active status
         'unit': ['exact', 'in'],
@@ -96,8 +100,11 @@ class MaterialViewSet(viewsets.ModelViewSet):
         'category__name',   # Search by category name
         'tags__name'        # Search by tag names
     ]
-    ordering_fields = ['name', 'price_per_unit', 'created_at', 'updated_at', 'stock_quantity', 'average_rating']
+    # seller_reputation is a column on the listing itself, so ?ordering=-seller_reputation needs no join
+    ordering_fields = ['name', 'price_per_unit', 'price_per_unit_base', 'created_at', 'updated_at', 'stock_quantity', 'average_rating', 'seller_reputation']
     ordering = ['-created_at'] # Default ordering
+    # Page size doesn't matter: relations are select_related / prefetched
+    query_budgets = {'list': 6, 'retrieve': 6}
 
     def get_queryset(self):
         """
@@ -117,7 +124,8 @@ class MaterialViewSet(viewsets.ModelViewSet):
             'category'
         ).prefetch_related(
             'tags', 
-            'certifications'
+            'certifications',
+            'category__subcategories', # For CategorySerializer.subcategories_count
         )
 
         # Admins can see everything, filters will apply on top of this
@@ -172,7 +180,7 @@ class MaterialViewSet(viewsets.ModelViewSet):
         instance.delete()
 
 class DesignViewSet(viewsets.ModelViewSet):
-    queryset = Design.objects.filter(is_active=True).select_related('designer__profile', 'category').prefetch_related('tags', 'certifications', 'tech_packs')
+    queryset = Design.objects.filter(is_active=True).select_related('designer__profile', 'category').prefetch_related('tags', 'certifications', 'tech_packs', 'category__subcategories')
     serializer_class = DesignSerializer
     permission_classes = [IsDesignerOrAdminOrReadOnly]
     lookup_field = 'slug'
@@ -183,10 +191,12 @@ class DesignViewSet(viewsets.ModelViewSet):
         'tags__slug': ['in'],
         'price': ['gte', 'lte'],
         'is_verified': ['exact'],
+        'seller_reputation': ['gte'],
     }
     search_fields = ['title', 'description', 'designer__username', 'category__name', 'tags__name']
-    ordering_fields = ['title', 'price', 'created_at']
+    ordering_fields = ['title', 'price', 'created_at', 'seller_reputation']
     ordering = ['-created_at']
+    query_budgets = {'list': 6, 'retrieve': 6}
 
     def perform_create(self, serializer):
         if self.request.user.user_type not in ['designer', 'admin']:
@@ -196,11 +206,11 @@ class DesignViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         qs = super().get_queryset()
         if self.request.user.is_staff or self.request.user.is_superuser:
-            return Design.objects.all().select_related('designer__profile', 'category').prefetch_related('tags', 'certifications', 'tech_packs')
+            return Design.objects.all().select_related('designer__profile', 'category').prefetch_related('tags', 'certifications', 'tech_packs', 'category__subcategories')
         
         owner_filter = self.request.query_params.get('owner', None)
         if owner_filter == 'me' and self.request.user.is_authenticated:
-            return Design.objects.filter(designer=self.request.user).select_related('designer__profile', 'category').prefetch_related('tags', 'certifications', 'tech_packs')
+            return Design.objects.filter(designer=self.request.user).select_related('designer__profile', 'category').prefetch_related('tags', 'certifications', 'tech_packs', 'category__subcategories')
 
         return qs
 
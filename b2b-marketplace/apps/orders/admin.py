@@ -127,7 +127,7 @@ class OrderItemInline(admin.TabularInline):
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = ('id', 'buyer_username', 'order_total_display', 'status', 'item_count', 'related_quote_id_display', 'created_at', 'payment_intent_id')
-    list_filter = ('status', 'buyer__username', 'created_at')
+    list_filter = ('status', 'currency', 'buyer__username', 'created_at')
     search_fields = ('id__iexact', 'buyer__username', 'payment_intent_id', 'items__material__name', 'items__design__title')
     readonly_fields = ('id', 'order_total', 'created_at', 'updated_at', 'item_count', 'buyer_username', 'related_quote_id_display')
     inlines = [OrderItemInline]
@@ -141,8 +141,7 @@ class OrderAdmin(admin.ModelAdmin):
     buyer_username.admin_order_field = 'buyer__username'
 
     def order_total_display(self, obj):
-        # Assuming currency is on the order or can be derived
-        return f"{obj.order_total} {getattr(obj, 'currency', 'USD')}"
+        return f"{obj.order_total} {obj.currency}"
     order_total_display.short_description = "Order Total"
     order_total_display.admin_order_field = 'order_total'
     
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:58
+
+from django.db import migrations, models
+
+from apps.core.downloads import move_to_private_media
+
+
+def move_files_to_private_media(apps, schema_editor):
+    """Moves RFQ.specifications_file uploads made before private/ existed into it (see apps.core.downloads)."""
+    move_to_private_media(apps.get_model('orders', 'RFQ'), 'specifications_file')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0005_order_currency'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='rfq',
+            name='specifications_file',
+            field=models.FileField(blank=True, null=True, upload_to='private/rfqs/specifications/%Y/%m/%d/'),
+        ),
+        migrations.RunPython(move_files_to_private_media, migrations.RunPython.noop),
+    ]
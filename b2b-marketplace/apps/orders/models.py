@@ -35,7 +35,7 @@ class RFQ(AbstractBaseModel): # Inherits created_at, updated_at from AbstractBas
     )
     title = models.CharField(max_length=255)
     description = models.TextField()
-    specifications_file = models.FileField(upload_to='rfqs/specifications/%Y/%m/%d/', blank=True, null=True)
+    specifications_file = models.FileField(upload_to='private/rfqs/specifications/%Y/%m/%d/', blank=True, null=True)
     quantity_required = models.PositiveIntegerField(blank=True, null=True)
     unit_of_measurement = models.CharField(max_length=50, blank=True, null=True)
     deadline_for_quotes = models.DateTimeField(null=True, blank=True)
@@ -132,7 +132,7 @@ class Order(AbstractBaseModel): # Inherits created_at, updated_at
         limit_choices_to={'user_type': 'buyer'}
     )
     order_total = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
-    # currency = models.CharField(max_length=3, default='USD') # Consider adding
+    currency = models.CharField(max_length=3, default='USD') # Currency of order_total and all item unit prices
     status = models.CharField(max_length=30, choices=ORDER_STATUS_CHOICES, default='pending_payment')
     shipping_address = models.TextField(blank=True, null=True)
     billing_address = models.TextField(blank=True, null=True)
@@ -190,6 +190,13 @@ class OrderItem(AbstractBaseModel): # Inherits created_at, updated_at
         related_name='sold_items',
         limit_choices_to={'user_type__in': ['seller', 'manufacturer', 'designer']}
     )
+    # Set by the payout engine once the item has been paid out; NULL means "not yet paid out".
+    payout_batch = models.ForeignKey(
+        'payments_monetization.PayoutBatch',
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='order_items'
+    )
 
     class Meta:
         verbose_name = "Order Item"
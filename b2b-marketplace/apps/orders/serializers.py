@@ -1,6 +1,7 @@
 # apps/orders/serializers.py
 from rest_framework import serializers
 from django.db import transaction
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 from decimal import Decimal
 from django.core.validators import MinValueValidator
@@ -8,6 +9,8 @@ from django.core.validators import MinValueValidator
 from .models import RFQ, Quote, Order, OrderItem
 from apps.accounts.serializers import UserSerializer
 from apps.listings.models import Material, Design
+from apps.core.currency import is_supported_currency
+from apps.core.serializers import DownloadURLField
 # from apps.listings.serializers import MaterialSerializer, DesignSerializer # Only if used for read_only nested display
 
 User = get_user_model()
@@ -18,7 +21,7 @@ class RFQSerializer(serializers.ModelSerializer):
         queryset=User.objects.filter(user_type='buyer'), source='buyer', write_only=True, required=False
     ) # required=False if perform_create sets it
     quotes_count = serializers.IntegerField(source='quotes.count', read_only=True)
-    specifications_file_url = serializers.FileField(source='specifications_file', read_only=True, required=False)
+    specifications_file_url = DownloadURLField('rfq_specifications')
 
     class Meta:
         model = RFQ
@@ -83,7 +86,7 @@ class QuoteSerializer(serializers.ModelSerializer):
             supplier_instance = data.get('supplier', request.user if request else None)
             if rfq.status not in ['open', 'pending']:
                  raise serializers.ValidationError(f"Cannot submit quote for RFQ with status '{rfq.status}'.")
-            if rfq.deadline_for_quotes and rfq.deadline_for_quotes < serializers.DateTimeField().to_internal_value(None).date():
+            if rfq.deadline_for_quotes and rfq.deadline_for_quotes < timezone.now():
                  raise serializers.ValidationError("The deadline for this RFQ has passed.")
             if rfq.buyer == supplier_instance: # Compare RFQ buyer with resolved supplier instance
                 raise serializers.ValidationError("You cannot submit a quote for your own RFQ.")
@@ -91,7 +94,7 @@ class QuoteSerializer(serializers.ModelSerializer):
         return data
 
 class OrderItemSerializer(serializers.ModelSerializer):
-    item_name_display = serializers.CharField(source='item_name_display', read_only=True, required=False)
+    item_name_display = serializers.CharField(read_only=True, required=False)
     subtotal = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True, required=False)
     seller_username = serializers.CharField(source='seller.username', read_only=True, allow_null=True, required=False)
 
@@ -144,7 +147,7 @@ class OrderSerializer(serializers.ModelSerializer):
     class Meta:
         model = Order
         fields = [
-            'id', 'buyer', 'items', 'order_total', 'order_total_display', 'status',
+            'id', 'buyer', 'items', 'order_total', 'order_total_display', 'currency', 'status',
             'shipping_address', 'billing_address', 'payment_intent_id',
             'related_quote_id', 'related_quote_details', 
             'created_at', 'updated_at'
@@ -152,6 +155,14 @@ class OrderSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', 'buyer', 'order_total', 'order_total_display', 'status', 
                             'payment_intent_id', 'created_at', 'updated_at', 'related_quote_details')
 
+    def validate_currency(self, value):
+        value = value.upper()
+        if self.instance and value != self.instance.currency:
+            raise serializers.ValidationError("Currency cannot be changed after the order is created.")
+        if not is_supported_currency(value):
+            raise serializers.ValidationError(f"Unsupported currency: {value}")
+        return value
+
     def validate_items(self, items_data):
         if not items_data:
             raise serializers.ValidationError("Order must contain at least one item.")
@@ -171,31 +182,27 @@ class OrderSerializer(serializers.ModelSerializer):
         
         order = Order.objects.create(buyer=buyer_instance, **order_specific_data)
 
-        for item_data_from_payload in items_payload:
-            # item_data_from_payload is what OrderItemSerializer expects for its fields
-            # 'material' or 'design' are resolved from 'material_id'/'design_id' by OrderItemSerializer
-            item_serializer = OrderItemSerializer(data=item_data_from_payload, context=self.context)
-            if item_serializer.is_valid(raise_exception=True):
-                validated_item_data = item_serializer.validated_data
-                
-                material_instance = validated_item_data.pop('material', None)
-                design_instance = validated_item_data.pop('design', None)
-                
-                item_seller = None
-                if material_instance:
-                    item_seller = material_instance.seller
-                elif design_instance:
-                    item_seller = design_instance.designer
-                # Add logic for custom item seller if needed
-
-                OrderItem.objects.create(
-                    order=order,
-                    material=material_instance,
-                    design=design_instance,
-                    seller=item_seller,
-                    **validated_item_data # quantity, unit_price, custom_item_description
-                )
-            # else: errors raised by raise_exception=True
+        for validated_item_data in items_payload:
+            # Already validated by the nested OrderItemSerializer: 'material'/'design' are instances
+            # resolved from 'material_id'/'design_id'. (Re-validating them as input data would drop both.)
+            validated_item_data = dict(validated_item_data)
+            material_instance = validated_item_data.pop('material', None)
+            design_instance = validated_item_data.pop('design', None)
+
+            item_seller = None
+            if material_instance:
+                item_seller = material_instance.seller
+            elif design_instance:
+                item_seller = design_instance.designer
+            # Add logic for custom item seller if needed
+
+            OrderItem.objects.create(
+                order=order,
+                material=material_instance,
+                design=design_instance,
+                seller=item_seller,
+                **validated_item_data # quantity, unit_price, custom_item_description
+            )
         
         order.update_total(commit=True)
         return order
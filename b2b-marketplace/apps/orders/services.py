@@ -6,6 +6,7 @@ from decimal import Decimal
 
 from .models import Order, OrderItem, Quote, RFQ
 from apps.listings.models import Material, Design
+from apps.core.currency import convert, get_base_currency, is_supported_currency
 # from apps.payments_monetization.services import PaymentService # Assuming a PaymentService for payment processing
 
 User = settings.AUTH_USER_MODEL
@@ -18,7 +19,7 @@ class OrderService:
     @transaction.atomic
     def create_order(self, buyer: User, items_data: list,
                      shipping_address: str = None, billing_address: str = None,
-                     related_quote_id: str = None) -> Order:
+                     related_quote_id: str = None, currency: str = None) -> Order:
         """
         Creates a new order.
         items_data: list of dicts, e.g.,
@@ -28,6 +29,9 @@ class OrderService:
         """
         if buyer.user_type != 'buyer' and not buyer.is_staff:
             raise PermissionDenied("Only buyers can create orders.")
+        currency = (currency or get_base_currency()).upper()
+        if not is_supported_currency(currency):
+            raise DjangoValidationError(f"Unsupported currency: {currency}")
 
         related_quote = None
         if related_quote_id:
@@ -50,6 +54,7 @@ class OrderService:
             shipping_address=shipping_address,
             billing_address=billing_address,
             related_quote=related_quote,
+            currency=currency,
             status='pending_payment' # Initial status
         )
 
@@ -90,7 +95,7 @@ class OrderService:
                     try:
                         product_obj = Material.objects.get(id=material_id, is_active=True)
                         seller = product_obj.seller
-                        unit_price = Decimal(unit_price) if unit_price is not None else product_obj.price_per_unit
+                        unit_price = Decimal(unit_price) if unit_price is not None else convert(product_obj.price_per_unit, product_obj.currency, currency)
                         # Check stock if applicable (simplified here)
                         # if product_obj.stock_quantity is not None and product_obj.stock_quantity < quantity:
                         #     raise DjangoValidationError(f"Not enough stock for {product_obj.name}")
@@ -101,7 +106,7 @@ class OrderService:
                     try:
                         product_obj = Design.objects.get(id=design_id, is_active=True)
                         seller = product_obj.designer
-                        unit_price = Decimal(unit_price) if unit_price is not None else product_obj.price
+                        unit_price = Decimal(unit_price) if unit_price is not None else convert(product_obj.price, product_obj.currency, currency)
                     except Design.DoesNotExist:
                         order.delete()
                         raise DjangoValidationError(f"Design with id {design_id} not found or inactive.")
@@ -123,7 +128,7 @@ class OrderService:
                     order.delete()
                     raise DjangoValidationError("Each order item must specify a product or custom description.")
 
-                if unit_price is None : # Should be caught earlier
+                if unit_price is None : # Price missing, or no exchange rate for the listing's currency
                     order.delete()
                     raise DjangoValidationError("Unit price could not be determined for an item.")
 
@@ -246,7 +251,7 @@ class OrderService:
         # try:
         #     payment_intent = payment_service.create_payment_intent(
         #         amount=int(order.order_total * 100), # Amount in cents
-        #         currency='usd', # Or your default currency
+        #         currency=order.currency.lower(),
         #         description=f"Order {order.id} for {order.buyer.username}",
         #         order_id=str(order.id),
         #         customer_id=order.buyer.stripe_customer_id # If you store Stripe customer IDs
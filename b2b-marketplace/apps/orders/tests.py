@@ -1,3 +1,32 @@
-from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from apps.core.testing import QueryBudgetAPITestCase, seed_marketplace
+from .models import Order, OrderItem
+
+
+class OrderQueryBudgetTests(QueryBudgetAPITestCase):
+    """Order list/detail stay within their query budgets however many items the orders have."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_marketplace()
+
+    def test_order_list(self):
+        buyer = self.data['buyers'][0]
+        self.client.force_authenticate(buyer)
+
+        def add_orders():
+            for material in self.data['materials'][-3:]:
+                order = Order.objects.create(buyer=buyer, status='processing')
+                OrderItem.objects.create(order=order, material=material, seller=material.seller, quantity=1, unit_price=material.price_per_unit)
+
+        self.get_within_budget(reverse('order-list'), 'orders.order-list', grow=add_orders)
+
+    def test_order_list_as_seller(self):
+        self.client.force_authenticate(self.data['sellers'][0])
+        self.get_within_budget(reverse('order-list'), 'orders.order-list-seller')
+
+    def test_order_detail(self):
+        order = self.data['orders'][0]
+        self.client.force_authenticate(order.buyer)
+        self.get_within_budget(reverse('order-detail', kwargs={'id': order.id}), 'orders.order-detail')
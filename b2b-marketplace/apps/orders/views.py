@@ -189,6 +189,7 @@ class OrderViewSet(viewsets.ModelViewSet):
     # permission_classes = [permissions.IsAuthenticated] 
     # permission_classes = [permissions.AllowAny] # For extreme debugging of 405
     lookup_field = 'id'
+    query_budgets = {'list': 8, 'retrieve': 8}
 
     def get_queryset(self):
         user = self.request.user
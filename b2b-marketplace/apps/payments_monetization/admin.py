@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import SubscriptionPlan, UserSubscription, TransactionLog #, UserPaymentMethod
+from .models import SubscriptionPlan, UserSubscription, TransactionLog, PayoutRun, PayoutBatch #, UserPaymentMethod
 
 @admin.register(SubscriptionPlan)
 class SubscriptionPlanAdmin(admin.ModelAdmin):
@@ -57,7 +57,7 @@ class TransactionLogAdmin(admin.ModelAdmin):
     list_display = ('id', 'user_email_display', 'transaction_type', 'amount_currency_display', 'status', 'payment_gateway', 'gateway_transaction_id', 'created_at')
     list_filter = ('transaction_type', 'status', 'payment_gateway', 'currency')
     search_fields = ('user__username', 'user__email', 'gateway_transaction_id', 'description', 'related_order__id')
-    raw_id_fields = ('user', 'related_order', 'related_subscription')
+    raw_id_fields = ('user', 'related_order', 'related_subscription', 'related_payout_batch')
     readonly_fields = ('created_at', 'updated_at')
 
     def amount_currency_display(self, obj):
@@ -68,6 +68,31 @@ class TransactionLogAdmin(admin.ModelAdmin):
         return obj.user.email if obj.user else "N/A"
     user_email_display.short_description = "User Email"
 
+class PayoutBatchInline(admin.TabularInline):
+    model = PayoutBatch
+    extra = 0
+    fields = ('seller', 'currency', 'gross_amount', 'platform_fee_amount', 'net_amount', 'item_count', 'status')
+    readonly_fields = fields
+    can_delete = False
+    show_change_link = True
+
+
+@admin.register(PayoutRun)
+class PayoutRunAdmin(admin.ModelAdmin):
+    list_display = ('id', 'status', 'platform_fee_rate', 'batch_count', 'item_count', 'high_watermark', 'created_at', 'completed_at')
+    list_filter = ('status',)
+    readonly_fields = ('id', 'status', 'platform_fee_rate', 'batch_count', 'item_count', 'high_watermark', 'error_message', 'created_at', 'updated_at', 'completed_at')
+    inlines = [PayoutBatchInline]
+
+
+@admin.register(PayoutBatch)
+class PayoutBatchAdmin(admin.ModelAdmin):
+    list_display = ('id', 'seller', 'net_amount', 'platform_fee_amount', 'currency', 'item_count', 'status', 'created_at')
+    list_filter = ('status', 'currency')
+    search_fields = ('seller__username', 'seller__email', 'gateway_transfer_id')
+    raw_id_fields = ('run', 'seller')
+    readonly_fields = ('run', 'gross_amount', 'platform_fee_amount', 'net_amount', 'item_count', 'created_at', 'updated_at')
+
 # @admin.register(UserPaymentMethod)
 # class UserPaymentMethodAdmin(admin.ModelAdmin):
 #     list_display = ('user', 'gateway_payment_method_id', 'card_brand', 'last4', 'is_default', 'gateway_name')
@@ -0,0 +1,113 @@
+import csv
+import glob
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from apps.payments_monetization.reconciliation import (
+    REPORT_COLUMNS, ReconciliationService, init_reconciliation_worker, reconcile_shard
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Reconciles gateway settlement exports (CSV or JSON Lines) against TransactionLog and Order '
+        'and writes a discrepancy report. Each input file is treated as a shard and processed by a '
+        'separate worker process.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'files', nargs='+',
+            help='Settlement files or glob patterns, e.g. exports/2025-05-*.csv',
+        )
+        parser.add_argument(
+            '--output', '-o', default='reconciliation_report.csv',
+            help='Path of the merged discrepancy report (CSV).',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Number of worker processes. Use 1 to run in-process.',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Settlement lines matched per database round trip.',
+        )
+        parser.add_argument(
+            '--minor-units', action='store_true',
+            help='Amounts in the export are in minor units (cents), as in raw Stripe API dumps.',
+        )
+
+    def handle(self, *args, **options):
+        paths = []
+        for pattern in options['files']:
+            matches = sorted(glob.glob(pattern)) or ([pattern] if os.path.exists(pattern) else [])
+            if not matches:
+                raise CommandError(f"No settlement file matches '{pattern}'.")
+            paths.extend(matches)
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1.')
+
+        workers = max(1, min(options['workers'], len(paths)))
+        self.stdout.write(f'Reconciling {len(paths)} shard(s) with {workers} worker(s)...')
+
+        work_dir = tempfile.mkdtemp(prefix='reconciliation_')
+        try:
+            results = self._run_shards(paths, work_dir, workers, options)
+            self._merge_reports(results, options['output'])
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        totals = {}
+        for result in results:
+            for kind, count in result.discrepancy_counts.items():
+                totals[kind] = totals.get(kind, 0) + count
+            self.stdout.write(
+                f'  {result.shard}: {result.lines_read} line(s), {result.discrepancies} discrepancy(ies)'
+            )
+        for kind, count in sorted(totals.items()):
+            self.stdout.write(f'  {kind}: {count}')
+
+        style = self.style.WARNING if totals else self.style.SUCCESS
+        self.stdout.write(style(
+            f"Done. {sum(totals.values())} discrepancy(ies) written to {options['output']}."
+        ))
+
+    def _run_shards(self, paths, work_dir, workers, options):
+        jobs = [
+            (path, os.path.join(work_dir, f'{index:05d}.csv'))
+            for index, path in enumerate(paths)
+        ]
+        kwargs = {'chunk_size': options['chunk_size'], 'amounts_in_minor_units': options['minor_units']}
+
+        if workers == 1:
+            service = ReconciliationService(**kwargs)
+            return [service.reconcile_file(path, report_path) for path, report_path in jobs]
+
+        # Workers must open their own connections; never share a socket across fork().
+        connections.close_all()
+        results = []
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_reconciliation_worker) as pool:
+            futures = {pool.submit(reconcile_shard, path, report_path, **kwargs): path for path, report_path in jobs}
+            for future in as_completed(futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    raise CommandError(f'Shard {futures[future]} failed: {e}')
+        # Keep the merged report in the same order as the input shards.
+        results.sort(key=lambda r: r.report_path)
+        return results
+
+    def _merge_reports(self, results, output_path):
+        """Concatenates per-shard reports, streaming so the merge is bounded in memory too."""
+        with open(output_path, 'w', newline='', encoding='utf-8') as out:
+            writer = csv.DictWriter(out, fieldnames=REPORT_COLUMNS)
+            writer.writeheader()
+            for result in results:
+                with open(result.report_path, newline='', encoding='utf-8') as shard_report:
+                    for row in csv.DictReader(shard_report):
+                        writer.writerow(row)
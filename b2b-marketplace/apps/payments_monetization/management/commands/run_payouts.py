@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.payments_monetization.models import PayoutRun
+from apps.payments_monetization.payouts import PayoutService, PayoutRunInProgress
+
+
+class Command(BaseCommand):
+    help = 'Groups completed order items per seller into payout batches and logs payout / platform fee transactions.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fee-rate',
+            help='Override settings.PLATFORM_FEE_RATE for this run, e.g. 0.08 for 8%%.',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Show what would be paid out without writing anything.',
+        )
+        parser.add_argument(
+            '--abandon-running', action='store_true',
+            help='Mark a run left in "running" state (e.g. after a crash) as failed before starting.',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            service = PayoutService(platform_fee_rate=options['fee_rate'])
+        except (ValueError, ArithmeticError) as e:
+            raise CommandError(f"Invalid fee rate: {e}")
+
+        if options['dry_run']:
+            preview = service.preview()
+            for row in preview:
+                self.stdout.write(
+                    f"  seller {row['seller_id']}: {row['items']} item(s), gross {row['gross']}, "
+                    f"fee {row['platform_fee']}, net {row['net']} {row['currency']}"
+                )
+            self.stdout.write(self.style.SUCCESS(f'Dry run: {len(preview)} seller(s) would be paid out.'))
+            return
+
+        if options['abandon_running']:
+            abandoned = PayoutRun.objects.filter(status='running').update(
+                status='failed', error_message='Abandoned via run_payouts --abandon-running.', completed_at=timezone.now()
+            )
+            if abandoned:
+                self.stdout.write(self.style.WARNING(f'Marked {abandoned} running payout run(s) as failed.'))
+
+        try:
+            payout_run = service.run()
+        except PayoutRunInProgress as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Payout run {payout_run.id} completed: {payout_run.batch_count} batch(es), '
+            f'{payout_run.item_count} order item(s), fee rate {payout_run.platform_fee_rate}.'
+        ))
@@ -87,6 +87,66 @@ class UserSubscription(AbstractBaseModel):
         return self.plan.features.get(feature_key, False) # Assumes features is a dict
 
 
+class PayoutRun(AbstractBaseModel):
+    """
+    One execution of the payout engine (see apps.payments_monetization.payouts).
+    `high_watermark` is the largest OrderItem id the run was allowed to claim, so a run
+    never sees items created while it was executing.
+    """
+    STATUS_CHOICES = (
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    )
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='running')
+    high_watermark = models.BigIntegerField(default=0, help_text="Highest OrderItem id considered by this run")
+    platform_fee_rate = models.DecimalField(max_digits=5, decimal_places=4, help_text="e.g., 0.1000 for 10%")
+    batch_count = models.PositiveIntegerField(default=0)
+    item_count = models.PositiveIntegerField(default=0)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    error_message = models.TextField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            # At most one run may be in flight at a time.
+            models.UniqueConstraint(fields=['status'], condition=models.Q(status='running'), name='unique_running_payout_run'),
+        ]
+
+    def __str__(self):
+        return f"Payout run {str(self.id)[:8]} ({self.status})"
+
+
+class PayoutBatch(AbstractBaseModel):
+    """All completed order items of one seller that were paid out together in a PayoutRun."""
+    STATUS_CHOICES = (
+        ('pending', 'Pending'), # Created, transfer not yet sent to the gateway
+        ('paid', 'Paid'),
+        ('failed', 'Failed'),
+    )
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    run = models.ForeignKey(PayoutRun, on_delete=models.PROTECT, related_name='batches')
+    seller = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.PROTECT, related_name='payout_batches')
+    currency = models.CharField(max_length=3, default='USD')
+    gross_amount = models.DecimalField(max_digits=14, decimal_places=2)
+    platform_fee_amount = models.DecimalField(max_digits=14, decimal_places=2)
+    net_amount = models.DecimalField(max_digits=14, decimal_places=2)
+    item_count = models.PositiveIntegerField(default=0)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    gateway_transfer_id = models.CharField(max_length=255, blank=True, null=True, db_index=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name_plural = "Payout batches"
+        constraints = [
+            models.UniqueConstraint(fields=['run', 'seller', 'currency'], name='unique_payout_batch_per_run_seller_currency'),
+        ]
+
+    def __str__(self):
+        return f"Payout {str(self.id)[:8]} to {self.seller_id}: {self.net_amount} {self.currency} ({self.status})"
+
+
 class TransactionLog(AbstractBaseModel):
     TRANSACTION_TYPE_CHOICES = (
         ('subscription_payment', 'Subscription Payment'),
@@ -119,7 +179,7 @@ class TransactionLog(AbstractBaseModel):
     # Links to other relevant models
     related_order = models.ForeignKey(Order, on_delete=models.SET_NULL, null=True, blank=True, related_name='transactions')
     related_subscription = models.ForeignKey(UserSubscription, on_delete=models.SET_NULL, null=True, blank=True, related_name='transactions')
-    # related_payout_batch = ... (if you have payout batching)
+    related_payout_batch = models.ForeignKey(PayoutBatch, on_delete=models.SET_NULL, null=True, blank=True, related_name='transactions')
 
     class Meta:
         ordering = ['-created_at']
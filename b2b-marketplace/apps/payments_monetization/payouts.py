@@ -0,0 +1,152 @@
+# apps/payments_monetization/payouts.py
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Max, OuterRef, Subquery, Sum
+from django.utils import timezone
+
+from apps.orders.models import OrderItem
+from .models import PayoutRun, PayoutBatch, TransactionLog
+
+
+class PayoutRunInProgress(Exception):
+    """Raised when another payout run has not finished yet."""
+
+
+class PayoutService:
+    """
+    Groups completed, not-yet-paid-out OrderItems per seller and order currency into PayoutBatches.
+
+    A run is:
+      1. one aggregate query (GROUP BY seller, currency) over the eligible items,
+      2. one bulk INSERT of PayoutBatch rows,
+      3. one UPDATE per currency that stamps every eligible item with its seller's batch,
+      4. one bulk INSERT of `payout` and `platform_fee` TransactionLog rows.
+    Steps 2-4 run in a single transaction. Items are only eligible while `payout_batch`
+    is NULL, so re-running (or retrying a failed run) never pays an item twice. Items whose
+    orders complete after a run are simply picked up by the next one.
+    """
+    ELIGIBLE_ORDER_STATUSES = ('completed',)
+
+    def __init__(self, platform_fee_rate=None):
+        if platform_fee_rate is None:
+            platform_fee_rate = getattr(settings, 'PLATFORM_FEE_RATE', '0.10')
+        self.platform_fee_rate = Decimal(str(platform_fee_rate))
+        if not Decimal('0') <= self.platform_fee_rate <= Decimal('1'):
+            raise ValueError("Platform fee rate must be between 0 and 1.")
+
+    def eligible_items(self, high_watermark: int):
+        return OrderItem.objects.filter(
+            payout_batch__isnull=True,
+            seller__isnull=False,
+            order__status__in=self.ELIGIBLE_ORDER_STATUSES,
+            id__lte=high_watermark,
+        )
+
+    def seller_totals(self, high_watermark: int) -> list:
+        """Single grouped query: [{'seller_id', 'currency', 'gross', 'items'}, ...]."""
+        line_total = ExpressionWrapper(F('quantity') * F('unit_price'), output_field=DecimalField(max_digits=14, decimal_places=2))
+        return list(
+            self.eligible_items(high_watermark)
+            .order_by()  # Drop Meta.ordering so it doesn't leak into GROUP BY
+            .values('seller_id', currency=F('order__currency'))
+            .annotate(gross=Sum(line_total), items=Count('id'))
+        )
+
+    def calculate_fee(self, gross: Decimal) -> Decimal:
+        return (gross * self.platform_fee_rate).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+    def preview(self) -> list:
+        """Totals the next run would pay out, without writing anything."""
+        high_watermark = OrderItem.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+        preview = []
+        for row in self.seller_totals(high_watermark):
+            gross = Decimal(row['gross'] or 0).quantize(Decimal('0.01'))
+            fee = self.calculate_fee(gross)
+            preview.append({'seller_id': row['seller_id'], 'currency': row['currency'], 'items': row['items'],
+                            'gross': gross, 'platform_fee': fee, 'net': gross - fee})
+        return preview
+
+    def run(self) -> PayoutRun:
+        high_watermark = OrderItem.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+        try:
+            with transaction.atomic():
+                payout_run = PayoutRun.objects.create(
+                    platform_fee_rate=self.platform_fee_rate,
+                    high_watermark=high_watermark,
+                )
+        except IntegrityError:
+            raise PayoutRunInProgress("Another payout run is still in progress.")
+
+        try:
+            with transaction.atomic():
+                self._execute(payout_run)
+        except Exception as e:
+            payout_run.status = 'failed'
+            payout_run.error_message = str(e)
+            payout_run.completed_at = timezone.now()
+            payout_run.save(update_fields=['status', 'error_message', 'completed_at', 'updated_at'])
+            raise
+        return payout_run
+
+    def _execute(self, payout_run: PayoutRun):
+        totals = self.seller_totals(payout_run.high_watermark)
+
+        batches = []
+        for row in totals:
+            gross = Decimal(row['gross'] or 0).quantize(Decimal('0.01'))
+            fee = self.calculate_fee(gross)
+            batches.append(PayoutBatch(
+                run=payout_run,
+                seller_id=row['seller_id'],
+                currency=row['currency'],
+                gross_amount=gross,
+                platform_fee_amount=fee,
+                net_amount=gross - fee,
+                item_count=row['items'],
+            ))
+        PayoutBatch.objects.bulk_create(batches)
+
+        expected_items = sum(batch.item_count for batch in batches)
+        claimed = 0
+        # UPDATE can't reference joined columns (order__currency), so stamp one currency at a time.
+        for currency in {batch.currency for batch in batches}:
+            batch_for_seller = PayoutBatch.objects.filter(
+                run=payout_run, seller_id=OuterRef('seller_id'), currency=currency
+            ).values('id')[:1]
+            claimed += self.eligible_items(payout_run.high_watermark).filter(
+                order__currency=currency
+            ).update(payout_batch=Subquery(batch_for_seller))
+        if claimed != expected_items:
+            # Something changed between aggregate and update; roll back and let the next run retry.
+            raise RuntimeError(f"Expected to claim {expected_items} order items but claimed {claimed}.")
+
+        transactions = []
+        for batch in batches:
+            transactions.append(TransactionLog(
+                user_id=batch.seller_id,
+                related_payout_batch=batch,
+                transaction_type='payout',
+                amount=batch.net_amount,
+                currency=batch.currency,
+                status='pending',
+                description=f"Payout of {batch.item_count} order item(s)",
+            ))
+            if batch.platform_fee_amount:
+                transactions.append(TransactionLog(
+                    user_id=batch.seller_id,
+                    related_payout_batch=batch,
+                    transaction_type='platform_fee',
+                    amount=batch.platform_fee_amount,
+                    currency=batch.currency,
+                    status='succeeded',
+                    description=f"Platform fee ({self.platform_fee_rate * 100:.2f}%) on {batch.gross_amount} {batch.currency}",
+                ))
+        TransactionLog.objects.bulk_create(transactions)
+
+        payout_run.status = 'completed'
+        payout_run.batch_count = len(batches)
+        payout_run.item_count = expected_items
+        payout_run.completed_at = timezone.now()
+        payout_run.save(update_fields=['status', 'batch_count', 'item_count', 'completed_at', 'updated_at'])
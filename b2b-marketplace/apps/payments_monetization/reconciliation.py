@@ -0,0 +1,299 @@
+# apps/payments_monetization/reconciliation.py
+import csv
+import json
+import os
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+
+from apps.orders.models import Order
+from .models import TransactionLog
+
+
+# Column aliases accepted in gateway settlement exports. The first alias found in a row wins.
+# Stripe balance/payment exports, PayPal settlement reports and our own mock exports all
+# use slightly different headers, so lines are normalised before matching.
+SETTLEMENT_FIELD_ALIASES = {
+    'transaction_id': ('gateway_transaction_id', 'payment_intent_id', 'payment_intent', 'transaction_id', 'id'),
+    'amount': ('amount', 'gross', 'amount_received'),
+    'currency': ('currency',),
+    'status': ('status',),
+    'order_id': ('order_id', 'metadata[order_id]', 'metadata.order_id', 'order_id (metadata)'),
+}
+
+# Gateway status -> local TransactionLog status
+GATEWAY_STATUS_MAP = {
+    'succeeded': 'succeeded',
+    'paid': 'succeeded',
+    'available': 'succeeded',
+    'settled': 'succeeded',
+    'completed': 'succeeded',
+    'pending': 'pending',
+    'processing': 'pending',
+    'failed': 'failed',
+    'canceled': 'failed',
+    'cancelled': 'failed',
+    'refunded': 'refunded',
+    'disputed': 'disputed',
+}
+
+# Order statuses that mean "we never recorded the money arriving".
+UNPAID_ORDER_STATUSES = ('pending_payment', 'payment_failed')
+
+REPORT_COLUMNS = [
+    'shard', 'line_number', 'kind', 'gateway_transaction_id', 'order_id',
+    'gateway_amount', 'local_amount', 'gateway_currency', 'local_currency',
+    'gateway_status', 'local_status', 'detail',
+]
+
+
+@dataclass
+class SettlementLine:
+    line_number: int
+    transaction_id: str
+    amount: Decimal | None
+    currency: str | None
+    status: str | None
+    order_id: str | None
+
+
+@dataclass
+class ShardResult:
+    """Summary returned by a shard worker. Discrepancies themselves are streamed to `report_path`."""
+    shard: str
+    report_path: str
+    lines_read: int = 0
+    lines_matched: int = 0
+    lines_invalid: int = 0
+    discrepancy_counts: dict = field(default_factory=dict)
+
+    @property
+    def discrepancies(self):
+        return sum(self.discrepancy_counts.values())
+
+
+def _first_present(row: dict, aliases) -> str | None:
+    for alias in aliases:
+        value = row.get(alias)
+        if value not in (None, ''):
+            return str(value).strip()
+    return None
+
+
+def _flatten_json_row(row: dict) -> dict:
+    """Lifts nested `metadata` keys so JSON lines can use the same aliases as CSV headers."""
+    metadata = row.get('metadata')
+    if isinstance(metadata, dict):
+        row = dict(row)
+        for key, value in metadata.items():
+            row.setdefault(f'metadata.{key}', value)
+    return row
+
+
+def iter_settlement_rows(path: str):
+    """
+    Streams raw rows from a settlement export without loading it into memory.
+    CSV is detected by extension; anything else is read as JSON Lines (one object per line).
+    Yields (line_number, row_dict) tuples.
+    """
+    if path.lower().endswith('.csv'):
+        with open(path, newline='', encoding='utf-8-sig') as handle:
+            reader = csv.DictReader(handle)
+            # DictReader.line_num counts physical lines, header included
+            for row in reader:
+                yield reader.line_num, row
+    else:
+        with open(path, encoding='utf-8') as handle:
+            for line_number, raw_line in enumerate(handle, start=1):
+                raw_line = raw_line.strip()
+                if not raw_line:
+                    continue
+                try:
+                    row = json.loads(raw_line)
+                except json.JSONDecodeError:
+                    yield line_number, None
+                    continue
+                yield line_number, _flatten_json_row(row) if isinstance(row, dict) else None
+
+
+def parse_settlement_line(line_number: int, row: dict | None, amounts_in_minor_units: bool = False) -> SettlementLine | None:
+    """Normalises a raw export row. Returns None if the row cannot be matched at all."""
+    if not row:
+        return None
+    transaction_id = _first_present(row, SETTLEMENT_FIELD_ALIASES['transaction_id'])
+    if not transaction_id:
+        return None
+
+    amount = None
+    raw_amount = _first_present(row, SETTLEMENT_FIELD_ALIASES['amount'])
+    if raw_amount is not None:
+        try:
+            amount = Decimal(raw_amount.replace(',', ''))
+        except InvalidOperation:
+            return None
+        if amounts_in_minor_units:
+            amount = amount / 100
+        amount = amount.quantize(Decimal('0.01'))
+
+    currency = _first_present(row, SETTLEMENT_FIELD_ALIASES['currency'])
+    raw_status = _first_present(row, SETTLEMENT_FIELD_ALIASES['status'])
+    return SettlementLine(
+        line_number=line_number,
+        transaction_id=transaction_id,
+        amount=amount,
+        currency=currency.upper() if currency else None,
+        status=GATEWAY_STATUS_MAP.get(raw_status.lower(), raw_status.lower()) if raw_status else None,
+        order_id=_first_present(row, SETTLEMENT_FIELD_ALIASES['order_id']),
+    )
+
+
+class ReconciliationService:
+    """
+    Matches gateway settlement lines against TransactionLog and Order.
+
+    Lines are processed in fixed-size chunks. For every chunk we issue one query per table
+    (`gateway_transaction_id__in` / `payment_intent_id__in`) and build dict indexes keyed
+    by the gateway id, i.e. a hash join where the chunk is the probe side. Memory use is
+    bounded by `chunk_size` regardless of how large the export is.
+    """
+
+    def __init__(self, chunk_size: int = 2000, amounts_in_minor_units: bool = False):
+        self.chunk_size = chunk_size
+        self.amounts_in_minor_units = amounts_in_minor_units
+
+    # --- Index building (one query per table per chunk) ---
+
+    def _build_transaction_index(self, transaction_ids) -> dict:
+        index = {}
+        rows = TransactionLog.objects.filter(
+            gateway_transaction_id__in=transaction_ids
+        ).values('gateway_transaction_id', 'amount', 'currency', 'status', 'related_order_id')
+        for row in rows.iterator():
+            # Several log rows can share a gateway id (e.g. payment + refund); keep them all.
+            index.setdefault(row['gateway_transaction_id'], []).append(row)
+        return index
+
+    def _build_order_index(self, transaction_ids) -> dict:
+        rows = Order.objects.filter(
+            payment_intent_id__in=transaction_ids
+        ).values('id', 'payment_intent_id', 'order_total', 'status')
+        return {row['payment_intent_id']: row for row in rows.iterator()}
+
+    # --- Matching ---
+
+    def _compare(self, line: SettlementLine, transactions: list | None, order: dict | None) -> list:
+        """Returns a list of discrepancy dicts (without shard info) for a single settlement line."""
+        found = []
+
+        def add(kind, detail='', local=None):
+            local = local or {}
+            found.append({
+                'line_number': line.line_number,
+                'kind': kind,
+                'gateway_transaction_id': line.transaction_id,
+                'order_id': str(order['id']) if order else (line.order_id or ''),
+                'gateway_amount': line.amount if line.amount is not None else '',
+                'local_amount': local.get('amount', ''),
+                'gateway_currency': line.currency or '',
+                'local_currency': local.get('currency', ''),
+                'gateway_status': line.status or '',
+                'local_status': local.get('status', ''),
+                'detail': detail,
+            })
+
+        if not transactions and not order:
+            add('missing_locally', 'No TransactionLog or Order references this gateway id.')
+            return found
+
+        if transactions:
+            # Compare against the row whose status agrees with the gateway if there is one,
+            # otherwise the first row.
+            primary = next((t for t in transactions if t['status'] == line.status), transactions[0])
+            if line.amount is not None and primary['amount'] != line.amount:
+                add('amount_mismatch', local=primary)
+            if line.currency and primary['currency'] and primary['currency'].upper() != line.currency:
+                add('currency_mismatch', local=primary)
+            if line.status and primary['status'] != line.status:
+                add('status_mismatch', local=primary)
+            if order and primary['related_order_id'] and primary['related_order_id'] != order['id']:
+                add('order_link_mismatch',
+                    f"TransactionLog points at order {primary['related_order_id']}.", local=primary)
+        elif line.status == 'succeeded':
+            add('missing_transaction_log', 'Order has this payment intent but no TransactionLog was written.',
+                local={'amount': order['order_total'], 'status': order['status']})
+
+        if order:
+            order_local = {'amount': order['order_total'], 'status': order['status']}
+            if line.status == 'succeeded' and order['status'] in UNPAID_ORDER_STATUSES:
+                add('order_not_marked_paid', local=order_local)
+            if not transactions and line.amount is not None and order['order_total'] != line.amount:
+                add('amount_mismatch', 'Compared against Order.order_total.', local=order_local)
+        return found
+
+    def reconcile_chunk(self, lines: list) -> list:
+        transaction_ids = {line.transaction_id for line in lines}
+        transaction_index = self._build_transaction_index(transaction_ids)
+        order_index = self._build_order_index(transaction_ids)
+
+        discrepancies = []
+        for line in lines:
+            discrepancies.extend(self._compare(
+                line,
+                transaction_index.get(line.transaction_id),
+                order_index.get(line.transaction_id),
+            ))
+        return discrepancies
+
+    def reconcile_file(self, path: str, report_path: str) -> ShardResult:
+        """Reconciles one settlement file, streaming discrepancies to a CSV at `report_path`."""
+        shard = os.path.basename(path)
+        result = ShardResult(shard=shard, report_path=report_path)
+
+        with open(report_path, 'w', newline='', encoding='utf-8') as report_handle:
+            writer = csv.DictWriter(report_handle, fieldnames=REPORT_COLUMNS)
+            writer.writeheader()
+
+            def flush(chunk):
+                for discrepancy in self.reconcile_chunk(chunk):
+                    discrepancy['shard'] = shard
+                    writer.writerow(discrepancy)
+                    kind = discrepancy['kind']
+                    result.discrepancy_counts[kind] = result.discrepancy_counts.get(kind, 0) + 1
+
+            chunk = []
+            for line_number, row in iter_settlement_rows(path):
+                result.lines_read += 1
+                line = parse_settlement_line(line_number, row, self.amounts_in_minor_units)
+                if line is None:
+                    result.lines_invalid += 1
+                    writer.writerow({'shard': shard, 'line_number': line_number, 'kind': 'unparseable_line'})
+                    result.discrepancy_counts['unparseable_line'] = result.discrepancy_counts.get('unparseable_line', 0) + 1
+                    continue
+                chunk.append(line)
+                if len(chunk) >= self.chunk_size:
+                    flush(chunk)
+                    chunk = []
+            if chunk:
+                flush(chunk)
+
+        result.lines_matched = result.lines_read - result.lines_invalid
+        return result
+
+
+def reconcile_shard(path: str, report_path: str, chunk_size: int = 2000, amounts_in_minor_units: bool = False) -> ShardResult:
+    """Process-pool entry point: must be a module-level function so it can be pickled."""
+    service = ReconciliationService(chunk_size=chunk_size, amounts_in_minor_units=amounts_in_minor_units)
+    return service.reconcile_file(path, report_path)
+
+
+def init_reconciliation_worker():
+    """
+    Process-pool initializer. Spawned workers (macOS/Windows) start without Django configured;
+    forked workers already have it. The parent closes its DB connections before the pool
+    starts, so every worker opens its own connection lazily.
+    """
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'marketplace_api.settings')
+        django.setup()
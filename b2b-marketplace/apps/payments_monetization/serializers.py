@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import SubscriptionPlan, UserSubscription, TransactionLog
+from .models import SubscriptionPlan, UserSubscription, TransactionLog, PayoutBatch
 from apps.accounts.serializers import UserSerializer # For user details in subscription/transaction
 
 class SubscriptionPlanSerializer(serializers.ModelSerializer):
@@ -71,7 +71,7 @@ class TransactionLogSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'user', 'transaction_type', 'amount', 'currency', 'status',
             'description', 'payment_gateway', 'gateway_transaction_id',
-            'related_order_id', 'related_subscription_id', # Show IDs
+            'related_order_id', 'related_subscription_id', 'related_payout_batch_id', # Show IDs
             'related_object_display', # Show descriptive name
             'created_at'
         ]
@@ -83,8 +83,20 @@ class TransactionLogSerializer(serializers.ModelSerializer):
         if obj.related_subscription:
             plan_name = obj.related_subscription.plan.name if obj.related_subscription.plan else "N/A"
             return f"Subscription: {plan_name} ({obj.related_subscription.id})"
+        if obj.related_payout_batch_id:
+            return f"Payout batch: {obj.related_payout_batch_id}"
         return None
 
+
+class PayoutBatchSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PayoutBatch
+        fields = [
+            'id', 'run', 'currency', 'gross_amount', 'platform_fee_amount', 'net_amount',
+            'item_count', 'status', 'gateway_transfer_id', 'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
+
 # --- Webhook Serializers (Example for Stripe) ---
 # These are not directly used by ModelViewSets but by webhook handler views.
 # They help validate and structure the incoming webhook data.
@@ -172,7 +172,7 @@ class PaymentService:
 
         intent_params = {
             "amount": int(order.order_total * 100),  # Amount in cents
-            "currency": order.items.first().material.currency if order.items.first() and order.items.first().material else 'usd', # Get currency from order or default
+            "currency": order.currency.lower(), # Stripe expects lowercase ISO codes
             "customer": stripe_customer.id,
             "description": f"Payment for Order ID: {order.id}",
             "metadata": {"order_id": str(order.id), "django_user_id": str(user.id)},
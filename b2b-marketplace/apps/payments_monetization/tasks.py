@@ -0,0 +1,16 @@
+from celery import shared_task
+
+
+@shared_task(name="payments_monetization.run_seller_payouts_task")
+def run_seller_payouts_task():
+    """
+    Celery task to batch seller payouts. Schedule it periodically (e.g., daily via celery beat);
+    overlapping executions are rejected by PayoutService, so a slow run is never doubled up.
+    """
+    from .payouts import PayoutService, PayoutRunInProgress # Import here to avoid circularity with celery app
+
+    try:
+        payout_run = PayoutService().run()
+    except PayoutRunInProgress as e:
+        return f"Skipped: {e}"
+    return f"Payout run {payout_run.id}: {payout_run.batch_count} batch(es), {payout_run.item_count} item(s)."
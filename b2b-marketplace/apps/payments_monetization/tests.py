@@ -0,0 +1,182 @@
+import csv
+import io
+import json
+import os
+import tempfile
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from apps.orders.models import Order, OrderItem
+from .models import PayoutBatch, PayoutRun, TransactionLog
+from .payouts import PayoutRunInProgress, PayoutService
+from .reconciliation import ReconciliationService
+
+User = get_user_model()
+
+
+class SettlementReconciliationTests(TestCase):
+    """Settlement exports are matched chunk by chunk against TransactionLog and Order."""
+
+    def setUp(self):
+        work_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(work_dir.cleanup)
+        self.dir = work_dir.name
+        buyer = User.objects.create_user('recon-buyer', 'recon-buyer@example.com', 'password123', user_type='buyer')
+        self.paid = Order.objects.create(buyer=buyer, status='processing', order_total=Decimal('100.00'), payment_intent_id='pi_paid')
+        TransactionLog.objects.create(
+            user=buyer, transaction_type='order_payment', amount=Decimal('100.00'), currency='USD',
+            status='succeeded', gateway_transaction_id='pi_paid', related_order=self.paid,
+        )
+        self.unpaid = Order.objects.create(buyer=buyer, status='pending_payment', order_total=Decimal('80.00'), payment_intent_id='pi_unpaid')
+
+    def write(self, name, content):
+        path = os.path.join(self.dir, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return path
+
+    def write_csv(self, name='settlements.csv'):
+        return self.write(name, (
+            'gateway_transaction_id,amount,currency,status\n'
+            'pi_paid,100.00,usd,succeeded\n'      # Matches
+            'pi_unknown,5.00,usd,succeeded\n'     # Not in our records
+            'pi_unpaid,50.00,usd,succeeded\n'     # No log, order still unpaid, total differs
+            ',1.00,usd,succeeded\n'               # No gateway id
+        ))
+
+    def write_jsonl(self, name='settlements.jsonl'):
+        lines = [
+            json.dumps({'payment_intent': 'pi_paid', 'amount': '99.00', 'currency': 'eur', 'status': 'paid', 'metadata': {'order_id': 'x'}}),
+            'not json',
+            '',
+            json.dumps({'id': 'pi_paid', 'gross': '100.00', 'status': 'refunded'}),
+        ]
+        return self.write(name, '\n'.join(lines) + '\n')
+
+    def report(self, path):
+        with open(path, newline='', encoding='utf-8') as f:
+            return list(csv.DictReader(f))
+
+    def test_csv_matches_and_reports_discrepancies(self):
+        report_path = os.path.join(self.dir, 'report.csv')
+        result = ReconciliationService(chunk_size=2).reconcile_file(self.write_csv(), report_path) # Several chunks
+        self.assertEqual((result.lines_read, result.lines_invalid, result.lines_matched), (4, 1, 3))
+        self.assertEqual(result.discrepancy_counts, {
+            'missing_locally': 1, 'missing_transaction_log': 1, 'order_not_marked_paid': 1,
+            'amount_mismatch': 1, 'unparseable_line': 1,
+        })
+        rows = self.report(report_path)
+        self.assertNotIn('pi_paid', [row['gateway_transaction_id'] for row in rows])
+        mismatch = next(row for row in rows if row['kind'] == 'amount_mismatch')
+        self.assertEqual((mismatch['gateway_amount'], mismatch['local_amount'], mismatch['order_id']), ('50.00', '80.00', str(self.unpaid.pk)))
+        self.assertEqual(next(row for row in rows if row['kind'] == 'unparseable_line')['line_number'], '5') # Header is line 1
+
+    def test_jsonl_uses_aliases_and_nested_metadata(self):
+        report_path = os.path.join(self.dir, 'report.csv')
+        result = ReconciliationService().reconcile_file(self.write_jsonl(), report_path)
+        self.assertEqual((result.lines_read, result.lines_invalid), (3, 1)) # Blank lines are skipped
+        self.assertEqual(result.discrepancy_counts, {
+            'amount_mismatch': 1, 'currency_mismatch': 1, 'unparseable_line': 1, 'status_mismatch': 1,
+        })
+        rows = self.report(report_path)
+        self.assertEqual(
+            [(row['line_number'], row['kind']) for row in rows],
+            [('2', 'unparseable_line'), ('1', 'amount_mismatch'), ('1', 'currency_mismatch'), ('4', 'status_mismatch')],
+        )
+
+    def test_minor_units(self):
+        path = self.write('cents.jsonl', json.dumps({'id': 'pi_paid', 'amount': 10000, 'status': 'succeeded'}) + '\n')
+        result = ReconciliationService(amounts_in_minor_units=True).reconcile_file(path, os.path.join(self.dir, 'report.csv'))
+        self.assertEqual(result.discrepancies, 0)
+
+    def test_command_merges_shards_in_input_order(self):
+        self.write_csv('a.csv')
+        jsonl_path = self.write_jsonl('b.jsonl')
+        output = os.path.join(self.dir, 'merged.csv')
+        out = io.StringIO()
+        call_command('reconcile_settlements', os.path.join(self.dir, '*.csv'), jsonl_path, '--output', output, '--workers', '1', stdout=out)
+        rows = self.report(output)
+        self.assertEqual([row['shard'] for row in rows], ['a.csv'] * 5 + ['b.jsonl'] * 4)
+        self.assertIn('Done. 9 discrepancy(ies)', out.getvalue())
+        self.assertIn('a.csv: 4 line(s), 5 discrepancy(ies)', out.getvalue())
+
+
+class PayoutRunTests(TestCase):
+    """Completed items are claimed into one batch per seller and currency, and never paid twice."""
+
+    def setUp(self):
+        self.buyer = User.objects.create_user('payout-buyer', 'payout-buyer@example.com', 'password123', user_type='buyer')
+        self.sellers = [
+            User.objects.create_user(f'payout-seller-{i}', f'payout-seller-{i}@example.com', 'password123', user_type='seller')
+            for i in range(2)
+        ]
+        self.service = PayoutService(platform_fee_rate='0.10')
+
+    def item(self, seller, unit_price, quantity=1, status='completed', currency='USD'):
+        order = Order.objects.create(buyer=self.buyer, status=status, currency=currency)
+        return OrderItem.objects.create(
+            order=order, seller=seller, custom_item_description='Sample yardage', quantity=quantity, unit_price=Decimal(unit_price),
+        )
+
+    def test_run_batches_per_seller_and_currency(self):
+        first, second = self.sellers
+        self.item(first, '10.00', quantity=3)
+        self.item(first, '5.00')
+        self.item(first, '20.00', currency='EUR')
+        self.item(second, '7.50')
+        pending = self.item(second, '99.00', status='processing') # Not completed yet
+
+        run = self.service.run()
+        self.assertEqual((run.status, run.batch_count, run.item_count), ('completed', 3, 4))
+        batches = {(batch.seller_id, batch.currency): batch for batch in run.batches.all()}
+        usd = batches[(first.pk, 'USD')]
+        self.assertEqual((usd.gross_amount, usd.platform_fee_amount, usd.net_amount, usd.item_count),
+                         (Decimal('35.00'), Decimal('3.50'), Decimal('31.50'), 2))
+        self.assertEqual(batches[(first.pk, 'EUR')].gross_amount, Decimal('20.00'))
+        self.assertEqual(
+            sorted(TransactionLog.objects.filter(related_payout_batch=usd).values_list('transaction_type', 'amount')),
+            [('payout', Decimal('31.50')), ('platform_fee', Decimal('3.50'))],
+        )
+        self.assertEqual(OrderItem.objects.filter(payout_batch=usd).count(), 2)
+        pending.refresh_from_db()
+        self.assertIsNone(pending.payout_batch_id)
+
+    def test_rerun_never_pays_an_item_twice(self):
+        claimed = self.item(self.sellers[0], '10.00')
+        first_run = self.service.run()
+        claimed.refresh_from_db()
+        batch_id = claimed.payout_batch_id
+
+        self.assertEqual(self.service.preview(), []) # Already batched items aren't eligible
+        second_run = self.service.run()
+        self.assertEqual((second_run.batch_count, second_run.item_count), (0, 0))
+        claimed.refresh_from_db()
+        self.assertEqual(claimed.payout_batch_id, batch_id)
+
+        later = self.item(self.sellers[0], '4.00') # Completed after the first run: the next run picks it up
+        third_run = self.service.run()
+        self.assertEqual(third_run.item_count, 1)
+        later.refresh_from_db()
+        self.assertEqual(later.payout_batch.run, third_run)
+        self.assertEqual(PayoutBatch.objects.filter(run=first_run).count(), 1)
+        self.assertEqual(TransactionLog.objects.filter(transaction_type='payout').count(), 2)
+
+    def test_items_above_the_watermark_wait_for_the_next_run(self):
+        before = self.item(self.sellers[0], '10.00')
+        after = self.item(self.sellers[0], '6.00') # Created while the run executes
+        run = PayoutRun.objects.create(platform_fee_rate=self.service.platform_fee_rate, high_watermark=before.pk)
+        self.service._execute(run)
+        before.refresh_from_db()
+        after.refresh_from_db()
+        self.assertIsNotNone(before.payout_batch_id)
+        self.assertIsNone(after.payout_batch_id)
+        self.assertEqual(run.batches.get().gross_amount, Decimal('10.00'))
+        self.assertEqual(self.service.run().item_count, 1)
+
+    def test_one_run_at_a_time(self):
+        PayoutRun.objects.create(platform_fee_rate=Decimal('0.10'))
+        with self.assertRaises(PayoutRunInProgress):
+            self.service.run()
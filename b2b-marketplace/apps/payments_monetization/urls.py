@@ -3,7 +3,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
-    SubscriptionPlanViewSet, UserSubscriptionViewSet, TransactionLogViewSet,
+    SubscriptionPlanViewSet, UserSubscriptionViewSet, TransactionLogViewSet, PayoutBatchViewSet,
     stripe_webhook_receiver
 )
 
@@ -11,6 +11,7 @@ router = DefaultRouter()
 router.register(r'plans', SubscriptionPlanViewSet, basename='subscriptionplan')
 router.register(r'my-subscription', UserSubscriptionViewSet, basename='usersubscription') # For current user
 router.register(r'transactions', TransactionLogViewSet, basename='transactionlog')
+router.register(r'payouts', PayoutBatchViewSet, basename='payoutbatch')
 
 urlpatterns = [
     path('', include(router.urls)),
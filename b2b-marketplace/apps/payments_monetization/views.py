@@ -6,10 +6,11 @@ from rest_framework import viewsets, permissions, status, generics, mixins
 from rest_framework.decorators import action, api_view, permission_classes as drf_permission_classes
 from rest_framework.response import Response
 
-from .models import SubscriptionPlan, UserSubscription, TransactionLog
+from .models import SubscriptionPlan, UserSubscription, TransactionLog, PayoutBatch
 from .serializers import (
     SubscriptionPlanSerializer, UserSubscriptionSerializer, TransactionLogSerializer,
-    CreateSubscriptionSerializer, CancelSubscriptionSerializer, StripeWebhookEventSerializer
+    CreateSubscriptionSerializer, CancelSubscriptionSerializer, StripeWebhookEventSerializer,
+    PayoutBatchSerializer
 )
 from .services import PaymentService
 from .permissions import IsSubscriptionOwner # Create this
@@ -137,6 +138,21 @@ class TransactionLogViewSet(viewsets.ReadOnlyModelViewSet):
         return TransactionLog.objects.filter(user=user).select_related('user', 'related_order', 'related_subscription__plan')
 
 
+class PayoutBatchViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    API endpoint for sellers to view their payout batches. Admins see all batches.
+    """
+    serializer_class = PayoutBatchSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filterset_fields = ['status', 'currency']
+
+    def get_queryset(self):
+        user = self.request.user
+        if user.is_staff:
+            return PayoutBatch.objects.all()
+        return PayoutBatch.objects.filter(seller=user)
+
+
 # --- Stripe Webhook Handler View ---
 @api_view(['POST'])
 @csrf_exempt # Important: Stripe webhooks don't send CSRF tokens
@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Review, ReviewReply
+from django.contrib.admin.views.main import ChangeList
+from .models import Review, ReviewReply, RatingAggregate
+from .services import ReviewModerationService, attach_review_targets
 from django.contrib.contenttypes.admin import GenericTabularInline
 
 class ReviewReplyInline(admin.TabularInline):
@@ -9,13 +11,22 @@ class ReviewReplyInline(admin.TabularInline):
     readonly_fields = ('created_at',)
     raw_id_fields = ('author',)
 
+class ReviewChangeList(ChangeList):
+    def get_results(self, request):
+        super().get_results(request)
+        # Resolve the page's heterogeneous review targets with one query per content type
+        # instead of one GenericForeignKey fetch per row.
+        self.result_list = attach_review_targets(self.result_list)
+
+
 @admin.register(Review)
 class ReviewAdmin(admin.ModelAdmin):
-    list_display = ('author', 'content_object_display', 'rating', 'is_approved', 'created_at', 'is_edited')
-    list_filter = ('rating', 'is_approved', 'content_type', 'created_at')
+    list_display = ('author', 'content_object_display', 'rating', 'is_approved', 'moderation_status', 'spam_score', 'helpful_count', 'created_at', 'is_edited')
+    list_filter = ('moderation_status', 'rating', 'is_approved', 'content_type', 'created_at')
     search_fields = ('author__username', 'title', 'comment', 'object_id_str')
     raw_id_fields = ('author',) # 'content_type' is a dropdown
-    readonly_fields = ('created_at', 'updated_at', 'content_object_display')
+    readonly_fields = ('created_at', 'updated_at', 'content_object_display', 'helpful_count',
+                       'moderation_status', 'spam_score', 'spam_reasons', 'moderated_by', 'moderated_at')
     actions = ['approve_reviews', 'unapprove_reviews']
     inlines = [ReviewReplyInline]
 
@@ -27,7 +38,10 @@ class ReviewAdmin(admin.ModelAdmin):
             'fields': ('rating', 'title', 'comment')
         }),
         ('Status', {
-            'fields': ('is_approved', 'is_edited')
+            'fields': ('is_approved', 'is_edited', 'helpful_count')
+        }),
+        ('Moderation', {
+            'fields': ('moderation_status', 'spam_score', 'spam_reasons', 'moderated_by', 'moderated_at')
         }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at'),
@@ -35,17 +49,37 @@ class ReviewAdmin(admin.ModelAdmin):
         }),
     )
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('author', 'content_type')
+
+    def get_changelist(self, request, **kwargs):
+        return ReviewChangeList
+
     def content_object_display(self, obj):
         return str(obj.content_object) if obj.content_object else "N/A"
     content_object_display.short_description = "Reviewed Item"
 
     def approve_reviews(self, request, queryset):
-        queryset.update(is_approved=True)
+        result = ReviewModerationService().set_status(queryset, 'approved', moderator=request.user)
+        self.message_user(request, f"Approved {result['updated']} review(s).")
     approve_reviews.short_description = "Approve selected reviews"
 
     def unapprove_reviews(self, request, queryset):
-        queryset.update(is_approved=False)
-    unapprove_reviews.short_description = "Unapprove selected reviews"
+        result = ReviewModerationService().set_status(queryset, 'rejected', moderator=request.user)
+        self.message_user(request, f"Rejected {result['updated']} review(s).")
+    unapprove_reviews.short_description = "Reject selected reviews"
+
+@admin.register(RatingAggregate)
+class RatingAggregateAdmin(admin.ModelAdmin):
+    list_display = ('content_type', 'object_id_str', 'review_count', 'average_rating', 'rating_1_count',
+                    'rating_2_count', 'rating_3_count', 'rating_4_count', 'rating_5_count', 'updated_at')
+    list_filter = ('content_type',)
+    search_fields = ('object_id_str',)
+    readonly_fields = [f.name for f in RatingAggregate._meta.fields]
+
+    def has_add_permission(self, request):
+        return False # Maintained by the Review signals / recompute_ratings
+
 
 @admin.register(ReviewReply)
 class ReviewReplyAdmin(admin.ModelAdmin):
@@ -55,8 +89,11 @@ class ReviewReplyAdmin(admin.ModelAdmin):
     raw_id_fields = ('review', 'author')
     readonly_fields = ('created_at', 'updated_at')
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('author')
+
     def review_id_display(self, obj):
-        return obj.review.id
+        return obj.review_id
     review_id_display.short_description = "Review ID"
 
     def comment_snippet(self, obj):
@@ -0,0 +1,39 @@
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.reviews_ratings.models import Review, RatingAggregate
+from apps.reviews_ratings.services import RatingAggregationService
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuilds RatingAggregate rows and the mirrored average_rating/review_count columns from the '
+        'reviews table, with one grouped query per content type. Use after bulk imports or to repair drift.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--content-type', action='append', dest='content_types',
+            help="Only recompute this model, as app_label.model (e.g. listings.material). Can be repeated.",
+        )
+
+    def handle(self, *args, **options):
+        if options['content_types']:
+            content_types = []
+            for label in options['content_types']:
+                app_label, _, model = label.lower().partition('.')
+                try:
+                    content_types.append(ContentType.objects.get_by_natural_key(app_label, model))
+                except ContentType.DoesNotExist:
+                    raise CommandError(f"Unknown content type '{label}'. Use app_label.model, e.g. listings.material.")
+        else:
+            # Every content type that has (or had, via stale aggregates) reviews
+            content_type_ids = set(Review.objects.order_by().values_list('content_type_id', flat=True).distinct())
+            content_type_ids |= set(RatingAggregate.objects.order_by().values_list('content_type_id', flat=True).distinct())
+            content_types = [ContentType.objects.get_for_id(content_type_id) for content_type_id in sorted(content_type_ids)]
+
+        service = RatingAggregationService()
+        for content_type in content_types:
+            rated = service.recompute(content_type.id)
+            self.stdout.write(f'  {content_type.app_label}.{content_type.model}: {rated} rated object(s)')
+        self.stdout.write(self.style.SUCCESS(f'Recomputed ratings for {len(content_types)} content type(s).'))
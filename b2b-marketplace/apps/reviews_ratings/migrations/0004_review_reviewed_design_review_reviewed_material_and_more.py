@@ -0,0 +1,78 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:25
+
+from itertools import islice
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+# (content type app_label, model, typed column on Review, attribute of the reviewed object it stores).
+# Frozen copy of registry.py at the time of this migration.
+TYPED_TARGETS = [
+    ('listings', 'material', 'reviewed_material', 'pk'),
+    ('listings', 'design', 'reviewed_design', 'pk'),
+    ('accounts', 'customuser', 'reviewed_user', 'pk'),
+    ('accounts', 'profile', 'reviewed_user', 'user_id'),
+]
+
+
+BATCH_SIZE = 500
+
+
+def backfill_typed_targets(apps, schema_editor):
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    Review = apps.get_model('reviews_ratings', 'Review')
+    for app_label, model_name, field, attr in TYPED_TARGETS:
+        content_type = ContentType.objects.filter(app_label=app_label, model=model_name).first()
+        if content_type is None:
+            continue
+        target_model = apps.get_model(app_label, model_name)
+        # Streamed in batches, so memory stays bounded however many reviews there are
+        reviews = Review.objects.filter(content_type=content_type).order_by('pk').values_list('pk', 'object_id_str').iterator(chunk_size=BATCH_SIZE)
+        while True:
+            batch = list(islice(reviews, BATCH_SIZE))
+            if not batch:
+                break
+            ids = {object_id_str for _, object_id_str in batch if object_id_str.isdigit()}
+            # Only link reviews whose target still exists, so the new FK constraint holds
+            values = dict(
+                (str(pk), value) for pk, value in target_model.objects.filter(pk__in=ids).values_list('pk', attr)
+            )
+            Review.objects.bulk_update([
+                Review(pk=pk, **{f'{field}_id': values[object_id_str]})
+                for pk, object_id_str in batch if object_id_str in values
+            ], [field])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0004_design_currency_material_currency_and_more'),
+        ('reviews_ratings', '0003_reviewhelpfulvote_review_helpful_count_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='reviewed_design',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reviews', to='listings.design'),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='reviewed_material',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reviews', to='listings.material'),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='reviewed_user',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reviews_received', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='review',
+            name='object_id',
+            field=models.UUIDField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_typed_targets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:28
+
+import django.db.models.deletion
+from django.conf import settings
+import hashlib
+import re
+
+from django.db import migrations, models
+
+
+def backfill_moderation_fields(apps, schema_editor):
+    """Hashes existing comments (same normalization as moderation.text_hash) and marks unapproved rows rejected."""
+    Review = apps.get_model('reviews_ratings', 'Review')
+    non_word = re.compile(r'[^\w]+')
+    reviews = list(Review.objects.only('id', 'comment', 'is_approved'))
+    for review in reviews:
+        normalized = non_word.sub(' ', (review.comment or '').lower()).strip()
+        review.text_hash = hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+        review.moderation_status = 'approved' if review.is_approved else 'rejected'
+    Review.objects.bulk_update(reviews, ['text_hash', 'moderation_status'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('listings', '0004_design_currency_material_currency_and_more'),
+        ('reviews_ratings', '0004_review_reviewed_design_review_reviewed_material_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='moderated_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='moderated_by',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='moderated_reviews', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='moderation_status',
+            field=models.CharField(choices=[('approved', 'Approved'), ('pending', 'Pending Moderation'), ('rejected', 'Rejected')], db_index=True, default='approved', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='spam_reasons',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='spam_score',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='text_hash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['moderation_status', '-spam_score'], name='review_moderation_queue_idx'),
+        ),
+        migrations.RunPython(backfill_moderation_fields, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+from django.db import migrations
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    """
+    Builds RatingAggregate rows for reviews written before aggregates were maintained (0002 created
+    the table empty), and rebuilds any the delta path started from zero, with the same grouped
+    recompute as `manage.py recompute_ratings`: one query per reviewed content type, mirrored onto
+    average_rating/review_count.
+    """
+    from apps.reviews_ratings.services import RatingAggregationService
+
+    Review = apps.get_model('reviews_ratings', 'Review')
+    RatingAggregate = apps.get_model('reviews_ratings', 'RatingAggregate')
+    content_type_ids = set(Review.objects.order_by().values_list('content_type_id', flat=True).distinct())
+    content_type_ids |= set(RatingAggregate.objects.order_by().values_list('content_type_id', flat=True).distinct())
+    service = RatingAggregationService()
+    for content_type_id in sorted(content_type_ids):
+        service.recompute(content_type_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews_ratings', '0005_review_moderated_at_review_moderated_by_and_more'),
+        # The recompute mirrors onto these models as they are now
+        ('accounts', '0003_profile_reputation_score_and_more'),
+        ('listings', '0005_design_seller_reputation_material_seller_reputation'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,5 @@
+from decimal import Decimal, ROUND_HALF_UP
+
 from django.db import models
 from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator
@@ -16,6 +18,11 @@ from apps.core.models import AbstractBaseModel # For created_at, updated_at
 
 class Review(AbstractBaseModel):
     RATING_CHOICES = [(i, str(i)) for i in range(1, 6)] # 1 to 5 stars
+    MODERATION_STATUS_CHOICES = (
+        ('approved', 'Approved'),   # Published (auto or by a moderator)
+        ('pending', 'Pending Moderation'), # Held by the spam scorer
+        ('rejected', 'Rejected'),
+    )
 
     author = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -30,11 +37,24 @@ class Review(AbstractBaseModel):
     comment = models.TextField()
     is_approved = models.BooleanField(default=True, help_text="Admin can unapprove problematic reviews")
     is_edited = models.BooleanField(default=False)
+    helpful_count = models.PositiveIntegerField(default=0, editable=False) # Denormalized from ReviewHelpfulVote
+
+    # Moderation (see moderation.py). is_approved stays the single flag that rating aggregates use.
+    moderation_status = models.CharField(max_length=10, choices=MODERATION_STATUS_CHOICES, default='approved', db_index=True)
+    spam_score = models.PositiveSmallIntegerField(default=0, editable=False)
+    spam_reasons = models.JSONField(default=list, blank=True, editable=False)
+    text_hash = models.CharField(max_length=64, blank=True, db_index=True, editable=False) # sha256 of normalized comment
+    moderated_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+        editable=False, related_name='moderated_reviews'
+    )
+    moderated_at = models.DateTimeField(null=True, blank=True, editable=False)
 
     # Generic Foreign Key to allow reviews on different models
     # (e.g., Seller (CustomUser), Manufacturer (CustomUser), Design, Material)
     content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
-    object_id = models.UUIDField() # Assuming target objects use UUIDs. If mixed, use CharField or PositiveIntegerField.
+    object_id = models.UUIDField(null=True, blank=True) # Unused: every reviewable model has an integer PK. Kept nullable for old rows.
+                                   # Assuming target objects use UUIDs. If mixed, use CharField or PositiveIntegerField.
                                    # For CustomUser, object_id would be CustomUser.id (which is int by default)
                                    # For Material/Design, object_id would be their UUIDs.
                                    # To handle this mix, object_id might need to be CharField if CustomUser.id is not UUID.
@@ -57,10 +77,11 @@ class Review(AbstractBaseModel):
     content_object = GenericForeignKey('content_type', 'object_id_str')
 
 
-    # Optional: Direct foreign keys if you primarily review specific types and GFK is for extension
-    # reviewed_user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True, related_name='reviews_received')
-    # reviewed_material = models.ForeignKey(Material, on_delete=models.CASCADE, null=True, blank=True, related_name='reviews')
-    # reviewed_design = models.ForeignKey(Design, on_delete=models.CASCADE, null=True, blank=True, related_name='reviews')
+    # Typed lookup columns mirroring (content_type, object_id_str) for the registered reviewable models
+    # (see registry.py), so reviews join back to their target on native integer keys. Set in save().
+    reviewed_user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True, editable=False, related_name='reviews_received')
+    reviewed_material = models.ForeignKey('listings.Material', on_delete=models.CASCADE, null=True, blank=True, editable=False, related_name='reviews')
+    reviewed_design = models.ForeignKey('listings.Design', on_delete=models.CASCADE, null=True, blank=True, editable=False, related_name='reviews')
 
     class Meta:
         ordering = ['-created_at']
@@ -68,6 +89,10 @@ class Review(AbstractBaseModel):
         unique_together = ('author', 'content_type', 'object_id_str')
         indexes = [
             models.Index(fields=["content_type", "object_id_str"]),
+            # "Most helpful" reviews for one object (review summary endpoint)
+            models.Index(fields=["content_type", "object_id_str", "-helpful_count"], name="review_most_helpful_idx"),
+            # Moderation queue: pending reviews, worst first
+            models.Index(fields=["moderation_status", "-spam_score"], name="review_moderation_queue_idx"),
         ]
 
     def __str__(self):
@@ -76,13 +101,125 @@ class Review(AbstractBaseModel):
     def save(self, *args, **kwargs):
         if self.pk: # if object is being updated
             self.is_edited = True
+        self.set_typed_target()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'comment', 'title'} & set(update_fields):
+            self.apply_spam_score()
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {
+                    'text_hash', 'spam_score', 'spam_reasons', 'is_approved', 'moderation_status'
+                }
         super().save(*args, **kwargs)
+        self._loaded_text = (self.comment, self.title)
+
+    def apply_spam_score(self):
+        """
+        Scores new or re-worded reviews and holds high scorers for moderation.
+        Reviews a moderator already decided on keep that decision.
+        """
+        from .moderation import get_hold_threshold, score_review, text_hash
+        new_hash = text_hash(self.comment)
+        if not self._state.adding:
+            loaded_text = getattr(self, '_loaded_text', None)
+            if loaded_text is not None:
+                changed = loaded_text != (self.comment, self.title)
+            else: # Deferred load: the stored hash is all we have (empty on rows saved before scoring)
+                changed = bool(self.text_hash) and new_hash != self.text_hash
+            if not changed:
+                self.text_hash = new_hash # Text unchanged; keep the existing score
+                return
+        self.text_hash = new_hash
+        self.spam_score, self.spam_reasons = score_review(self)
+        if self.moderated_by_id is None and self.spam_score >= get_hold_threshold():
+            self.is_approved = False
+            self.moderation_status = 'pending'
+
+    def set_typed_target(self):
+        """Fills the typed reviewed_* column matching content_type/object_id_str and clears the others."""
+        from .registry import get_reviewable_for_content_type_id, target_fields
+        reviewable = get_reviewable_for_content_type_id(self.content_type_id) if self.content_type_id else None
+        for field in target_fields():
+            attname = f'{field}_id'
+            if reviewable and field == reviewable.target_field:
+                if reviewable.target_attr == 'pk' or getattr(self, attname) is None: # Non-pk values cost a query
+                    setattr(self, attname, reviewable.target_value(self.object_id_str))
+            else:
+                setattr(self, attname, None)
+
+    # Fields that decide what a review contributes to its target's RatingAggregate
+    RATING_STATE_FIELDS = ('content_type_id', 'object_id_str', 'rating', 'is_approved')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what this row contributed to the aggregates when it was loaded, so the
+        # post_save/post_delete signals can apply a delta instead of re-aggregating.
+        # Skipped for deferred loads (.only()/.defer()); the signals fall back to a recompute.
+        if all(attname in instance.__dict__ for attname in cls.RATING_STATE_FIELDS):
+            instance._counted_rating = instance.rating_contribution()
+        # Likewise the text, so saves only rescore (and maybe hold) reviews whose wording changed.
+        if 'comment' in instance.__dict__ and 'title' in instance.__dict__:
+            instance._loaded_text = (instance.comment, instance.title)
+        return instance
+
+    def rating_contribution(self):
+        """(content_type_id, object_id_str, rating) this review adds to aggregates, or None if it doesn't count."""
+        if not self.is_approved:
+            return None
+        return (self.content_type_id, str(self.object_id_str), self.rating)
+
+
+class RatingAggregate(AbstractBaseModel):
+    """
+    Running rating totals for one reviewed object, kept in sync incrementally by the Review signals.
+    `average_rating`/`review_count` on the reviewed model itself (Material, Design, Profile) are
+    mirrored from this row; run `manage.py recompute_ratings` to rebuild everything from scratch.
+    """
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id_str = models.CharField(max_length=36)
+    review_count = models.PositiveIntegerField(default=0) # Approved reviews only
+    rating_sum = models.PositiveIntegerField(default=0)
+    # 1-5 star histogram
+    rating_1_count = models.PositiveIntegerField(default=0)
+    rating_2_count = models.PositiveIntegerField(default=0)
+    rating_3_count = models.PositiveIntegerField(default=0)
+    rating_4_count = models.PositiveIntegerField(default=0)
+    rating_5_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['content_type', 'object_id_str']
+        constraints = [
+            models.UniqueConstraint(fields=['content_type', 'object_id_str'], name='unique_rating_aggregate_target'),
+        ]
+
+    def __str__(self):
+        return f"{self.content_type.model} {self.object_id_str}: {self.average_rating} ({self.review_count} reviews)"
 
-# We'll also need a way to store average ratings. This could be on the reviewed models themselves
-# or in a separate model. For now, let's assume we'll add fields to CustomUser (Profile), Material, Design.
-# Example fields to add to other models (e.g., Profile or Material/Design):
-# average_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.00)
-# review_count = models.PositiveIntegerField(default=0)
+    @staticmethod
+    def histogram_field(rating):
+        return f'rating_{rating}_count'
+
+    @property
+    def average_rating(self):
+        if not self.review_count:
+            return Decimal('0.00')
+        return (Decimal(self.rating_sum) / Decimal(self.review_count)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+    @property
+    def histogram(self):
+        return {rating: getattr(self, self.histogram_field(rating)) for rating in range(1, 6)}
+
+
+class ReviewHelpfulVote(AbstractBaseModel):
+    """One user marking one review as helpful. Review.helpful_count is kept in sync with F() updates."""
+    review = models.ForeignKey(Review, on_delete=models.CASCADE, related_name='helpful_votes')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='helpful_review_votes')
+
+    class Meta:
+        unique_together = ('review', 'user')
+
+    def __str__(self):
+        return f"{self.user.username} found review {self.review_id} helpful"
 
 
 class ReviewReply(AbstractBaseModel):
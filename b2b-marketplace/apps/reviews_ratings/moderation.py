@@ -0,0 +1,88 @@
+# apps/reviews_ratings/moderation.py
+"""
+Write-time spam/quality scoring for reviews.
+
+Scores are 0-100, built from a few cheap, indexed checks:
+  - duplicate text: other reviews with the same normalized-comment hash (`text_hash` index)
+  - author velocity: reviews by the same author in the last hour (author FK + created_at)
+  - rating outlier: rating far from an established RatingAggregate average
+  - content heuristics: links and very short comments
+Reviews scoring at or above REVIEW_SPAM_HOLD_THRESHOLD are held for moderation (not approved)
+until a moderator approves or rejects them.
+"""
+import hashlib
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+DUPLICATE_TEXT_POINTS = 40          # First duplicate; each further copy adds DUPLICATE_TEXT_EXTRA_POINTS
+DUPLICATE_TEXT_EXTRA_POINTS = 10
+VELOCITY_WINDOW = timedelta(hours=1)
+VELOCITY_LIMITS = [(20, 50), (5, 25)] # (reviews in window, points), highest first
+OUTLIER_MIN_REVIEWS = 5
+OUTLIER_DISTANCE = 3                # Stars away from the current average
+OUTLIER_POINTS = 15
+LINK_POINTS = 20
+SHORT_COMMENT_LENGTH = 10
+SHORT_COMMENT_POINTS = 10
+
+_NON_WORD = re.compile(r'[^\w]+')
+_LINK = re.compile(r'https?://|www\.', re.IGNORECASE)
+
+
+def get_hold_threshold():
+    return int(getattr(settings, 'REVIEW_SPAM_HOLD_THRESHOLD', 50))
+
+
+def normalize_text(text):
+    """Lower-cases and strips punctuation/whitespace so trivially varied copies hash the same."""
+    return _NON_WORD.sub(' ', (text or '').lower()).strip()
+
+
+def text_hash(text):
+    return hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+
+
+def score_review(review):
+    """
+    Returns (score, reasons) for an unsaved or edited Review. `review.text_hash` must already be set.
+    Costs at most three small indexed queries.
+    """
+    from .models import Review, RatingAggregate
+
+    score, reasons = 0, []
+
+    if normalize_text(review.comment):
+        duplicates = Review.objects.filter(text_hash=review.text_hash).exclude(pk=review.pk).count()
+        if duplicates:
+            score += DUPLICATE_TEXT_POINTS + DUPLICATE_TEXT_EXTRA_POINTS * (duplicates - 1)
+            reasons.append(f'duplicate_text:{duplicates}')
+
+    if review.author_id:
+        recent = Review.objects.filter(
+            author_id=review.author_id, created_at__gte=timezone.now() - VELOCITY_WINDOW
+        ).exclude(pk=review.pk).count()
+        for limit, points in VELOCITY_LIMITS:
+            if recent >= limit:
+                score += points
+                reasons.append(f'author_velocity:{recent}')
+                break
+
+    aggregate = RatingAggregate.objects.filter(
+        content_type_id=review.content_type_id, object_id_str=str(review.object_id_str)
+    ).only('review_count', 'rating_sum').first()
+    if aggregate and aggregate.review_count >= OUTLIER_MIN_REVIEWS and review.rating:
+        if abs(review.rating - aggregate.average_rating) >= OUTLIER_DISTANCE:
+            score += OUTLIER_POINTS
+            reasons.append('rating_outlier')
+
+    if _LINK.search(review.comment or '') or _LINK.search(review.title or ''):
+        score += LINK_POINTS
+        reasons.append('contains_link')
+    if len((review.comment or '').strip()) < SHORT_COMMENT_LENGTH:
+        score += SHORT_COMMENT_POINTS
+        reasons.append('short_comment')
+
+    return min(score, 100), reasons
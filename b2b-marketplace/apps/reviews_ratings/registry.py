@@ -0,0 +1,98 @@
+# apps/reviews_ratings/registry.py
+"""
+Registry of models that can be reviewed.
+
+Resolves the `content_type_model` names used in the API (e.g. 'material') to model classes and
+ContentTypes without hitting the database on every request: model classes come from the app
+registry and ContentTypes from ContentTypeManager's per-process cache (get_for_model/get_for_id),
+unlike `ContentType.objects.get(model=...)`, which is an uncached query each time.
+
+Each reviewable type also names the typed foreign key on Review (`reviewed_material`, ...) that
+mirrors `object_id_str`, so reviews can be joined back to their target on native key types.
+"""
+from dataclasses import dataclass
+from functools import cached_property
+
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+
+
+@dataclass(frozen=True)
+class ReviewableType:
+    name: str                       # ContentType.model, as sent by clients
+    model_label: str                # 'app_label.ModelName'
+    target_field: str               # Typed FK on Review pointing at the reviewed object (or its owner)
+    target_attr: str = 'pk'         # Attribute of the reviewed object stored in `target_field`
+    owner_attr: str = 'pk'          # Attribute of the reviewed object holding its owner's user id
+    rating_model_label: str = None  # Model holding average_rating/review_count, if not the model itself
+    rating_lookup: str = 'pk'       # Field of rating_model matching the reviewed object's id
+
+    @cached_property
+    def model(self):
+        return apps.get_model(self.model_label)
+
+    @property
+    def content_type(self):
+        return ContentType.objects.get_for_model(self.model)  # Cached per process by Django
+
+    @cached_property
+    def rating_model(self):
+        return apps.get_model(self.rating_model_label) if self.rating_model_label else self.model
+
+    @property
+    def owner_field(self):
+        """Name of the owner relation on the reviewed object (e.g. 'seller'), or None if it is the owner."""
+        return None if self.owner_attr == 'pk' else self.owner_attr.removesuffix('_id')
+
+    def owner_id(self, obj):
+        """User id owning a reviewed object (seller, designer, or the user/profile's user)."""
+        return obj.pk if self.owner_attr == 'pk' else getattr(obj, self.owner_attr)
+
+    def target_value(self, object_id_str):
+        """Native-typed value for `target_field`, or None if the id is invalid / the object is gone."""
+        try:
+            object_id = self.model._meta.pk.to_python(object_id_str)
+        except Exception:
+            return None
+        if self.target_attr == 'pk':
+            return object_id
+        return self.model.objects.filter(pk=object_id).values_list(self.target_attr, flat=True).first()
+
+
+_REGISTRY = {}
+
+
+def register_reviewable(reviewable: ReviewableType):
+    _REGISTRY[reviewable.name] = reviewable
+    return reviewable
+
+
+register_reviewable(ReviewableType('material', 'listings.Material', 'reviewed_material', owner_attr='seller_id'))
+register_reviewable(ReviewableType('design', 'listings.Design', 'reviewed_design', owner_attr='designer_id'))
+register_reviewable(ReviewableType(
+    'customuser', 'accounts.CustomUser', 'reviewed_user',
+    rating_model_label='accounts.Profile', rating_lookup='user_id',  # User ratings are displayed on the Profile
+))
+register_reviewable(ReviewableType('profile', 'accounts.Profile', 'reviewed_user', target_attr='user_id', owner_attr='user_id'))
+
+
+def get_reviewable(name):
+    """ReviewableType for a model name like 'material' (case-insensitive), or None."""
+    return _REGISTRY.get((name or '').lower())
+
+
+def get_reviewable_for_content_type_id(content_type_id):
+    content_type = ContentType.objects.get_for_id(content_type_id)  # Cached
+    reviewable = _REGISTRY.get(content_type.model)
+    if reviewable and reviewable.model._meta.app_label == content_type.app_label:
+        return reviewable
+    return None
+
+
+def reviewable_names():
+    return sorted(_REGISTRY)
+
+
+def target_fields():
+    """All typed target FK names on Review."""
+    return sorted({reviewable.target_field for reviewable in _REGISTRY.values()})
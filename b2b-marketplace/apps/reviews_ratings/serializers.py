@@ -4,6 +4,8 @@ from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
 
 from .models import Review, ReviewReply
+from .registry import get_reviewable, reviewable_names
+from .services import get_review_target_owner_id
 from apps.accounts.serializers import UserSerializer # For author details
 from django.contrib.auth import get_user_model
 
@@ -41,29 +43,17 @@ class ReviewReplySerializer(serializers.ModelSerializer):
         user = request.user
         review = data.get('review') # This is Review instance due to source='review'
 
-        # Check if the user replying is the owner of the reviewed item
-        # This requires knowing who owns the 'content_object' of the review.
-        if review and review.content_object:
-            reviewed_item_owner = None
-            # Determine owner of the reviewed item
-            if hasattr(review.content_object, 'owner'): # e.g., Project
-                reviewed_item_owner = review.content_object.owner
-            elif hasattr(review.content_object, 'seller'): # e.g., Material
-                reviewed_item_owner = review.content_object.seller
-            elif hasattr(review.content_object, 'designer'): # e.g., Design
-                reviewed_item_owner = review.content_object.designer
-            elif isinstance(review.content_object, User): # If reviewing a User/Profile
-                 # If a user can reply to reviews about themselves.
-                 # Or if only admins can reply.
-                 # This logic depends on your business rules.
-                 # For now, let's assume the reviewed user can reply.
-                reviewed_item_owner = review.content_object
-
-            if reviewed_item_owner != user and not user.is_staff:
-                raise serializers.ValidationError("You are not authorized to reply to this review.")
-        else:
+        # Check if the user replying is the owner of the reviewed item (seller, designer, or the
+        # reviewed user). Uses owners attached by attach_review_targets() when the caller batched
+        # them; otherwise a single narrow query instead of loading content_object and its owner.
+        if not review:
             # This should ideally not happen if review is valid
             raise serializers.ValidationError("Cannot determine context for review reply.")
+        reviewed_item_owner_id = get_review_target_owner_id(review)
+        if reviewed_item_owner_id is None and not user.is_staff:
+            raise serializers.ValidationError("Cannot determine context for review reply.")
+        if reviewed_item_owner_id != user.id and not user.is_staff:
+            raise serializers.ValidationError("You are not authorized to reply to this review.")
 
         if 'author' not in data and user: # If CurrentUserDefault didn't set it
              data['author'] = user
@@ -83,7 +73,7 @@ class ReviewSerializer(serializers.ModelSerializer):
     object_id_str = serializers.CharField(write_only=True, source='object_id_str_input', help_text="ID of the object being reviewed.") # Use a different source name to avoid conflict
 
     # For displaying reviewed object info
-    reviewed_item_type = serializers.CharField(source='content_type.model', read_only=True)
+    reviewed_item_type = serializers.SerializerMethodField()
     reviewed_item_id = serializers.CharField(source='object_id_str', read_only=True) # Displaying the stored string ID
     # reviewed_item_details = serializers.SerializerMethodField(read_only=True) # For richer display
 
@@ -93,14 +83,18 @@ class ReviewSerializer(serializers.ModelSerializer):
             'id', 'author', 'author_id', 'rating', 'title', 'comment',
             'content_type_model', 'object_id_str', # Write-only for GFK
             'reviewed_item_type', 'reviewed_item_id', #'reviewed_item_details', # Read-only for GFK display
-            'is_approved', 'is_edited',
+            'is_approved', 'moderation_status', 'is_edited', 'helpful_count',
             'replies', 'created_at', 'updated_at'
         ]
         read_only_fields = [
-            'id', 'is_approved', 'is_edited', 'created_at', 'updated_at',
+            'id', 'is_approved', 'moderation_status', 'is_edited', 'helpful_count', 'created_at', 'updated_at',
             'replies', 'reviewed_item_type', 'reviewed_item_id', #'reviewed_item_details'
         ]
 
+    def get_reviewed_item_type(self, obj):
+        # ContentType manager cache instead of a content_type query per review
+        return ContentType.objects.get_for_id(obj.content_type_id).model
+
     # def get_reviewed_item_details(self, obj):
     #     if obj.content_object:
     #         return get_content_object_serializer(obj.content_object)
@@ -108,16 +102,11 @@ class ReviewSerializer(serializers.ModelSerializer):
 
     def validate_content_type_model(self, value):
         value = value.lower()
-        # Map user-friendly model names to actual ContentType model names if needed
-        # e.g., if user sends 'user', map to 'customuser' (ContentType.model is usually lowercase model name)
-        try:
-            # Assuming 'value' is the model name as stored in ContentType (e.g., 'customuser', 'material')
-            # You might need a mapping if user input is different:
-            # model_map = {"user": "customuser", "profile": "profile", "material": "material", "design": "design"}
-            # actual_model_name = model_map.get(value, value)
-            ContentType.objects.get(model=value) # Check if content type exists
-        except ContentType.DoesNotExist:
-            raise serializers.ValidationError(f"Invalid model name for review: {value}. Supported types are e.g. 'customuser', 'material', 'design'.")
+        # Only registered reviewable models (see registry.py); resolved without a ContentType query
+        if get_reviewable(value) is None:
+            raise serializers.ValidationError(
+                f"Invalid model name for review: {value}. Supported types are: {', '.join(reviewable_names())}."
+            )
         return value
 
     def validate(self, data):
@@ -129,10 +118,11 @@ class ReviewSerializer(serializers.ModelSerializer):
 
         if content_type_model_name and object_id_input:
             try:
-                content_type_instance = ContentType.objects.get(model=content_type_model_name)
-                target_model_class = content_type_instance.model_class()
-                if target_model_class is None:
-                    raise serializers.ValidationError(f"Could not resolve model class for '{content_type_model_name}'.")
+                reviewable = get_reviewable(content_type_model_name)
+                if reviewable is None:
+                    raise ContentType.DoesNotExist
+                content_type_instance = reviewable.content_type # Cached by ContentTypeManager
+                target_model_class = reviewable.model
 
                 # Try to fetch the object to ensure it exists
                 # Handle potential ValueError if object_id_input cannot be cast to target model's PK type
@@ -150,14 +140,17 @@ class ReviewSerializer(serializers.ModelSerializer):
                     raise serializers.ValidationError("You cannot review yourself.")
 
                 data['content_type'] = content_type_instance
-                data['object_id_str'] = str(object_id_input) # Ensure it's stored as string
+                data['object_id_str'] = str(target_object.pk) # Ensure it's stored as string
+                # Typed lookup column; we already have the object, so no extra query in Review.save()
+                data[reviewable.target_field] = target_object if reviewable.target_attr == 'pk' \
+                    else getattr(target_object, reviewable.target_attr.removesuffix('_id'))
 
                 # Check for existing review by the same author for the same object
                 if not self.instance: # Only on create
                     if Review.objects.filter(
                         author=user,
                         content_type=content_type_instance,
-                        object_id_str=str(object_id_input)
+                        object_id_str=str(target_object.pk)
                     ).exists():
                         raise serializers.ValidationError("You have already reviewed this item.")
 
@@ -189,4 +182,42 @@ class ReviewSerializer(serializers.ModelSerializer):
             if field not in allowed_update_fields and not (request.user.is_staff and field == 'is_approved'):
                 validated_data.pop(field) # Remove fields not allowed to be updated by user
 
-        return super().update(instance, validated_data)
\ No newline at end of file
+        return super().update(instance, validated_data)
+
+
+class ReviewSnippetSerializer(serializers.ModelSerializer):
+    """Flat review for summaries: no nested user/profile or replies."""
+    author_username = serializers.CharField(source='author.username', read_only=True)
+
+    class Meta:
+        model = Review
+        fields = ['id', 'author_username', 'rating', 'title', 'comment', 'helpful_count', 'created_at']
+        read_only_fields = fields
+
+
+class ModerationReviewSerializer(ReviewSnippetSerializer):
+    """Moderation queue row: the review plus its spam score and what triggered it."""
+    reviewed_item_type = serializers.SerializerMethodField()
+    reviewed_item_id = serializers.CharField(source='object_id_str', read_only=True)
+
+    class Meta(ReviewSnippetSerializer.Meta):
+        fields = ReviewSnippetSerializer.Meta.fields + [
+            'reviewed_item_type', 'reviewed_item_id', 'is_approved', 'moderation_status',
+            'spam_score', 'spam_reasons', 'text_hash', 'moderated_at',
+        ]
+        read_only_fields = fields
+
+    def get_reviewed_item_type(self, obj):
+        return ContentType.objects.get_for_id(obj.content_type_id).model
+
+
+class RatingSummarySerializer(serializers.Serializer):
+    """Serializes a RatingAggregate (or an unsaved empty one for objects without reviews)."""
+    object_id = serializers.CharField(source='object_id_str')
+    review_count = serializers.IntegerField()
+    average_rating = serializers.DecimalField(max_digits=3, decimal_places=2)
+    histogram = serializers.SerializerMethodField()
+
+    def get_histogram(self, obj):
+        # JSON object keys are strings anyway; make that explicit
+        return {str(rating): count for rating, count in obj.histogram.items()}
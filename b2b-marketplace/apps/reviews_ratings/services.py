@@ -0,0 +1,313 @@
+# apps/reviews_ratings/services.py
+from collections import defaultdict
+from decimal import Decimal
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from .models import Review, RatingAggregate
+from .registry import get_reviewable_for_content_type_id
+
+
+def _target_for(content_type: ContentType):
+    """
+    (model, lookup field) holding `average_rating`/`review_count` for objects of `content_type`,
+    or None if that model doesn't display ratings.
+    """
+    reviewable = get_reviewable_for_content_type_id(content_type.id)
+    if reviewable:
+        model, lookup = reviewable.rating_model, reviewable.rating_lookup
+    else:
+        model, lookup = content_type.model_class(), 'pk'
+    if model is None:
+        return None
+    field_names = {f.name for f in model._meta.get_fields()}
+    if not {'average_rating', 'review_count'} <= field_names:
+        return None
+    return model, lookup
+
+
+class RatingAggregationService:
+    """
+    Keeps RatingAggregate rows (and the mirrored `average_rating`/`review_count` columns) in sync.
+
+    Review saves and deletes are applied as deltas: one `UPDATE ... SET review_count = review_count + 1,
+    rating_sum = rating_sum + 4, rating_4_count = rating_4_count + 1` on the aggregate row plus one
+    UPDATE of the reviewed object, instead of an Avg/Count over all of its reviews. `recompute` rebuilds
+    aggregates with one grouped query per content type for bulk changes or drift repair.
+    """
+
+    # --- Incremental path (signals) ---
+
+    def apply_delta(self, content_type_id, object_id_str, count_delta: int, sum_delta: int, histogram_delta: dict):
+        """
+        Adds the deltas to the object's aggregate row and mirrors the result. Without a row (the first
+        review, or reviews older than the aggregates) a delta has nothing to start from, so the row is
+        rebuilt from the reviews table, which already includes this change.
+        """
+        if not (count_delta or sum_delta or any(histogram_delta.values())):
+            return
+        object_id_str = str(object_id_str)
+        changes = {
+            'review_count': F('review_count') + count_delta,
+            'rating_sum': F('rating_sum') + sum_delta,
+            'updated_at': timezone.now(),  # .update() skips auto_now
+        }
+        for rating, delta in histogram_delta.items():
+            if delta:
+                field = RatingAggregate.histogram_field(rating)
+                changes[field] = F(field) + delta
+
+        aggregate_qs = RatingAggregate.objects.filter(content_type_id=content_type_id, object_id_str=object_id_str)
+        with transaction.atomic():
+            if aggregate_qs.update(**changes):
+                aggregate = aggregate_qs.only('review_count', 'rating_sum').get()
+                self._mirror(ContentType.objects.get_for_id(content_type_id), object_id_str, aggregate)
+                return
+        try:
+            with transaction.atomic():
+                self.recompute(content_type_id, [object_id_str])
+        except IntegrityError:
+            # A concurrent writer inserted the row first; rebuilding again counts both changes
+            self.recompute(content_type_id, [object_id_str])
+
+    def apply_review_change(self, old_contribution, new_contribution):
+        """
+        Applies the difference between what a review counted before and after a change.
+        Contributions are `Review.rating_contribution()` tuples or None (not counted).
+        Handles create, delete, approve/unapprove and rating edits.
+        """
+        if old_contribution == new_contribution:
+            return
+        if old_contribution and new_contribution and old_contribution[:2] == new_contribution[:2]:
+            # Same target: a single UPDATE covers a rating edit.
+            content_type_id, object_id_str, old_rating = old_contribution
+            new_rating = new_contribution[2]
+            self.apply_delta(content_type_id, object_id_str, 0, new_rating - old_rating,
+                             {old_rating: -1, new_rating: 1})
+            return
+        if old_contribution:
+            content_type_id, object_id_str, rating = old_contribution
+            self.apply_delta(content_type_id, object_id_str, -1, -rating, {rating: -1})
+        if new_contribution:
+            content_type_id, object_id_str, rating = new_contribution
+            self.apply_delta(content_type_id, object_id_str, 1, rating, {rating: 1})
+
+    def _mirror(self, content_type, object_id_str, aggregate):
+        target = _target_for(content_type)
+        if target is None:
+            return
+        model, lookup = target
+        try:
+            lookup_value = model._meta.pk.to_python(object_id_str) if lookup == 'pk' else object_id_str
+        except Exception:
+            return  # Stale/invalid id; nothing to mirror onto
+        model.objects.filter(**{lookup: lookup_value}).update(
+            average_rating=aggregate.average_rating,
+            review_count=aggregate.review_count,
+        )
+
+    # --- Bulk path (management command, admin bulk actions) ---
+
+    def grouped_totals(self, content_type_id, object_ids=None):
+        """One GROUP BY query: {object_id_str: {'review_count', 'rating_sum', 'rating_N_count'...}}."""
+        qs = Review.objects.filter(content_type_id=content_type_id, is_approved=True)
+        if object_ids is not None:
+            qs = qs.filter(object_id_str__in=object_ids)
+        histogram = {
+            RatingAggregate.histogram_field(rating): Count('id', filter=Q(rating=rating))
+            for rating in range(1, 6)
+        }
+        rows = (
+            qs.order_by()  # Drop Meta.ordering so it doesn't leak into GROUP BY
+            .values('object_id_str')
+            .annotate(review_count=Count('id'), rating_sum=Sum('rating'), **histogram)
+        )
+        return {row.pop('object_id_str'): row for row in rows}
+
+    @transaction.atomic
+    def recompute(self, content_type_id, object_ids=None) -> int:
+        """
+        Rebuilds aggregates for one content type (optionally only `object_ids`) from the reviews table.
+        Returns the number of objects that have at least one approved review.
+        """
+        if object_ids is not None:
+            object_ids = [str(object_id) for object_id in object_ids]
+        totals = self.grouped_totals(content_type_id, object_ids)
+
+        existing = RatingAggregate.objects.filter(content_type_id=content_type_id)
+        if object_ids is not None:
+            existing = existing.filter(object_id_str__in=object_ids)
+        existing.delete()
+        aggregates = RatingAggregate.objects.bulk_create(
+            [RatingAggregate(content_type_id=content_type_id, object_id_str=object_id, **row)
+             for object_id, row in totals.items()],
+            batch_size=1000,
+        )
+        stale_ids = None if object_ids is None else [object_id for object_id in object_ids if object_id not in totals]
+        self._mirror_bulk(ContentType.objects.get_for_id(content_type_id), aggregates, stale_ids)
+        return len(aggregates)
+
+    def recompute_targets(self, targets) -> int:
+        """Recomputes a set of (content_type_id, object_id_str) pairs, one grouped query per content type."""
+        by_content_type = defaultdict(set)
+        for content_type_id, object_id_str in targets:
+            by_content_type[content_type_id].add(str(object_id_str))
+        return sum(self.recompute(content_type_id, object_ids) for content_type_id, object_ids in by_content_type.items())
+
+    def _mirror_bulk(self, content_type, aggregates, stale_ids=None):
+        """Mirrors `aggregates` onto the reviewed model. `stale_ids=None` means "every other object"."""
+        target = _target_for(content_type)
+        if target is None:
+            return
+        model, lookup = target
+        field = model._meta.pk if lookup == 'pk' else model._meta.get_field(lookup.removesuffix('_id'))
+
+        # Reset objects that no longer have approved reviews...
+        reset_qs = model.objects.filter(Q(review_count__gt=0) | Q(average_rating__gt=0))
+        if stale_ids is not None:
+            reset_qs = reset_qs.filter(**{f'{lookup}__in': self._to_python_ids(field, stale_ids)})
+        reset_qs.update(average_rating=Decimal('0.00'), review_count=0)
+
+        # ...then write the rest in batched CASE/WHEN updates.
+        values_by_id = {}
+        for aggregate in aggregates:
+            ids = self._to_python_ids(field, [aggregate.object_id_str])
+            if ids:
+                values_by_id[ids[0]] = aggregate
+        if not values_by_id:
+            return
+        instances = list(model.objects.filter(**{f'{lookup}__in': list(values_by_id)}).only('pk', lookup))
+        for instance in instances:
+            aggregate = values_by_id[getattr(instance, 'pk' if lookup == 'pk' else lookup)]
+            instance.average_rating = aggregate.average_rating
+            instance.review_count = aggregate.review_count
+        model.objects.bulk_update(instances, ['average_rating', 'review_count'], batch_size=500)
+
+    @staticmethod
+    def _to_python_ids(field, object_ids):
+        # ForeignKey.to_python delegates to the target's pk field
+        converted = []
+        for object_id in object_ids or []:
+            try:
+                converted.append(field.to_python(object_id))
+            except Exception:
+                continue
+        return converted
+
+
+def get_rating_summaries(content_type: ContentType, object_ids) -> dict:
+    """
+    {object_id_str: RatingAggregate} for `object_ids` in one query. Objects without approved
+    reviews get an unsaved, all-zero aggregate so callers don't have to special-case them.
+    """
+    object_ids = [str(object_id) for object_id in object_ids]
+    found = {
+        aggregate.object_id_str: aggregate
+        for aggregate in RatingAggregate.objects.filter(content_type=content_type, object_id_str__in=object_ids)
+    }
+    return {
+        object_id: found.get(object_id) or RatingAggregate(content_type=content_type, object_id_str=object_id)
+        for object_id in object_ids
+    }
+
+
+def attach_review_targets(reviews) -> list:
+    """
+    Resolves `content_object` for many reviews at once: reviews are grouped by content type and each
+    type's targets are loaded with a single `in_bulk` query (owner FK joined in), then stored in the
+    GenericForeignKey cache so `review.content_object` (and `Review.__str__`) no longer query per row.
+
+    Also sets `review.target_owner_id` / `review.target_owner` (seller, designer or reviewed user;
+    None if unknown) so reply authorization needs no per-row queries. Returns the reviews as a list.
+    """
+    reviews = list(reviews)
+    generic_fk = Review.content_object # Descriptor access on the class returns the field
+    by_content_type = defaultdict(list)
+    for review in reviews:
+        by_content_type[review.content_type_id].append(review)
+
+    for content_type_id, group in by_content_type.items():
+        model = ContentType.objects.get_for_id(content_type_id).model_class() # Cached
+        reviewable = get_reviewable_for_content_type_id(content_type_id)
+        ids = {}
+        if model is not None:
+            for review in group:
+                try:
+                    ids[review.pk] = model._meta.pk.to_python(review.object_id_str)
+                except Exception:
+                    pass # Malformed id: resolves to None like a deleted target
+        targets = {}
+        if ids:
+            queryset = model.objects.all()
+            owner_field = reviewable.owner_field if reviewable else None
+            if owner_field:
+                queryset = queryset.select_related(owner_field)
+            targets = queryset.in_bulk(set(ids.values()))
+        for review in group:
+            target = targets.get(ids.get(review.pk))
+            generic_fk.set_cached_value(review, target)
+            if reviewable and target is not None:
+                review.target_owner_id = reviewable.owner_id(target)
+                review.target_owner = getattr(target, reviewable.owner_field) if reviewable.owner_field else target
+            else:
+                review.target_owner_id = review.target_owner = None
+    return reviews
+
+
+def get_review_target_owner_id(review):
+    """
+    Owner user id of the reviewed object, using values attached by `attach_review_targets` when present.
+    Otherwise costs at most one narrow query (none if the target is already cached on the review).
+    """
+    if hasattr(review, 'target_owner_id'):
+        return review.target_owner_id
+    reviewable = get_reviewable_for_content_type_id(review.content_type_id)
+    if reviewable is None:
+        return None
+    if Review.content_object.is_cached(review):
+        target = review.content_object
+        owner_id = reviewable.owner_id(target) if target is not None else None
+    else:
+        try:
+            object_id = reviewable.model._meta.pk.to_python(review.object_id_str)
+        except Exception:
+            return None
+        if reviewable.owner_attr == 'pk':
+            owner_id = object_id if reviewable.model.objects.filter(pk=object_id).exists() else None
+        else:
+            owner_id = reviewable.model.objects.filter(pk=object_id).values_list(reviewable.owner_attr, flat=True).first()
+    review.target_owner_id = owner_id
+    return owner_id
+
+
+class ReviewModerationService:
+    """
+    Bulk approve/reject for the moderation queue. Each call is one UPDATE over the selected reviews
+    followed by one grouped recompute per content type for the targets whose approval actually
+    changed, instead of a save() (and an aggregate update) per review.
+    """
+    STATUS_APPROVAL = {'approved': True, 'rejected': False}
+
+    @transaction.atomic
+    def set_status(self, queryset, moderation_status, moderator=None) -> dict:
+        if moderation_status not in self.STATUS_APPROVAL:
+            raise ValueError(f"Unknown moderation status: {moderation_status}")
+        is_approved = self.STATUS_APPROVAL[moderation_status]
+
+        # Lock the rows so the recompute sees exactly the approval flips made here.
+        ids = list(queryset.order_by().select_for_update().values_list('id', flat=True))
+        reviews = Review.objects.filter(pk__in=ids)
+        targets = set(reviews.exclude(is_approved=is_approved).values_list('content_type_id', 'object_id_str'))
+        now = timezone.now()
+        updated = reviews.update(
+            is_approved=is_approved,
+            moderation_status=moderation_status,
+            moderated_by=moderator,
+            moderated_at=now,
+            updated_at=now,
+        )
+        RatingAggregationService().recompute_targets(targets)
+        return {'updated': updated, 'targets_recomputed': len(targets)}
@@ -0,0 +1,386 @@
+import importlib
+from unittest import mock
+from decimal import Decimal
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from apps.core.testing import QueryBudgetAPITestCase, seed_marketplace
+from apps.accounts.models import Profile
+from apps.listings.models import Category, Design, Material
+from . import moderation
+from .models import RatingAggregate, Review, ReviewReply
+from .services import attach_review_targets, get_review_target_owner_id
+from .views import ReviewViewSet
+from .registry import get_reviewable, get_reviewable_for_content_type_id, reviewable_names, target_fields
+
+User = get_user_model()
+
+
+class ReviewQueryBudgetTests(QueryBudgetAPITestCase):
+    """Review list/detail stay within their query budgets across authors, targets and replies."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_marketplace()
+
+    def setUp(self):
+        self.client.force_authenticate(self.data['buyers'][0])
+
+    def test_review_list(self):
+        author = self.data['buyers'][1]
+        material_type = get_reviewable('material')
+
+        def add_reviews():
+            reviewed = set(Review.objects.filter(author=author).values_list('object_id_str', flat=True))
+            for material in [m for m in self.data['materials'] if str(m.pk) not in reviewed][:3]:
+                review = Review.objects.create(
+                    author=author, rating=4, comment=f'Reordered {material.name}, colour matched the swatch.',
+                    content_type=material_type.content_type, object_id_str=str(material.pk),
+                )
+                ReviewReply.objects.create(review=review, author=material.seller, comment='Thanks for the feedback!')
+
+        self.get_within_budget(reverse('review-list'), 'reviews.review-list')
+        self.get_within_budget(reverse('review-list'), None, grow=add_reviews, data={'author__id': author.id})
+
+    def test_review_detail(self):
+        review = self.data['reviews'][0]
+        self.get_within_budget(reverse('review-detail', kwargs={'pk': review.pk}), 'reviews.review-detail')
+
+
+class MaterialReviewsMixin:
+    """A material with three 5-star reviews, and helpers to add users, materials and reviews."""
+
+    def setUp(self):
+        super().setUp()
+        self.seller = self.user('seller')
+        self.category = Category.objects.create(name='Wool')
+        self.material = self.make_material('Boiled wool')
+        self.material_type = get_reviewable('material').content_type
+        self.reviews = [self.review(5, f'Dense, warm and even, order {i}.') for i in range(3)]
+
+    def user(self, user_type='buyer', **extra):
+        username = f'review-{user_type}-{User.objects.count()}'
+        return User.objects.create_user(username, f'{username}@example.com', 'password123', user_type=user_type, **extra)
+
+    def make_material(self, name):
+        return Material.objects.create(
+            name=name, description='Wool', seller=self.seller, category=self.category, price_per_unit=Decimal('12.00'), stock_quantity=10,
+        )
+
+    def review(self, rating, comment, target=None, author=None):
+        target = target or self.material
+        return Review.objects.create(
+            author=author or self.user(), rating=rating, comment=comment,
+            content_type=get_reviewable(target._meta.model_name).content_type, object_id_str=str(target.pk),
+        )
+
+
+class RatingAggregateTests(MaterialReviewsMixin, TestCase):
+    """Aggregates follow review changes, including reviews written before aggregates existed."""
+
+    def forget_aggregates(self):
+        """The state before 0002: reviews and the mirrored columns, but no aggregate rows."""
+        RatingAggregate.objects.all().delete()
+
+    def assertRating(self, count, average, histogram=None):
+        self.material.refresh_from_db()
+        self.assertEqual((self.material.review_count, self.material.average_rating), (count, Decimal(average)))
+        aggregate = RatingAggregate.objects.get(content_type=self.material_type, object_id_str=str(self.material.pk))
+        self.assertEqual((aggregate.review_count, aggregate.average_rating), (count, Decimal(average)))
+        if histogram:
+            self.assertEqual(aggregate.histogram, histogram)
+
+    def test_deltas(self):
+        self.assertRating(3, '5.00')
+        self.reviews[0].rating = 2
+        self.reviews[0].save()
+        self.assertRating(3, '4.00', {1: 0, 2: 1, 3: 0, 4: 0, 5: 2})
+        self.reviews[1].delete()
+        self.assertRating(2, '3.50')
+
+    def test_new_review_of_an_object_reviewed_before_aggregates(self):
+        self.forget_aggregates()
+        self.review(1, 'Pilled after one wash.')
+        self.assertRating(4, '4.00', {1: 1, 2: 0, 3: 0, 4: 0, 5: 3})
+
+    def test_edited_review_from_before_aggregates(self):
+        self.forget_aggregates()
+        review = Review.objects.get(pk=self.reviews[0].pk)
+        review.rating = 3
+        review.save()
+        self.assertRating(3, '4.33')
+
+    def test_deleted_review_from_before_aggregates(self):
+        self.forget_aggregates()
+        Review.objects.get(pk=self.reviews[0].pk).delete() # Used to fail the rating_sum CHECK constraint
+        self.assertRating(2, '5.00')
+
+    def test_migration_backfills_aggregates(self):
+        self.forget_aggregates()
+        migration = importlib.import_module('apps.reviews_ratings.migrations.0006_backfill_rating_aggregates')
+        migration.backfill_rating_aggregates(apps, None)
+        self.assertRating(3, '5.00', {1: 0, 2: 0, 3: 0, 4: 0, 5: 3})
+
+
+class RatingSummaryTests(MaterialReviewsMixin, APITestCase):
+    """Summaries are read from the stored aggregates; helpful votes count once per user."""
+
+    def test_summary(self):
+        self.reviews[1].rating = 3
+        self.reviews[1].save()
+        for voter in (self.user(), self.user()):
+            self.client.force_authenticate(voter)
+            self.client.post(reverse('review-helpful', kwargs={'pk': self.reviews[2].pk}))
+        self.client.force_authenticate(None)
+
+        with self.assertNumQueries(2): # The aggregate row and the most helpful reviews
+            data = self.client.get(reverse('rating-summary', kwargs={'model_name': 'Material', 'object_id': self.material.pk})).data
+        self.assertEqual((data['review_count'], data['average_rating']), (3, '4.33'))
+        self.assertEqual(data['histogram'], {'1': 0, '2': 0, '3': 1, '4': 0, '5': 2})
+        self.assertEqual(data['most_helpful_reviews'][0]['id'], self.reviews[2].pk)
+        self.assertEqual(data['most_helpful_reviews'][0]['helpful_count'], 2)
+
+        unreviewed = self.make_material('Mohair')
+        data = self.client.get(reverse('rating-summary', kwargs={'model_name': 'material', 'object_id': unreviewed.pk})).data
+        self.assertEqual((data['review_count'], data['average_rating'], data['most_helpful_reviews']), (0, '0.00', []))
+
+    def test_unknown_model(self):
+        self.assertEqual(self.client.get(reverse('rating-summary', kwargs={'model_name': 'order', 'object_id': 1})).status_code, 404)
+        self.assertEqual(self.client.get(reverse('rating-summary-batch', kwargs={'model_name': 'order'}), {'ids': '1'}).status_code, 404)
+
+    def test_batch(self):
+        other = self.make_material('Alpaca')
+        self.review(2, 'Scratchy against the skin.', target=other)
+        url = reverse('rating-summary-batch', kwargs={'model_name': 'material'})
+        with self.assertNumQueries(1):
+            data = self.client.get(url, {'ids': f'{other.pk},{self.material.pk},{other.pk},999999'}).data
+        self.assertEqual(data['content_type_model'], 'material')
+        self.assertEqual( # Request order, duplicates dropped, unknown ids as empty summaries
+            [(row['object_id'], row['review_count'], row['average_rating']) for row in data['results']],
+            [(str(other.pk), 1, '2.00'), (str(self.material.pk), 3, '5.00'), ('999999', 0, '0.00')],
+        )
+        self.assertEqual(len(self.client.post(url, {'ids': [self.material.pk]}, format='json').data['results']), 1)
+        self.assertEqual(self.client.get(url).status_code, 400)
+        self.assertEqual(self.client.post(url, {'ids': 'nope'}, format='json').status_code, 400)
+        self.assertEqual(self.client.get(url, {'ids': ','.join(map(str, range(101)))}).status_code, 400)
+
+    def test_helpful_votes(self):
+        review = self.reviews[0]
+        url = reverse('review-helpful', kwargs={'pk': review.pk})
+        self.assertEqual(self.client.post(url).status_code, 401)
+
+        self.client.force_authenticate(self.user())
+        self.assertEqual(self.client.post(url).data['helpful_count'], 1)
+        self.assertEqual(self.client.post(url).data['helpful_count'], 1) # A second vote is ignored
+        self.assertEqual(self.client.delete(url).data['helpful_count'], 0)
+        self.assertEqual(self.client.delete(url).data['helpful_count'], 0) # So is taking it back twice
+
+        self.client.force_authenticate(review.author)
+        self.assertEqual(self.client.post(url).status_code, 400) # Not on your own review
+
+
+class ModerationTests(MaterialReviewsMixin, APITestCase):
+    """Reviews are scored when written or re-worded; held ones wait in the queue for a moderator."""
+
+    def test_score_review(self):
+        author = self.user()
+        review = Review(author=author, rating=5, comment=self.reviews[0].comment.upper(), content_type=self.material_type, object_id_str=str(self.material.pk))
+        review.text_hash = moderation.text_hash(review.comment)
+        with self.assertNumQueries(3): # Duplicates, author velocity, aggregate
+            self.assertEqual(moderation.score_review(review), (40, ['duplicate_text:1']))
+
+        for i in range(5):
+            self.review(5, f'Consistent colour across bolts, batch {i}.', target=self.make_material(f'Tweed {i}'), author=author)
+        self.review(5, 'Holds its shape after steaming.')
+        self.review(5, 'Exactly as described.') # Five reviews: an established average
+        review.comment, review.rating = 'Much thinner than the sample was.', 1
+        review.text_hash = moderation.text_hash(review.comment)
+        self.assertEqual(moderation.score_review(review), (40, ['author_velocity:5', 'rating_outlier']))
+
+        review = Review(author=self.user(), rating=5, comment='Meh', title='http://spam.example', content_type=self.material_type, object_id_str=str(self.material.pk))
+        review.text_hash = moderation.text_hash(review.comment)
+        self.assertEqual(moderation.score_review(review), (30, ['contains_link', 'short_comment']))
+
+    def test_high_scores_are_held(self):
+        copy = self.review(5, f'{self.reviews[0].comment} http://example.com')
+        self.assertEqual((copy.spam_score, copy.is_approved), (20, True))
+        held = self.review(5, f'{self.reviews[0].comment} http://example.com')
+        self.assertEqual((held.spam_score, held.moderation_status, held.is_approved), (60, 'pending', False))
+        self.assertEqual(held.spam_reasons, ['duplicate_text:1', 'contains_link'])
+        self.material.refresh_from_db()
+        self.assertEqual(self.material.review_count, 4) # Held reviews don't count
+
+    def test_saves_only_rescore_changed_text(self):
+        review = Review.objects.get(pk=self.reviews[0].pk)
+        with mock.patch.object(moderation, 'score_review', return_value=(0, [])) as score:
+            review.rating = 4
+            review.save()
+            review.save(update_fields=['rating'])
+            score.assert_not_called()
+            review.title = 'Warm'
+            review.save()
+            review.comment = 'Warm, but sheds a little.'
+            review.save(update_fields=['comment'])
+            review.save() # Nothing changed since
+        self.assertEqual(score.call_count, 2)
+
+    def test_rows_scored_before_text_hashes_are_not_rescored(self):
+        Review.objects.update(text_hash='', spam_score=0)
+        review = Review.objects.get(pk=self.reviews[0].pk)
+        with mock.patch.object(moderation, 'score_review') as score:
+            review.rating = 3
+            review.save()
+        score.assert_not_called()
+        review.refresh_from_db()
+        self.assertEqual(review.text_hash, moderation.text_hash(review.comment)) # Filled in on the way
+        deferred = Review.objects.only('pk', 'comment', 'text_hash', 'content_type', 'object_id_str').get(pk=self.reviews[1].pk)
+        with mock.patch.object(moderation, 'score_review') as score:
+            deferred.save()
+        score.assert_not_called()
+
+    def test_moderation_queue(self):
+        low = self.review(5, f'{self.reviews[0].comment} www.example.com') # 20: approved
+        held = [self.review(5, f'{self.reviews[0].comment} www.example.com') for _ in range(2)] # 60, 70
+        url = reverse('review-moderation-queue')
+        self.client.force_authenticate(self.user())
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.client.force_authenticate(self.user(is_staff=True))
+        rows = self.client.get(url).data['results']
+        self.assertEqual([(row['id'], row['spam_score']) for row in rows], [(held[1].pk, 70), (held[0].pk, 60)])
+        self.assertEqual(rows[0]['reviewed_item_type'], 'material')
+        self.assertEqual([row['id'] for row in self.client.get(url, {'min_score': 65}).data['results']], [held[1].pk])
+        self.assertIn(low.pk, [row['id'] for row in self.client.get(url, {'status': 'approved', 'min_score': 20}).data['results']])
+
+    def test_bulk_moderation(self):
+        held = [self.review(1, 'Buy cheap wool at www.example.com') for _ in range(3)]
+        self.assertEqual([review.moderation_status for review in held], ['approved', 'pending', 'pending'])
+        moderator = self.user(is_staff=True)
+        self.client.force_authenticate(moderator)
+
+        response = self.client.post(reverse('review-bulk-approve'), {'ids': [held[1].pk, self.reviews[0].pk]}, format='json')
+        self.assertEqual(response.data, {'updated': 2, 'targets_recomputed': 1})
+        held[1].refresh_from_db()
+        self.assertEqual((held[1].is_approved, held[1].moderated_by), (True, moderator))
+        self.material.refresh_from_db()
+        self.assertEqual((self.material.review_count, self.material.average_rating), (5, Decimal('3.40')))
+
+        response = self.client.post(reverse('review-bulk-reject'), {'text_hash': held[0].text_hash}, format='json')
+        self.assertEqual(response.data, {'updated': 3, 'targets_recomputed': 1})
+        self.assertEqual(set(Review.objects.filter(pk__in=[review.pk for review in held]).values_list('moderation_status', flat=True)), {'rejected'})
+        self.material.refresh_from_db()
+        self.assertEqual((self.material.review_count, self.material.average_rating), (3, Decimal('5.00')))
+
+    def test_bulk_moderation_errors(self):
+        url = reverse('review-bulk-approve')
+        self.client.force_authenticate(self.user())
+        self.assertEqual(self.client.post(url, {'ids': [self.reviews[0].pk]}, format='json').status_code, 403)
+        self.client.force_authenticate(self.user(is_staff=True))
+        for body in ({}, {'ids': []}, {'ids': 'all'}, {'ids': ['x']}):
+            self.assertEqual(self.client.post(url, body, format='json').status_code, 400, body)
+        with mock.patch.object(ReviewViewSet, 'MAX_BULK_MODERATION', 2):
+            self.assertEqual(self.client.post(url, {'ids': [1, 2, 3]}, format='json').status_code, 400)
+        self.assertEqual(self.client.post(url, {'text_hash': 'unknown'}, format='json').data['updated'], 0)
+
+class ReviewableRegistryTests(MaterialReviewsMixin, TestCase):
+    """Model names resolve without queries; reviews carry a typed FK to their target."""
+
+    def test_lookups(self):
+        self.assertEqual(reviewable_names(), ['customuser', 'design', 'material', 'profile'])
+        self.assertEqual(target_fields(), ['reviewed_design', 'reviewed_material', 'reviewed_user'])
+        with self.assertNumQueries(0): # Content types come from Django's per-process cache
+            material = get_reviewable('MATERIAL')
+            self.assertIs(get_reviewable_for_content_type_id(material.content_type.id), material)
+        self.assertIsNone(get_reviewable('order'))
+        self.assertIsNone(get_reviewable_for_content_type_id(ContentType.objects.get_for_model(Category).id))
+        self.assertEqual(get_reviewable('customuser').rating_model, Profile)
+        self.assertEqual(material.owner_id(self.material), self.seller.pk)
+
+    def test_reviews_get_typed_targets(self):
+        designer = self.user('designer')
+        design = Design.objects.create(title='Houndstooth', description='Woven', designer=designer, category=self.category, price=Decimal('50.00'))
+        by_type = {
+            'material': self.reviews[0],
+            'design': self.review(4, 'Clean repeat, easy to scale.', target=design),
+            'customuser': self.review(5, 'Shipped samples the same week.', target=self.seller),
+            'profile': self.review(4, 'Answers questions quickly.', target=designer.profile),
+        }
+        self.assertEqual(by_type['material'].reviewed_material_id, self.material.pk)
+        self.assertEqual(by_type['design'].reviewed_design_id, design.pk)
+        self.assertEqual(by_type['customuser'].reviewed_user_id, self.seller.pk)
+        self.assertEqual(by_type['profile'].reviewed_user_id, designer.pk) # A profile's review points at its user
+        self.assertIsNone(by_type['design'].reviewed_material_id)
+        self.assertEqual(get_reviewable('material').target_value('not-a-number'), None)
+
+    def test_migration_backfills_typed_targets_in_batches(self):
+        migration = importlib.import_module('apps.reviews_ratings.migrations.0004_review_reviewed_design_review_reviewed_material_and_more')
+        gone = self.make_material('Discontinued')
+        orphan = self.review(3, 'Fine while it lasted.', target=gone)
+        Review.objects.update(reviewed_material=None)
+        Review.objects.filter(pk=orphan.pk).update(object_id_str='999999') # Target no longer exists
+
+        with mock.patch.object(migration, 'BATCH_SIZE', 2):
+            migration.backfill_typed_targets(apps, None)
+        self.assertEqual(
+            set(Review.objects.values_list('pk', 'reviewed_material_id')),
+            {*((review.pk, self.material.pk) for review in self.reviews), (orphan.pk, None)},
+        )
+
+
+class ReviewTargetTests(MaterialReviewsMixin, TestCase):
+    """Review targets and their owners resolve with one query per content type, not per review."""
+
+    def setUp(self):
+        super().setUp()
+        self.designer = self.user('designer')
+        self.design = Design.objects.create(title='Herringbone', description='Woven', designer=self.designer, category=self.category, price=Decimal('50.00'))
+        self.design_review = self.review(4, 'Clean repeat, easy to scale.', target=self.design)
+        self.user_review = self.review(5, 'Shipped samples the same week.', target=self.seller)
+        self.profile_review = self.review(4, 'Answers questions quickly.', target=self.designer.profile)
+        self.dangling = self.review(2, 'Never arrived.', target=self.make_material('Withdrawn'))
+        Review.objects.filter(pk=self.dangling.pk).update(object_id_str='999999', reviewed_material=None) # Target gone
+
+    def test_mixed_targets_in_one_query_per_type(self):
+        reviews = list(Review.objects.select_related('author', 'content_type'))
+        with self.assertNumQueries(4): # Materials, designs, users, profiles
+            attach_review_targets(reviews)
+        with self.assertNumQueries(0):
+            owners = {review.pk: get_review_target_owner_id(review) for review in reviews}
+            [str(review) for review in reviews] # __str__ reads the cached content_object
+        expected = {review.pk: self.seller.pk for review in self.reviews}
+        expected.update({
+            self.design_review.pk: self.designer.pk, self.user_review.pk: self.seller.pk,
+            self.profile_review.pk: self.designer.pk, self.dangling.pk: None,
+        })
+        self.assertEqual(owners, expected)
+        self.assertIsNone(next(review for review in reviews if review.pk == self.dangling.pk).content_object)
+
+    def test_owner_without_attached_targets(self):
+        for review in Review.objects.all():
+            with self.assertNumQueries(1):
+                owner_id = get_review_target_owner_id(review)
+            with self.assertNumQueries(0): # Remembered on the instance
+                self.assertEqual(get_review_target_owner_id(review), owner_id)
+
+    def test_admin_changelist_query_count_is_flat(self):
+        self.client.force_login(self.user('buyer', is_staff=True, is_superuser=True))
+        url = reverse('admin:reviews_ratings_review_changelist')
+
+        def count():
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            return len(queries)
+
+        before = count()
+        other_design = Design.objects.create(title='Twill', description='Woven', designer=self.designer, category=self.category, price=Decimal('40.00'))
+        self.review(3, 'Colour differs from the photo.', target=other_design)
+        self.review(5, 'Great communication.', target=self.designer)
+        self.review(4, 'Soft hand feel.', target=self.make_material('Merino'))
+        self.assertEqual(count(), before)
@@ -2,7 +2,9 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 # from rest_framework_nested import routers as nested_routers # If using nested for reviews on specific items
 
-from .views import ReviewViewSet, ReviewReplyViewSet, ListReviewsForObjectView
+from .views import (
+    ReviewViewSet, ReviewReplyViewSet, ListReviewsForObjectView, RatingSummaryView, RatingSummaryBatchView
+)
 
 router = DefaultRouter()
 router.register(r'reviews', ReviewViewSet, basename='review')
@@ -32,4 +34,11 @@ urlpatterns = [
         ListReviewsForObjectView.as_view(),
         name='reviews-for-object'
     ),
+
+    # Precomputed rating summary (histogram/average/count + most helpful reviews) for one object,
+    # and a batch variant for up to 100 objects of the same model
+    # e.g., /api/v1/reviews/summary/material/<object_id>/
+    # e.g., /api/v1/reviews/summary/material/?ids=<id1>,<id2>
+    path('summary/<str:model_name>/<str:object_id>/', RatingSummaryView.as_view(), name='rating-summary'),
+    path('summary/<str:model_name>/', RatingSummaryBatchView.as_view(), name='rating-summary-batch'),
 ]
\ No newline at end of file
@@ -1,19 +1,32 @@
-from rest_framework import viewsets, permissions, status, generics
+from rest_framework import viewsets, permissions, status, generics, views
 from rest_framework.response import Response
 from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.shortcuts import get_object_or_404
-from django.db.models import Q
+from django.utils import timezone
+from django.db import IntegrityError, transaction
+from django.db.models import F, Prefetch, Q
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.decorators import action
 
-from .models import Review, ReviewReply
-from .serializers import ReviewSerializer, ReviewReplySerializer
+from .models import Review, ReviewReply, ReviewHelpfulVote
+from .serializers import (
+    ReviewSerializer, ReviewReplySerializer, ReviewSnippetSerializer, RatingSummarySerializer, ModerationReviewSerializer
+)
+from .services import get_rating_summaries, ReviewModerationService
+from .registry import get_reviewable
 from .permissions import IsAuthorOrReadOnly, IsReviewOwnerOrAdminForReply # Create these
 
+# Replies with their authors in one query (a 'replies__author__profile' lookup adds two more once any reply exists)
+REPLIES_PREFETCH = Prefetch('replies', queryset=ReviewReply.objects.select_related('author__profile'))
+
+
 class ReviewViewSet(viewsets.ModelViewSet):
-    queryset = Review.objects.filter(is_approved=True).select_related('author__profile').prefetch_related('replies__author__profile')
+    queryset = Review.objects.filter(is_approved=True).select_related('author__profile').prefetch_related(REPLIES_PREFETCH)
     serializer_class = ReviewSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly]
+    # +1 for a cold ContentType cache
+    query_budgets = {'list': 4, 'retrieve': 3}
     filter_backends = [DjangoFilterBackend]
     filterset_fields = {
         'rating': ['exact'],
@@ -28,7 +41,7 @@ class ReviewViewSet(viewsets.ModelViewSet):
 
         # Allow admin/staff to see unapproved reviews
         if user.is_authenticated and user.is_staff:
-            qs = Review.objects.all().select_related('author__profile').prefetch_related('replies__author__profile')
+            qs = Review.objects.all().select_related('author__profile').prefetch_related(REPLIES_PREFETCH)
 
         # Specific filtering by content_type and object_id_str from URL kwargs if using nested routes (not current setup)
         # Example if nested:
@@ -62,10 +75,87 @@ class ReviewViewSet(viewsets.ModelViewSet):
     def toggle_approval(self, request, pk=None):
         review = self.get_object()
         review.is_approved = not review.is_approved
-        review.save(update_fields=['is_approved'])
+        review.moderation_status = 'approved' if review.is_approved else 'rejected'
+        review.moderated_by = request.user
+        review.moderated_at = timezone.now()
+        review.save(update_fields=['is_approved', 'moderation_status', 'moderated_by', 'moderated_at'])
         # Signal will be triggered by save to update average rating
         return Response(ReviewSerializer(review, context={'request': request}).data)
 
+    # --- Moderation queue (admin) ---
+
+    MAX_BULK_MODERATION = 5000
+
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser], url_path='moderation-queue')
+    def moderation_queue(self, request):
+        """Held reviews, highest spam score first. ?status=pending|approved|rejected, ?min_score=N."""
+        moderation_status = request.query_params.get('status', 'pending')
+        qs = Review.objects.filter(moderation_status=moderation_status).select_related('author', 'content_type')
+        min_score = request.query_params.get('min_score')
+        if min_score and min_score.isdigit():
+            qs = qs.filter(spam_score__gte=int(min_score))
+        page = self.paginate_queryset(qs.order_by('-spam_score', '-created_at'))
+        return self.get_paginated_response(ModerationReviewSerializer(page, many=True).data)
+
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAdminUser], url_path='bulk-approve')
+    def bulk_approve(self, request):
+        return self._bulk_moderate(request, 'approved')
+
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAdminUser], url_path='bulk-reject')
+    def bulk_reject(self, request):
+        return self._bulk_moderate(request, 'rejected')
+
+    def _bulk_moderate(self, request, moderation_status):
+        """
+        Body: {"ids": [...]} (up to MAX_BULK_MODERATION) or {"text_hash": "..."} to act on every copy
+        of one duplicated text. One UPDATE plus one aggregate recompute per affected target.
+        """
+        ids = request.data.get('ids')
+        text_hash = request.data.get('text_hash')
+        if ids is not None:
+            if not isinstance(ids, list) or not ids:
+                return Response({"error": "'ids' must be a non-empty list."}, status=status.HTTP_400_BAD_REQUEST)
+            if len(ids) > self.MAX_BULK_MODERATION:
+                return Response(
+                    {"error": f"At most {self.MAX_BULK_MODERATION} ids per request."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            filters = {'pk__in': ids}
+        elif text_hash:
+            filters = {'text_hash': text_hash}
+        else:
+            return Response({"error": "Provide 'ids' or 'text_hash'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            queryset = Review.objects.filter(**filters)
+            result = ReviewModerationService().set_status(queryset, moderation_status, moderator=request.user)
+        except (ValueError, TypeError, DjangoValidationError):
+            return Response({"error": "Invalid review ids."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result)
+
+    # POST marks a review as helpful, DELETE takes the vote back. One vote per user per review.
+    @action(detail=True, methods=['post', 'delete'], permission_classes=[permissions.IsAuthenticated], url_path='helpful')
+    def helpful(self, request, pk=None):
+        review = self.get_object()
+        if review.author_id == request.user.id:
+            return Response({"error": "You cannot vote on your own review."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if request.method == 'POST':
+            try:
+                with transaction.atomic():
+                    ReviewHelpfulVote.objects.create(review=review, user=request.user)
+                    Review.objects.filter(pk=review.pk).update(helpful_count=F('helpful_count') + 1)
+            except IntegrityError:
+                pass # Already voted; voting is idempotent
+        else:
+            with transaction.atomic():
+                deleted, _ = ReviewHelpfulVote.objects.filter(review=review, user=request.user).delete()
+                if deleted:
+                    Review.objects.filter(pk=review.pk).update(helpful_count=F('helpful_count') - 1)
+
+        review.refresh_from_db(fields=['helpful_count'])
+        return Response({'id': review.id, 'helpful_count': review.helpful_count})
+
 
 class ReviewReplyViewSet(viewsets.ModelViewSet):
     queryset = ReviewReply.objects.all().select_related('author__profile', 'review__author')
@@ -111,16 +201,85 @@ class ListReviewsForObjectView(generics.ListAPIView):
         model_name = self.kwargs.get('model_name').lower()
         object_id = self.kwargs.get('object_id') # This will be a string
 
-        try:
-            content_type = ContentType.objects.get(model=model_name)
-            # Fetch the actual object to ensure it exists before listing reviews (optional but good practice)
-            # model_class = content_type.model_class()
-            # get_object_or_404(model_class, pk=object_id)
-        except ContentType.DoesNotExist:
+        reviewable = get_reviewable(model_name)
+        if reviewable is None:
             return Review.objects.none() # Or raise Http404
+        target_value = reviewable.target_value(object_id)
+        if target_value is None:
+            return Review.objects.none()
 
+        # Filter on the typed reviewed_* column (native key type, indexed) rather than object_id_str
         return Review.objects.filter(
-            content_type=content_type,
-            object_id_str=str(object_id), # Ensure object_id is string for GFK
-            is_approved=True
-        ).select_related('author__profile').prefetch_related('replies__author__profile')
\ No newline at end of file
+            content_type=reviewable.content_type,
+            is_approved=True,
+            **{reviewable.target_field: target_value},
+        ).select_related('author__profile').prefetch_related(REPLIES_PREFETCH)
+
+
+def _content_type_for_model_name(model_name):
+    reviewable = get_reviewable(model_name)
+    return reviewable.content_type if reviewable else None
+
+
+# Example URL: /api/v1/reviews/summary/{model_name}/{object_id}/
+class RatingSummaryView(views.APIView):
+    """
+    Star histogram, count and average for one object, read from its precomputed RatingAggregate
+    row, plus its most helpful reviews. Replaces paging through every review to build a product page.
+    """
+    permission_classes = [permissions.AllowAny]
+    MOST_HELPFUL_LIMIT = 3
+
+    def get(self, request, model_name, object_id):
+        content_type = _content_type_for_model_name(model_name)
+        if content_type is None:
+            return Response({"error": f"Unknown model '{model_name}'."}, status=status.HTTP_404_NOT_FOUND)
+
+        summary = get_rating_summaries(content_type, [object_id])[str(object_id)]
+        most_helpful = Review.objects.filter(
+            content_type=content_type, object_id_str=str(object_id), is_approved=True
+        ).select_related('author').order_by('-helpful_count', '-created_at')[:self.MOST_HELPFUL_LIMIT]
+
+        data = RatingSummarySerializer(summary).data
+        data['most_helpful_reviews'] = ReviewSnippetSerializer(most_helpful, many=True).data
+        return Response(data)
+
+
+# Example URL: /api/v1/reviews/summary/material/?ids=<uuid>,<uuid>,...
+class RatingSummaryBatchView(views.APIView):
+    """
+    Rating summaries (histogram, count, average) for up to MAX_BATCH_SIZE objects of one model in a
+    single query, e.g. for catalog grids. Ids come from `?ids=a,b,c` (GET) or `{"ids": [...]}` (POST).
+    """
+    permission_classes = [permissions.AllowAny]
+    MAX_BATCH_SIZE = 100
+
+    def get(self, request, model_name):
+        raw_ids = request.query_params.get('ids', '')
+        return self._summaries(model_name, [object_id for object_id in raw_ids.split(',') if object_id.strip()])
+
+    def post(self, request, model_name):
+        object_ids = request.data.get('ids')
+        if not isinstance(object_ids, list):
+            return Response({"error": "'ids' must be a list."}, status=status.HTTP_400_BAD_REQUEST)
+        return self._summaries(model_name, object_ids)
+
+    def _summaries(self, model_name, object_ids):
+        content_type = _content_type_for_model_name(model_name)
+        if content_type is None:
+            return Response({"error": f"Unknown model '{model_name}'."}, status=status.HTTP_404_NOT_FOUND)
+        # Keep request order, drop duplicates
+        object_ids = list(dict.fromkeys(str(object_id).strip() for object_id in object_ids))
+        if not object_ids:
+            return Response({"error": "Provide at least one id."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(object_ids) > self.MAX_BATCH_SIZE:
+            return Response(
+                {"error": f"At most {self.MAX_BATCH_SIZE} ids per request."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        summaries = get_rating_summaries(content_type, object_ids)
+        return Response({
+            'content_type_model': content_type.model,
+            'results': RatingSummarySerializer(summaries.values(), many=True).data,
+        })
@@ -13,4 +13,17 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'marketplace_api.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after Django is set up
+from apps.collaborations.streaming import STREAM_PATH, lifespan, message_stream  # noqa: E402
+
+
+async def application(scope, receive, send):
+    # The message stream (Server-Sent Events) is served outside Django's request cycle so idle
+    # connections hold no thread; everything else goes to Django.
+    if scope['type'] == 'http' and scope['path'] == STREAM_PATH:
+        return await message_stream(scope, receive, send)
+    if scope['type'] == 'lifespan':
+        return await lifespan(scope, receive, send)
+    return await django_application(scope, receive, send)
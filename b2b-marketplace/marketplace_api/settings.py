@@ -53,6 +53,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'apps.core.middleware.RequestInstrumentationMiddleware', # Outermost, so it sees every query of the request
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -95,6 +96,19 @@ DATABASES = {
     }
 }
 
+# Cache
+# Token snapshots, project memberships and download purchases are cached here and invalidated from
+# whichever worker handled the change, so production needs a cache shared by all workers
+# (CACHE_REDIS_URL). Without one, Django's per-process local-memory cache is used and they fall back
+# to per-process/per-request copies (see apps.core.utils.cache_is_shared and `check --deploy`).
+if os.getenv('CACHE_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('CACHE_REDIS_URL'),
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -139,6 +153,12 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Set MEDIA_STORAGE_BACKEND=apps.core.storage.ContentAddressedStorage to store uploads once per distinct
+# content, where MEDIA_ROOT can hold hard links (checked by core.E001), then run `manage.py dedupe_media`.
+STORAGES = {
+    'default': {'BACKEND': os.getenv('MEDIA_STORAGE_BACKEND', 'django.core.files.storage.FileSystemStorage')},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'}, # As before: Django 5.1+ ignores STATICFILES_STORAGE
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -147,7 +167,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'apps.accounts.authentication.CachedTokenAuthentication', # TokenAuthentication with a user snapshot cache
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -190,3 +210,87 @@ LOGGING = {
         'level': 'INFO',
     },
 }
+
+# Currency
+# Prices in other currencies are normalized into this one via core.ExchangeRate.
+BASE_CURRENCY = os.getenv('BASE_CURRENCY', 'USD')
+
+# Payouts
+# Fraction of each completed sale kept by the platform, e.g. 0.10 for 10%.
+PLATFORM_FEE_RATE = os.getenv('PLATFORM_FEE_RATE', '0.10')
+
+# Reviews
+# Reviews whose write-time spam score (0-100) reaches this are held in the moderation queue.
+REVIEW_SPAM_HOLD_THRESHOLD = int(os.getenv('REVIEW_SPAM_HOLD_THRESHOLD', '50'))
+
+# Request instrumentation
+# Per-request query count / SQL time / serializer time, aggregated at /api/v1/core/metrics/requests/.
+# Off by default; when on, a fraction of requests (REQUEST_INSTRUMENTATION_SAMPLE_RATE, 0-1) is measured.
+REQUEST_INSTRUMENTATION = os.getenv('REQUEST_INSTRUMENTATION', 'False') == 'True'
+REQUEST_INSTRUMENTATION_SAMPLE_RATE = float(os.getenv('REQUEST_INSTRUMENTATION_SAMPLE_RATE', '1.0'))
+REQUEST_INSTRUMENTATION_MAX_SAMPLES = int(os.getenv('REQUEST_INSTRUMENTATION_MAX_SAMPLES', '500')) # Per endpoint
+# Raise when a request exceeds its view's `query_budgets` (turned on by apps.core.testing in tests)
+QUERY_BUDGET_ENFORCE = os.getenv('QUERY_BUDGET_ENFORCE', 'False') == 'True'
+# Wall-clock baseline for the query budget test suites (apps.core.testing). A timing counts as a
+# regression above baseline * TOLERANCE + SLACK_MS; set PERF_BASELINE_STRICT=True to fail on it.
+# Timings are machine-specific, so the file is untracked: PERF_BASELINE_UPDATE=True records one.
+PERF_BASELINE_PATH = os.getenv('PERF_BASELINE_PATH', BASE_DIR / 'perf_baseline.json')
+PERF_BASELINE_TOLERANCE = float(os.getenv('PERF_BASELINE_TOLERANCE', '2.0'))
+PERF_BASELINE_SLACK_MS = float(os.getenv('PERF_BASELINE_SLACK_MS', '10'))
+
+# Resumable chunked uploads (apps.core.uploads)
+# Clients may pick a chunk size between UPLOAD_MIN_CHUNK_SIZE and UPLOAD_MAX_CHUNK_SIZE bytes. Chunks
+# are kept under UPLOAD_PART_DIR in default storage until the upload completes; unfinished uploads
+# are discarded UPLOAD_SESSION_TTL seconds after they start (manage.py prune_uploads).
+UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE', str(8 * 1024 * 1024)))
+UPLOAD_MIN_CHUNK_SIZE = int(os.getenv('UPLOAD_MIN_CHUNK_SIZE', str(256 * 1024)))
+UPLOAD_MAX_CHUNK_SIZE = int(os.getenv('UPLOAD_MAX_CHUNK_SIZE', str(64 * 1024 * 1024)))
+UPLOAD_MAX_SIZE = int(os.getenv('UPLOAD_MAX_SIZE', str(5 * 1024 * 1024 * 1024)))
+UPLOAD_SESSION_TTL = int(os.getenv('UPLOAD_SESSION_TTL', str(24 * 3600)))
+UPLOAD_PART_DIR = os.getenv('UPLOAD_PART_DIR', 'uploads/partial')
+
+# Authorized downloads (apps.core.downloads)
+# MEDIA_SENDFILE hands the transfer to the front proxy: 'x-accel-redirect' (nginx, with an internal
+# location at MEDIA_SENDFILE_URL aliased to MEDIA_ROOT) or 'x-sendfile' (Apache/lighttpd). Empty:
+# Django streams the file itself, with Range support. Private files live under MEDIA_ROOT/private/,
+# which the proxy must not serve at MEDIA_URL (only images are public there). Purchased designs are
+# cached per buyer when the cache is shared (CACHE_REDIS_URL), otherwise looked up on each download.
+MEDIA_SENDFILE = os.getenv('MEDIA_SENDFILE', '')
+MEDIA_SENDFILE_URL = os.getenv('MEDIA_SENDFILE_URL', '/protected-media/')
+DOWNLOAD_PURCHASES_CACHE_TTL = int(os.getenv('DOWNLOAD_PURCHASES_CACHE_TTL', '300'))
+
+# Token authentication cache (apps.accounts.authentication.CachedTokenAuthentication)
+# Snapshots live in the shared cache for TOKEN_AUTH_CACHE_TTL seconds and in a per-process LRU for
+# TOKEN_AUTH_CACHE_LOCAL_TTL seconds, which bounds how long other processes may still see a revoked token.
+# With a process-local cache (no CACHE_REDIS_URL) only the LRU is used.
+TOKEN_AUTH_CACHE_TTL = int(os.getenv('TOKEN_AUTH_CACHE_TTL', '300'))
+TOKEN_AUTH_CACHE_LOCAL_TTL = int(os.getenv('TOKEN_AUTH_CACHE_LOCAL_TTL', '5'))
+TOKEN_AUTH_CACHE_MAX_ENTRIES = int(os.getenv('TOKEN_AUTH_CACHE_MAX_ENTRIES', '10000'))
+
+# Project membership index (apps.collaborations.membership)
+# Each user's project roles are cached for this many seconds; membership changes invalidate them.
+# Needs a shared cache (CACHE_REDIS_URL); otherwise roles are only kept for the current request.
+PROJECT_MEMBERSHIP_CACHE_TTL = int(os.getenv('PROJECT_MEMBERSHIP_CACHE_TTL', '300'))
+
+# Project task boards (apps.collaborations.services.TaskBoardService)
+# Deleted tasks are remembered this many seconds for ?since= refreshes; older cursors get a full reload.
+BOARD_TOMBSTONE_RETENTION = int(os.getenv('BOARD_TOMBSTONE_RETENTION', str(7 * 24 * 3600)))
+# next_since is taken this many seconds before the board was read, so tasks saved by transactions
+# still open at that moment are picked up by the next refresh (cards may then repeat; apply them by id).
+BOARD_SINCE_OVERLAP = int(os.getenv('BOARD_SINCE_OVERLAP', '5'))
+
+# Activity feed (apps.collaborations.services.ActivityFeedService)
+# Events of projects with up to ACTIVITY_FANOUT_MAX_MEMBERS members are copied into each member's feed
+# when written; larger projects' events are read at load time. Events older than ACTIVITY_RETENTION
+# seconds are deleted by `manage.py prune_activity`.
+ACTIVITY_FANOUT_MAX_MEMBERS = int(os.getenv('ACTIVITY_FANOUT_MAX_MEMBERS', '100'))
+ACTIVITY_RETENTION = int(os.getenv('ACTIVITY_RETENTION', str(90 * 24 * 3600)))
+
+# Real-time messaging (apps.collaborations.realtime / streaming)
+# InProcessBroker needs the API and the streams in one ASGI process; use
+# apps.collaborations.realtime.RedisBroker with several workers.
+REALTIME_BACKEND = os.getenv('REALTIME_BACKEND', 'apps.collaborations.realtime.InProcessBroker')
+REALTIME_REDIS_URL = os.getenv('REALTIME_REDIS_URL', 'redis://localhost:6379/0')
+REALTIME_REDIS_PREFIX = os.getenv('REALTIME_REDIS_PREFIX', 'marketplace:realtime:')
+REALTIME_QUEUE_SIZE = int(os.getenv('REALTIME_QUEUE_SIZE', '100')) # Events a stream may fall behind before it is reset
+REALTIME_HEARTBEAT = int(os.getenv('REALTIME_HEARTBEAT', '15')) # Seconds between keep-alive comments
@@ -2,10 +2,15 @@
 """
 marketplace_api URL Configuration
 """
+import re
+
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
+from django.views.static import serve
+
+from apps.core.downloads import PRIVATE_MEDIA_PREFIX
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -16,6 +21,7 @@ urlpatterns = [
     path('api/v1/reviews/', include('apps.reviews_ratings.urls')),
     path('api/v1/community/', include('apps.community_engagement.urls')),
     path('api/v1/payments/', include('apps.payments_monetization.urls')),
+    path('api/v1/core/', include('apps.core.urls')),
     # path('api/v1/analytics/', include('apps.analytics_ai.urls')), # Add if analytics_ai has URLs
 
     # For DRF browsable API login/logout
@@ -23,7 +29,11 @@ urlpatterns = [
 ]
 
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    # Private files (apps.core.downloads) only through the download endpoint, as behind the front proxy
+    urlpatterns += [re_path(
+        r'^%s(?!%s)(?P<path>.*)$' % (re.escape(settings.MEDIA_URL.lstrip('/')), re.escape(PRIVATE_MEDIA_PREFIX)), serve,
+        {'document_root': settings.MEDIA_ROOT},
+    )]
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
 
 # Optional: Add a health check endpoint